@@ -8,9 +8,18 @@ import argparse
 import json
 import logging
 import sys
+import time
 from pathlib import Path
 
+from luca_core.config import load_config
+from luca_core.config.loader import ConfigurationError
+from luca_core.config.schemas import ComponentConfig
 from luca_core.context import factory
+from luca_core.context.migrate import (
+    DEFAULT_MIGRATION_BATCH_SIZE,
+    MigrationReport,
+    migrate,
+)
 from luca_core.manager.manager import LucaManager
 from luca_core.registry import registry
 
@@ -38,8 +47,15 @@ def get_status(db_path: Path) -> dict:
         # Ensure the directory exists
         db_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Create context store (synchronous version)
-        context_store = factory.create_context_store("sqlite", str(db_path))
+        # Create context store (synchronous version), with the configured
+        # settings
+        try:
+            components = load_config().components
+        except ConfigurationError as e:
+            logger.warning(f"Using the default context store settings: {e}")
+            components = ComponentConfig()
+        config = components.context_store.model_dump(mode="json")
+        context_store = factory.create_context_store("sqlite", str(db_path), config)
 
         # Create manager
         manager = LucaManager(
@@ -66,6 +82,48 @@ def get_status(db_path: Path) -> dict:
         }
 
 
+def run_migrate(args: argparse.Namespace) -> int:
+    """Run the migrate command.
+
+    Progress goes to stderr every ``--report-interval`` seconds, the final
+    report to stdout as JSON.
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        Exit code
+    """
+    last_report = time.monotonic()
+
+    def report_progress(report: MigrationReport) -> None:
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report < args.report_interval:
+            return
+        last_report = now
+        done = report.rows / report.total if report.total else 1.0
+        print(
+            f"{report.step}: {report.rows}/{report.total} rows ({done:.1%}), "
+            f"{report.rows_per_s:.0f} rows/s, {report.mb_per_s:.1f} MB/s",
+            file=sys.stderr,
+        )
+
+    try:
+        report = migrate(
+            str(args.source),
+            str(args.destination),
+            batch_size=args.batch_size,
+            restart=args.restart,
+            progress=report_progress,
+        )
+    except ValueError as e:
+        logger.error(f"Migration failed: {e}")
+        return 1
+    print(json.dumps(report.as_dict()))
+    return 0
+
+
 def main():
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(
@@ -92,6 +150,36 @@ def main():
         help="Enable verbose logging",
     )
 
+    subparsers = parser.add_subparsers(dest="command")
+    migrate_parser = subparsers.add_parser(
+        "migrate",
+        help="Copy a context database between the ContextStore and "
+        "SQLiteContextStore layouts",
+    )
+    migrate_parser.add_argument("source", type=Path, help="Database to read")
+    migrate_parser.add_argument(
+        "destination",
+        type=Path,
+        help="Database to write, in the other layout; created if missing",
+    )
+    migrate_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_MIGRATION_BATCH_SIZE,
+        help=f"Rows per batch (default: {DEFAULT_MIGRATION_BATCH_SIZE})",
+    )
+    migrate_parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Start over instead of resuming from the destination's checkpoint",
+    )
+    migrate_parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between progress reports (default: 5)",
+    )
+
     args = parser.parse_args()
 
     # Configure logging level
@@ -99,6 +187,9 @@ def main():
         logging.getLogger().setLevel(logging.DEBUG)
 
     # Handle commands
+    if args.command == "migrate":
+        return run_migrate(args)
+
     if args.status:
         status = get_status(args.db_path)
         print(json.dumps(status))
@@ -17,6 +17,8 @@ class StorageType(str, Enum):
     """Storage backend types for ContextStore."""
 
     SQLITE = "sqlite"
+    SQLITE_SHARDED = "sqlite_sharded"
+    LOG = "log"
     POSTGRES = "postgres"
     CHROMA = "chroma"
 
@@ -63,6 +65,44 @@ class ContextStoreConfig(BaseModel):
         default=300, ge=0, description="Backup interval in seconds"
     )
     connection_params: Dict[str, Any] = Field(default_factory=dict)
+    write_behind: Optional[Dict[str, Any]] = Field(
+        default=None, description="Group commit thresholds; enables write-behind"
+    )
+    backup: Dict[str, Any] = Field(
+        default_factory=dict, description="Online backup pacing and retention"
+    )
+    codecs: Dict[str, Any] = Field(
+        default_factory=dict, description="Payload codec settings by namespace"
+    )
+    search_namespaces: Optional[List[str]] = Field(
+        default=None, description="Namespaces kept in the full-text index"
+    )
+    cache: Optional[Dict[str, Any]] = Field(
+        default=None, description="Read-through fetch cache bounds and TTLs"
+    )
+    recall: Optional[Dict[str, Any]] = Field(
+        default=None, description="Vector index settings for semantic recall"
+    )
+    retention: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="TTL policies by namespace; under ComponentConfig, unset "
+        "means the default namespaces expire after error_retention_days",
+    )
+    change_log: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Change log settings (keep, prune_every); enables the log "
+        "other processes tail",
+    )
+    shards: Optional[Dict[str, int]] = Field(
+        default=None,
+        description="Hash partitions by namespace kept in its own database "
+        "(type sqlite_sharded)",
+    )
+    log: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Segment size, syncing and compaction of the log store "
+        "(type log)",
+    )
 
     @field_validator("path", mode="before")
     @classmethod
@@ -97,6 +137,20 @@ class ComponentConfig(BaseModel):
     tool_registry: ToolRegistryConfig = Field(default_factory=ToolRegistryConfig)
     error_schema: ErrorSchemaConfig = Field(default_factory=ErrorSchemaConfig)
 
+    @model_validator(mode="after")
+    def apply_error_retention(self) -> "ComponentConfig":
+        """Default the context store's retention TTL to error_retention_days.
+
+        Without retention settings the default namespaces (see
+        luca_core.context.retention) expire after error_retention_days.
+        """
+        retention = self.context_store.retention
+        if retention is None:
+            self.context_store.retention = retention = {}
+        if "days" not in retention:
+            retention["days"] = self.error_schema.error_retention_days
+        return self
+
 
 class SandboxConfig(BaseModel):
     """Configuration for sandbox execution."""
@@ -5,11 +5,37 @@ for persistent storage of context data across conversations and sessions.
 """
 
 from luca_core.context.base_store import BaseContextStore
+from luca_core.context.cache import CachedContextStore
+from luca_core.context.changes import ChangeEvent, ChangeFeedOverflow, Subscription
+from luca_core.context.embeddings import Embedder, HashingEmbedder
 from luca_core.context.factory import create_context_store
+from luca_core.context.log_store import LogContextStore
+from luca_core.context.pagination import Page
+from luca_core.context.recall import MessageRecall
+from luca_core.context.search import SearchHit
+from luca_core.context.sharded import ShardedContextStore
 from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.context.transactions import Transaction
+from luca_core.context.vector_index import VectorIndex
+from luca_core.context.versions import VersionConflict, Versioned
 
 __all__ = [
     "BaseContextStore",
+    "CachedContextStore",
+    "ChangeEvent",
+    "ChangeFeedOverflow",
+    "Embedder",
+    "HashingEmbedder",
+    "LogContextStore",
+    "MessageRecall",
+    "Page",
     "SQLiteContextStore",
+    "SearchHit",
+    "ShardedContextStore",
+    "Subscription",
+    "Transaction",
+    "VectorIndex",
+    "VersionConflict",
+    "Versioned",
     "create_context_store",
 ]
@@ -5,11 +5,59 @@ ensuring consistent behavior across different storage backends.
 """
 
 import abc
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+)
 
 from pydantic import BaseModel
 
+from luca_core.context.changes import (
+    DEFAULT_QUEUE_SIZE,
+    DELETE,
+    DROP_OLDEST,
+    STORE,
+    UPDATE,
+    ChangeFeed,
+    Subscription,
+)
+from luca_core.context.metrics import (
+    DEFAULT_PERCENTILES,
+    aggregate_records,
+    metric_columns,
+    to_arrays,
+)
+from luca_core.context.pagination import (
+    Page,
+    decode_offset_cursor,
+    encode_offset_cursor,
+)
+from luca_core.context.projection import project_model, resolve_fields
+from luca_core.context.search import (
+    DEFAULT_SEARCH_NAMESPACES,
+    SearchHit,
+    hit_from_values,
+    query_words,
+)
+from luca_core.context.transactions import Transaction, validate_patch
+from luca_core.context.versions import (
+    DEFAULT_ATTEMPTS,
+    VersionConflict,
+    Versioned,
+    retry_delay,
+)
 from luca_core.schemas import (
     ClarificationRequest,
     Message,
@@ -62,12 +110,23 @@ class BaseContextStore(abc.ABC):
         pass
 
     @abc.abstractmethod
-    async def update(self, model: BaseModel, namespace: str = "default") -> None:
+    async def update(
+        self,
+        model: BaseModel,
+        namespace: str = "default",
+        expected_version: Optional[int] = None,
+    ) -> None:
         """Update an existing model instance.
 
         Args:
             model: The model instance to update
             namespace: Optional namespace for organization
+            expected_version: Only update if this is still the stored
+                version (see fetch_versioned()); only passed to backends
+                that track versions
+
+        Raises:
+            VersionConflict: If the stored version is not expected_version
         """
         pass
 
@@ -118,7 +177,9 @@ class BaseContextStore(abc.ABC):
 
         Args:
             model_cls: The model class to query
-            query: A dictionary of key-value pairs to filter by
+            query: A dictionary of field lookups to filter by; keys may carry
+                an operator suffix such as ``__in`` or ``__gte`` (see
+                luca_core.context.query)
             namespace: Optional namespace for organization
             limit: Maximum number of items to return
             offset: Offset for pagination
@@ -128,6 +189,474 @@ class BaseContextStore(abc.ABC):
         """
         pass
 
+    async def project(
+        self,
+        model_cls: Type[BaseModel],
+        fields: Sequence[str],
+        query: Optional[Dict[str, Any]] = None,
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[BaseModel]:
+        """Select some fields of model instances, ordered like query().
+
+        This default projects the models returned by query(); backends that
+        can read single fields of stored documents override it.
+
+        Args:
+            model_cls: The model class to query
+            fields: Names of the fields to return
+            query: Field lookups to filter by, as in query()
+            namespace: Optional namespace for organization
+            limit: Maximum number of items to return
+            offset: Offset for pagination
+
+        Returns:
+            Instances of luca_core.context.projection.projection_model(),
+            holding only the requested fields
+
+        Raises:
+            ValueError: If a field is not a field of the model
+        """
+        fields = resolve_fields(model_cls, fields)
+        models = await self.query(model_cls, query or {}, namespace, limit, offset)
+        return [project_model(model, fields) for model in models]
+
+    def model_key(self, model: BaseModel) -> str:
+        """Return the primary key a model instance is stored under.
+
+        fetch() and delete() take this key. Models without an ``id`` field
+        get a key unique to the instance.
+        """
+        return getattr(model, "id", str(id(model)))
+
+    # Cursor pagination
+    #
+    # Pages are ordered like list() and query(). The defaults below page with
+    # offsets hidden in the cursor, so every backend supports the API; stores
+    # that can seek by sort key override them with keyset pagination.
+
+    async def list_page(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """List one page of model instances of a specific type.
+
+        Args:
+            model_cls: The model class to list
+            namespace: Optional namespace for organization
+            limit: Maximum number of items to return
+            cursor: ``next_cursor`` of the previous page; None for the first
+
+        Returns:
+            The page, with a cursor for the next one unless it is the last
+
+        Raises:
+            ValueError: If the cursor was not produced by this store, or
+                limit is not positive
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        offset = decode_offset_cursor(cursor)
+        items = await self.list(model_cls, namespace, limit + 1, offset)
+        return self._offset_page(items, limit, offset)
+
+    async def query_page(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """Query one page of model instances based on criteria.
+
+        Args:
+            model_cls: The model class to query
+            query: Field lookups, as for query()
+            namespace: Optional namespace for organization
+            limit: Maximum number of items to return
+            cursor: ``next_cursor`` of the previous page; None for the first
+
+        Returns:
+            The page, with a cursor for the next one unless it is the last
+
+        Raises:
+            ValueError: If the cursor was not produced by this store, or
+                limit is not positive
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        offset = decode_offset_cursor(cursor)
+        items = await self.query(model_cls, query, namespace, limit + 1, offset)
+        return self._offset_page(items, limit, offset)
+
+    @staticmethod
+    def _offset_page(items: List[T], limit: int, offset: int) -> Page[T]:
+        """Build a page from ``limit + 1`` items fetched at ``offset``."""
+        if len(items) > limit:
+            return Page(items[:limit], encode_offset_cursor(offset + limit))
+        return Page(items)
+
+    # Streaming
+    #
+    # The iterators yield results in list() order while holding at most one
+    # batch in memory. Breaking out of the loop early is safe: no cursor or
+    # connection is held between batches.
+
+    async def aiter_models(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[T]:
+        """Stream model instances, fetching them in batches.
+
+        Args:
+            model_cls: The model class to stream
+            namespace: Optional namespace for organization
+            query: Optional field lookups, as for query()
+            batch_size: Number of rows fetched per round trip
+
+        Yields:
+            Model instances, newest first
+        """
+        cursor = None
+        while True:
+            page = await self.query_page(
+                model_cls, query or {}, namespace, batch_size, cursor
+            )
+            for item in page.items:
+                yield item
+            cursor = page.next_cursor
+            if cursor is None:
+                return
+
+    async def aiter_raw(
+        self,
+        model_cls: Type[BaseModel],
+        namespace: str = "default",
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[str]:
+        """Stream the stored JSON documents without building models.
+
+        Backends that keep JSON documents return them as stored, skipping
+        model validation entirely; this default serializes the models from
+        aiter_models().
+
+        Args:
+            model_cls: The model class to stream
+            namespace: Optional namespace for organization
+            query: Optional field lookups, as for query()
+            batch_size: Number of rows fetched per round trip
+
+        Yields:
+            JSON documents, newest first
+        """
+        async for model in self.aiter_models(model_cls, namespace, query, batch_size):
+            yield model.model_dump_json()
+
+    # Full-text search
+
+    # Model class stored in each searchable namespace
+    SEARCH_MODELS: Dict[str, Type[BaseModel]] = {
+        "conversation": Message,
+        "task_results": TaskResult,
+    }
+
+    async def search_messages(
+        self, query: str, limit: int = 20, namespace: Optional[str] = None
+    ) -> List[SearchHit]:
+        """Search the text of conversation messages and task results.
+
+        Every word of the query must appear in a result. This default scans
+        the namespaces with aiter_models() and ranks by the number of
+        occurrences; backends with a full-text index override it.
+
+        Args:
+            query: Words to search for
+            limit: Maximum number of results to return
+            namespace: Namespace to search; all searchable namespaces
+                (``conversation`` and ``task_results``) when omitted
+
+        Returns:
+            The best matches, best first
+
+        Raises:
+            ValueError: If the namespace is not searchable, or limit is not
+                positive
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        namespaces = DEFAULT_SEARCH_NAMESPACES if namespace is None else (namespace,)
+        for name in namespaces:
+            if name not in self.SEARCH_MODELS:
+                raise ValueError(f"Namespace is not searchable: {name}")
+        words = query_words(query)
+        if not words:
+            return []
+
+        hits = []
+        for name in namespaces:
+            model_cls = self.SEARCH_MODELS[name]
+            async for model in self.aiter_models(model_cls, name):
+                row_key = (name, model_cls.__name__, self.model_key(model))
+                hit = hit_from_values(row_key, dict(model), words)
+                if hit is not None:
+                    hits.append(hit)
+        hits.sort(key=lambda hit: hit.rank)
+        return hits[:limit]
+
+    async def flush(self) -> None:
+        """Wait until every write issued so far is durable.
+
+        Backends that acknowledge writes before committing them (such as the
+        SQLite store in write-behind mode) override this; for the rest every
+        awaited write is already durable.
+        """
+
+    # Change feed
+    #
+    # Backends publish their committed writes to the store's ChangeFeed; see
+    # luca_core.context.changes. Backends that do not publish leave their
+    # subscribers waiting.
+
+    @property
+    def change_feed(self) -> ChangeFeed:
+        """The feed committed changes are published to, created on first use."""
+        feed = self.__dict__.get("_change_feed")
+        if feed is None:
+            feed = self.__dict__["_change_feed"] = ChangeFeed()
+        return feed
+
+    @change_feed.setter
+    def change_feed(self, feed: ChangeFeed) -> None:
+        """Publish to another store's feed, such as a wrapping store's."""
+        self.__dict__["_change_feed"] = feed
+
+    def subscribe(
+        self,
+        namespaces: Optional[Iterable[str]] = None,
+        maxsize: int = DEFAULT_QUEUE_SIZE,
+        overflow: str = DROP_OLDEST,
+    ) -> Subscription:
+        """Subscribe to the changes committed from now on.
+
+        Args:
+            namespaces: Namespaces to receive changes of; all when omitted
+            maxsize: Events queued for the subscriber at most
+            overflow: What to do when the queue is full: ``drop_oldest``,
+                ``drop_newest`` or ``overflow`` (see
+                luca_core.context.changes)
+
+        Returns:
+            The subscription; iterate over it for ChangeEvent instances and
+            close() it when done
+
+        Raises:
+            ValueError: If maxsize is not positive or the policy is unknown
+        """
+        return self.change_feed.subscribe(namespaces, maxsize, overflow)
+
+    # Versions
+    #
+    # Backends that track versions override fetch_versioned() and accept
+    # update()'s expected_version; see luca_core.context.versions.
+
+    async def fetch_versioned(
+        self, model_cls: Type[T], key: str, namespace: str = "default"
+    ) -> Optional[Versioned[T]]:
+        """Fetch a model instance with its version.
+
+        Args:
+            model_cls: The model class to fetch
+            key: The primary key of the model
+            namespace: Optional namespace for organization
+
+        Returns:
+            The model and its version if found, None otherwise. This default
+            reports no version, for backends that do not track them.
+        """
+        model = await self.fetch(model_cls, key, namespace)
+        return Versioned(model, None) if model is not None else None
+
+    async def modify(
+        self,
+        model_cls: Type[T],
+        key: str,
+        change: Callable[[T], None],
+        namespace: str = "default",
+        attempts: int = DEFAULT_ATTEMPTS,
+    ) -> Optional[T]:
+        """Read a model, change it and write it back, retrying on conflicts.
+
+        The update is a compare-and-swap against the version that was read,
+        so changes made meanwhile by another process are never overwritten:
+        the model is read again and ``change`` applied to the new state.
+
+        Args:
+            model_cls: The model class to modify
+            key: The primary key of the model
+            change: Changes the model in place; may run more than once
+            namespace: Optional namespace for organization
+            attempts: Read-modify-write cycles tried before giving up
+
+        Returns:
+            The model as written, or None if it is not stored
+
+        Raises:
+            VersionConflict: If every attempt conflicted
+        """
+        for attempt in range(attempts):
+            current = await self.fetch_versioned(model_cls, key, namespace)
+            if current is None:
+                return None
+            model = current.model
+            change(model)
+            if current.version is None:
+                await self.update(model, namespace)
+                return model
+            try:
+                await self.update(model, namespace, expected_version=current.version)
+                return model
+            except VersionConflict:
+                if attempt + 1 >= attempts:
+                    raise
+                await asyncio.sleep(retry_delay(attempt))
+        return None
+
+    # Transactions
+    #
+    # See luca_core.context.transactions. Backends that can apply several
+    # writes atomically override apply() and patch().
+
+    @asynccontextmanager
+    async def transact(self) -> AsyncIterator[Transaction]:
+        """Collect writes and apply them together when the block exits.
+
+        Nothing is written if the block raises.
+
+        Yields:
+            The Transaction to add writes to
+
+        Raises:
+            VersionConflict: If an update's expected version is stale
+        """
+        transaction = Transaction()
+        yield transaction
+        await self.apply(transaction)
+
+    async def apply(self, transaction: Transaction) -> None:
+        """Apply the writes of a transaction.
+
+        This default applies them one by one, so it is not atomic.
+
+        Args:
+            transaction: The writes to apply, in order
+        """
+        for operation in transaction.operations:
+            namespace = operation.namespace
+            if operation.kind == STORE:
+                await self.store_many(operation.models, namespace)
+            elif operation.kind == UPDATE and operation.expected_version is not None:
+                await self.update(
+                    operation.models[0], namespace, operation.expected_version
+                )
+            elif operation.kind == UPDATE:
+                await self.update_many(operation.models, namespace)
+            elif operation.kind == DELETE:
+                assert operation.model_cls is not None
+                await self.delete_many(operation.model_cls, operation.keys, namespace)
+            else:
+                assert operation.model_cls and operation.values is not None
+                await self.patch(
+                    operation.model_cls,
+                    operation.keys[0],
+                    dict(operation.values),
+                    namespace,
+                )
+
+    async def patch(
+        self,
+        model_cls: Type[BaseModel],
+        key: str,
+        values: Dict[str, Any],
+        namespace: str = "default",
+    ) -> None:
+        """Set fields of a stored model; ignored if it is not stored.
+
+        This default reads the model and writes it back with modify().
+
+        Args:
+            model_cls: The model class to patch
+            key: The primary key of the model
+            values: New values by field name
+            namespace: Optional namespace for organization
+
+        Raises:
+            ValueError: If a field is not on the model
+            pydantic.ValidationError: If a value does not fit its field
+        """
+        validated = validate_patch(model_cls, values)
+
+        def _set(model: BaseModel) -> None:
+            for name, value in validated:
+                setattr(model, name, value)
+
+        await self.modify(model_cls, key, _set, namespace)
+
+    # Bulk operations
+    #
+    # Each call behaves like the matching single-model method applied to the
+    # items in order, so a later model with the same key wins. Backends that
+    # support transactions override these to apply the whole batch atomically
+    # in one commit; these defaults fall back to one call per item.
+
+    async def store_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Store several model instances.
+
+        Args:
+            models: The model instances to store
+            namespace: Optional namespace for organization
+        """
+        for model in models:
+            await self.store(model, namespace)
+
+    async def update_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Update several existing model instances.
+
+        Args:
+            models: The model instances to update
+            namespace: Optional namespace for organization
+        """
+        for model in models:
+            await self.update(model, namespace)
+
+    async def delete_many(
+        self,
+        model_cls: Type[BaseModel],
+        keys: Sequence[str],
+        namespace: str = "default",
+    ) -> None:
+        """Delete several model instances.
+
+        Args:
+            model_cls: The model class to delete
+            keys: The primary keys of the models
+            namespace: Optional namespace for organization
+        """
+        for key in keys:
+            await self.delete(model_cls, key, namespace)
+
     # Convenience methods for common operations
 
     async def get_conversation_history(self, limit: int = 10) -> List[Message]:
@@ -181,6 +710,78 @@ class BaseContextStore(abc.ABC):
         """
         await self.store(metric, namespace="metrics")
 
+    async def record_metrics(self, metrics: Sequence[MetricRecord]) -> None:
+        """Record several performance metrics.
+
+        Args:
+            metrics: The metrics to record
+        """
+        for metric in metrics:
+            await self.record_metric(metric)
+
+    async def get_metrics_for_task(self, task_id: str) -> List[MetricRecord]:
+        """Get the metrics recorded for a task.
+
+        Args:
+            task_id: The ID of the task
+
+        Returns:
+            The task's metrics, oldest first
+        """
+        metrics = [
+            metric
+            async for metric in self.aiter_models(
+                MetricRecord, "metrics", {"task_id": task_id}
+            )
+        ]
+        return sorted(metrics, key=lambda metric: metric.timestamp)
+
+    async def aggregate_metrics(
+        self,
+        group_by: Sequence[str] = (),
+        granularity: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+        as_arrays: bool = False,
+    ) -> Any:
+        """Aggregate recorded metrics.
+
+        Returns one row per time bucket and group, ordered by bucket then
+        group, with the record count, counts by completion status, error
+        and token sums, latency mean, minimum, maximum and percentiles
+        (``latency_p50`` ...) and the mean user feedback score. This
+        default scans the metrics with aiter_models() and computes exact
+        percentiles; backends with metric rollups override it.
+
+        Args:
+            group_by: Fields to group by, from agent_id, domain and
+                learning_mode
+            granularity: Time bucket, "minute", "hour" or "day"; None
+                aggregates the whole range
+            start: Earliest timestamp included; naive datetimes are UTC
+            end: Timestamp the range ends before
+            filters: Values to keep per field, one or a list of them
+            percentiles: Latency percentiles to compute
+            as_arrays: Return a dict of NumPy arrays, one per column, rather
+                than a list of dicts
+
+        Returns:
+            The aggregate rows, or arrays
+
+        Raises:
+            ValueError: If an option is invalid, or as_arrays is set and
+                numpy is not installed
+        """
+        records = [m async for m in self.aiter_models(MetricRecord, "metrics")]
+        rows = aggregate_records(
+            records, group_by, granularity, start, end, filters, percentiles
+        )
+        if as_arrays:
+            return to_arrays(rows, metric_columns(group_by, granularity, percentiles))
+        return rows
+
     async def store_message(self, message: Message) -> None:
         """Store a conversation message.
 
@@ -197,32 +798,47 @@ class BaseContextStore(abc.ABC):
         """
         await self.store(task, namespace="tasks")
 
-    async def update_task_status(self, task_id: str, status: str) -> None:
+    async def update_task_status(
+        self, task_id: str, status: str, attempts: int = DEFAULT_ATTEMPTS
+    ) -> None:
         """Update a task's status.
 
+        Concurrent changes to the task by other processes are kept; see
+        modify().
+
         Args:
             task_id: The ID of the task
             status: The new status
+            attempts: Tries before a VersionConflict is raised
         """
-        task = await self.fetch(Task, task_id, namespace="tasks")
-        if task:
+
+        def _set_status(task: Task) -> None:
             task.status = TaskStatus(status)
             task.updated_at = datetime.utcnow()
             if status == TaskStatus.COMPLETED:
                 task.completed_at = datetime.utcnow()
-            await self.update(task, namespace="tasks")
+
+        await self.modify(Task, task_id, _set_status, "tasks", attempts)
 
     async def store_task_result(self, result: TaskResult) -> None:
-        """Store a task result.
+        """Store a task result and mark its task finished, in one transaction.
+
+        The task's status and timestamps are patched without reading the
+        task; see transact().
 
         Args:
             result: The task result to store
         """
-        await self.store(result, namespace="task_results")
-        # Also update the task status
-        await self.update_task_status(
-            result.task_id, "completed" if result.success else "failed"
-        )
+        now = datetime.utcnow()
+        values: Dict[str, Any] = {
+            "status": TaskStatus.COMPLETED if result.success else TaskStatus.FAILED,
+            "updated_at": now,
+        }
+        if result.success:
+            values["completed_at"] = now
+        async with self.transact() as transaction:
+            transaction.store(result, namespace="task_results")
+            transaction.patch(Task, result.task_id, values, namespace="tasks")
 
     async def request_clarification(self, request: ClarificationRequest) -> None:
         """Store a clarification request.
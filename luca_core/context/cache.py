@@ -0,0 +1,447 @@
+"""Read-through cache in front of a context store.
+
+CachedContextStore wraps any BaseContextStore and keeps recently fetched
+models in process memory, so hot lookups such as get_user_preferences() and
+get_project() skip the database. Only fetch() is cached; lists, queries,
+pages and streams always go to the wrapped store.
+
+Entries hold the model's JSON document rather than the model itself: a hit
+validates a fresh instance, so callers may mutate what they get back
+without corrupting the cache, and the JSON length is the entry's size for
+the byte bound. Misses are cached too, as empty entries.
+
+Writes through the wrapper invalidate exactly the keys they touch. Writes
+that bypass it (another process, or the wrapped store used directly) are
+only picked up once the entry's TTL runs out, so namespaces shared with
+other writers should be given a TTL.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Type,
+    TypeVar,
+)
+
+from pydantic import BaseModel
+
+from luca_core.context.base_store import BaseContextStore
+from luca_core.context.changes import ChangeFeed
+from luca_core.context.pagination import Page
+from luca_core.context.search import SearchHit
+from luca_core.context.sqlite_schema import RowKey
+from luca_core.context.transactions import Transaction
+from luca_core.context.versions import Versioned
+from luca_core.schemas import MetricRecord
+
+T = TypeVar("T", bound=BaseModel)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class CacheStats:
+    """Counters for a CachedContextStore."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Return the counters as a plain dictionary."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+@dataclass
+class _CacheEntry:
+    """One cached fetch() result; ``data`` is None for a miss."""
+
+    data: Optional[str]
+    expires_at: Optional[float]
+
+    @property
+    def size(self) -> int:
+        return len(self.data) if self.data is not None else 0
+
+
+class CachedContextStore(BaseContextStore):
+    """LRU cache of fetch() results in front of another context store.
+
+    Args:
+        inner: The store to cache
+        max_entries: Maximum number of cached entries
+        max_bytes: Maximum total size of the cached JSON documents
+        ttls: Seconds an entry stays valid, per namespace; 0 disables
+            caching for the namespace
+        default_ttl: TTL for namespaces not in ``ttls``; None never expires
+        clock: Monotonic time source, in seconds
+    """
+
+    def __init__(
+        self,
+        inner: BaseContextStore,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 0 or max_bytes < 0:
+            raise ValueError("Cache bounds must not be negative")
+        self.inner = inner
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[RowKey, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._counters = CacheStats()
+        # Keys with a fetch or write in progress, and those invalidated
+        # meanwhile; a fetch that raced a write must not cache its result
+        self._busy: Dict[RowKey, int] = {}
+        self._stale: Set[RowKey] = set()
+
+    def __getattr__(self, name: str) -> Any:
+        # Backend-specific extras (stats(), ensure_indexes(), ...) pass through
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    # Cache bookkeeping
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Return the hit, miss and eviction counters and the current size."""
+        stats = self._counters.as_dict()
+        stats["entries"] = len(self._entries)
+        stats["bytes"] = self._bytes
+        return stats
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self._entries.clear()
+        self._bytes = 0
+        self._stale.update(self._busy)
+
+    def invalidate(
+        self, model_cls: Type[BaseModel], key: str, namespace: str = "default"
+    ) -> None:
+        """Drop the cached entry for one key, if any."""
+        self._invalidate((namespace, model_cls.__name__, key))
+
+    def _ttl(self, namespace: str) -> Optional[float]:
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def _invalidate(self, row_key: RowKey) -> None:
+        entry = self._entries.pop(row_key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self._counters.invalidations += 1
+        if row_key in self._busy:
+            self._stale.add(row_key)
+
+    def _lookup(self, row_key: RowKey) -> Optional[_CacheEntry]:
+        entry = self._entries.get(row_key)
+        if entry is None:
+            return None
+        if entry.expires_at is not None and self._clock() >= entry.expires_at:
+            del self._entries[row_key]
+            self._bytes -= entry.size
+            self._counters.expirations += 1
+            return None
+        self._entries.move_to_end(row_key)
+        return entry
+
+    def _insert(self, row_key: RowKey, data: Optional[str]) -> None:
+        ttl = self._ttl(row_key[0])
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = self._clock() + ttl if ttl is not None else None
+        entry = _CacheEntry(data, expires_at)
+        if entry.size > self.max_bytes or self.max_entries == 0:
+            return
+        self._entries[row_key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._counters.evictions += 1
+
+    def _begin(self, row_keys: Sequence[RowKey]) -> None:
+        for row_key in row_keys:
+            self._busy[row_key] = self._busy.get(row_key, 0) + 1
+
+    def _end(self, row_keys: Sequence[RowKey]) -> None:
+        for row_key in row_keys:
+            remaining = self._busy.pop(row_key) - 1
+            if remaining:
+                self._busy[row_key] = remaining
+            else:
+                self._stale.discard(row_key)
+
+    async def _write(self, row_keys: List[RowKey], operation: Any) -> None:
+        """Run a write, invalidating its keys before and after it."""
+        for row_key in row_keys:
+            self._invalidate(row_key)
+        self._begin(row_keys)
+        try:
+            await operation
+        finally:
+            # Fetches that read the old row while the write was running
+            # may have cached it
+            for row_key in row_keys:
+                self._invalidate(row_key)
+            self._end(row_keys)
+
+    def _row_keys(self, models: Sequence[BaseModel], namespace: str) -> List[RowKey]:
+        return [
+            (namespace, type(model).__name__, self.inner.model_key(model))
+            for model in models
+        ]
+
+    # BaseContextStore
+
+    async def initialize(self) -> None:
+        """Initialize the wrapped store."""
+        await self.inner.initialize()
+
+    async def close(self) -> None:
+        """Drop the cache and close the wrapped store, if it can be closed."""
+        self.clear()
+        close = getattr(self.inner, "close", None)
+        if close is not None:
+            await close()
+
+    async def fetch(
+        self, model_cls: Type[T], key: str, namespace: str = "default"
+    ) -> Optional[T]:
+        """Fetch a model instance by key, from the cache when possible."""
+        row_key = (namespace, model_cls.__name__, key)
+        entry = self._lookup(row_key)
+        if entry is not None:
+            self._counters.hits += 1
+            if entry.data is None:
+                return None
+            return model_cls.model_validate_json(entry.data)
+
+        self._counters.misses += 1
+        self._begin([row_key])
+        try:
+            model = await self.inner.fetch(model_cls, key, namespace)
+            if row_key not in self._stale:
+                data = model.model_dump_json() if model is not None else None
+                self._insert(row_key, data)
+        finally:
+            self._end([row_key])
+        return model
+
+    def model_key(self, model: BaseModel) -> str:
+        """Return the key the wrapped store keeps a model under."""
+        return self.inner.model_key(model)
+
+    async def store(self, model: BaseModel, namespace: str = "default") -> None:
+        """Store a model instance and invalidate its cached entry."""
+        await self.store_many([model], namespace)
+
+    async def store_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Store model instances and invalidate their cached entries."""
+        row_keys = self._row_keys(models, namespace)
+        await self._write(row_keys, self.inner.store_many(models, namespace))
+
+    async def fetch_versioned(
+        self, model_cls: Type[T], key: str, namespace: str = "default"
+    ) -> Optional[Versioned[T]]:
+        """Fetch a model instance with its version from the wrapped store.
+
+        Versions are not cached: a compare-and-swap needs the latest one.
+        """
+        return await self.inner.fetch_versioned(model_cls, key, namespace)
+
+    async def update(
+        self,
+        model: BaseModel,
+        namespace: str = "default",
+        expected_version: Optional[int] = None,
+    ) -> None:
+        """Update a model instance and invalidate its cached entry.
+
+        The entry is invalidated on a VersionConflict too, since another
+        process changed the model.
+        """
+        if expected_version is None:
+            await self.update_many([model], namespace)
+            return
+        row_keys = self._row_keys([model], namespace)
+        await self._write(
+            row_keys, self.inner.update(model, namespace, expected_version)
+        )
+
+    async def update_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Update model instances and invalidate their cached entries."""
+        row_keys = self._row_keys(models, namespace)
+        await self._write(row_keys, self.inner.update_many(models, namespace))
+
+    async def delete(
+        self, model_cls: Type[BaseModel], key: str, namespace: str = "default"
+    ) -> None:
+        """Delete a model instance and invalidate its cached entry."""
+        await self.delete_many(model_cls, [key], namespace)
+
+    async def delete_many(
+        self,
+        model_cls: Type[BaseModel],
+        keys: Sequence[str],
+        namespace: str = "default",
+    ) -> None:
+        """Delete model instances and invalidate their cached entries."""
+        row_keys = [(namespace, model_cls.__name__, key) for key in keys]
+        await self._write(row_keys, self.inner.delete_many(model_cls, keys, namespace))
+
+    async def patch(
+        self,
+        model_cls: Type[BaseModel],
+        key: str,
+        values: Dict[str, Any],
+        namespace: str = "default",
+    ) -> None:
+        """Patch a model instance and invalidate its cached entry."""
+        row_keys = [(namespace, model_cls.__name__, key)]
+        await self._write(row_keys, self.inner.patch(model_cls, key, values, namespace))
+
+    async def apply(self, transaction: Transaction) -> None:
+        """Apply a transaction in the wrapped store, invalidating its keys."""
+        row_keys = transaction.row_keys(self.inner.model_key)
+        await self._write(row_keys, self.inner.apply(transaction))
+
+    async def list(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[T]:
+        """List model instances from the wrapped store."""
+        return await self.inner.list(model_cls, namespace, limit, offset)
+
+    async def query(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[T]:
+        """Query model instances from the wrapped store."""
+        return await self.inner.query(model_cls, query, namespace, limit, offset)
+
+    @property  # type: ignore[override]
+    def change_feed(self) -> ChangeFeed:
+        """The wrapped store's change feed; writes are published there."""
+        return self.inner.change_feed
+
+    async def project(
+        self,
+        model_cls: Type[BaseModel],
+        fields: Sequence[str],
+        query: Optional[Dict[str, Any]] = None,
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[BaseModel]:
+        """Project model instances from the wrapped store."""
+        return await self.inner.project(
+            model_cls, fields, query, namespace, limit, offset
+        )
+
+    async def list_page(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """List one page of model instances from the wrapped store."""
+        return await self.inner.list_page(model_cls, namespace, limit, cursor)
+
+    async def query_page(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """Query one page of model instances from the wrapped store."""
+        return await self.inner.query_page(model_cls, query, namespace, limit, cursor)
+
+    async def aiter_models(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[T]:
+        """Stream model instances from the wrapped store."""
+        async for model in self.inner.aiter_models(
+            model_cls, namespace, query, batch_size
+        ):
+            yield model
+
+    async def aiter_raw(
+        self,
+        model_cls: Type[BaseModel],
+        namespace: str = "default",
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[str]:
+        """Stream stored JSON documents from the wrapped store."""
+        async for data in self.inner.aiter_raw(model_cls, namespace, query, batch_size):
+            yield data
+
+    async def search_messages(
+        self, query: str, limit: int = 20, namespace: Optional[str] = None
+    ) -> List[SearchHit]:
+        """Search the wrapped store."""
+        return await self.inner.search_messages(query, limit, namespace)
+
+    async def record_metric(self, metric: MetricRecord) -> None:
+        """Record a metric in the wrapped store."""
+        await self.inner.record_metric(metric)
+
+    async def record_metrics(self, metrics: Sequence[MetricRecord]) -> None:
+        """Record metrics in the wrapped store."""
+        await self.inner.record_metrics(metrics)
+
+    async def get_metrics_for_task(self, task_id: str) -> List[MetricRecord]:
+        """Get a task's metrics from the wrapped store."""
+        return await self.inner.get_metrics_for_task(task_id)
+
+    async def aggregate_metrics(self, *args: Any, **kwargs: Any) -> Any:
+        """Aggregate the wrapped store's metrics."""
+        return await self.inner.aggregate_metrics(*args, **kwargs)
+
+    async def flush(self) -> None:
+        """Flush the wrapped store."""
+        await self.inner.flush()
@@ -0,0 +1,326 @@
+"""Change feed and change log of a context store.
+
+Every committed store, update and delete of a model is a change event:
+``(namespace, model_type, key, op)``. Changes reach two kinds of
+consumers.
+
+In-process subscribers get events pushed after the write commits::
+
+    async with store.subscribe(namespaces=["conversation"]) as changes:
+        async for event in changes:
+            ...  # event.key was stored, updated or deleted
+
+Each subscription has a bounded queue, so a slow subscriber never holds up
+writers. When its queue is full, the subscription's ``overflow`` policy
+decides what gives:
+
+    drop_oldest     the oldest queued event is discarded (the default)
+    drop_newest     the new event is discarded
+    overflow        the queue is cleared and the next get() raises
+                    ChangeFeedOverflow; the subscriber should then re-read
+                    what it follows, and the subscription carries on
+
+Other processes tail the change log, a table written in the same
+transaction as the changes it records (see SQLiteContextStore's
+``change_log`` setting). Its ``seq`` column is an AUTOINCREMENT key, so
+sequence numbers only grow, and reading what follows a sequence number is
+a range scan of the primary key. The log keeps the ``keep`` most recent
+entries; a consumer that falls further behind than that has missed changes
+and should re-read, as after an overflow.
+
+Changes made by a retention sweep or a migration are not reported.
+"""
+
+import asyncio
+import sqlite3
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Set
+
+# Operations
+STORE = "store"
+UPDATE = "update"
+DELETE = "delete"
+
+# Queue overflow policies
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+OVERFLOW = "overflow"
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, OVERFLOW)
+
+DEFAULT_QUEUE_SIZE = 1000
+
+CHANGES_TABLE = "changes"
+
+DEFAULT_CHANGE_LOG_PARAMS: Dict[str, Any] = {
+    "keep": 100000,  # Most recent entries kept
+    "prune_every": 1000,  # Entries written between prunes
+}
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """A committed change to one model."""
+
+    namespace: str
+    model_type: str
+    key: str
+    op: str
+    # Position in the change log; None when the log is disabled
+    seq: Optional[int] = None
+
+
+class ChangeFeedOverflow(Exception):
+    """Raised by a subscription whose queue overflowed."""
+
+
+class Subscription:
+    """A subscriber's queue of change events.
+
+    Created by BaseContextStore.subscribe(); iterate over it, or call
+    get(), from the event loop of the store's writers.
+    """
+
+    def __init__(
+        self,
+        feed: "ChangeFeed",
+        namespaces: Optional[Iterable[str]] = None,
+        maxsize: int = DEFAULT_QUEUE_SIZE,
+        overflow: str = DROP_OLDEST,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy: {overflow}")
+        self.namespaces = frozenset(namespaces) if namespaces is not None else None
+        self.maxsize = maxsize
+        self.overflow = overflow
+        # Events discarded because the queue was full
+        self.dropped = 0
+        self.closed = False
+        self._feed = feed
+        self._queue: Deque[ChangeEvent] = deque()
+        self._overflowed = False
+        self._ready = asyncio.Event()
+
+    def _offer(self, event: ChangeEvent) -> None:
+        """Queue an event, applying the overflow policy."""
+        if self.namespaces is not None and event.namespace not in self.namespaces:
+            return
+        if len(self._queue) >= self.maxsize:
+            if self.overflow == DROP_NEWEST:
+                self._drop(1)
+                return
+            if self.overflow == DROP_OLDEST:
+                self._drop(1)
+                self._queue.popleft()
+            else:
+                self._drop(len(self._queue) + 1)
+                self._queue.clear()
+                self._overflowed = True
+                self._ready.set()
+                return
+        self._queue.append(event)
+        self._ready.set()
+
+    def _drop(self, count: int) -> None:
+        """Count discarded events here and in the feed's total."""
+        self.dropped += count
+        self._feed.dropped += count
+
+    def get_nowait(self) -> Optional[ChangeEvent]:
+        """Return the next queued event, or None if there is none.
+
+        Raises:
+            ChangeFeedOverflow: If events were lost to an overflow since
+                the last call
+        """
+        if self._overflowed:
+            self._overflowed = False
+            raise ChangeFeedOverflow(
+                f"Subscription queue overflowed after {self.maxsize} events"
+            )
+        if not self._queue:
+            self._ready.clear()
+            return None
+        return self._queue.popleft()
+
+    async def get(self) -> ChangeEvent:
+        """Wait for the next event.
+
+        Raises:
+            ChangeFeedOverflow: If events were lost to an overflow
+            StopAsyncIteration: If the subscription is closed
+        """
+        while True:
+            event = self.get_nowait()
+            if event is not None:
+                return event
+            if self.closed:
+                raise StopAsyncIteration
+            await self._ready.wait()
+
+    def close(self) -> None:
+        """Stop receiving events; waiting getters stop iterating."""
+        if not self.closed:
+            self.closed = True
+            self._feed.unsubscribe(self)
+            self._ready.set()
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> ChangeEvent:
+        return await self.get()
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class ChangeFeed:
+    """Fans committed changes out to in-process subscribers."""
+
+    def __init__(self) -> None:
+        self._subscribers: Set[Subscription] = set()
+        # Events discarded by every subscription, closed ones included
+        self.dropped = 0
+        # Set, and replaced, on every publish; wakes change log tailers
+        self._published = asyncio.Event()
+
+    @property
+    def active(self) -> bool:
+        """Whether anyone is subscribed."""
+        return bool(self._subscribers)
+
+    @property
+    def subscription_count(self) -> int:
+        """The number of open subscriptions."""
+        return len(self._subscribers)
+
+    def subscribe(
+        self,
+        namespaces: Optional[Iterable[str]] = None,
+        maxsize: int = DEFAULT_QUEUE_SIZE,
+        overflow: str = DROP_OLDEST,
+    ) -> Subscription:
+        """Add a subscriber; see Subscription."""
+        subscription = Subscription(self, namespaces, maxsize, overflow)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop delivering events to a subscription; see Subscription.close()."""
+        self._subscribers.discard(subscription)
+
+    def publish(self, events: Sequence[ChangeEvent]) -> None:
+        """Deliver committed events to every subscriber. Never blocks."""
+        if not events:
+            return
+        for subscription in list(self._subscribers):
+            for event in events:
+                subscription._offer(event)
+        published, self._published = self._published, asyncio.Event()
+        published.set()
+
+    def next_publish(self) -> asyncio.Event:
+        """Return an event that the next publish sets."""
+        return self._published
+
+    def close(self) -> None:
+        """Close every subscription."""
+        for subscription in list(self._subscribers):
+            subscription.close()
+
+
+def resolve_change_log_params(settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge change log settings over DEFAULT_CHANGE_LOG_PARAMS.
+
+    Raises:
+        ValueError: If a setting is unknown or not a positive integer
+    """
+    params = dict(DEFAULT_CHANGE_LOG_PARAMS)
+    for key, value in (settings or {}).items():
+        if key not in DEFAULT_CHANGE_LOG_PARAMS:
+            raise ValueError(f"Unsupported change log parameter: {key}")
+        params[key] = value
+    for key, value in params.items():
+        if not isinstance(value, int) or value < 1:
+            raise ValueError(f"Change log {key} must be a positive integer")
+    return params
+
+
+def create_changes_schema(conn: sqlite3.Connection) -> None:
+    """Create the change log table."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL,
+            model_type TEXT NOT NULL,
+            key TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at INTEGER NOT NULL
+        )
+        """
+    )
+
+
+def log_changes(
+    conn: sqlite3.Connection,
+    events: Sequence[ChangeEvent],
+    changed_at: int,
+    params: Dict[str, Any],
+) -> List[ChangeEvent]:
+    """Append events to the change log; return them with their ``seq``.
+
+    Runs in the transaction of the changes. Pruning happens whenever the
+    log crosses a multiple of ``prune_every`` entries.
+    """
+    if not events:
+        return []
+    conn.executemany(
+        f"INSERT INTO {CHANGES_TABLE} "
+        "(namespace, model_type, key, op, changed_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (event.namespace, event.model_type, event.key, event.op, changed_at)
+            for event in events
+        ],
+    )
+    # The writer is alone, so this transaction's entries are the last ones
+    (last,) = conn.execute(f"SELECT max(seq) FROM {CHANGES_TABLE}").fetchone()
+    first = last - len(events) + 1
+    every = params["prune_every"]
+    if (last // every) != ((first - 1) // every):
+        conn.execute(
+            f"DELETE FROM {CHANGES_TABLE} WHERE seq <= ?", (last - params["keep"],)
+        )
+    return [
+        ChangeEvent(event.namespace, event.model_type, event.key, event.op, seq)
+        for seq, event in enumerate(events, first)
+    ]
+
+
+def changes_after(
+    conn: sqlite3.Connection,
+    after: int,
+    limit: int,
+    namespaces: Optional[Sequence[str]] = None,
+) -> List[ChangeEvent]:
+    """Read the change log entries that follow ``after``, oldest first."""
+    sql = (
+        f"SELECT seq, namespace, model_type, key, op FROM {CHANGES_TABLE} "
+        "WHERE seq > ?"
+    )
+    params: List[Any] = [after]
+    if namespaces is not None:
+        sql += f" AND namespace IN ({', '.join('?' * len(namespaces))})"
+        params.extend(namespaces)
+    sql += " ORDER BY seq LIMIT ?"
+    params.append(limit)
+    return [
+        ChangeEvent(namespace, model_type, key, op, seq)
+        for seq, namespace, model_type, key, op in conn.execute(sql, params)
+    ]
@@ -0,0 +1,179 @@
+"""Payload codecs for stored models.
+
+Every stored row carries a codec tag next to its payload, so a database can
+hold rows written with different codecs and a namespace's codec can change
+at any time. A tag names the format, optionally followed by a compression:
+
+    json            # model_dump_json() text, the default
+    json+zlib       # the same, zlib-compressed
+    msgpack         # MessagePack of model_dump(mode="json")
+    msgpack+zlib
+
+MessagePack needs the optional ``msgpack`` package. Compression is applied
+per row, only to payloads larger than the namespace's ``compress_above``
+threshold, so small rows skip the compression cost.
+
+SQL filters work on JSON; ``luca_document(codec, data)`` (see
+register_sql_functions()) converts other payloads for them.
+
+Decoding is pydantic's validate_json() in every case. Rows written by a
+store could in principle skip validation, but building the models in
+Python (model_construct() and converting enums and datetimes by hand)
+measures two to four times slower than pydantic-core's validator (see the
+``validated`` and ``trusted`` timings of
+scripts/benchmarks/context_store_projection.py), which also keeps rows from
+imported or hand-edited databases checked.
+"""
+
+import json
+import sqlite3
+import zlib
+from typing import Any, Dict, Optional, Tuple, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency
+    msgpack = None
+
+T = TypeVar("T", bound=BaseModel)
+
+Payload = Union[str, bytes]
+
+JSON = "json"
+MSGPACK = "msgpack"
+ZLIB = "zlib"
+FORMATS = (JSON, MSGPACK)
+
+DEFAULT_CODEC_PARAMS: Dict[str, Any] = {
+    "format": JSON,
+    "compress_above": None,  # Payload bytes; None never compresses
+    "level": 1,  # zlib level; favours speed over ratio
+}
+
+# SQL expression evaluating to a row's JSON document
+DOCUMENT_SQL = f"CASE codec WHEN '{JSON}' THEN data ELSE luca_document(codec, data) END"
+
+
+class PayloadCodec:
+    """Encodes models for one namespace.
+
+    Args:
+        format: ``"json"`` or ``"msgpack"``
+        compress_above: Compress payloads larger than this many bytes
+        level: zlib compression level
+    """
+
+    def __init__(
+        self,
+        format: str = JSON,
+        compress_above: Optional[int] = None,
+        level: int = 1,
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported codec format: {format}")
+        if format == MSGPACK and msgpack is None:
+            raise ValueError("The msgpack codec requires the msgpack package")
+        if compress_above is not None and compress_above < 0:
+            raise ValueError("compress_above must be non-negative")
+        if not 0 <= level <= 9:
+            raise ValueError("level must be between 0 and 9")
+        self.format = format
+        self.compress_above = compress_above
+        self.level = level
+
+    def __repr__(self) -> str:
+        return (
+            f"PayloadCodec(format={self.format!r}, "
+            f"compress_above={self.compress_above!r}, level={self.level!r})"
+        )
+
+    def encode(self, model: BaseModel) -> Tuple[str, Payload]:
+        """Return the ``(codec tag, payload)`` to store for a model."""
+        if self.format == JSON:
+            return self.pack(model.model_dump_json())
+        return self.pack(msgpack.packb(model.model_dump(mode="json")))
+
+    def pack(self, payload: Payload) -> Tuple[str, Payload]:
+        """Compress an encoded payload if it is over the threshold."""
+        if self.compress_above is None or len(payload) <= self.compress_above:
+            return self.format, payload
+        if isinstance(payload, str):
+            payload = payload.encode()
+        return f"{self.format}+{ZLIB}", zlib.compress(payload, self.level)
+
+
+JSON_CODEC = PayloadCodec()
+
+
+def resolve_codecs(codecs: Optional[Dict[str, Any]]) -> Dict[str, PayloadCodec]:
+    """Build the codec of each configured namespace.
+
+    Args:
+        codecs: Namespace to a format name, or to a dict of
+            DEFAULT_CODEC_PARAMS overrides
+
+    Returns:
+        The codec of each namespace
+
+    Raises:
+        ValueError: If a setting is unknown or invalid, or a format's
+            package is not installed
+    """
+    resolved = {}
+    for namespace, settings in (codecs or {}).items():
+        if isinstance(settings, str):
+            settings = {"format": settings}
+        params = dict(DEFAULT_CODEC_PARAMS)
+        for key, value in settings.items():
+            if key not in DEFAULT_CODEC_PARAMS:
+                raise ValueError(f"Unsupported codec parameter: {key}")
+            params[key] = value
+        try:
+            if params["compress_above"] is not None:
+                params["compress_above"] = int(params["compress_above"])
+            params["level"] = int(params["level"])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid codec parameters for {namespace}: {params!r}")
+        resolved[namespace] = PayloadCodec(**params)
+    return resolved
+
+
+def _unpack(codec: str, data: Payload) -> Tuple[str, Payload]:
+    """Undo a row's compression; return its format and raw payload."""
+    format, _, compression = codec.partition("+")
+    if compression == ZLIB:
+        data = zlib.decompress(data)
+    elif compression:
+        raise ValueError(f"Unsupported codec: {codec}")
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported codec: {codec}")
+    if format == MSGPACK and msgpack is None:
+        raise ValueError("Reading msgpack rows requires the msgpack package")
+    return format, data
+
+
+def decode_model(model_cls: Type[T], codec: str, data: Payload) -> T:
+    """Validate a model from a stored payload.
+
+    Raises:
+        ValueError: If the codec is unknown or the payload is invalid
+    """
+    format, data = _unpack(codec, data)
+    if format == JSON:
+        return model_cls.model_validate_json(data)
+    return model_cls.model_validate(msgpack.unpackb(data))
+
+
+def to_json(codec: str, data: Payload) -> str:
+    """Return a stored payload as a JSON document, without validating it."""
+    format, data = _unpack(codec, data)
+    if format == JSON:
+        return data.decode() if isinstance(data, bytes) else data
+    return json.dumps(msgpack.unpackb(data), ensure_ascii=False, separators=(",", ":"))
+
+
+def register_sql_functions(conn: sqlite3.Connection) -> None:
+    """Register ``luca_document(codec, data)``, used by DOCUMENT_SQL."""
+    conn.create_function("luca_document", 2, to_json, deterministic=True)
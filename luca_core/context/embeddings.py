@@ -0,0 +1,146 @@
+"""Text embedders for semantic recall.
+
+An embedder turns texts into fixed-size vectors whose cosine similarity
+tracks how related the texts are. MessageRecall (see recall.py) stores them
+in a VectorIndex; any model can be plugged in by subclassing Embedder.
+
+HashingEmbedder needs no model and no network: it hashes words, word pairs
+and character trigrams into signed buckets (the "hashing trick"). Texts that
+share vocabulary, including inflections such as "index" and "indexes", get
+similar vectors. The hash is CRC-32, so vectors are identical across
+processes and machines and an index built once stays valid.
+
+Embedders need the optional ``numpy`` package.
+"""
+
+import abc
+import re
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+_WORD = re.compile(r"\w+")
+
+# Words whose hashed features are remembered; vocabularies are Zipfian, so
+# the cache absorbs most lookups
+FEATURE_CACHE_SIZE = 1 << 18
+
+
+def require_numpy() -> None:
+    """Raise ValueError unless numpy is installed."""
+    if np is None:
+        raise ValueError("Semantic recall requires the numpy package")
+
+
+class Embedder(abc.ABC):
+    """Maps texts to vectors of ``dim`` float32 components.
+
+    Subclasses set ``dim`` and implement embed(). ``name`` identifies the
+    embedding space: a VectorIndex built with one name is discarded and
+    rebuilt when opened with another, so it must change whenever the
+    vectors would.
+    """
+
+    dim: int
+
+    @property
+    def name(self) -> str:
+        """Identity of the embedding space, recorded in the index."""
+        return f"{type(self).__name__}:{self.dim}"
+
+    @abc.abstractmethod
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """Embed texts.
+
+        Called from a worker thread, so implementations may block.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            A ``(len(texts), dim)`` float32 array
+        """
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic, offline embedder based on feature hashing.
+
+    Args:
+        dim: Number of buckets; more buckets mean fewer collisions
+        char_ngrams: Length of the character n-grams hashed for every word,
+            0 to hash whole words and word pairs only
+    """
+
+    def __init__(self, dim: int = 512, char_ngrams: int = 3):
+        require_numpy()
+        if dim < 1:
+            raise ValueError("dim must be positive")
+        if char_ngrams < 0:
+            raise ValueError("char_ngrams must be non-negative")
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self._features: Dict[str, Tuple[Tuple[int, ...], Tuple[float, ...]]] = {}
+
+    @property
+    def name(self) -> str:
+        """Identity of the embedding space, recorded in the index."""
+        return f"hashing:{self.dim}:{self.char_ngrams}"
+
+    def _hash(self, feature: str, weight: float) -> Tuple[int, float]:
+        """Return the bucket of a feature and its signed weight."""
+        h = zlib.crc32(feature.encode())
+        # The top bit picks the sign, so collisions tend to cancel
+        return h % self.dim, -weight if h & 0x80000000 else weight
+
+    def _word_features(self, word: str) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+        """Return the hashed features of a word and its character n-grams."""
+        features = [self._hash("w:" + word, 1.0)]
+        n = self.char_ngrams
+        padded = f"<{word}>"
+        if n and len(padded) > n:
+            features.extend(
+                self._hash("c:" + padded[i : i + n], 0.25)
+                for i in range(len(padded) - n + 1)
+            )
+        columns, weights = zip(*features)
+        return columns, weights
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """Embed texts into L2-normalised hashed feature vectors."""
+        rows: List[int] = []
+        columns: List[int] = []
+        weights: List[float] = []
+        cache = self._features
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            start = len(columns)
+            for word in words:
+                features = cache.get(word)
+                if features is None:
+                    if len(cache) >= FEATURE_CACHE_SIZE:
+                        cache.clear()
+                    features = cache[word] = self._word_features(word)
+                columns.extend(features[0])
+                weights.extend(features[1])
+            for first, second in zip(words, words[1:]):
+                column, weight = self._hash(f"b:{first} {second}", 0.5)
+                columns.append(column)
+                weights.append(weight)
+            rows.extend([row] * (len(columns) - start))
+
+        # Sum weights per (row, bucket) in one pass
+        flat = np.asarray(rows, dtype=np.intp) * self.dim
+        flat += np.asarray(columns, dtype=np.intp)
+        vectors = np.bincount(
+            flat, weights=weights, minlength=len(texts) * self.dim
+        ).reshape(len(texts), self.dim)
+        vectors = vectors.astype(np.float32)
+        # Damp repeated terms, then normalise so dot products are cosines
+        np.copysign(np.log1p(np.abs(vectors)), vectors, out=vectors)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
@@ -9,6 +9,10 @@ import os
 from typing import Any, Dict, Optional
 
 from luca_core.context.base_store import BaseContextStore
+from luca_core.context.cache import CachedContextStore
+from luca_core.context.log_store import LogContextStore
+from luca_core.context.recall import MessageRecall
+from luca_core.context.sharded import ShardedContextStore
 from luca_core.context.sqlite_store import SQLiteContextStore
 
 
@@ -20,8 +24,12 @@ async def create_async_context_store(
     """Create a context store instance asynchronously.
 
     Args:
-        store_type: Type of store to create ("sqlite" or future types)
-        db_path: Path to database file (for SQLite)
+        store_type: Type of store to create ("sqlite", "sqlite_sharded"
+            for namespaces in separate files, see luca_core.context.sharded,
+            or "log" for append-only segment files, see
+            luca_core.context.log_store)
+        db_path: Path to database file (for SQLite), or segment directory
+            (for the log store)
         config: Additional configuration dictionary
 
     Returns:
@@ -32,16 +40,44 @@ async def create_async_context_store(
     if db_path is not None:
         config["path"] = db_path
 
-    if store_type == "sqlite":
+    if store_type in ("sqlite", "sqlite_sharded"):
         path = config.get("path", os.environ.get("LUCA_SQLITE_PATH", "data/context.db"))
         backup_interval = int(
             config.get("backup_interval", os.environ.get("LUCA_BACKUP_INTERVAL", "300"))
         )
+        options: Dict[str, Any] = dict(
+            backup_interval=backup_interval,
+            connection_params=config.get("connection_params"),
+            indexed_fields=config.get("indexed_fields"),
+            write_behind=config.get("write_behind"),
+            backup=config.get("backup"),
+            codecs=config.get("codecs"),
+            search_namespaces=config.get("search_namespaces"),
+            retention=config.get("retention"),
+            change_log=config.get("change_log"),
+        )
 
-        store = SQLiteContextStore(db_path=path, backup_interval=backup_interval)
+        store: BaseContextStore
+        if store_type == "sqlite":
+            store = SQLiteContextStore(db_path=path, **options)
+        else:
+            store = ShardedContextStore(
+                db_path=path, shards=config.get("shards"), **options
+            )
+    elif store_type == "log":
+        store = LogContextStore(
+            path=config.get(
+                "path", os.environ.get("LUCA_LOG_PATH", "data/context.log")
+            ),
+            log=config.get("log"),
+        )
     else:
         raise ValueError(f"Unsupported context store type: {store_type}")
 
+    cache = config.get("cache")
+    if cache is not None:
+        store = CachedContextStore(store, **cache)
+
     # Initialize the store
     await store.initialize()
 
@@ -76,3 +112,26 @@ def create_context_store(
     except RuntimeError:
         # No event loop running, so create one with asyncio.run
         return asyncio.run(create_async_context_store(store_type, db_path, config))
+
+
+def create_message_recall(
+    db_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None
+) -> Optional[MessageRecall]:
+    """Create the semantic recall index kept next to a context database.
+
+    Args:
+        db_path: Path to the database file
+        config: Context store configuration; its ``recall`` entry holds the
+            vector index settings
+
+    Returns:
+        A MessageRecall, or None when the configuration has no ``recall``
+    """
+    config = config or {}
+    recall = config.get("recall")
+    if recall is None:
+        return None
+    path = db_path or config.get(
+        "path", os.environ.get("LUCA_SQLITE_PATH", "data/context.db")
+    )
+    return MessageRecall.for_database(path, **recall)
@@ -0,0 +1,181 @@
+"""Declarative secondary indexes for the SQLite context store.
+
+Models are stored as JSON documents, so filters on their fields would need a
+full scan. Fields declared here are exposed as virtual generated columns
+(``json_extract`` of the document) and covered by one partial index per model
+type, restricted to that model type's rows. ``query()`` compares indexed
+fields against the generated column, which turns the lookup into an index
+seek.
+
+Declarations map a model class name to the fields to index:
+
+    {"Task": ("status",), "TaskResult": ("task_id",)}
+
+Indexes are reconciled when the store initializes: missing columns are added
+with ``ALTER TABLE``, missing indexes are built, and indexes that are no
+longer declared are dropped. Adding a virtual column does not rewrite the
+table, so existing databases migrate in place. Columns whose expression has
+changed are dropped and added again, along with their indexes.
+"""
+
+import re
+import sqlite3
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from luca_core.context.query import json_path, parse_lookup
+
+# Hot filters used by BaseContextStore and LucaManager
+DEFAULT_INDEXED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "Task": ("status",),
+    "ClarificationRequest": ("resolved",),
+    "TaskResult": ("task_id",),
+    "MetricRecord": ("agent_id",),
+}
+
+INDEX_PREFIX = "ix_"
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def resolve_indexed_fields(
+    indexed_fields: Optional[Mapping[str, Sequence[str]]] = None,
+) -> Dict[str, Tuple[str, ...]]:
+    """Merge index declarations over the defaults.
+
+    Args:
+        indexed_fields: Extra declarations; a model type mapped to an empty
+            sequence disables its default indexes
+
+    Returns:
+        The validated declarations
+
+    Raises:
+        ValueError: If a model type or field name is not a valid identifier
+    """
+    resolved = dict(DEFAULT_INDEXED_FIELDS)
+    for model_type, fields in (indexed_fields or {}).items():
+        resolved[model_type] = tuple(fields)
+
+    for model_type, fields in resolved.items():
+        check_model_type(model_type)
+        for field in fields:
+            parsed, op = parse_lookup(field)
+            if parsed != field or op != "eq":
+                raise ValueError(f"Invalid indexed field: {field!r}")
+    return {model_type: fields for model_type, fields in resolved.items() if fields}
+
+
+def check_model_type(model_type: str) -> str:
+    """Validate a model type name so it can be used as a SQL literal."""
+    if not _IDENTIFIER.match(model_type):
+        raise ValueError(f"Invalid model type: {model_type!r}")
+    return model_type
+
+
+def column_name(field: str) -> str:
+    """Return the generated column name backing an indexed field."""
+    return INDEX_PREFIX + field.replace(".", "__")
+
+
+def index_name(table: str, model_type: str, field: str) -> str:
+    """Return the name of the partial index for a model type and field."""
+    return f"{INDEX_PREFIX}{table}_{model_type}_{column_name(field)}"
+
+
+def field_columns(
+    indexed_fields: Mapping[str, Sequence[str]], model_type: str, alias: str = ""
+) -> Dict[str, str]:
+    """Map the indexed fields of ``model_type`` to their column expressions."""
+    prefix = f"{alias}." if alias else ""
+    return {
+        field: prefix + column_name(field)
+        for field in indexed_fields.get(model_type, ())
+    }
+
+
+def column_expression(
+    field: str, data_column: str = "data", codec_column: Optional[str] = None
+) -> str:
+    """Return the SQL expression of the generated column for a field.
+
+    With ``codec_column``, only rows whose codec is ``json`` are read; the
+    column is NULL for rows in other codecs.
+    """
+    expr = f"json_extract({data_column}, '{json_path(field)}')"
+    if codec_column is None:
+        return expr
+    return f"CASE {codec_column} WHEN 'json' THEN {expr} END"
+
+
+def sync_indexes(
+    conn: sqlite3.Connection,
+    table: str,
+    indexed_fields: Mapping[str, Sequence[str]],
+    data_column: str = "data",
+    codec_column: Optional[str] = None,
+) -> List[str]:
+    """Create or drop generated columns and indexes to match the declarations.
+
+    Args:
+        conn: Writer connection
+        table: Table holding the JSON documents
+        indexed_fields: Validated declarations from resolve_indexed_fields()
+        data_column: Column holding the JSON document
+        codec_column: Column holding each row's codec, if the table has one
+
+    Returns:
+        Names of the indexes that were created
+    """
+    existing_columns = {
+        row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})").fetchall()
+    }
+    table_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()[0]
+    wanted_columns = {field for fields in indexed_fields.values() for field in fields}
+    for field in sorted(wanted_columns):
+        column = column_name(field)
+        expr = column_expression(field, data_column, codec_column)
+        if column in existing_columns:
+            if f"AS ({expr})" in table_sql:
+                continue
+            # Declared with an older expression; indexes on it go first
+            for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+                (table,),
+            ).fetchall():
+                if name.startswith(INDEX_PREFIX) and name.endswith(f"_{column}"):
+                    conn.execute(f"DROP INDEX {name}")
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+        conn.execute(
+            f"ALTER TABLE {table} ADD COLUMN {column} GENERATED ALWAYS AS "
+            f"({expr}) VIRTUAL"
+        )
+
+    wanted_indexes = {
+        index_name(table, model_type, field): (model_type, field)
+        for model_type, fields in indexed_fields.items()
+        for field in fields
+    }
+    existing_indexes = {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+            (table,),
+        )
+        if row[0].startswith(INDEX_PREFIX)
+    }
+
+    for name in sorted(existing_indexes - set(wanted_indexes)):
+        conn.execute(f"DROP INDEX {name}")
+
+    created = []
+    for name, (model_type, field) in sorted(wanted_indexes.items()):
+        if name in existing_indexes:
+            continue
+        conn.execute(
+            f"CREATE INDEX {name} ON {table} (namespace, {column_name(field)}) "
+            f"WHERE model_type = '{model_type}'"
+        )
+        created.append(name)
+    return created
@@ -0,0 +1,992 @@
+"""Log-structured implementation of the context store.
+
+LogContextStore keeps models in append-only segment files, without SQLite,
+for deployments dominated by writes. Its design follows Bitcask: every
+write appends a record to the active segment, and an in-memory hash index
+maps each key to its latest record. A fetch is one dictionary lookup and
+one read through the segment's memory map.
+
+``path`` is a directory of numbered segments and their hint files::
+
+    00000001.seg    records
+    00000001.hint   the headers of 00000001.seg's records, without values
+    00000002.seg    the active segment, appended to
+
+A record is a header followed by its key and value. The header holds a
+CRC-32 of the rest of the record, the model's creation and update times in
+epoch microseconds, its version (see luca_core.context.versions), the
+operation (a put or a deletion tombstone) and the lengths of key and
+value. The key is ``namespace``, ``model_type`` and ``key`` joined by NUL
+characters; the value is the model's JSON.
+
+A transaction (see luca_core.context.transactions) is one append: its
+records are built and its expected versions checked against the index
+first, so a conflict writes nothing.
+
+On startup the index is rebuilt from the hint files, which are small next
+to the segments, and only the part of a segment that no hint covers is
+read. Hints are written when a segment fills up and when the store is
+closed. A record torn by a crash fails its CRC and is truncated away.
+
+Overwritten and deleted records stay in their segment until compaction
+rewrites it. A background task compacts every full segment whose dead
+bytes reach ``compact_ratio`` of its size, copying its live records to a
+new file that then replaces it. Tombstones are kept until their segment is
+the oldest, since an older segment may still hold the record they delete.
+
+Writes return once the records are in the operating system's page cache,
+which survives a crash of the process; with ``sync`` they return once they
+are on disk, and flush() syncs on demand. Queries have no indexes: they
+decode and filter every model of the type, newest first. Intended for a
+single process, like SQLite's exclusive writer.
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from pydantic import BaseModel
+
+from luca_core.context.base_store import BaseContextStore
+from luca_core.context.changes import DELETE, STORE, UPDATE, ChangeEvent
+from luca_core.context.pagination import (
+    Page,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+)
+from luca_core.context.query import matches
+from luca_core.context.sqlite_schema import RowKey, now_timestamp
+from luca_core.context.transactions import Operation, Transaction
+from luca_core.context.versions import VersionConflict, Versioned
+
+T = TypeVar("T", bound=BaseModel)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_PARAMS: Dict[str, Any] = {
+    "segment_bytes": 64 * 1024 * 1024,  # Size at which a segment is sealed
+    "sync": False,  # fsync every write before it returns
+    "compact_interval": 60,  # Seconds between compaction checks; 0 disables
+    "compact_ratio": 0.5,  # Dead fraction of a segment that triggers it
+}
+
+# CRC-32, created_at, updated_at, version, operation, key length, value length
+HEADER = struct.Struct("<IqqIBHI")
+# Magic, segment bytes covered, CRC-32 of the entries
+HINT_HEADER = struct.Struct("<4sQI")
+# Record offset, created_at, updated_at, version, operation, key length,
+# value length
+HINT_ENTRY = struct.Struct("<QqqIBHI")
+HINT_MAGIC = b"LHT1"
+
+PUT = 0
+TOMBSTONE = 1
+
+SEGMENT_SUFFIX = ".seg"
+HINT_SUFFIX = ".hint"
+
+
+def resolve_log_params(settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge log store settings over DEFAULT_LOG_PARAMS.
+
+    Raises:
+        ValueError: If a setting is unknown or out of range
+    """
+    params = dict(DEFAULT_LOG_PARAMS)
+    for key, value in (settings or {}).items():
+        if key not in DEFAULT_LOG_PARAMS:
+            raise ValueError(f"Unsupported log store parameter: {key}")
+        params[key] = value
+    try:
+        params["segment_bytes"] = int(params["segment_bytes"])
+        params["compact_interval"] = float(params["compact_interval"])
+        params["compact_ratio"] = float(params["compact_ratio"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid log store parameters: {params!r}")
+    params["sync"] = bool(params["sync"])
+    if params["segment_bytes"] < 1024:
+        raise ValueError("segment_bytes must be at least 1024")
+    if params["compact_interval"] < 0 or not 0 < params["compact_ratio"] <= 1:
+        raise ValueError(f"Invalid log store compaction parameters: {params!r}")
+    return params
+
+
+class _Entry(NamedTuple):
+    """Where the latest record of a key is."""
+
+    segment: int
+    offset: int
+    size: int
+    value_start: int
+    created_at: int
+    updated_at: int
+    version: int
+
+
+# A record's header fields: offset, created_at, updated_at, version, op, key,
+# value length
+_Header = Tuple[int, int, int, int, int, bytes, int]
+
+
+def _encode_key(namespace: str, model_type: str, key: str) -> bytes:
+    return f"{namespace}\0{model_type}\0{key}".encode("utf-8")
+
+
+def _decode_key(raw: bytes) -> Tuple[str, str, str]:
+    namespace, model_type, key = raw.decode("utf-8").split("\0", 2)
+    return namespace, model_type, key
+
+
+def _record(
+    key: bytes, op: int, created_at: int, updated_at: int, version: int, value: bytes
+) -> bytes:
+    """Encode a record, CRC first."""
+    header = HEADER.pack(0, created_at, updated_at, version, op, len(key), len(value))
+    crc = zlib.crc32(value, zlib.crc32(key, zlib.crc32(header[4:])))
+    return struct.pack("<I", crc) + header[4:] + key + value
+
+
+def _read_headers(data: Any, start: int, verify: bool) -> Tuple[List[_Header], int]:
+    """Parse the records of a segment from ``start``.
+
+    Returns:
+        The records' header fields, and the offset where parsing stopped:
+        the end of the data, or the first incomplete or (with ``verify``)
+        corrupt record
+    """
+    headers = []
+    pos, end = start, len(data)
+    while pos + HEADER.size <= end:
+        crc, created_at, updated_at, version, op, key_len, value_len = (
+            HEADER.unpack_from(data, pos)
+        )
+        key_start = pos + HEADER.size
+        record_end = key_start + key_len + value_len
+        if record_end > end or op not in (PUT, TOMBSTONE):
+            break
+        if verify and zlib.crc32(data[pos + 4 : record_end]) != crc:
+            break
+        key = bytes(data[key_start : key_start + key_len])
+        headers.append((pos, created_at, updated_at, version, op, key, value_len))
+        pos = record_end
+    return headers, pos
+
+
+def _hint_path(segment_path: str) -> str:
+    return segment_path[: -len(SEGMENT_SUFFIX)] + HINT_SUFFIX
+
+
+def _write_hint(path: str, covered: int, headers: List[_Header]) -> None:
+    """Write a hint file atomically."""
+    body = b"".join(
+        HINT_ENTRY.pack(*header[:5], len(header[5]), header[6]) + header[5]
+        for header in headers
+    )
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HINT_HEADER.pack(HINT_MAGIC, covered, zlib.crc32(body)) + body)
+    os.replace(tmp, path)
+
+
+def _read_hint(path: str) -> Optional[Tuple[int, List[_Header]]]:
+    """Read a hint file; None if it is missing or damaged."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, covered, crc = HINT_HEADER.unpack_from(data, 0)
+    except (OSError, struct.error):
+        return None
+    body = memoryview(data)[HINT_HEADER.size :]
+    if magic != HINT_MAGIC or zlib.crc32(body) != crc:
+        return None
+    headers = []
+    pos = 0
+    while pos < len(body):
+        offset, created_at, updated_at, version, op, key_len, value_len = (
+            HINT_ENTRY.unpack_from(body, pos)
+        )
+        pos += HINT_ENTRY.size
+        headers.append(
+            (
+                offset,
+                created_at,
+                updated_at,
+                version,
+                op,
+                bytes(body[pos : pos + key_len]),
+                value_len,
+            )
+        )
+        pos += key_len
+    return covered, headers
+
+
+class _Segment:
+    """A segment file, read through a memory map."""
+
+    def __init__(self, id: int, path: str):
+        self.id = id
+        self.path = path
+        # Kept open so the map follows this file even after compaction
+        # replaces the path
+        self.fd = os.open(path, os.O_RDONLY | os.O_CREAT, 0o644)
+        self.size = os.fstat(self.fd).st_size
+        # Bytes of records that are overwritten or deleted
+        self.dead = 0
+        self._map: Optional[mmap.mmap] = None
+
+    def read(self, offset: int, length: int) -> bytes:
+        """Read bytes, mapping the file again if it grew past the map."""
+        end = offset + length
+        if self._map is None or len(self._map) < end:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+        return self._map[offset:end]
+
+    def view(self) -> mmap.mmap:
+        """Map the whole file, for a sequential pass over its records."""
+        return mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        os.close(self.fd)
+
+
+class _Batch:
+    """The records of one append, built against the index.
+
+    Keys written earlier in the batch are seen as written, so the
+    operations of a transaction build on each other.
+    """
+
+    def __init__(self, store: "LogContextStore"):
+        self.owner = store
+        # (namespace, model_type, key, op, created_at, version, value)
+        self.writes: List[Tuple[str, str, str, int, int, int, bytes]] = []
+        self.events: List[ChangeEvent] = []
+        # Keys written so far: (created_at, version, value), or None once
+        # deleted
+        self._written: Dict[RowKey, Optional[Tuple[int, int, bytes]]] = {}
+
+    def _current(self, row_key: RowKey) -> Optional[Tuple[int, int]]:
+        """Return the creation time and version of a key, if it is stored."""
+        if row_key in self._written:
+            written = self._written[row_key]
+            return written[:2] if written is not None else None
+        namespace, model_type, key = row_key
+        entry = self.owner._bucket(namespace, model_type).get(key)
+        return (entry.created_at, entry.version) if entry is not None else None
+
+    def _value(self, row_key: RowKey) -> bytes:
+        """Return the value of a stored key."""
+        written = self._written.get(row_key)
+        if written is not None:
+            return written[2]
+        namespace, model_type, key = row_key
+        return self.owner._value(self.owner._bucket(namespace, model_type)[key])
+
+    def _put(self, row_key: RowKey, kind: str, created_at: int, value: bytes) -> None:
+        current = self._current(row_key)
+        version = current[1] + 1 if current is not None else 1
+        self.writes.append((*row_key, PUT, created_at, version, value))
+        self.events.append(ChangeEvent(*row_key, kind))
+        self._written[row_key] = (created_at, version, value)
+
+    def add(self, operation: Operation) -> None:
+        """Add an operation of a transaction.
+
+        Raises:
+            VersionConflict: If an update's expected version is stale
+        """
+        namespace = operation.namespace
+        if operation.kind == STORE:
+            self.store(operation.models, namespace)
+        elif operation.kind == UPDATE:
+            if operation.expected_version is not None:
+                self.check(operation.models[0], namespace, operation.expected_version)
+            self.update(operation.models, namespace)
+        elif operation.kind == DELETE:
+            assert operation.model_cls is not None
+            self.delete(operation.model_cls.__name__, operation.keys, namespace)
+        else:
+            assert operation.model_cls and operation.values is not None
+            row_key = (namespace, operation.model_cls.__name__, operation.keys[0])
+            self.patch(row_key, operation.values)
+
+    def store(self, models: Sequence[BaseModel], namespace: str) -> None:
+        now = now_timestamp()
+        for model in models:
+            row_key = (namespace, type(model).__name__, self.owner.model_key(model))
+            current = self._current(row_key)
+            created_at = current[0] if current is not None else now
+            value = model.model_dump_json().encode("utf-8")
+            self._put(row_key, STORE, created_at, value)
+
+    def check(self, model: BaseModel, namespace: str, expected_version: int) -> None:
+        """Raise VersionConflict unless the model is at expected_version."""
+        row_key = (namespace, type(model).__name__, self.owner.model_key(model))
+        current = self._current(row_key)
+        actual = current[1] if current is not None else None
+        if actual != expected_version:
+            raise VersionConflict(*row_key, expected_version, actual)
+
+    def update(self, models: Sequence[BaseModel], namespace: str) -> None:
+        for model in models:
+            row_key = (namespace, type(model).__name__, self.owner.model_key(model))
+            current = self._current(row_key)
+            if current is not None:
+                value = model.model_dump_json().encode("utf-8")
+                self._put(row_key, UPDATE, current[0], value)
+
+    def delete(self, model_type: str, keys: Sequence[str], namespace: str) -> None:
+        for key in dict.fromkeys(keys):
+            row_key = (namespace, model_type, key)
+            current = self._current(row_key)
+            if current is not None:
+                self.writes.append((*row_key, TOMBSTONE, current[0], 0, b""))
+                self.events.append(ChangeEvent(*row_key, DELETE))
+                self._written[row_key] = None
+
+    def patch(self, row_key: RowKey, values: BaseModel) -> None:
+        """Set validated fields in the stored JSON, if the key is stored."""
+        current = self._current(row_key)
+        if current is None:
+            return
+        document = json.loads(self._value(row_key))
+        document.update(values.model_dump(mode="json"))
+        value = json.dumps(document, separators=(",", ":")).encode("utf-8")
+        self._put(row_key, UPDATE, current[0], value)
+
+
+class LogContextStore(BaseContextStore):
+    """Context store kept in append-only segment files.
+
+    Args:
+        path: Directory of the segment files
+        log: Settings (segment_bytes, sync, compact_interval,
+            compact_ratio), merged over DEFAULT_LOG_PARAMS
+    """
+
+    def __init__(
+        self, path: str = "data/context.log", log: Optional[Dict[str, Any]] = None
+    ):
+        self.path = path
+        self.params = resolve_log_params(log)
+        # Latest record by (namespace, model type), then key
+        self._index: Dict[Tuple[str, str], Dict[str, _Entry]] = {}
+        self._segments: Dict[int, _Segment] = {}
+        self._active: Optional[_Segment] = None
+        self._active_fd: Optional[int] = None
+        # Latest update time written; write times never go backwards, so
+        # log order is update order even if the system clock does
+        self._clock = 0
+        self._version_conflicts = 0
+        self._compaction_task: Optional[asyncio.Task[None]] = None
+        self._compaction_lock = asyncio.Lock()
+        self._compaction_stats: Dict[str, Any] = {
+            "count": 0,
+            "reclaimed_bytes": 0,
+            "last": None,
+        }
+
+    # Lifecycle
+
+    async def initialize(self) -> None:
+        """Open the segments and rebuild the index."""
+        os.makedirs(self.path, exist_ok=True)
+        await asyncio.to_thread(self._recover)
+        if self.params["compact_interval"] > 0:
+            self._compaction_task = asyncio.create_task(self._compaction_loop())
+
+    def _segment_path(self, id: int) -> str:
+        return os.path.join(self.path, f"{id:08d}{SEGMENT_SUFFIX}")
+
+    def _recover(self) -> None:
+        """Rebuild the index from hints and segments, oldest first."""
+        ids = []
+        for name in os.listdir(self.path):
+            if name.endswith(".tmp"):
+                # Left by an interrupted compaction or hint write
+                os.remove(os.path.join(self.path, name))
+            elif name.endswith(SEGMENT_SUFFIX):
+                ids.append(int(name[: -len(SEGMENT_SUFFIX)]))
+        ids.sort()
+        started = time.perf_counter()
+        for id in ids:
+            segment = _Segment(id, self._segment_path(id))
+            self._segments[id] = segment
+            hint = _read_hint(_hint_path(segment.path))
+            covered = 0
+            if hint is not None and hint[0] <= segment.size:
+                covered, headers = hint
+                self._apply(segment, headers)
+            if covered < segment.size:
+                self._scan(segment, covered, last=id == ids[-1])
+                if id != ids[-1]:
+                    # Sealed without its hint, by a crash
+                    self._seal_hint(segment)
+        if not ids:
+            self._segments[1] = _Segment(1, self._segment_path(1))
+            ids.append(1)
+        self._active = self._segments[ids[-1]]
+        self._active_fd = os.open(self._active.path, os.O_WRONLY | os.O_APPEND)
+        logger.info(
+            f"Loaded {sum(len(bucket) for bucket in self._index.values())} keys "
+            f"from {len(ids)} segments in {time.perf_counter() - started:.2f}s"
+        )
+
+    def _scan(self, segment: _Segment, start: int, last: bool) -> None:
+        """Index the records of a segment that no hint covers."""
+        view = segment.view()
+        try:
+            headers, end = _read_headers(view, start, verify=True)
+        finally:
+            view.close()
+        self._apply(segment, headers)
+        if end < segment.size:
+            if last:
+                logger.warning(
+                    f"Truncating {segment.size - end} bytes of incomplete records "
+                    f"from {segment.path}"
+                )
+                os.truncate(segment.path, end)
+                segment.size = end
+            else:
+                logger.error(
+                    f"Ignoring {segment.size - end} bytes of damaged records in "
+                    f"{segment.path}"
+                )
+
+    def _apply(self, segment: _Segment, headers: List[_Header]) -> None:
+        """Apply records to the index, in log order."""
+        for offset, created_at, updated_at, version, op, raw_key, value_len in headers:
+            namespace, model_type, key = _decode_key(raw_key)
+            bucket = self._index.setdefault((namespace, model_type), {})
+            previous = bucket.pop(key, None)
+            if previous is not None:
+                self._segments[previous.segment].dead += previous.size
+            if op == PUT:
+                value_start = offset + HEADER.size + len(raw_key)
+                bucket[key] = _Entry(
+                    segment.id,
+                    offset,
+                    value_start - offset + value_len,
+                    value_start,
+                    created_at,
+                    updated_at,
+                    version,
+                )
+        if headers:
+            self._clock = max(self._clock, headers[-1][2])
+
+    async def close(self) -> None:
+        """Stop compaction, write the active segment's hint and close."""
+        if self._compaction_task:
+            self._compaction_task.cancel()
+            try:
+                await self._compaction_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._compaction_task = None
+        if self._active is not None:
+            # Speeds up the next startup; appends after it are scanned
+            await asyncio.to_thread(self._seal_hint, self._active)
+        if self._active_fd is not None:
+            os.close(self._active_fd)
+            self._active_fd = None
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
+        self._active = None
+        self._index = {}
+        self.change_feed.close()
+
+    async def flush(self) -> None:
+        """Sync the active segment to disk."""
+        if self._active_fd is not None:
+            await self._sync()
+
+    async def _sync(self) -> None:
+        """fsync the active segment off the event loop."""
+        # A duplicate stays valid if the segment is sealed meanwhile
+        fd = os.dup(self._active_fd)  # type: ignore[arg-type]
+
+        def _fsync() -> None:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        await asyncio.to_thread(_fsync)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the size of the log, compaction statistics and the number
+        of compare-and-swap updates that conflicted."""
+        return {
+            "keys": sum(len(bucket) for bucket in self._index.values()),
+            "segments": len(self._segments),
+            "bytes": sum(segment.size for segment in self._segments.values()),
+            "dead_bytes": sum(segment.dead for segment in self._segments.values()),
+            "compaction": dict(self._compaction_stats),
+            "versions": {"conflicts": self._version_conflicts},
+        }
+
+    # Writes
+
+    def _bucket(self, namespace: str, model_type: str) -> Dict[str, _Entry]:
+        return self._index.get((namespace, model_type), {})
+
+    async def _append(
+        self,
+        writes: List[Tuple[str, str, str, int, int, int, bytes]],
+        events: List[ChangeEvent],
+    ) -> None:
+        """Append records and index them.
+
+        ``writes`` are ``(namespace, model_type, key, op, created_at,
+        version, value)``. Appending and indexing happen without yielding to the
+        event loop, so every caller sees either none or all of a write.
+        """
+        if not writes:
+            return
+        if self._active is None or self._active_fd is None:
+            raise RuntimeError("LogContextStore is not initialized")
+        active = self._active
+        now = self._clock = max(now_timestamp(), self._clock)
+        chunks = []
+        headers: List[_Header] = []
+        offset = active.size
+        for namespace, model_type, key, op, created_at, version, value in writes:
+            raw_key = _encode_key(namespace, model_type, key)
+            record = _record(raw_key, op, created_at, now, version, value)
+            chunks.append(record)
+            headers.append((offset, created_at, now, version, op, raw_key, len(value)))
+            offset += len(record)
+        data = b"".join(chunks)
+        view = memoryview(data)
+        while view:
+            written = os.write(self._active_fd, view)
+            view = view[written:]
+        active.size += len(data)
+        self._apply(active, headers)
+
+        if self.params["sync"]:
+            await self._sync()
+        if active.size >= self.params["segment_bytes"] and active is self._active:
+            await self._rotate()
+        if self.change_feed.active:
+            self.change_feed.publish(events)
+
+    async def _rotate(self) -> None:
+        """Seal the active segment and start a new one."""
+        sealed = self._active
+        assert sealed is not None and self._active_fd is not None
+        os.close(self._active_fd)
+        segment = _Segment(sealed.id + 1, self._segment_path(sealed.id + 1))
+        self._segments[segment.id] = segment
+        self._active = segment
+        self._active_fd = os.open(segment.path, os.O_WRONLY | os.O_APPEND)
+        await asyncio.to_thread(self._seal_hint, sealed)
+
+    def _seal_hint(self, segment: _Segment) -> None:
+        """Write the hint of a segment, covering its current size."""
+        size = segment.size
+        if not size:
+            return
+        view = segment.view()
+        try:
+            headers, end = _read_headers(view[:size], 0, verify=False)
+        finally:
+            view.close()
+        _write_hint(_hint_path(segment.path), end, headers)
+
+    async def store(self, model: BaseModel, namespace: str = "default") -> None:
+        """Store a model instance."""
+        await self.store_many([model], namespace)
+
+    async def store_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Store several model instances with one append.
+
+        Storing a model that already exists replaces it and keeps its
+        creation time.
+        """
+        batch = _Batch(self)
+        batch.store(models, namespace)
+        await self._append(batch.writes, batch.events)
+
+    async def update(
+        self,
+        model: BaseModel,
+        namespace: str = "default",
+        expected_version: Optional[int] = None,
+    ) -> None:
+        """Update an existing model instance.
+
+        Raises:
+            VersionConflict: If expected_version is given and is not the
+                stored version, or the model is not stored
+        """
+        transaction = Transaction()
+        transaction.update(model, namespace, expected_version)
+        await self.apply(transaction)
+
+    async def update_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Update several existing model instances with one append.
+
+        Models that are not stored yet are ignored.
+        """
+        batch = _Batch(self)
+        batch.update(models, namespace)
+        await self._append(batch.writes, batch.events)
+
+    async def delete(
+        self, model_cls: Type[BaseModel], key: str, namespace: str = "default"
+    ) -> None:
+        """Delete a model instance."""
+        await self.delete_many(model_cls, [key], namespace)
+
+    async def delete_many(
+        self,
+        model_cls: Type[BaseModel],
+        keys: Sequence[str],
+        namespace: str = "default",
+    ) -> None:
+        """Delete several model instances with one append of tombstones."""
+        batch = _Batch(self)
+        batch.delete(model_cls.__name__, keys, namespace)
+        await self._append(batch.writes, batch.events)
+
+    async def patch(
+        self,
+        model_cls: Type[BaseModel],
+        key: str,
+        values: Dict[str, Any],
+        namespace: str = "default",
+    ) -> None:
+        """Set fields of a stored model in its JSON, without decoding it."""
+        transaction = Transaction()
+        transaction.patch(model_cls, key, values, namespace)
+        await self.apply(transaction)
+
+    async def apply(self, transaction: Transaction) -> None:
+        """Apply the writes of a transaction with one append.
+
+        Raises:
+            VersionConflict: If an update's expected version is stale;
+                nothing is written then
+        """
+        batch = _Batch(self)
+        try:
+            for operation in transaction.operations:
+                batch.add(operation)
+        except VersionConflict:
+            self._version_conflicts += 1
+            raise
+        # No await between the checks and the append
+        await self._append(batch.writes, batch.events)
+
+    # Reads
+
+    def _value(self, entry: _Entry) -> bytes:
+        return self._segments[entry.segment].read(
+            entry.value_start, entry.offset + entry.size - entry.value_start
+        )
+
+    def _decode(self, model_cls: Type[T], entry: _Entry) -> Optional[T]:
+        try:
+            return model_cls.model_validate_json(self._value(entry))
+        except Exception as e:
+            logger.error(f"Error deserializing {model_cls.__name__}: {e}")
+            return None
+
+    async def fetch(
+        self, model_cls: Type[T], key: str, namespace: str = "default"
+    ) -> Optional[T]:
+        """Fetch a model instance by key."""
+        entry = self._bucket(namespace, model_cls.__name__).get(key)
+        if entry is None:
+            return None
+        return self._decode(model_cls, entry)
+
+    async def fetch_versioned(
+        self, model_cls: Type[T], key: str, namespace: str = "default"
+    ) -> Optional[Versioned[T]]:
+        """Fetch a model instance with its version."""
+        entry = self._bucket(namespace, model_cls.__name__).get(key)
+        if entry is None:
+            return None
+        model = self._decode(model_cls, entry)
+        return Versioned(model, entry.version) if model is not None else None
+
+    def _newest(
+        self,
+        model_cls: Type[BaseModel],
+        namespace: str,
+        after: Optional[Tuple[int, str]] = None,
+    ) -> Iterator[Tuple[str, _Entry]]:
+        """Iterate over the entries of a model type, newest first.
+
+        A bucket holds its keys in the order of their latest writes, which
+        is the order of their update times, so it is read backwards; only
+        the keys of one write, which share a time, need sorting.
+        """
+        group: List[Tuple[str, _Entry]] = []
+        for item in reversed(self._bucket(namespace, model_cls.__name__).items()):
+            if group and item[1].updated_at != group[0][1].updated_at:
+                yield from self._sorted_group(group, after)
+                group = []
+            group.append(item)
+        yield from self._sorted_group(group, after)
+
+    @staticmethod
+    def _sorted_group(
+        group: List[Tuple[str, _Entry]], after: Optional[Tuple[int, str]]
+    ) -> List[Tuple[str, _Entry]]:
+        group.sort(key=lambda item: item[0], reverse=True)
+        if after is None or not group or group[0][1].updated_at < after[0]:
+            return group
+        return [item for item in group if (item[1].updated_at, item[0]) < after]
+
+    def _select(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str,
+        limit: int,
+        offset: int = 0,
+        after: Optional[Tuple[int, str]] = None,
+    ) -> List[Tuple[Tuple[int, str], T]]:
+        """Return matching models with their sort keys, newest first.
+
+        Only the returned rows are decoded into models. Rows that fail to
+        deserialize are logged and skipped.
+        """
+        results: List[Tuple[Tuple[int, str], T]] = []
+        skipped = 0
+        for key, entry in self._newest(model_cls, namespace, after):
+            if len(results) >= limit:
+                break
+            if query:
+                try:
+                    if not matches(json.loads(self._value(entry)), query):
+                        continue
+                except json.JSONDecodeError as e:
+                    logger.error(f"Error deserializing {model_cls.__name__}: {e}")
+                    continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            model = self._decode(model_cls, entry)
+            if model is not None:
+                results.append(((entry.updated_at, key), model))
+        return results
+
+    async def list(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[T]:
+        """List model instances of a type, newest first."""
+        return [
+            model for _, model in self._select(model_cls, {}, namespace, limit, offset)
+        ]
+
+    async def query(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[T]:
+        """Query model instances, newest first, by decoding and filtering."""
+        return [
+            model
+            for _, model in self._select(model_cls, query, namespace, limit, offset)
+        ]
+
+    async def list_page(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """List one page of model instances, newest first."""
+        return await self.query_page(model_cls, {}, namespace, limit, cursor)
+
+    async def query_page(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """Query one page of model instances, keyed on ``(updated_at, key)``."""
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        after = decode_keyset_cursor(cursor) if cursor is not None else None
+        rows = self._select(model_cls, query, namespace, limit + 1, 0, after)
+        items = [model for _, model in rows[:limit]]
+        if len(rows) <= limit:
+            return Page(items)
+        return Page(items, encode_keyset_cursor(*rows[limit - 1][0]))
+
+    # Compaction
+
+    async def _compaction_loop(self) -> None:
+        """Compact segments periodically."""
+        while True:
+            await asyncio.sleep(self.params["compact_interval"])
+            try:
+                await self.compact()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error compacting the context log: {e}")
+
+    async def compact(self, ratio: Optional[float] = None) -> Dict[str, Any]:
+        """Rewrite the full segments whose dead bytes reach ``ratio``.
+
+        Args:
+            ratio: Dead fraction of a segment that qualifies it, by default
+                the ``compact_ratio`` setting
+
+        Returns:
+            The number of segments compacted and the bytes reclaimed
+        """
+        if ratio is None:
+            ratio = self.params["compact_ratio"]
+        async with self._compaction_lock:
+            started = time.perf_counter()
+            result: Dict[str, Any] = {"segments": 0, "reclaimed_bytes": 0}
+            for segment in list(self._segments.values()):
+                if segment is self._active or not segment.dead:
+                    continue
+                if segment.dead < ratio * segment.size:
+                    continue
+                result["reclaimed_bytes"] += await self._compact_segment(segment)
+                result["segments"] += 1
+            result["duration_ms"] = (time.perf_counter() - started) * 1000
+            if result["segments"]:
+                self._compaction_stats["count"] += 1
+                self._compaction_stats["reclaimed_bytes"] += result["reclaimed_bytes"]
+                self._compaction_stats["last"] = dict(result)
+                logger.info(
+                    f"Compacted {result['segments']} segments, reclaiming "
+                    f"{result['reclaimed_bytes']} bytes"
+                )
+            return result
+
+    async def _compact_segment(self, segment: _Segment) -> int:
+        """Replace a segment with a copy of its live records.
+
+        Returns:
+            The bytes reclaimed
+        """
+        # Snapshot of the live records, taken on the event loop
+        live = {
+            entry.offset: (bucket, key, entry)
+            for bucket in self._index.values()
+            for key, entry in bucket.items()
+            if entry.segment == segment.id
+        }
+        keep_tombstones = segment.id != min(self._segments)
+        offsets, size = await asyncio.to_thread(
+            self._rewrite, segment, set(live), keep_tombstones
+        )
+
+        if size:
+            replacement = _Segment(segment.id, segment.path)
+            self._segments[segment.id] = replacement
+        else:
+            replacement = None
+            del self._segments[segment.id]
+        for offset, (bucket, key, entry) in live.items():
+            if bucket.get(key) is entry:
+                delta = offsets[offset] - offset
+                bucket[key] = entry._replace(
+                    offset=entry.offset + delta,
+                    value_start=entry.value_start + delta,
+                )
+            elif replacement is not None:
+                # Overwritten while the copy was made
+                replacement.dead += entry.size
+        reclaimed = segment.size - size
+        segment.close()
+        return reclaimed
+
+    def _rewrite(
+        self, segment: _Segment, live: set, keep_tombstones: bool
+    ) -> Tuple[Dict[int, int], int]:
+        """Copy a segment's live records to a new file that replaces it.
+
+        Runs on a worker thread; the segment is sealed, so it no longer
+        changes.
+
+        Returns:
+            The new offset of every copied record, and the new size (0 if
+            nothing was left and the files were removed)
+        """
+        hint = _hint_path(segment.path)
+        view = segment.view()
+        offsets: Dict[int, int] = {}
+        kept: List[_Header] = []
+        tmp = segment.path + ".tmp"
+        try:
+            headers, _ = _read_headers(view, 0, verify=False)
+            with open(tmp, "wb") as out:
+                position = 0
+                for offset, *fields, op, key, value_len in headers:
+                    if op == PUT and offset not in live:
+                        continue
+                    if op == TOMBSTONE and not keep_tombstones:
+                        continue
+                    size = HEADER.size + len(key) + value_len
+                    out.write(view[offset : offset + size])
+                    offsets[offset] = position
+                    kept.append((position, *fields, op, key, value_len))
+                    position += size
+                out.flush()
+                os.fsync(out.fileno())
+        finally:
+            view.close()
+
+        if not position:
+            os.remove(tmp)
+            for path in (segment.path, hint):
+                if os.path.exists(path):
+                    os.remove(path)
+            return offsets, 0
+        _write_hint(hint + ".new", position, kept)
+        os.replace(tmp, segment.path)
+        os.replace(hint + ".new", hint)
+        return offsets, position
@@ -0,0 +1,799 @@
+"""Typed metric storage with time rollups.
+
+MetricRecords are stored one row each in ``metric_records``, with a column
+per field, rather than as documents. Every insert also updates three rollup
+tables (``metric_rollup_minute``, ``_hour`` and ``_day``) in the same
+transaction: per time bucket and ``(agent_id, domain, learning_mode)``
+they hold counts by completion status, error and token sums, latency
+sum, minimum and maximum, feedback sums and a latency histogram.
+
+The histogram has logarithmic bins that grow by HISTOGRAM_GROWTH (10%), so
+percentiles read from rollups are within 5% of the exact value while a
+rollup row stays a few hundred bytes. aggregate_metrics() reads the
+coarsest rollup whose buckets line up with the requested granularity and
+time range; ranges that do not start and end on a minute boundary are
+aggregated from ``metric_records``, with exact percentiles.
+
+Timestamps are stored as UNIX seconds. Naive datetimes are taken as UTC,
+like ``datetime.utcnow()``, and buckets come back as naive UTC datetimes.
+"""
+
+import json
+import math
+import sqlite3
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from luca_core.context.sqlite_schema import MODELS_TABLE
+from luca_core.schemas import MetricRecord
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+METRICS_TABLE = "metric_records"
+
+# Rollup bucket sizes in seconds, finest first
+GRANULARITIES: Dict[str, int] = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Fields metrics can be grouped and filtered by
+DIMENSIONS: Tuple[str, ...] = ("agent_id", "domain", "learning_mode")
+
+DEFAULT_PERCENTILES: Tuple[float, ...] = (50, 95, 99)
+
+# Ratio between the bounds of consecutive latency histogram bins
+HISTOGRAM_GROWTH = 1.1
+_LOG_GROWTH = math.log(HISTOGRAM_GROWTH)
+
+_STATUSES = ("success", "partial", "failure")
+
+# Aggregate columns holding integers; the others are floats
+_INTEGER_COLUMNS = frozenset(
+    (
+        "count",
+        *_STATUSES,
+        "error_count",
+        "tokens_used",
+        "latency_min",
+        "latency_max",
+        "feedback_count",
+    )
+)
+
+_RECORD_COLUMNS = (
+    "ts, task_id, agent_id, domain, learning_mode, completion_status, "
+    "latency_ms, error_count, tokens_used, feedback, additional"
+)
+_ROLLUP_COLUMNS = (
+    "bucket, agent_id, domain, learning_mode, count, success, partial, failure, "
+    "errors, tokens, latency_sum, latency_min, latency_max, feedback_sum, "
+    "feedback_count, histogram"
+)
+
+# Upsert of a rollup row: sums add up, extremes and histogram bins merge
+_MERGE_SQL = ", ".join(
+    [
+        *(
+            f"{column} = {column} + excluded.{column}"
+            for column in (
+                "count",
+                *_STATUSES,
+                "errors",
+                "tokens",
+                "latency_sum",
+                "feedback_sum",
+                "feedback_count",
+            )
+        ),
+        "latency_min = min(latency_min, excluded.latency_min)",
+        "latency_max = max(latency_max, excluded.latency_max)",
+        """histogram = (
+            SELECT json_group_object(key, n) FROM (
+                SELECT key, sum(value) AS n FROM (
+                    SELECT key, value FROM json_each(histogram)
+                    UNION ALL
+                    SELECT key, value FROM json_each(excluded.histogram)
+                )
+                GROUP BY key
+            )
+        )""",
+    ]
+)
+
+# A record as stored, without its id; see record_row()
+RecordRow = Tuple[Any, ...]
+
+
+def rollup_table(granularity: str) -> str:
+    """Return the name of a granularity's rollup table."""
+    return f"metric_rollup_{granularity}"
+
+
+def to_epoch(value: datetime) -> float:
+    """Return a datetime as UNIX seconds; naive datetimes are UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def from_epoch(seconds: float) -> datetime:
+    """Return UNIX seconds as a naive UTC datetime."""
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+def latency_bin(latency_ms: float) -> int:
+    """Return the histogram bin of a latency.
+
+    Bin 0 holds latencies under 1 ms; bin ``b`` holds
+    ``[GROWTH ** (b - 1), GROWTH ** b)``.
+    """
+    if latency_ms < 1:
+        return 0
+    return 1 + int(math.log(latency_ms) / _LOG_GROWTH)
+
+
+def bin_value(bin: int) -> float:
+    """Return the latency a histogram bin stands for, its geometric middle."""
+    if bin <= 0:
+        return 0.0
+    return HISTOGRAM_GROWTH ** (bin - 0.5)
+
+
+def _rank(count: int, percentile: float) -> int:
+    """Return the 1-based nearest rank of a percentile."""
+    return max(1, math.ceil(percentile / 100 * count))
+
+
+def create_metrics_schema(conn: sqlite3.Connection) -> bool:
+    """Create the metric and rollup tables.
+
+    Args:
+        conn: Writer connection
+
+    Returns:
+        Whether ``metric_records`` was created, i.e. metrics stored before
+        it existed need a backfill
+    """
+    created = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (METRICS_TABLE,),
+    ).fetchone()
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {METRICS_TABLE} (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            task_id TEXT NOT NULL,
+            agent_id TEXT NOT NULL DEFAULT '',
+            domain TEXT NOT NULL,
+            learning_mode TEXT NOT NULL,
+            completion_status TEXT NOT NULL,
+            latency_ms INTEGER NOT NULL,
+            error_count INTEGER NOT NULL,
+            tokens_used INTEGER NOT NULL,
+            feedback REAL,
+            additional TEXT NOT NULL DEFAULT '{{}}',
+            latency_bin INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_metric_records_ts ON {METRICS_TABLE} (ts)"
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_metric_records_task "
+        f"ON {METRICS_TABLE} (task_id)"
+    )
+    for granularity in GRANULARITIES:
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {rollup_table(granularity)} (
+                bucket INTEGER NOT NULL,
+                agent_id TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                learning_mode TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                success INTEGER NOT NULL,
+                partial INTEGER NOT NULL,
+                failure INTEGER NOT NULL,
+                errors INTEGER NOT NULL,
+                tokens INTEGER NOT NULL,
+                latency_sum INTEGER NOT NULL,
+                latency_min INTEGER NOT NULL,
+                latency_max INTEGER NOT NULL,
+                feedback_sum REAL NOT NULL,
+                feedback_count INTEGER NOT NULL,
+                histogram TEXT NOT NULL,
+                PRIMARY KEY (bucket, agent_id, domain, learning_mode)
+            ) WITHOUT ROWID
+            """
+        )
+    # Position of the backfill from the models table while one is running
+    conn.execute("CREATE TABLE IF NOT EXISTS metric_backfill (after TEXT NOT NULL)")
+    return created
+
+
+def record_row(metric: MetricRecord) -> RecordRow:
+    """Return the ``metric_records`` columns of a metric, without its id."""
+    return (
+        to_epoch(metric.timestamp),
+        metric.task_id,
+        metric.agent_id or "",
+        metric.domain,
+        metric.learning_mode,
+        metric.completion_status,
+        metric.latency_ms,
+        metric.error_count,
+        metric.tokens_used,
+        metric.user_feedback_score,
+        (
+            json.dumps(metric.additional_metrics, default=str)
+            if metric.additional_metrics
+            else "{}"
+        ),
+    )
+
+
+def _record_from_row(row: Sequence[Any]) -> MetricRecord:
+    return MetricRecord(
+        timestamp=from_epoch(row[0]),
+        task_id=row[1],
+        agent_id=row[2] or None,
+        domain=row[3],
+        learning_mode=row[4],
+        completion_status=row[5],
+        latency_ms=row[6],
+        error_count=row[7],
+        tokens_used=row[8],
+        user_feedback_score=row[9],
+        additional_metrics=json.loads(row[10]),
+    )
+
+
+class _Group:
+    """Running totals of one aggregate row.
+
+    Exact groups keep every latency; the others keep a histogram.
+    """
+
+    __slots__ = (
+        "count",
+        "success",
+        "partial",
+        "failure",
+        "errors",
+        "tokens",
+        "latency_sum",
+        "latency_min",
+        "latency_max",
+        "feedback_sum",
+        "feedback_count",
+        "histogram",
+        "latencies",
+    )
+
+    def __init__(self, exact: bool = False):
+        self.count = self.success = self.partial = self.failure = 0
+        self.errors = self.tokens = self.latency_sum = 0
+        self.latency_min: Optional[int] = None
+        self.latency_max: Optional[int] = None
+        self.feedback_sum = 0.0
+        self.feedback_count = 0
+        self.histogram: Dict[int, int] = {}
+        self.latencies: Optional[List[int]] = [] if exact else None
+
+    def add(
+        self,
+        status: str,
+        latency: int,
+        errors: int,
+        tokens: int,
+        feedback: Optional[float],
+    ) -> None:
+        """Add one record."""
+        self.count += 1
+        if status in _STATUSES:
+            setattr(self, status, getattr(self, status) + 1)
+        self.errors += errors
+        self.tokens += tokens
+        self.latency_sum += latency
+        if self.latency_min is None or latency < self.latency_min:
+            self.latency_min = latency
+        if self.latency_max is None or latency > self.latency_max:
+            self.latency_max = latency
+        if feedback is not None:
+            self.feedback_sum += feedback
+            self.feedback_count += 1
+        if self.latencies is not None:
+            self.latencies.append(latency)
+        else:
+            bin = latency_bin(latency)
+            self.histogram[bin] = self.histogram.get(bin, 0) + 1
+
+    def merge(self, row: Sequence[Any]) -> None:
+        """Add a rollup row, from its ``count`` column on."""
+        (
+            count,
+            success,
+            partial,
+            failure,
+            errors,
+            tokens,
+            latency_sum,
+            latency_min,
+            latency_max,
+            feedback_sum,
+            feedback_count,
+            histogram,
+        ) = row
+        self.count += count
+        self.success += success
+        self.partial += partial
+        self.failure += failure
+        self.errors += errors
+        self.tokens += tokens
+        self.latency_sum += latency_sum
+        if self.latency_min is None or latency_min < self.latency_min:
+            self.latency_min = latency_min
+        if self.latency_max is None or latency_max > self.latency_max:
+            self.latency_max = latency_max
+        self.feedback_sum += feedback_sum
+        self.feedback_count += feedback_count
+        for bin, n in json.loads(histogram).items():
+            self.histogram[int(bin)] = self.histogram.get(int(bin), 0) + n
+
+    def percentile(self, percentile: float) -> float:
+        """Return a latency percentile (nearest rank)."""
+        rank = _rank(self.count, percentile)
+        if self.latencies is not None:
+            self.latencies.sort()
+            return float(self.latencies[rank - 1])
+        seen = 0
+        value = 0.0
+        for bin in sorted(self.histogram):
+            seen += self.histogram[bin]
+            if seen >= rank:
+                value = bin_value(bin)
+                break
+        # The bin's middle may fall outside the latencies actually seen
+        return min(
+            max(value, float(self.latency_min or 0)), float(self.latency_max or 0)
+        )
+
+
+def insert_metrics(conn: sqlite3.Connection, rows: Sequence[RecordRow]) -> None:
+    """Insert metric records and fold them into the rollups.
+
+    Runs in the caller's transaction, so records and rollups commit together.
+
+    Args:
+        conn: Writer connection
+        rows: The records, as returned by record_row()
+    """
+    if not rows:
+        return
+    last = conn.execute(f"SELECT max(id) FROM {METRICS_TABLE}").fetchone()[0]
+    conn.executemany(
+        f"INSERT INTO {METRICS_TABLE} ({_RECORD_COLUMNS}, latency_bin) "
+        f"VALUES ({', '.join('?' * 12)})",
+        [(*row, latency_bin(row[6])) for row in rows],
+    )
+    for granularity, size in GRANULARITIES.items():
+        # Aggregate the new rows per bucket, group and histogram bin, then
+        # per bucket and group; conflicting rollup rows are merged
+        conn.execute(
+            f"""
+            INSERT INTO {rollup_table(granularity)} ({_ROLLUP_COLUMNS})
+            SELECT bucket, agent_id, domain, learning_mode, sum(n), sum(success),
+                sum(partial), sum(failure), sum(errors), sum(tokens),
+                sum(latency_sum), min(latency_min), max(latency_max),
+                sum(feedback_sum), sum(feedback_count),
+                json_group_object(CAST(latency_bin AS TEXT), n)
+            FROM (
+                SELECT CAST(ts / {size} AS INTEGER) * {size} AS bucket,
+                    agent_id, domain, learning_mode, latency_bin, count(*) AS n,
+                    sum(completion_status = 'success') AS success,
+                    sum(completion_status = 'partial') AS partial,
+                    sum(completion_status = 'failure') AS failure,
+                    sum(error_count) AS errors, sum(tokens_used) AS tokens,
+                    sum(latency_ms) AS latency_sum,
+                    min(latency_ms) AS latency_min,
+                    max(latency_ms) AS latency_max,
+                    total(feedback) AS feedback_sum,
+                    count(feedback) AS feedback_count
+                FROM {METRICS_TABLE}
+                WHERE id > ?
+                GROUP BY bucket, agent_id, domain, learning_mode, latency_bin
+            )
+            WHERE true
+            GROUP BY bucket, agent_id, domain, learning_mode
+            ON CONFLICT (bucket, agent_id, domain, learning_mode) DO UPDATE SET
+                {_MERGE_SQL}
+            """,
+            (last or 0,),
+        )
+
+
+def records_batch(
+    conn: sqlite3.Connection, after: int, batch_size: int
+) -> List[Tuple[Any, ...]]:
+    """Return up to ``batch_size`` records after id ``after``, in id order.
+
+    Rows hold the id followed by a RecordRow; see copy_records().
+    """
+    return conn.execute(
+        f"SELECT id, {_RECORD_COLUMNS} FROM {METRICS_TABLE} "
+        "WHERE id > ? ORDER BY id LIMIT ?",
+        (after, batch_size),
+    ).fetchall()
+
+
+def copy_records(conn: sqlite3.Connection, rows: Sequence[Tuple[Any, ...]]) -> None:
+    """Insert rows read by records_batch(), leaving the rollups alone.
+
+    Used with merge_rollups() to copy metrics between databases, so that
+    rollups outlive records removed by retention.
+    """
+    conn.executemany(
+        f"INSERT INTO {METRICS_TABLE} ({_RECORD_COLUMNS}, latency_bin) "
+        f"VALUES ({', '.join('?' * 12)})",
+        [(*row[1:], latency_bin(row[7])) for row in rows],
+    )
+
+
+def rollups_batch(
+    conn: sqlite3.Connection,
+    granularity: str,
+    after: Optional[Sequence[Any]],
+    batch_size: int,
+) -> List[Tuple[Any, ...]]:
+    """Return up to ``batch_size`` rollup rows in primary key order.
+
+    Args:
+        conn: Connection to read from
+        granularity: Rollup to read
+        after: Primary key ``(bucket, agent_id, domain, learning_mode)`` of
+            the last row read, or None to start
+        batch_size: Maximum number of rows
+    """
+    where, params = "", []
+    if after is not None:
+        where = "WHERE (bucket, agent_id, domain, learning_mode) > (?, ?, ?, ?)"
+        params = list(after)
+    return conn.execute(
+        f"SELECT {_ROLLUP_COLUMNS} FROM {rollup_table(granularity)} {where} "
+        "ORDER BY bucket, agent_id, domain, learning_mode LIMIT ?",
+        (*params, batch_size),
+    ).fetchall()
+
+
+def merge_rollups(
+    conn: sqlite3.Connection, granularity: str, rows: Sequence[Tuple[Any, ...]]
+) -> None:
+    """Merge rows read by rollups_batch() into a rollup."""
+    conn.executemany(
+        f"""
+        INSERT INTO {rollup_table(granularity)} ({_ROLLUP_COLUMNS})
+        VALUES ({', '.join('?' * 16)})
+        ON CONFLICT (bucket, agent_id, domain, learning_mode) DO UPDATE SET
+            {_MERGE_SQL}
+        """,
+        rows,
+    )
+
+
+def select_metrics(conn: sqlite3.Connection, task_id: str) -> List[MetricRecord]:
+    """Return a task's metric records, oldest first."""
+    rows = conn.execute(
+        f"SELECT {_RECORD_COLUMNS} FROM {METRICS_TABLE} WHERE task_id = ? "
+        "ORDER BY ts, id",
+        (task_id,),
+    )
+    return [_record_from_row(row) for row in rows]
+
+
+def backfill_position(conn: sqlite3.Connection) -> Optional[str]:
+    """Return where the backfill from the models table stands, if running."""
+    row = conn.execute("SELECT after FROM metric_backfill").fetchone()
+    return row[0] if row else None
+
+
+def has_document_metrics(conn: sqlite3.Connection) -> bool:
+    """Return whether metrics are stored as documents in the models table."""
+    return bool(
+        conn.execute(
+            f"SELECT 1 FROM {MODELS_TABLE} "
+            "WHERE namespace = 'metrics' AND model_type = ? LIMIT 1",
+            (MetricRecord.__name__,),
+        ).fetchone()
+    )
+
+
+def start_backfill(conn: sqlite3.Connection) -> None:
+    """Mark metrics stored in the models table as needing a backfill."""
+    conn.execute("DELETE FROM metric_backfill")
+    conn.execute("INSERT INTO metric_backfill (after) VALUES ('')")
+
+
+def backfill_batch(
+    conn: sqlite3.Connection,
+    after: str,
+    batch_size: int,
+    decode: Callable[[str, Any], Optional[MetricRecord]],
+) -> Optional[str]:
+    """Copy the next batch of document metrics into the typed table.
+
+    Metrics stored as documents in the ``metrics`` namespace (by
+    BaseContextStore.record_metric()) are copied in key order; the position
+    is saved in the same transaction, so an interrupted backfill resumes.
+
+    Args:
+        conn: Writer connection
+        after: Key of the last row copied so far; ``""`` to start
+        batch_size: Rows per batch
+        decode: Callable returning the metric of a row from its codec and
+            data, or None to skip the row
+
+    Returns:
+        The position to continue from, or None once the backfill is done
+    """
+    rows = conn.execute(
+        f"""
+        SELECT key, codec, data FROM {MODELS_TABLE}
+        WHERE namespace = 'metrics' AND model_type = ? AND key > ?
+        ORDER BY key
+        LIMIT ?
+        """,
+        (MetricRecord.__name__, after, batch_size),
+    ).fetchall()
+    metrics = [decode(row[1], row[2]) for row in rows]
+    insert_metrics(conn, [record_row(metric) for metric in metrics if metric])
+    if len(rows) < batch_size:
+        conn.execute("DELETE FROM metric_backfill")
+        return None
+    conn.execute("UPDATE metric_backfill SET after = ?", (rows[-1][0],))
+    return rows[-1][0]
+
+
+def _check_options(
+    group_by: Sequence[str],
+    granularity: Optional[str],
+    filters: Optional[Mapping[str, Any]],
+    percentiles: Sequence[float],
+) -> Dict[str, List[str]]:
+    """Validate aggregate options and return the filters as value lists."""
+    for name in group_by:
+        if name not in DIMENSIONS:
+            raise ValueError(f"Cannot group metrics by {name}")
+    if granularity is not None and granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown metric granularity: {granularity}")
+    for percentile in percentiles:
+        if not 0 <= percentile <= 100:
+            raise ValueError("Percentiles must be between 0 and 100")
+    values: Dict[str, List[str]] = {}
+    for name, value in (filters or {}).items():
+        if name not in DIMENSIONS:
+            raise ValueError(f"Cannot filter metrics by {name}")
+        if value is None or isinstance(value, str):
+            value = [value]
+        values[name] = [item or "" for item in value]
+    return values
+
+
+def metric_columns(
+    group_by: Sequence[str] = (),
+    granularity: Optional[str] = None,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+) -> List[str]:
+    """Return the keys of the aggregate rows for a set of options."""
+    columns = ["bucket"] if granularity else []
+    columns.extend(group_by)
+    columns.extend(
+        [
+            "count",
+            "success",
+            "partial",
+            "failure",
+            "error_count",
+            "tokens_used",
+            "latency_mean",
+            "latency_min",
+            "latency_max",
+        ]
+    )
+    columns.extend(f"latency_p{percentile:g}" for percentile in percentiles)
+    columns.extend(["feedback_mean", "feedback_count"])
+    return columns
+
+
+class _Aggregation:
+    """Groups records or rollup rows into aggregate rows."""
+
+    def __init__(
+        self,
+        group_by: Sequence[str],
+        granularity: Optional[str],
+        percentiles: Sequence[float],
+        exact: bool,
+    ):
+        self.positions = [DIMENSIONS.index(name) for name in group_by]
+        self.size = GRANULARITIES[granularity] if granularity else None
+        self.group_by = list(group_by)
+        self.percentiles = list(percentiles)
+        self.exact = exact
+        self.groups: Dict[Tuple[Any, ...], _Group] = {}
+
+    def group(self, ts: float, dimensions: Sequence[str]) -> _Group:
+        bucket = int(ts // self.size) * self.size if self.size else None
+        key = (bucket, *(dimensions[i] for i in self.positions))
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = _Group(self.exact)
+        return group
+
+    def rows(self) -> List[Dict[str, Any]]:
+        results = []
+        for key in sorted(self.groups, key=lambda key: (key[0] or 0, *key[1:])):
+            group = self.groups[key]
+            row: Dict[str, Any] = {}
+            if self.size:
+                row["bucket"] = from_epoch(key[0])
+            for name, value in zip(self.group_by, key[1:]):
+                row[name] = (value or None) if name == "agent_id" else value
+            row.update(
+                count=group.count,
+                success=group.success,
+                partial=group.partial,
+                failure=group.failure,
+                error_count=group.errors,
+                tokens_used=group.tokens,
+                latency_mean=group.latency_sum / group.count,
+                latency_min=group.latency_min,
+                latency_max=group.latency_max,
+            )
+            for percentile in self.percentiles:
+                row[f"latency_p{percentile:g}"] = group.percentile(percentile)
+            row["feedback_mean"] = (
+                group.feedback_sum / group.feedback_count
+                if group.feedback_count
+                else None
+            )
+            row["feedback_count"] = group.feedback_count
+            results.append(row)
+        return results
+
+
+def _rollup_source(
+    granularity: Optional[str], start: Optional[float], end: Optional[float]
+) -> Optional[str]:
+    """Return the coarsest rollup that answers a query, if any does."""
+    for name in reversed(list(GRANULARITIES)):
+        size = GRANULARITIES[name]
+        if granularity and GRANULARITIES[granularity] % size:
+            continue
+        if all(bound is None or bound % size == 0 for bound in (start, end)):
+            return name
+    return None
+
+
+def aggregate_metrics(
+    conn: sqlite3.Connection,
+    group_by: Sequence[str] = (),
+    granularity: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    filters: Optional[Mapping[str, Any]] = None,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+) -> List[Dict[str, Any]]:
+    """Aggregate stored metrics; see BaseContextStore.aggregate_metrics()."""
+    values = _check_options(group_by, granularity, filters, percentiles)
+    lower = to_epoch(start) if start is not None else None
+    upper = to_epoch(end) if end is not None else None
+    source = _rollup_source(granularity, lower, upper)
+
+    clauses = []
+    params: List[Any] = []
+    column = "bucket" if source else "ts"
+    if lower is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(lower)
+    if upper is not None:
+        clauses.append(f"{column} < ?")
+        params.append(upper)
+    for name, items in values.items():
+        clauses.append(f"{name} IN ({', '.join('?' * len(items))})")
+        params.extend(items)
+    where = " AND ".join(clauses) or "1"
+
+    aggregation = _Aggregation(group_by, granularity, percentiles, source is None)
+    if source is None:
+        rows = conn.execute(
+            f"""
+            SELECT ts, agent_id, domain, learning_mode, completion_status,
+                latency_ms, error_count, tokens_used, feedback
+            FROM {METRICS_TABLE} WHERE {where}
+            """,
+            params,
+        )
+        for row in rows:
+            aggregation.group(row[0], row[1:4]).add(*row[4:])
+    else:
+        rows = conn.execute(
+            f"SELECT {_ROLLUP_COLUMNS} FROM {rollup_table(source)} WHERE {where}",
+            params,
+        )
+        for row in rows:
+            aggregation.group(row[0], row[1:4]).merge(row[4:])
+    return aggregation.rows()
+
+
+def aggregate_records(
+    metrics: Iterable[MetricRecord],
+    group_by: Sequence[str] = (),
+    granularity: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    filters: Optional[Mapping[str, Any]] = None,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+) -> List[Dict[str, Any]]:
+    """Aggregate metric records in memory, with exact percentiles.
+
+    Takes the same options as aggregate_metrics().
+    """
+    values = _check_options(group_by, granularity, filters, percentiles)
+    lower = to_epoch(start) if start is not None else None
+    upper = to_epoch(end) if end is not None else None
+    aggregation = _Aggregation(group_by, granularity, percentiles, True)
+    for metric in metrics:
+        row = record_row(metric)
+        if lower is not None and row[0] < lower:
+            continue
+        if upper is not None and row[0] >= upper:
+            continue
+        dimensions = row[2:5]
+        if any(
+            dimensions[DIMENSIONS.index(name)] not in items
+            for name, items in values.items()
+        ):
+            continue
+        aggregation.group(row[0], dimensions).add(*row[5:10])
+    return aggregation.rows()
+
+
+def to_arrays(rows: List[Dict[str, Any]], columns: Sequence[str]) -> Dict[str, Any]:
+    """Return aggregate rows as one NumPy array per column.
+
+    Buckets become ``datetime64[s]``, dimensions object arrays and missing
+    feedback means NaN.
+
+    Raises:
+        ValueError: If numpy is not installed
+    """
+    if np is None:
+        raise ValueError("Metric arrays require the numpy package")
+    arrays = {}
+    for column in columns:
+        values = [row[column] for row in rows]
+        if column == "bucket":
+            arrays[column] = np.array(values, dtype="datetime64[s]")
+        elif column in DIMENSIONS:
+            arrays[column] = np.array(values, dtype=object)
+        elif column in _INTEGER_COLUMNS:
+            arrays[column] = np.array(values, dtype=np.int64)
+        else:
+            arrays[column] = np.array(
+                [np.nan if value is None else value for value in values],
+                dtype=np.float64,
+            )
+    return arrays
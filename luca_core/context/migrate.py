@@ -0,0 +1,552 @@
+"""Copy a context database between the two SQLite layouts.
+
+ContextStore keeps each model type in its own table (``messages``,
+``tasks``, ...), SQLiteContextStore keeps every model in the ``models``
+table under a namespace and model type. migrate() streams the rows of one
+layout into a database of the other:
+
+    ContextStore table    SQLiteContextStore namespace / model type
+    messages              conversation / Message
+    conversations         conversations / Conversation
+    tasks                 tasks / Task
+    task_results          task_results / TaskResult
+    projects              projects / Project
+    user_preferences      preferences / UserPreferences
+    metrics               metrics / MetricRecord
+
+Payloads are copied as stored, with their codec tags, and never decoded.
+Columns that only one layout has are derived in SQL: a task's ``status``,
+for instance, is read from its document. Namespaces of the models layout
+without a table in the other layout are skipped and counted. Typed metric
+records and their rollups are copied table to table.
+
+Rows are read in primary key order, ``batch_size`` at a time. Each batch
+is written with one bulk insert, in a transaction that also records the
+position reached in the ``migration_checkpoint`` table of the destination.
+An interrupted migration therefore resumes after its last committed batch.
+The table is dropped once the migration completes. Rows already in the
+destination are replaced by source rows with the same key.
+
+The full-text index and typed metrics of SQLiteContextStore are derived
+data. The search index is rebuilt by the store's backfill the next time it
+is opened. Messages copied to the ContextStore layout have no
+``conversation_id``, since the models layout does not record it.
+"""
+
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from luca_core.context.codecs import DOCUMENT_SQL, register_sql_functions
+from luca_core.context.metrics import (
+    GRANULARITIES,
+    METRICS_TABLE,
+    copy_records,
+    create_metrics_schema,
+    merge_rollups,
+    records_batch,
+    rollup_table,
+    rollups_batch,
+)
+from luca_core.context.sqlite_schema import (
+    MODELS_TABLE,
+    create_schema,
+    has_legacy_tables,
+    now_timestamp,
+)
+from luca_core.context.store import ContextStore
+
+# Layout names: ContextStore and SQLiteContextStore
+LEGACY_LAYOUT = "legacy"
+MODELS_LAYOUT = "models"
+
+CHECKPOINT_TABLE = "migration_checkpoint"
+DEFAULT_MIGRATION_BATCH_SIZE = 2000
+
+# ContextStore table: namespace, model type, and the table's columns as SQL
+# over a models row (``doc`` is the row's JSON document)
+LAYOUT_MAP: Dict[str, Tuple[str, str, Dict[str, str]]] = {
+    "messages": ("conversation", "Message", {"id": "key"}),
+    "conversations": (
+        "conversations",
+        "Conversation",
+        {"id": "key", "project_id": "json_extract(doc, '$.project_id')"},
+    ),
+    "tasks": (
+        "tasks",
+        "Task",
+        {"id": "key", "status": "json_extract(doc, '$.status')"},
+    ),
+    "task_results": (
+        "task_results",
+        "TaskResult",
+        {
+            "id": "'result_' || json_extract(doc, '$.task_id')",
+            "task_id": "json_extract(doc, '$.task_id')",
+        },
+    ),
+    "projects": ("projects", "Project", {"id": "key"}),
+    "user_preferences": (
+        "preferences",
+        "UserPreferences",
+        {"id": "json_extract(doc, '$.user_id')"},
+    ),
+    "metrics": (
+        "metrics",
+        "MetricRecord",
+        {"id": "key", "task_id": "json_extract(doc, '$.task_id')"},
+    ),
+}
+
+# ContextStore column that becomes the models key, where it is not ``id``
+_LEGACY_KEYS = {"task_results": "task_id"}
+
+# Source rows after a position, and the position after a row
+Reader = Callable[[sqlite3.Connection, Any, int], List[Tuple[Any, ...]]]
+
+
+@dataclass
+class MigrationReport:
+    """Progress, and in the end the outcome, of a migration."""
+
+    source_layout: str
+    destination_layout: str
+    # Rows copied by step (a table, or a namespace and model type)
+    copied: Dict[str, int] = field(default_factory=dict)
+    # Rows left to copy when the migration started or resumed
+    total: int = 0
+    # Models layout rows without a ContextStore table
+    skipped: int = 0
+    # Payload bytes copied
+    bytes: int = 0
+    batches: int = 0
+    resumed: bool = False
+    step: Optional[str] = None
+    duration_s: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        """Rows copied so far."""
+        return sum(self.copied.values())
+
+    @property
+    def rows_per_s(self) -> float:
+        """Rows copied per second."""
+        return self.rows / self.duration_s if self.duration_s else 0.0
+
+    @property
+    def mb_per_s(self) -> float:
+        """Payload megabytes copied per second."""
+        return self.bytes / 1e6 / self.duration_s if self.duration_s else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the report as a plain dictionary."""
+        return {
+            "source_layout": self.source_layout,
+            "destination_layout": self.destination_layout,
+            "copied": dict(self.copied),
+            "rows": self.rows,
+            "total": self.total,
+            "skipped": self.skipped,
+            "bytes": self.bytes,
+            "batches": self.batches,
+            "resumed": self.resumed,
+            "duration_s": self.duration_s,
+            "rows_per_s": self.rows_per_s,
+            "mb_per_s": self.mb_per_s,
+        }
+
+
+@dataclass
+class _Step:
+    """One table or model type to copy."""
+
+    name: str
+    read: Reader
+    # Writes a batch and returns its payload bytes
+    write: Callable[[sqlite3.Connection, List[Tuple[Any, ...]]], int]
+    # Position after a row
+    position: Callable[[Tuple[Any, ...]], Any]
+    # Rows left after a position
+    count: Callable[[sqlite3.Connection, Any], int]
+    start: Any = None
+
+
+def _tables(conn: sqlite3.Connection) -> set:
+    return {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+
+
+def detect_layout(conn: sqlite3.Connection) -> Optional[str]:
+    """Return the layout of a database, or None if it has no context tables."""
+    tables = _tables(conn)
+    if MODELS_TABLE in tables or has_legacy_tables(conn):
+        return MODELS_LAYOUT
+    if "messages" in tables:
+        return LEGACY_LAYOUT
+    return None
+
+
+def _payload_bytes(rows: Sequence[Tuple[Any, ...]], column: int) -> int:
+    return sum(len(row[column]) for row in rows)
+
+
+def _timestamp(value: Optional[float]) -> int:
+    """Convert a ContextStore timestamp to models layout microseconds."""
+    return now_timestamp() if value is None else int(round(value * 1000000))
+
+
+def _legacy_step(conn: sqlite3.Connection, table: str) -> _Step:
+    """Copy a ContextStore table to its namespace."""
+    namespace, model_type, _ = LAYOUT_MAP[table]
+    key = _LEGACY_KEYS.get(table, "id")
+    # Tables created before codecs hold JSON only
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    codec = "codec" if "codec" in columns else "'json'"
+
+    def read(conn: sqlite3.Connection, after: Any, size: int) -> List[Tuple[Any, ...]]:
+        return conn.execute(
+            f"SELECT id, {key}, {codec}, data, timestamp FROM {table} "
+            "WHERE id > ? ORDER BY id LIMIT ?",
+            (after, size),
+        ).fetchall()
+
+    def write(conn: sqlite3.Connection, rows: List[Tuple[Any, ...]]) -> int:
+        conn.executemany(
+            f"""
+            INSERT OR REPLACE INTO {MODELS_TABLE}
+            (namespace, model_type, key, created_at, updated_at, codec, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (namespace, model_type, row[1], ts, ts, row[2], row[3])
+                for row in rows
+                for ts in (_timestamp(row[4]),)
+            ],
+        )
+        return _payload_bytes(rows, 3)
+
+    def count(conn: sqlite3.Connection, after: Any) -> int:
+        return conn.execute(
+            f"SELECT count(*) FROM {table} WHERE id > ?", (after,)
+        ).fetchone()[0]
+
+    return _Step(table, read, write, lambda row: row[0], count, "")
+
+
+def _models_step(table: str) -> _Step:
+    """Copy a namespace and model type to its ContextStore table."""
+    namespace, model_type, columns = LAYOUT_MAP[table]
+    names = ", ".join(columns)
+    placeholders = ", ".join("?" * (len(columns) + 3))
+
+    def read(conn: sqlite3.Connection, after: Any, size: int) -> List[Tuple[Any, ...]]:
+        return conn.execute(
+            f"""
+            SELECT key, codec, data, updated_at, {', '.join(columns.values())}
+            FROM (
+                SELECT *, {DOCUMENT_SQL} AS doc FROM {MODELS_TABLE}
+                WHERE namespace = ? AND model_type = ? AND key > ?
+                ORDER BY key
+                LIMIT ?
+            )
+            ORDER BY key
+            """,
+            (namespace, model_type, after, size),
+        ).fetchall()
+
+    def write(conn: sqlite3.Connection, rows: List[Tuple[Any, ...]]) -> int:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {table} (codec, data, timestamp, {names}) "
+            f"VALUES ({placeholders})",
+            [(row[1], row[2], row[3] / 1000000, *row[4:]) for row in rows],
+        )
+        return _payload_bytes(rows, 2)
+
+    def count(conn: sqlite3.Connection, after: Any) -> int:
+        return conn.execute(
+            f"SELECT count(*) FROM {MODELS_TABLE} "
+            "WHERE namespace = ? AND model_type = ? AND key > ?",
+            (namespace, model_type, after),
+        ).fetchone()[0]
+
+    return _Step(
+        f"{namespace}/{model_type}", read, write, lambda row: row[0], count, ""
+    )
+
+
+def _metric_steps() -> List[_Step]:
+    """Copy typed metric records, then their rollups."""
+
+    def write_records(conn: sqlite3.Connection, rows: List[Tuple[Any, ...]]) -> int:
+        copy_records(conn, rows)
+        return 0
+
+    def count_records(conn: sqlite3.Connection, after: Any) -> int:
+        return conn.execute(
+            f"SELECT count(*) FROM {METRICS_TABLE} WHERE id > ?", (after,)
+        ).fetchone()[0]
+
+    steps = [
+        _Step(
+            METRICS_TABLE,
+            records_batch,
+            write_records,
+            lambda row: row[0],
+            count_records,
+            0,
+        )
+    ]
+    for granularity in GRANULARITIES:
+        steps.append(_rollup_step(granularity))
+    return steps
+
+
+def _rollup_step(granularity: str) -> _Step:
+    table = rollup_table(granularity)
+
+    def read(conn: sqlite3.Connection, after: Any, size: int) -> List[Tuple[Any, ...]]:
+        return rollups_batch(conn, granularity, after, size)
+
+    def write(conn: sqlite3.Connection, rows: List[Tuple[Any, ...]]) -> int:
+        merge_rollups(conn, granularity, rows)
+        return 0
+
+    def count(conn: sqlite3.Connection, after: Any) -> int:
+        if after is None:
+            return conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+        return conn.execute(
+            f"SELECT count(*) FROM {table} "
+            "WHERE (bucket, agent_id, domain, learning_mode) > (?, ?, ?, ?)",
+            after,
+        ).fetchone()[0]
+
+    return _Step(table, read, write, lambda row: list(row[:4]), count)
+
+
+def _skipped(conn: sqlite3.Connection) -> int:
+    """Count models layout rows that have no ContextStore table."""
+    pairs = [
+        (namespace, model_type) for namespace, model_type, _ in LAYOUT_MAP.values()
+    ]
+    return conn.execute(
+        f"SELECT count(*) FROM {MODELS_TABLE} "
+        f"WHERE (namespace, model_type) NOT IN "
+        f"(VALUES {', '.join('(?, ?)' for _ in pairs)})",
+        [value for pair in pairs for value in pair],
+    ).fetchone()[0]
+
+
+def _load_checkpoint(
+    conn: sqlite3.Connection, source: str, restart: bool
+) -> Dict[str, Tuple[Any, bool]]:
+    """Create the checkpoint table and return the saved positions by step.
+
+    Raises:
+        ValueError: If the checkpoint belongs to a migration from another
+            source and ``restart`` is not set
+    """
+    with conn:
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+                step TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                position TEXT,
+                done INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        if restart:
+            conn.execute(f"DELETE FROM {CHECKPOINT_TABLE}")
+    rows = conn.execute(
+        f"SELECT step, source, position, done FROM {CHECKPOINT_TABLE}"
+    ).fetchall()
+    others = {row[1] for row in rows if row[1] != source}
+    if others:
+        raise ValueError(
+            f"The destination holds a checkpoint of a migration from "
+            f"{others.pop()}; restart the migration to discard it"
+        )
+    return {
+        row[0]: (None if row[2] is None else json.loads(row[2]), bool(row[3]))
+        for row in rows
+    }
+
+
+def _save_checkpoint(
+    conn: sqlite3.Connection, step: str, source: str, position: Any, done: bool
+) -> None:
+    conn.execute(
+        f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE} (step, source, position, done) "
+        "VALUES (?, ?, ?, ?)",
+        (step, source, json.dumps(position), int(done)),
+    )
+
+
+def _open_source(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+    register_sql_functions(conn)
+    return conn
+
+
+def _prepare_destination(path: Path, layout: str, metrics: bool) -> sqlite3.Connection:
+    """Create the destination's tables and open it for the bulk load."""
+    if layout == LEGACY_LAYOUT:
+        ContextStore(str(path)).close()
+        conn = sqlite3.connect(str(path))
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path))
+        # Like SQLiteEngine; only takes effect on a new file
+        conn.execute("PRAGMA auto_vacuum = incremental")
+        with conn:
+            create_schema(conn)
+            if metrics:
+                create_metrics_schema(conn)
+    # Batches commit with their checkpoint; a lost batch is copied again
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def migrate(
+    source: str,
+    destination: str,
+    batch_size: int = DEFAULT_MIGRATION_BATCH_SIZE,
+    restart: bool = False,
+    progress: Optional[Callable[[MigrationReport], None]] = None,
+) -> MigrationReport:
+    """Copy a context database into a database of the other layout.
+
+    Args:
+        source: Database to read; opened read-only
+        destination: Database to write; created if missing
+        batch_size: Rows read and written per batch
+        restart: Discard the destination's checkpoint instead of resuming
+        progress: Called with the report after every batch
+
+    Returns:
+        The report of the migration
+
+    Raises:
+        ValueError: If a database is missing, has no context tables, or
+            both use the same layout
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    source_path, destination_path = Path(source).resolve(), Path(destination).resolve()
+    if not source_path.exists():
+        raise ValueError(f"Source database does not exist: {source}")
+    if source_path == destination_path:
+        raise ValueError("Source and destination are the same database")
+
+    started = time.perf_counter()
+    src = _open_source(source_path)
+    try:
+        layout = detect_layout(src)
+        if layout is None:
+            raise ValueError(f"{source} is not a context database")
+        if layout == MODELS_LAYOUT and has_legacy_tables(src):
+            raise ValueError(
+                f"{source} is still being migrated to the models table; "
+                "open it with SQLiteContextStore first"
+            )
+        target = LEGACY_LAYOUT if layout == MODELS_LAYOUT else MODELS_LAYOUT
+        if destination_path.exists():
+            conn = sqlite3.connect(str(destination_path))
+            existing = detect_layout(conn)
+            conn.close()
+            if existing == layout:
+                raise ValueError(
+                    f"{destination} already uses the {layout} layout of the source"
+                )
+
+        tables = _tables(src)
+        if layout == LEGACY_LAYOUT:
+            steps = [
+                _legacy_step(src, table) for table in LAYOUT_MAP if table in tables
+            ]
+        else:
+            steps = [_models_step(table) for table in LAYOUT_MAP]
+        metrics = METRICS_TABLE in tables
+        if metrics:
+            steps.extend(_metric_steps())
+
+        dst = _prepare_destination(destination_path, target, metrics)
+        try:
+            report = MigrationReport(layout, target)
+            if layout == MODELS_LAYOUT:
+                report.skipped = _skipped(src)
+            _copy(
+                src,
+                dst,
+                str(source_path),
+                steps,
+                batch_size,
+                restart,
+                report,
+                progress,
+            )
+            with dst:
+                dst.execute(f"DROP TABLE {CHECKPOINT_TABLE}")
+                if "search_namespaces" in _tables(dst):
+                    # Rebuilt by the next SQLiteContextStore.initialize()
+                    dst.execute("UPDATE search_namespaces SET backfilled = 0")
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+    report.step = None
+    report.duration_s = time.perf_counter() - started
+    return report
+
+
+def _copy(
+    src: sqlite3.Connection,
+    dst: sqlite3.Connection,
+    source: str,
+    steps: List[_Step],
+    batch_size: int,
+    restart: bool,
+    report: MigrationReport,
+    progress: Optional[Callable[[MigrationReport], None]],
+) -> None:
+    """Run the steps, resuming from and updating the checkpoint."""
+    started = time.perf_counter()
+    saved = _load_checkpoint(dst, source, restart)
+    report.resumed = bool(saved)
+    positions = {}
+    for step in steps:
+        position, done = saved.get(step.name, (step.start, False))
+        positions[step.name] = position
+        if not done:
+            report.total += step.count(src, position)
+
+    for step in steps:
+        if saved.get(step.name, (None, False))[1]:
+            continue
+        report.step = step.name
+        report.copied.setdefault(step.name, 0)
+        position = positions[step.name]
+        while True:
+            rows = step.read(src, position, batch_size)
+            done = len(rows) < batch_size
+            if rows:
+                position = step.position(rows[-1])
+            with dst:
+                if rows:
+                    report.bytes += step.write(dst, rows)
+                _save_checkpoint(dst, step.name, source, position, done)
+            report.copied[step.name] += len(rows)
+            report.batches += 1
+            report.duration_s = time.perf_counter() - started
+            if progress is not None:
+                progress(report)
+            if done:
+                break
@@ -0,0 +1,80 @@
+"""Cursor pagination for context stores.
+
+A page carries an opaque cursor for the next page. SQLite-backed stores use
+keyset cursors that hold the sort key of the last row returned, so fetching
+page ``n`` is an index range scan that costs the same as fetching page 1.
+Stores without keyset support fall back to cursors holding an offset.
+
+Cursors are URL-safe strings; callers must treat them as opaque and only
+hand them back to the store that produced them.
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class Page(Generic[T]):
+    """One page of results.
+
+    ``next_cursor`` is ``None`` on the last page.
+    """
+
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+def _encode(payload: Any) -> str:
+    """Encode a JSON payload as a URL-safe cursor."""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> Any:
+    """Decode a cursor produced by _encode()."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def encode_keyset_cursor(sort_value: Any, key: str) -> str:
+    """Return a cursor positioned after the row with this sort value and key."""
+    return _encode({"k": [sort_value, key]})
+
+
+def decode_keyset_cursor(cursor: str) -> Tuple[Any, str]:
+    """Return the ``(sort_value, key)`` held by a keyset cursor.
+
+    Raises:
+        ValueError: If the cursor is not a keyset cursor
+    """
+    payload = _decode(cursor)
+    if not isinstance(payload, dict) or not isinstance(payload.get("k"), list):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    sort_value, key = payload["k"]
+    return sort_value, key
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Return a cursor for the page starting at ``offset``."""
+    return _encode({"o": offset})
+
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    """Return the offset held by an offset cursor, 0 for no cursor.
+
+    Raises:
+        ValueError: If the cursor is not an offset cursor
+    """
+    if cursor is None:
+        return 0
+    payload = _decode(cursor)
+    if not isinstance(payload, dict) or not isinstance(payload.get("o"), int):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return payload["o"]
@@ -0,0 +1,74 @@
+"""Field projections of stored models.
+
+A projection holds a few fields of a model, such as the ``id``, ``role``
+and ``timestamp`` of a Message without its ``content``. Stores that keep
+JSON documents extract the fields in SQL, so the rest of the document is
+never parsed in Python::
+
+    rows = await store.project(Message, ("id", "role", "timestamp"),
+                               namespace="conversation")
+    rows[0].role  # MessageRole.USER
+
+Projection classes are pydantic models made of the chosen fields, with the
+model's own types and defaults, so the projected values are validated and
+converted like the full model's.
+"""
+
+from functools import lru_cache
+from typing import Sequence, Tuple, Type
+
+from pydantic import BaseModel, create_model
+
+from luca_core.context.codecs import DOCUMENT_SQL
+
+
+def resolve_fields(
+    model_cls: Type[BaseModel], fields: Sequence[str]
+) -> Tuple[str, ...]:
+    """Validate projected field names, keeping their order.
+
+    Raises:
+        ValueError: If no field is given or a field is not on the model
+    """
+    if isinstance(fields, str):
+        fields = (fields,)
+    resolved = tuple(dict.fromkeys(fields))
+    if not resolved:
+        raise ValueError("A projection needs at least one field")
+    for name in resolved:
+        if name not in model_cls.model_fields:
+            raise ValueError(f"{model_cls.__name__} has no field {name!r}")
+    return resolved
+
+
+@lru_cache(maxsize=None)
+def projection_model(
+    model_cls: Type[BaseModel], fields: Tuple[str, ...]
+) -> Type[BaseModel]:
+    """Return the model class holding the given fields of ``model_cls``."""
+    return create_model(  # type: ignore[call-overload, no-any-return]
+        f"{model_cls.__name__}Projection",
+        **{
+            name: (
+                model_cls.model_fields[name].annotation,
+                model_cls.model_fields[name],
+            )
+            for name in fields
+        },
+    )
+
+
+def project_model(model: BaseModel, fields: Tuple[str, ...]) -> BaseModel:
+    """Return the projection of a model instance."""
+    projection = projection_model(type(model), fields)
+    return projection.model_construct(**{name: getattr(model, name) for name in fields})
+
+
+def projection_sql(fields: Tuple[str, ...]) -> str:
+    """Return SQL building the JSON object of the fields of a models row.
+
+    Field names are model field names, which are identifiers.
+    """
+    return "json_object({})".format(
+        ", ".join(f"'{name}', ({DOCUMENT_SQL}) -> '$.{name}'" for name in fields)
+    )
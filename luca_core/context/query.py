@@ -0,0 +1,229 @@
+"""Query filter compilation for context stores.
+
+A query is a dictionary mapping field lookups to values. A lookup is a field
+name, optionally a dotted path into nested objects, optionally followed by an
+operator suffix:
+
+    {"status": "pending"}                      # equality
+    {"status__in": ["pending", "in_progress"]} # membership
+    {"execution_time_ms__gte": 100}            # range
+    {"metadata.request_id": "abc"}             # nested field
+
+Supported operators are ``eq`` (the default), ``ne``, ``gt``, ``gte``, ``lt``,
+``lte`` and ``in``. Values are converted with pydantic's JSON encoder, so
+enums, datetimes and booleans compare the same way they were serialized.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic_core import to_jsonable_python
+
+_FIELD_PART = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+_COMPARISONS = {
+    "eq": "=",
+    "ne": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+
+OPERATORS = frozenset(_COMPARISONS) | {"in"}
+
+
+def parse_lookup(lookup: str) -> Tuple[str, str]:
+    """Split a lookup such as ``"value__gte"`` into field and operator.
+
+    Args:
+        lookup: The query dictionary key
+
+    Returns:
+        A ``(field, operator)`` tuple
+
+    Raises:
+        ValueError: If the field name or operator is invalid
+    """
+    field, sep, op = lookup.rpartition("__")
+    if not sep or op not in OPERATORS:
+        field, op = lookup, "eq"
+
+    if not all(_FIELD_PART.match(part) for part in field.split(".")):
+        raise ValueError(f"Invalid query field: {field!r}")
+    return field, op
+
+
+def json_path(field: str) -> str:
+    """Return the SQLite JSON path for a (possibly dotted) field name."""
+    return "$." + ".".join(f'"{part}"' for part in field.split("."))
+
+
+def _is_structured(value: Any) -> bool:
+    """Whether a value serializes to a JSON object or array."""
+    return isinstance(to_jsonable_python(value), (dict, list))
+
+
+def _sql_value(value: Any) -> Any:
+    """Convert a Python value to the form json_extract() returns for it."""
+    value = to_jsonable_python(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def _compile_lookup(
+    expr: str, expr_params: List[Any], op: str, value: Any
+) -> Tuple[str, List[Any]]:
+    """Compile a single lookup against a field expression."""
+    if op == "in":
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            raise ValueError("Value for an 'in' lookup must be a list")
+        values = [v for v in value if v is not None]
+        parts: List[str] = []
+        params: List[Any] = []
+        if values:
+            parts.append(f"{expr} IN ({', '.join('?' * len(values))})")
+            params += expr_params + [_sql_value(v) for v in values]
+        if len(values) != len(value):
+            parts.append(f"{expr} IS NULL")
+            params += expr_params
+        if not parts:
+            return "0", []
+        return f"({' OR '.join(parts)})", params
+
+    if value is None:
+        if op == "eq":
+            return f"{expr} IS NULL", list(expr_params)
+        if op == "ne":
+            return f"{expr} IS NOT NULL", list(expr_params)
+        # Ordering comparisons against NULL never match
+        return "0", []
+
+    # Objects and arrays come back from json_extract() as minified JSON text,
+    # so compare both sides in SQLite's canonical form.
+    if _is_structured(value):
+        expr, comparand = f"json({expr})", "json(?)"
+    else:
+        comparand = "?"
+    sql_value = _sql_value(value)
+
+    if op == "ne":
+        # Missing fields count as "not equal", matching attribute comparison
+        return (
+            f"({expr} != {comparand} OR {expr} IS NULL)",
+            expr_params + [sql_value] + expr_params,
+        )
+    return f"{expr} {_COMPARISONS[op]} {comparand}", expr_params + [sql_value]
+
+
+def compile_filter(
+    query: Dict[str, Any],
+    data_column: str = "data",
+    field_columns: Optional[Dict[str, str]] = None,
+) -> Tuple[str, List[Any]]:
+    """Compile a query dictionary to a SQL boolean expression.
+
+    Args:
+        query: The query dictionary
+        data_column: Column holding the JSON document
+        field_columns: Fields backed by a dedicated column; these are compared
+            against the column instead of a json_extract() of the document
+
+    Returns:
+        A ``(sql, params)`` tuple; ``sql`` is ``"1"`` for an empty query
+
+    Raises:
+        ValueError: If a lookup is invalid or an ``in`` value is not a list
+    """
+    field_columns = field_columns or {}
+    clauses: List[str] = []
+    params: List[Any] = []
+
+    for lookup, value in query.items():
+        field, op = parse_lookup(lookup)
+        if field in field_columns:
+            expr, expr_params = field_columns[field], []
+        else:
+            expr, expr_params = f"json_extract({data_column}, ?)", [json_path(field)]
+
+        clause, clause_params = _compile_lookup(expr, expr_params, op, value)
+        clauses.append(clause)
+        params.extend(clause_params)
+
+    if not clauses:
+        return "1", []
+    return " AND ".join(clauses), params
+
+
+def _field_value(document: Dict[str, Any], field: str) -> Any:
+    """Return a (possibly dotted) field of a JSON document; None if missing."""
+    value: Any = document
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    """Order JSON values the way SQLite orders what json_extract() returns.
+
+    Numbers sort before text; objects and arrays compare as minified JSON
+    text.
+    """
+    if isinstance(value, (dict, list)):
+        return 1, json.dumps(value, separators=(",", ":"))
+    if isinstance(value, str):
+        return 1, value
+    return 0, value
+
+
+def _compare(value: Any, op: str, comparand: Any) -> bool:
+    """Compare two non-null JSON values like their SQL form."""
+    if op == "eq":
+        return bool(value == comparand)
+    if op == "ne":
+        return bool(value != comparand)
+    left, right = _sort_key(value), _sort_key(comparand)
+    if op == "gt":
+        return left > right
+    if op == "gte":
+        return left >= right
+    if op == "lt":
+        return left < right
+    return left <= right
+
+
+def matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Evaluate a query dictionary against a JSON document in Python.
+
+    The counterpart of compile_filter() for stores without SQL: a missing
+    field is NULL, which ``ne`` matches and ordering comparisons never do,
+    and values of different types order as in SQLite.
+
+    Raises:
+        ValueError: If a lookup is invalid or an ``in`` value is not a list
+    """
+    for lookup, value in query.items():
+        field, op = parse_lookup(lookup)
+        actual = _field_value(document, field)
+        if op == "in":
+            if not isinstance(value, (list, tuple, set, frozenset)):
+                raise ValueError("Value for an 'in' lookup must be a list")
+            if not any(actual == to_jsonable_python(v) for v in value):
+                return False
+            continue
+        comparand = to_jsonable_python(value)
+        if comparand is None or actual is None:
+            if op == "eq" and (actual is None) != (comparand is None):
+                return False
+            if op == "ne" and actual is None and comparand is None:
+                return False
+            if op not in ("eq", "ne"):
+                return False
+            continue
+        if not _compare(actual, op, comparand):
+            return False
+    return True
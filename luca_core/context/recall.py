@@ -0,0 +1,165 @@
+"""Semantic recall of past conversation messages.
+
+MessageRecall keeps a VectorIndex of message embeddings next to the context
+database and answers "which past messages are about this?" with a top-k
+cosine search, where get_conversation_history() can only return the latest
+messages. The store stays the source of truth: the index maps message ids
+to vectors, and recalled messages are fetched back from the store by key.
+
+LucaManager adds every message it stores. Messages written by other paths
+are picked up by sync(), which the manager runs at start-up when the index
+is empty (a first run, or an index discarded for a new embedder).
+
+Embedding and index work is blocking and runs in a worker thread.
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Collection, List, Optional, Sequence, Tuple, Union
+
+from luca_core.context.base_store import BaseContextStore
+from luca_core.context.embeddings import Embedder, HashingEmbedder
+from luca_core.context.vector_index import VectorIndex
+from luca_core.schemas import Message
+
+logger = logging.getLogger(__name__)
+
+
+class MessageRecall:
+    """Vector index over the messages of the ``conversation`` namespace.
+
+    Args:
+        path: Directory of the vector index
+        embedder: Embedder for messages and queries; defaults to a
+            HashingEmbedder, which works offline
+        **index_options: VectorIndex settings (block_rows, coarse_above,
+            probes)
+    """
+
+    NAMESPACE = "conversation"
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        embedder: Optional[Embedder] = None,
+        **index_options: Any,
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.index = VectorIndex(
+            path, self.embedder.dim, self.embedder.name, **index_options
+        )
+
+    @classmethod
+    def for_database(
+        cls,
+        db_path: Union[str, Path],
+        embedder: Optional[Embedder] = None,
+        **index_options: Any,
+    ) -> "MessageRecall":
+        """Open the index kept next to a database, e.g. data/context.vectors/.
+
+        Args:
+            db_path: Path of the context database
+            embedder: Embedder for messages and queries
+            **index_options: VectorIndex settings
+
+        Returns:
+            A MessageRecall for the database
+        """
+        return cls(Path(db_path).with_suffix(".vectors"), embedder, **index_options)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _add(self, messages: Sequence[Message]) -> None:
+        vectors = self.embedder.embed([message.content for message in messages])
+        self.index.add([message.id for message in messages], vectors)
+
+    async def add(self, messages: Sequence[Message]) -> None:
+        """Index messages, replacing earlier vectors of the same ids.
+
+        Args:
+            messages: Messages to index
+        """
+        if messages:
+            await asyncio.to_thread(self._add, list(messages))
+
+    def _search(
+        self, query: str, k: int, probes: Optional[int]
+    ) -> List[Tuple[str, float]]:
+        return self.index.search(self.embedder.embed([query])[0], k, probes)
+
+    async def search(
+        self, query: str, k: int = 5, probes: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """Find the ids of the messages most similar to a text.
+
+        Args:
+            query: Text to look for
+            k: Maximum number of results
+            probes: Coarse lists to search, overriding the index setting
+
+        Returns:
+            ``(message id, cosine similarity)`` pairs, most similar first
+        """
+        return await asyncio.to_thread(self._search, query, k, probes)
+
+    async def recall(
+        self,
+        store: BaseContextStore,
+        query: str,
+        k: int = 5,
+        exclude: Collection[str] = (),
+    ) -> List[Message]:
+        """Return the stored messages most similar to a text.
+
+        Args:
+            store: Store holding the messages
+            query: Text to look for
+            k: Maximum number of messages
+            exclude: Ids of messages to leave out, such as the query's own
+
+        Returns:
+            Messages, most similar first
+        """
+        if k < 1:
+            return []
+        hits = await self.search(query, k + len(exclude))
+        keys = [key for key, _ in hits if key not in exclude][:k]
+        messages = await asyncio.gather(
+            *(store.fetch(Message, key, namespace=self.NAMESPACE) for key in keys)
+        )
+        # Messages deleted from the store since they were indexed drop out
+        return [message for message in messages if message is not None]
+
+    async def sync(self, store: BaseContextStore, batch_size: int = 500) -> int:
+        """Index the stored messages missing from the index.
+
+        Args:
+            store: Store holding the messages
+            batch_size: Messages embedded per batch
+
+        Returns:
+            Number of messages added
+        """
+        added = 0
+        batch: List[Message] = []
+        async for message in store.aiter_models(
+            Message, namespace=self.NAMESPACE, batch_size=batch_size
+        ):
+            if message.id not in self.index:
+                batch.append(message)
+            if len(batch) >= batch_size:
+                await self.add(batch)
+                added += len(batch)
+                batch = []
+        await self.add(batch)
+        added += len(batch)
+        if added:
+            logger.info("Indexed %d stored messages for recall", added)
+        return added
+
+    def close(self) -> None:
+        """Flush and release the index files."""
+        self.index.close()
@@ -0,0 +1,238 @@
+"""Retention for the SQLite context store.
+
+Rows of a namespace older than its TTL (by ``updated_at``) are deleted by a
+background sweep. Deletes run in small batches, one writer transaction
+each with a pause in between, so foreground writes queue behind a single
+short batch at most rather than behind the whole sweep. Full-text index
+entries go with their rows. For the ``metrics`` namespace the sweep also
+expires typed metric records and minute rollups; hour and day rollups are
+small and kept, so long-range aggregates outlive the raw records.
+
+Deleted rows leave free pages behind. Databases created with
+``auto_vacuum = incremental`` (the default connection profile) give them
+back to the file system with ``PRAGMA incremental_vacuum``, a few pages per
+step; older databases reuse them for new rows instead, until a one-off
+``VACUUM`` converts them.
+
+By default conversation messages, task results and metrics expire after
+``days``, which ComponentConfig fills in from
+``ErrorSchemaConfig.error_retention_days``.
+"""
+
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from luca_core.context.metrics import METRICS_TABLE, rollup_table
+from luca_core.context.search import unindex_documents
+from luca_core.context.sqlite_schema import MODELS_TABLE
+
+# Namespaces that expire when no policies are given
+DEFAULT_RETENTION_NAMESPACES: Tuple[str, ...] = (
+    "conversation",
+    "task_results",
+    "metrics",
+)
+
+# Retention settings. Values can be overridden through
+# ContextStoreConfig.retention.
+DEFAULT_RETENTION_PARAMS: Dict[str, Any] = {
+    "days": 30,  # TTL of namespaces listed without their own
+    "namespaces": None,  # TTL in days by namespace; None keeps a namespace
+    "interval": 3600,  # Seconds between sweeps
+    "batch_size": 500,  # Rows deleted per writer transaction
+    "batch_delay_ms": 10.0,  # Pause between batches
+    "vacuum_pages": 256,  # Pages freed per incremental vacuum step
+}
+
+
+def resolve_retention_params(params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge user supplied retention settings over the defaults.
+
+    ``namespaces`` may be a list of namespaces, which expire after
+    ``days``, or a dict of TTLs in days, where None keeps a namespace.
+
+    Args:
+        params: Overrides for DEFAULT_RETENTION_PARAMS
+
+    Returns:
+        The validated settings, with ``namespaces`` resolved to a dict of
+        TTLs in days
+
+    Raises:
+        ValueError: If a key is unknown or a value is out of range
+    """
+    resolved = dict(DEFAULT_RETENTION_PARAMS)
+    for key, value in (params or {}).items():
+        if key not in DEFAULT_RETENTION_PARAMS:
+            raise ValueError(f"Unsupported retention parameter: {key}")
+        resolved[key] = value
+
+    namespaces = resolved["namespaces"]
+    if namespaces is None:
+        namespaces = DEFAULT_RETENTION_NAMESPACES
+    if not isinstance(namespaces, dict):
+        namespaces = {namespace: resolved["days"] for namespace in namespaces}
+    try:
+        resolved["days"] = float(resolved["days"])
+        resolved["namespaces"] = {
+            str(namespace): float(days)
+            for namespace, days in namespaces.items()
+            if days is not None
+        }
+        resolved["interval"] = float(resolved["interval"])
+        resolved["batch_size"] = int(resolved["batch_size"])
+        resolved["batch_delay_ms"] = float(resolved["batch_delay_ms"])
+        resolved["vacuum_pages"] = int(resolved["vacuum_pages"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid retention parameters: {resolved!r}")
+
+    if resolved["days"] <= 0 or any(
+        days <= 0 for days in resolved["namespaces"].values()
+    ):
+        raise ValueError("Retention days must be positive")
+    if resolved["interval"] <= 0:
+        raise ValueError("interval must be positive")
+    if resolved["batch_size"] < 1 or resolved["vacuum_pages"] < 1:
+        raise ValueError("batch_size and vacuum_pages must be at least 1")
+    if resolved["batch_delay_ms"] < 0:
+        raise ValueError("batch_delay_ms must be non-negative")
+    return resolved
+
+
+@dataclass
+class RetentionResult:
+    """Outcome of one retention sweep."""
+
+    # Rows deleted by namespace; metrics include typed records and rollups
+    deleted: Dict[str, int] = field(default_factory=dict)
+    batches: int = 0
+    vacuum_steps: int = 0
+    # Bytes the database file shrank by, and free bytes left inside it
+    reclaimed_bytes: int = 0
+    free_bytes: int = 0
+    duration_ms: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the result as a plain dictionary."""
+        return {
+            "deleted": dict(self.deleted),
+            "batches": self.batches,
+            "vacuum_steps": self.vacuum_steps,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "free_bytes": self.free_bytes,
+            "duration_ms": self.duration_ms,
+        }
+
+
+def model_types(conn: sqlite3.Connection, namespace: str) -> List[str]:
+    """Return the model types stored in a namespace."""
+    rows = conn.execute(
+        f"SELECT DISTINCT model_type FROM {MODELS_TABLE} WHERE namespace = ?",
+        (namespace,),
+    )
+    return [row[0] for row in rows]
+
+
+def expire_batch(
+    conn: sqlite3.Connection,
+    namespace: str,
+    model_type: str,
+    cutoff: int,
+    batch_size: int,
+    searchable: bool,
+) -> int:
+    """Delete the oldest expired rows of one model type.
+
+    Args:
+        conn: Writer connection
+        namespace: Namespace to expire
+        model_type: Model type to expire
+        cutoff: Rows last updated before this timestamp (see
+            luca_core.context.sqlite_schema.to_timestamp) expire
+        batch_size: Maximum number of rows to delete
+        searchable: Whether the namespace is in the full-text index
+
+    Returns:
+        The number of rows deleted
+    """
+    # A range on idx_models_recent
+    keys = [
+        (namespace, model_type, row[0])
+        for row in conn.execute(
+            f"""
+            SELECT key FROM {MODELS_TABLE}
+            WHERE namespace = ? AND model_type = ? AND updated_at < ?
+            ORDER BY updated_at
+            LIMIT ?
+            """,
+            (namespace, model_type, cutoff, batch_size),
+        )
+    ]
+    conn.executemany(
+        f"DELETE FROM {MODELS_TABLE} "
+        "WHERE namespace = ? AND model_type = ? AND key = ?",
+        keys,
+    )
+    if searchable:
+        unindex_documents(conn, keys)
+    return len(keys)
+
+
+def expire_metrics_batch(
+    conn: sqlite3.Connection, cutoff: float, batch_size: int
+) -> int:
+    """Delete the oldest expired typed metric records and minute rollups.
+
+    Args:
+        conn: Writer connection
+        cutoff: Records before this UNIX time expire
+        batch_size: Maximum number of rows to delete from each table
+
+    Returns:
+        The number of rows deleted
+    """
+    deleted = conn.execute(
+        f"""
+        DELETE FROM {METRICS_TABLE} WHERE id IN (
+            SELECT id FROM {METRICS_TABLE} WHERE ts < ? ORDER BY ts LIMIT ?
+        )
+        """,
+        (cutoff, batch_size),
+    ).rowcount
+    minute = rollup_table("minute")
+    rollups = conn.execute(
+        f"""
+        DELETE FROM {minute}
+        WHERE (bucket, agent_id, domain, learning_mode) IN (
+            SELECT bucket, agent_id, domain, learning_mode FROM {minute}
+            WHERE bucket < ? ORDER BY bucket LIMIT ?
+        )
+        """,
+        (cutoff, batch_size),
+    ).rowcount
+    return deleted + rollups
+
+
+def page_counts(conn: sqlite3.Connection) -> Tuple[int, int, int]:
+    """Return the page size, page count and free page count."""
+    return (
+        conn.execute("PRAGMA page_size").fetchone()[0],
+        conn.execute("PRAGMA page_count").fetchone()[0],
+        conn.execute("PRAGMA freelist_count").fetchone()[0],
+    )
+
+
+def incremental_vacuum(conn: sqlite3.Connection, pages: int) -> Optional[int]:
+    """Give up to ``pages`` free pages back to the file system.
+
+    Returns:
+        The free pages left, or None if the database was not created with
+        incremental auto-vacuum
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return None
+    # executescript() steps the pragma to completion; execute() would
+    # free a single page
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
@@ -0,0 +1,521 @@
+"""Full-text search over stored models.
+
+The SQLite context store keeps an FTS5 index of the text of every model in
+the searchable namespaces (``conversation`` and ``task_results`` by
+default): message content, task results and error messages. The index is
+updated in the same transaction as the rows it covers, so a search never
+sees a model that is not stored or misses one that is.
+
+``search_docs`` holds each indexed row's text under a stable integer id;
+``search_fts`` is an external-content FTS5 index over it, since ``models``
+rows may be compressed or binary and their rowids change on VACUUM. Every
+searchable namespace owns a range of ids (see ``search_namespaces``), so a
+search of one namespace is a rowid range scan of the index. Rows written
+before a namespace became searchable are indexed by a background backfill.
+
+Queries are plain text: every word must appear (in any form the Porter
+stemmer folds together), and results are ranked by BM25.
+"""
+
+import math
+import re
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from pydantic_core import to_jsonable_python
+
+from luca_core.context.sqlite_schema import MODELS_TABLE, RowKey
+
+DEFAULT_SEARCH_NAMESPACES: Tuple[str, ...] = ("conversation", "task_results")
+
+# Matches ranked when a query has a word at least this common; see search()
+MAX_RANKED_MATCHES = 500
+
+# Bits of a docid below the namespace slot
+NAMESPACE_SHIFT = 40
+
+# Model fields holding searchable text
+SEARCH_FIELDS: Tuple[str, ...] = ("content", "result", "error_message")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class SearchHit:
+    """One search result.
+
+    ``rank`` is the BM25 score; lower is better. ``snippet`` is an excerpt
+    around the matches, with matched words wrapped in ``[`` and ``]``.
+    """
+
+    namespace: str
+    model_type: str
+    key: str
+    rank: float
+    snippet: str
+
+
+def search_text(values: Mapping[str, Any]) -> str:
+    """Return the searchable text of a model from its field values.
+
+    Strings nested in structured fields (such as ``TaskResult.result``) are
+    included; keys, numbers and booleans are not.
+    """
+    parts: List[str] = []
+
+    def collect(value: Any) -> None:
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                collect(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                collect(item)
+
+    for field in SEARCH_FIELDS:
+        value = values.get(field)
+        if value is not None and not isinstance(value, str):
+            value = to_jsonable_python(value, fallback=str)
+        collect(value)
+    return "\n".join(part for part in parts if part)
+
+
+def query_words(query: str) -> List[str]:
+    """Return the words of a user query; punctuation is ignored."""
+    return _WORD.findall(query)
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Convert a user query to an FTS5 expression matching all its words.
+
+    Returns None if the query has no words. Every word is quoted, so FTS5
+    operators in the input are searched for as text.
+    """
+    words = query_words(query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+
+def create_search_schema(
+    conn: sqlite3.Connection, namespaces: Sequence[str], reset: bool = False
+) -> List[str]:
+    """Create the search tables and drop namespaces no longer searchable.
+
+    Args:
+        conn: Writer connection
+        namespaces: Searchable namespaces
+        reset: Whether every namespace must be backfilled again, because
+            rows are still being migrated into the models table
+
+    Returns:
+        The searchable namespaces that need a backfill
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS search_namespaces (
+            namespace TEXT PRIMARY KEY,
+            slot INTEGER NOT NULL UNIQUE,
+            backfilled INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS search_docs (
+            docid INTEGER PRIMARY KEY,
+            namespace TEXT NOT NULL,
+            model_type TEXT NOT NULL,
+            key TEXT NOT NULL,
+            text TEXT NOT NULL,
+            UNIQUE (namespace, model_type, key)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+            text,
+            content = 'search_docs',
+            content_rowid = 'docid',
+            tokenize = 'porter unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    if reset:
+        conn.execute("UPDATE search_namespaces SET backfilled = 0")
+
+    registered = dict(conn.execute("SELECT namespace, slot FROM search_namespaces"))
+    for namespace in sorted(set(registered) - set(namespaces)):
+        # Writes to it are no longer indexed, so its entries would go stale
+        low, high = _docid_range(registered[namespace])
+        conn.execute(
+            "INSERT INTO search_fts (search_fts, rowid, text) "
+            "SELECT 'delete', docid, text FROM search_docs "
+            "WHERE docid >= ? AND docid < ? AND text != ''",
+            (low, high),
+        )
+        conn.execute(
+            "DELETE FROM search_docs WHERE docid >= ? AND docid < ?", (low, high)
+        )
+        conn.execute("DELETE FROM search_namespaces WHERE namespace = ?", (namespace,))
+
+    for namespace in namespaces:
+        if namespace in registered:
+            continue
+        slot = conn.execute(
+            "SELECT coalesce(max(slot) + 1, 0) FROM search_namespaces"
+        ).fetchone()[0]
+        # Nothing to backfill in a new namespace; writes from now on are
+        # indexed as they happen
+        empty = (
+            not reset
+            and not conn.execute(
+                f"SELECT 1 FROM {MODELS_TABLE} WHERE namespace = ? LIMIT 1",
+                (namespace,),
+            ).fetchone()
+        )
+        conn.execute(
+            "INSERT INTO search_namespaces (namespace, slot, backfilled) "
+            "VALUES (?, ?, ?)",
+            (namespace, slot, int(empty)),
+        )
+
+    done = {
+        row[0]
+        for row in conn.execute(
+            "SELECT namespace FROM search_namespaces WHERE backfilled"
+        )
+    }
+    return [namespace for namespace in namespaces if namespace not in done]
+
+
+def _docid_range(slot: int) -> Tuple[int, int]:
+    """Return the docids ``[low, high)`` of a namespace slot."""
+    return slot << NAMESPACE_SHIFT, (slot + 1) << NAMESPACE_SHIFT
+
+
+def _namespace_range(
+    conn: sqlite3.Connection, namespace: str
+) -> Optional[Tuple[int, int]]:
+    """Return the docid range of a searchable namespace, if it is one."""
+    row = conn.execute(
+        "SELECT slot FROM search_namespaces WHERE namespace = ?", (namespace,)
+    ).fetchone()
+    return None if row is None else _docid_range(row[0])
+
+
+def _unindex(conn: sqlite3.Connection, docid: int, text: str) -> None:
+    """Remove a row's text from the FTS5 index.
+
+    An external-content index must be given the text it indexed; rows
+    without text were never added.
+    """
+    if text:
+        conn.execute(
+            "INSERT INTO search_fts (search_fts, rowid, text) "
+            "VALUES ('delete', ?, ?)",
+            (docid, text),
+        )
+
+
+def index_documents(
+    conn: sqlite3.Connection, documents: Sequence[Tuple[RowKey, str]]
+) -> None:
+    """Index or re-index rows, given their row keys and searchable text.
+
+    Raises:
+        ValueError: If a row's namespace is not searchable
+    """
+    next_docid: Dict[str, int] = {}
+    # A row written twice in one batch keeps its last text
+    for row_key, text in dict(documents).items():
+        row = conn.execute(
+            "SELECT docid, text FROM search_docs "
+            "WHERE namespace = ? AND model_type = ? AND key = ?",
+            row_key,
+        ).fetchone()
+        if row is None:
+            namespace = row_key[0]
+            if namespace not in next_docid:
+                docids = _namespace_range(conn, namespace)
+                if docids is None:
+                    raise ValueError(f"Namespace is not searchable: {namespace}")
+                last = conn.execute(
+                    "SELECT max(docid) FROM search_docs "
+                    "WHERE docid >= ? AND docid < ?",
+                    docids,
+                ).fetchone()[0]
+                next_docid[namespace] = docids[0] if last is None else last + 1
+            docid = next_docid[namespace]
+            next_docid[namespace] += 1
+            conn.execute(
+                "INSERT INTO search_docs (docid, namespace, model_type, key, text) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (docid, *row_key, text),
+            )
+        elif row[1] == text:
+            continue
+        else:
+            docid = row[0]
+            _unindex(conn, docid, row[1])
+            conn.execute(
+                "UPDATE search_docs SET text = ? WHERE docid = ?", (text, docid)
+            )
+        if text:
+            conn.execute(
+                "INSERT INTO search_fts (rowid, text) VALUES (?, ?)", (docid, text)
+            )
+
+
+def unindex_documents(conn: sqlite3.Connection, keys: Sequence[RowKey]) -> None:
+    """Remove rows from the index."""
+    for row_key in keys:
+        row = conn.execute(
+            "SELECT docid, text FROM search_docs "
+            "WHERE namespace = ? AND model_type = ? AND key = ?",
+            row_key,
+        ).fetchone()
+        if row is not None:
+            _unindex(conn, row[0], row[1])
+            conn.execute("DELETE FROM search_docs WHERE docid = ?", (row[0],))
+
+
+def backfill_batch(
+    conn: sqlite3.Connection,
+    namespace: str,
+    after: Tuple[str, str],
+    batch_size: int,
+    extract: Any,
+) -> Optional[Tuple[str, str]]:
+    """Index the next batch of a namespace's rows, in primary key order.
+
+    Args:
+        conn: Writer connection
+        namespace: Namespace to backfill
+        after: ``(model_type, key)`` of the last row indexed so far;
+            ``("", "")`` to start
+        batch_size: Rows per batch
+        extract: Callable returning the searchable text of a row from its
+            codec and data
+
+    Returns:
+        The position to continue from, or None once the namespace is done
+    """
+    rows = conn.execute(
+        f"""
+        SELECT model_type, key, codec, data FROM {MODELS_TABLE}
+        WHERE namespace = ? AND (model_type, key) > (?, ?)
+        ORDER BY model_type, key
+        LIMIT ?
+        """,
+        (namespace, *after, batch_size),
+    ).fetchall()
+    index_documents(
+        conn,
+        [((namespace, row[0], row[1]), extract(row[2], row[3])) for row in rows],
+    )
+    if len(rows) < batch_size:
+        conn.execute(
+            "UPDATE search_namespaces SET backfilled = 1 WHERE namespace = ?",
+            (namespace,),
+        )
+        return None
+    return rows[-1][0], rows[-1][1]
+
+
+def _match(
+    conn: sqlite3.Connection,
+    expression: str,
+    docids: Optional[Tuple[int, int]],
+    columns: str,
+    order: str,
+    limit: int,
+) -> List[Tuple[Any, ...]]:
+    """Return FTS5 columns of the rows matching an expression.
+
+    ``docids`` restricts the matches to a namespace's docid range.
+    """
+    sql = f"SELECT {columns} FROM search_fts WHERE search_fts MATCH ?"
+    params: List[Any] = [expression]
+    if docids is not None:
+        sql += " AND rowid >= ? AND rowid < ?"
+        params.extend(docids)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def _documents(
+    conn: sqlite3.Connection, docids: Sequence[int]
+) -> Dict[int, Tuple[str, str, str, str]]:
+    """Return ``(namespace, model_type, key, text)`` of rows by docid."""
+    if not docids:
+        return {}
+    placeholders = ", ".join("?" * len(docids))
+    rows = conn.execute(
+        f"SELECT docid, namespace, model_type, key, text FROM search_docs "
+        f"WHERE docid IN ({placeholders})",
+        list(docids),
+    )
+    return {row[0]: row[1:] for row in rows}
+
+
+def _row_estimate(conn: sqlite3.Connection) -> int:
+    """Return the number of docids handed out, an upper bound of the rows."""
+    total = 0
+    for (slot,) in conn.execute("SELECT slot FROM search_namespaces").fetchall():
+        low, high = _docid_range(slot)
+        last = conn.execute(
+            "SELECT max(docid) FROM search_docs WHERE docid >= ? AND docid < ?",
+            (low, high),
+        ).fetchone()[0]
+        if last is not None:
+            total += last - low + 1
+    return total
+
+
+def _bm25(
+    rows: Sequence[Tuple[str, str, str, str]],
+    words: Sequence[str],
+    frequencies: Sequence[int],
+    total: int,
+) -> List[Tuple[float, str, str, str, str]]:
+    """Score ``(namespace, model_type, key, text)`` rows with BM25.
+
+    Uses k1 = 1.2 and b = 0.75, negated so that lower is better as with
+    FTS5's bm25(). Term frequencies count case-insensitive occurrences of
+    each word, at least one since every row matched; lengths are in
+    characters, relative to the rows' average.
+    """
+    if not rows:
+        return []
+    average = sum(len(row[3]) for row in rows) / len(rows) or 1.0
+    weights = [math.log(1 + (total - df + 0.5) / (df + 0.5)) for df in frequencies]
+    lowered = [word.lower() for word in words]
+    scored = []
+    for row in rows:
+        text = row[3].lower()
+        norm = 1.2 * (0.25 + 0.75 * len(text) / average)
+        score = 0.0
+        for word, weight in zip(lowered, weights):
+            tf = max(1, text.count(word))
+            score += weight * tf * 2.2 / (tf + norm)
+        scored.append((-score, *row))
+    scored.sort(key=lambda item: item[0])
+    return scored
+
+
+def _highlight_pattern(words: Sequence[str]) -> "re.Pattern[str]":
+    """Return a pattern matching the words of a text that match the query.
+
+    Words starting with a query word match, which approximates the stemmed
+    matching of the index.
+    """
+    return re.compile(
+        r"\b(?:" + "|".join(re.escape(word) for word in words) + r")\w*",
+        re.IGNORECASE,
+    )
+
+
+def _snippet(text: str, pattern: "re.Pattern[str]", size: int = 16) -> str:
+    """Return about ``size`` words of text around the first match.
+
+    Matches are wrapped in ``[`` and ``]``, and ``...`` marks text left
+    out, as FTS5's snippet() would.
+    """
+    tokens = [match.span() for match in re.finditer(r"\S+", text)]
+    if not tokens:
+        return ""
+    first = next(
+        (
+            i
+            for i, (start, end) in enumerate(tokens)
+            if pattern.search(text, start, end)
+        ),
+        0,
+    )
+    begin = max(0, min(first - size // 4, len(tokens) - size))
+    end = min(len(tokens), begin + size)
+    excerpt = pattern.sub(
+        lambda match: f"[{match.group(0)}]",
+        text[tokens[begin][0] : tokens[end - 1][1]],
+    )
+    return ("..." if begin > 0 else "") + excerpt + ("..." if end < len(tokens) else "")
+
+
+def search(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int,
+    namespace: Optional[str] = None,
+    max_ranked: int = MAX_RANKED_MATCHES,
+) -> List[SearchHit]:
+    """Return the best matches for a query, best first.
+
+    FTS5's bm25() reads the whole posting list of every query word to count
+    the rows containing it, so its cost grows with the frequency of the
+    most common word rather than with the number of results. Each word's
+    frequency is therefore probed first, capped at ``max_ranked``:
+
+    - If every word is that selective, all matches are ranked by bm25().
+    - Otherwise the newest ``max_ranked`` matches are fetched and ranked by
+      BM25 in Python, with the capped frequencies standing in for the
+      unknown ones. Older matches of a query with a common word are not
+      ranked.
+
+    Snippets are built in Python, only for the returned rows.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    words = query_words(query)
+    docids = None
+    if namespace is not None:
+        docids = _namespace_range(conn, namespace)
+        if docids is None:
+            return []
+
+    frequencies = [
+        len(_match(conn, f'"{word}"', None, "rowid", "rowid", max_ranked + 1))
+        for word in words
+    ]
+    if max(frequencies) <= max_ranked:
+        ranks = _match(conn, expression, docids, "rowid, rank", "rank", limit)
+        documents = _documents(conn, [docid for docid, _ in ranks])
+        ranked = [
+            (rank, *documents[docid]) for docid, rank in ranks if docid in documents
+        ]
+    else:
+        matches = _match(conn, expression, docids, "rowid", "rowid DESC", max_ranked)
+        documents = _documents(conn, [docid for docid, in matches])
+        ranked = _bm25(
+            list(documents.values()), words, frequencies, _row_estimate(conn)
+        )[:limit]
+
+    pattern = _highlight_pattern(words)
+    return [
+        SearchHit(row[1], row[2], row[3], row[0], _snippet(row[4], pattern))
+        for row in ranked
+    ]
+
+
+def hit_from_values(
+    row_key: RowKey, values: Dict[str, Any], words: Sequence[str]
+) -> Optional[SearchHit]:
+    """Score a model against query words without an index.
+
+    Used by stores without full-text indexing. Every word must occur in the
+    text (case-insensitively); the rank is the negated number of
+    occurrences, so more frequent matches sort first as with BM25.
+    """
+    text = search_text(values)
+    lowered = text.lower()
+    counts = [lowered.count(word.lower()) for word in words]
+    if not words or not all(counts):
+        return None
+    return SearchHit(
+        *row_key, -float(sum(counts)), _snippet(text, _highlight_pattern(words))
+    )
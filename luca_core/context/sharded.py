@@ -0,0 +1,580 @@
+"""Context store split across several SQLite files.
+
+ShardedContextStore keeps chosen namespaces in databases of their own, each
+an SQLiteContextStore with its own writer thread and WAL, so heavy
+``metrics`` ingestion no longer queues ``conversation`` writes behind it.
+A namespace can also be split into hash partitions of its keys, each a
+separate file, to spread a single busy namespace over several writers.
+
+``shards`` maps namespaces to their number of partitions; namespaces not
+listed stay in the main database at ``db_path``. Shards live in a
+directory next to it, one subdirectory per shard, so their backups (kept
+next to each file) do not mix::
+
+    data/context.db                          main database
+    data/context.shards/metrics/context.db   {"metrics": 1}
+    data/context.shards/tasks.0/context.db   {"tasks": 2}, keys hashing to 0
+    data/context.shards/tasks.1/context.db
+
+Reads of an unpartitioned namespace go straight to its database. list(),
+query() and their pages fan out to every partition and merge the results on
+``(updated_at, key)``, the order a single store returns them in, so keyset
+cursors stay valid across partitions. search_messages() merges the hits of
+every database by rank; each file ranks with its own word statistics, so
+the merged order is close to, not exactly, that of a single index.
+
+Writes that span partitions commit once per partition, concurrently: a
+store_many() is atomic within each partition only; so is a transaction,
+which commits once per database it touches. Subscribers receive the
+changes of every database; with a change log, each database keeps its own
+and is tailed through ``stores``. Typed metrics
+(record_metrics(), aggregate_metrics()) live in the first partition of
+``metrics``, or the main database if ``metrics`` is not sharded.
+
+The layout is recorded in the main database. Changing the number of
+partitions of a namespace, or sharding a namespace that already has rows
+in the main database, would strand rows and is refused by initialize().
+"""
+
+import asyncio
+import heapq
+import os
+import re
+import sqlite3
+import zlib
+from dataclasses import replace
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from pydantic import BaseModel
+
+from luca_core.context.base_store import BaseContextStore
+from luca_core.context.pagination import (
+    Page,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+)
+from luca_core.context.retention import RetentionResult
+from luca_core.context.search import SearchHit
+from luca_core.context.sqlite_schema import MODELS_TABLE
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.context.transactions import Transaction
+from luca_core.context.versions import Versioned
+from luca_core.schemas import MetricRecord
+
+T = TypeVar("T", bound=BaseModel)
+
+# Namespaces given their own database by default
+DEFAULT_SHARDS: Dict[str, int] = {
+    "conversation": 1,
+    "tasks": 1,
+    "task_results": 1,
+    "metrics": 1,
+}
+
+LAYOUT_TABLE = "shard_layout"
+_NAMESPACE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# (updated_at, key), as returned by SQLiteContextStore.query_sorted()
+SortKey = Tuple[int, str]
+
+
+def resolve_shards(shards: Optional[Dict[str, int]]) -> Dict[str, int]:
+    """Validate a shard layout, falling back to DEFAULT_SHARDS.
+
+    Raises:
+        ValueError: If a namespace is not a valid directory name or a
+            partition count is below 1
+    """
+    resolved = dict(DEFAULT_SHARDS if shards is None else shards)
+    for namespace, partitions in resolved.items():
+        if not _NAMESPACE.match(namespace):
+            raise ValueError(f"Invalid shard namespace: {namespace!r}")
+        if not isinstance(partitions, int) or partitions < 1:
+            raise ValueError(f"Partitions of {namespace} must be at least 1")
+    return resolved
+
+
+def partition(key: str, partitions: int) -> int:
+    """Return the partition of a key; stable across processes."""
+    return zlib.crc32(key.encode("utf-8")) % partitions
+
+
+def check_layout(db_path: str, shards: Dict[str, int]) -> None:
+    """Record the shard layout in the main database, refusing changes.
+
+    Raises:
+        ValueError: If a namespace's partition count changed, or a newly
+            sharded namespace has rows in the main database
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {LAYOUT_TABLE} (
+                    namespace TEXT PRIMARY KEY,
+                    partitions INTEGER NOT NULL
+                )
+                """
+            )
+            recorded = dict(
+                conn.execute(f"SELECT namespace, partitions FROM {LAYOUT_TABLE}")
+            )
+            for namespace, partitions in recorded.items():
+                if shards.get(namespace, 0) != partitions:
+                    raise ValueError(
+                        f"Namespace {namespace} is stored in {partitions} "
+                        f"shard(s); changing its layout needs a migration"
+                    )
+            for namespace in sorted(set(shards) - set(recorded)):
+                if conn.execute(
+                    f"SELECT 1 FROM {MODELS_TABLE} WHERE namespace = ? LIMIT 1",
+                    (namespace,),
+                ).fetchone():
+                    raise ValueError(
+                        f"Namespace {namespace} has rows in the main database; "
+                        "sharding it needs a migration"
+                    )
+                conn.execute(
+                    f"INSERT INTO {LAYOUT_TABLE} VALUES (?, ?)",
+                    (namespace, shards[namespace]),
+                )
+    finally:
+        conn.close()
+
+
+class ShardedContextStore(BaseContextStore):
+    """Context store that keeps namespaces in separate SQLite databases.
+
+    Args:
+        db_path: Path of the main database
+        shards: Number of hash partitions by sharded namespace, by default
+            DEFAULT_SHARDS
+        **store_options: Arguments for every database's SQLiteContextStore
+            (backup_interval, connection_params, write_behind, ...)
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/context.db",
+        shards: Optional[Dict[str, int]] = None,
+        **store_options: Any,
+    ):
+        self.db_path = db_path
+        self.shards = resolve_shards(shards)
+        self.main = SQLiteContextStore(db_path, **store_options)
+        # Store by shard name; the main database is "main"
+        self.stores: Dict[str, SQLiteContextStore] = {"main": self.main}
+        self._partitions: Dict[str, List[SQLiteContextStore]] = {}
+        root, _ = os.path.splitext(db_path)
+        for namespace, partitions in self.shards.items():
+            names = (
+                [namespace]
+                if partitions == 1
+                else [f"{namespace}.{i}" for i in range(partitions)]
+            )
+            for name in names:
+                path = os.path.join(f"{root}.shards", name, os.path.basename(db_path))
+                self.stores[name] = SQLiteContextStore(path, **store_options)
+            self._partitions[namespace] = [self.stores[name] for name in names]
+        self.search_namespaces = self.main.search_namespaces
+        # Subscribers see the writes of every database
+        for store in self.stores.values():
+            store.change_feed = self.change_feed
+
+    # Routing
+
+    def partitions(self, namespace: str) -> List[SQLiteContextStore]:
+        """Return the databases holding a namespace."""
+        return self._partitions.get(namespace, [self.main])
+
+    def shard(self, namespace: str, key: str) -> SQLiteContextStore:
+        """Return the database holding one key of a namespace."""
+        stores = self.partitions(namespace)
+        if len(stores) == 1:
+            return stores[0]
+        return stores[partition(key, len(stores))]
+
+    def _group(
+        self, namespace: str, keys: Sequence[str]
+    ) -> Dict[int, Tuple[SQLiteContextStore, List[int]]]:
+        """Group item positions by the database holding their key."""
+        groups: Dict[int, Tuple[SQLiteContextStore, List[int]]] = {}
+        for i, key in enumerate(keys):
+            store = self.shard(namespace, key)
+            groups.setdefault(id(store), (store, []))[1].append(i)
+        return groups
+
+    @property
+    def metrics_store(self) -> SQLiteContextStore:
+        """The database holding typed metrics."""
+        return self.partitions("metrics")[0]
+
+    # Lifecycle
+
+    async def initialize(self) -> None:
+        """Open every database and check the shard layout.
+
+        Raises:
+            ValueError: If the layout differs from the recorded one
+        """
+        await self.main.initialize()
+        try:
+            await asyncio.to_thread(check_layout, self.db_path, self.shards)
+            await asyncio.gather(
+                *(
+                    store.initialize()
+                    for store in self.stores.values()
+                    if store is not self.main
+                )
+            )
+        except Exception:
+            await self.close()
+            raise
+
+    async def close(self) -> None:
+        """Close every database; ones never opened are skipped."""
+        await asyncio.gather(*(store.close() for store in self.stores.values()))
+
+    async def flush(self) -> None:
+        """Wait until every write issued so far is committed in every shard."""
+        await asyncio.gather(*(store.flush() for store in self.stores.values()))
+
+    async def ensure_indexes(
+        self, indexed_fields: Optional[Dict[str, Sequence[str]]] = None
+    ) -> None:
+        """Apply new index declarations to every database."""
+        await asyncio.gather(
+            *(store.ensure_indexes(indexed_fields) for store in self.stores.values())
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the statistics of every database, by shard name."""
+        return {name: store.stats() for name, store in self.stores.items()}
+
+    async def apply_retention(
+        self,
+        namespaces: Optional[Dict[str, float]] = None,
+        now: Optional[datetime] = None,
+    ) -> RetentionResult:
+        """Run a retention sweep in every database, concurrently.
+
+        Every database also sweeps on its own schedule when retention is
+        configured; the result adds up the sweeps of all of them.
+        """
+        results = await asyncio.gather(
+            *(store.apply_retention(namespaces, now) for store in self.stores.values())
+        )
+        total = RetentionResult()
+        for result in results:
+            for namespace, count in result.deleted.items():
+                total.deleted[namespace] = total.deleted.get(namespace, 0) + count
+            total.batches += result.batches
+            total.vacuum_steps += result.vacuum_steps
+            total.reclaimed_bytes += result.reclaimed_bytes
+            total.free_bytes += result.free_bytes
+            total.duration_ms = max(total.duration_ms, result.duration_ms)
+        return total
+
+    # Single models
+
+    async def store(self, model: BaseModel, namespace: str = "default") -> None:
+        """Store a model instance in its shard."""
+        await self.shard(namespace, self.model_key(model)).store(model, namespace)
+
+    async def fetch(
+        self, model_cls: Type[T], key: str, namespace: str = "default"
+    ) -> Optional[T]:
+        """Fetch a model instance from its shard."""
+        return await self.shard(namespace, key).fetch(model_cls, key, namespace)
+
+    async def fetch_versioned(
+        self, model_cls: Type[T], key: str, namespace: str = "default"
+    ) -> Optional[Versioned[T]]:
+        """Fetch a model instance with its version from its shard."""
+        return await self.shard(namespace, key).fetch_versioned(
+            model_cls, key, namespace
+        )
+
+    async def update(
+        self,
+        model: BaseModel,
+        namespace: str = "default",
+        expected_version: Optional[int] = None,
+    ) -> None:
+        """Update a model instance in its shard."""
+        await self.shard(namespace, self.model_key(model)).update(
+            model, namespace, expected_version
+        )
+
+    async def delete(
+        self, model_cls: Type[BaseModel], key: str, namespace: str = "default"
+    ) -> None:
+        """Delete a model instance from its shard."""
+        await self.shard(namespace, key).delete(model_cls, key, namespace)
+
+    # Bulk operations
+
+    async def store_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Store several model instances, one transaction per shard."""
+        groups = self._group(namespace, [self.model_key(model) for model in models])
+        await asyncio.gather(
+            *(
+                store.store_many([models[i] for i in items], namespace)
+                for store, items in groups.values()
+            )
+        )
+
+    async def update_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Update several model instances, one transaction per shard."""
+        groups = self._group(namespace, [self.model_key(model) for model in models])
+        await asyncio.gather(
+            *(
+                store.update_many([models[i] for i in items], namespace)
+                for store, items in groups.values()
+            )
+        )
+
+    async def delete_many(
+        self,
+        model_cls: Type[BaseModel],
+        keys: Sequence[str],
+        namespace: str = "default",
+    ) -> None:
+        """Delete several model instances, one transaction per shard."""
+        groups = self._group(namespace, keys)
+        await asyncio.gather(
+            *(
+                store.delete_many(model_cls, [keys[i] for i in items], namespace)
+                for store, items in groups.values()
+            )
+        )
+
+    # Transactions
+
+    async def patch(
+        self,
+        model_cls: Type[BaseModel],
+        key: str,
+        values: Dict[str, Any],
+        namespace: str = "default",
+    ) -> None:
+        """Set fields of a model instance in its shard."""
+        await self.shard(namespace, key).patch(model_cls, key, values, namespace)
+
+    async def apply(self, transaction: Transaction) -> None:
+        """Apply a transaction, one transaction per shard.
+
+        The part of each database commits concurrently, so a VersionConflict
+        in one database does not undo the writes to the others.
+        """
+        parts: Dict[int, Tuple[SQLiteContextStore, Transaction]] = {}
+        for operation in transaction.operations:
+            keys = (
+                [self.model_key(model) for model in operation.models]
+                if operation.models
+                else list(operation.keys)
+            )
+            for store, items in self._group(operation.namespace, keys).values():
+                part = parts.setdefault(id(store), (store, Transaction()))[1]
+                part.operations.append(
+                    replace(
+                        operation,
+                        models=tuple(operation.models[i] for i in items),
+                    )
+                    if operation.models
+                    else replace(operation, keys=tuple(keys[i] for i in items))
+                )
+        await asyncio.gather(*(store.apply(part) for store, part in parts.values()))
+
+    # Fan-out reads
+
+    async def _merged(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str,
+        limit: int,
+        after: Optional[SortKey] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Tuple[SortKey, Any]]:
+        """Return the first ``limit`` results of every partition, merged."""
+        results = await asyncio.gather(
+            *(
+                store.query_sorted(model_cls, query, namespace, limit, after, fields)
+                for store in self.partitions(namespace)
+            )
+        )
+        merged = heapq.merge(*results, key=lambda item: item[0], reverse=True)
+        return [item for _, item in zip(range(limit), merged)]
+
+    async def list(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[T]:
+        """List model instances of a type across its partitions."""
+        return await self.query(model_cls, {}, namespace, limit, offset)
+
+    async def query(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[T]:
+        """Query model instances across the namespace's partitions.
+
+        Each partition returns its first ``offset + limit`` matches; pages
+        deep into a partitioned namespace are cheaper with query_page().
+        """
+        stores = self.partitions(namespace)
+        if len(stores) == 1:
+            return await stores[0].query(model_cls, query, namespace, limit, offset)
+        merged = await self._merged(model_cls, query, namespace, offset + limit)
+        return [model for _, model in merged[offset:]]
+
+    async def project(
+        self,
+        model_cls: Type[BaseModel],
+        fields: Sequence[str],
+        query: Optional[Dict[str, Any]] = None,
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[BaseModel]:
+        """Select some fields of model instances across partitions."""
+        stores = self.partitions(namespace)
+        if len(stores) == 1:
+            return await stores[0].project(
+                model_cls, fields, query, namespace, limit, offset
+            )
+        merged = await self._merged(
+            model_cls, query or {}, namespace, offset + limit, fields=fields
+        )
+        return [model for _, model in merged[offset:]]
+
+    async def list_page(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """List one page of model instances, newest first."""
+        return await self.query_page(model_cls, {}, namespace, limit, cursor)
+
+    async def query_page(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """Query one page of model instances, newest first.
+
+        Every partition seeks to the cursor, so deep pages cost the same as
+        the first, as with a single store.
+        """
+        stores = self.partitions(namespace)
+        if len(stores) == 1:
+            return await stores[0].query_page(
+                model_cls, query, namespace, limit, cursor
+            )
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        after = decode_keyset_cursor(cursor) if cursor is not None else None
+        merged = await self._merged(model_cls, query, namespace, limit + 1, after)
+        items = [model for _, model in merged[:limit]]
+        if len(merged) <= limit:
+            return Page(items)
+        return Page(items, encode_keyset_cursor(*merged[limit - 1][0]))
+
+    async def aiter_models(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[T]:
+        """Stream model instances, newest first, in merged keyset batches."""
+        stores = self.partitions(namespace)
+        if len(stores) == 1:
+            iterator = stores[0].aiter_models(model_cls, namespace, query, batch_size)
+        else:
+            iterator = super().aiter_models(model_cls, namespace, query, batch_size)
+        async for model in iterator:
+            yield model
+
+    async def aiter_raw(
+        self,
+        model_cls: Type[BaseModel],
+        namespace: str = "default",
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[str]:
+        """Stream the stored JSON documents, newest first."""
+        stores = self.partitions(namespace)
+        if len(stores) == 1:
+            iterator = stores[0].aiter_raw(model_cls, namespace, query, batch_size)
+        else:
+            iterator = super().aiter_raw(model_cls, namespace, query, batch_size)
+        async for data in iterator:
+            yield data
+
+    async def search_messages(
+        self, query: str, limit: int = 20, namespace: Optional[str] = None
+    ) -> List[SearchHit]:
+        """Search the full-text index of every database, merged by rank."""
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        if namespace is not None and namespace not in self.search_namespaces:
+            raise ValueError(f"Namespace is not searchable: {namespace}")
+        namespaces = self.search_namespaces if namespace is None else (namespace,)
+        results = await asyncio.gather(
+            *(
+                store.search_messages(query, limit, name)
+                for name in namespaces
+                for store in self.partitions(name)
+            )
+        )
+        hits = [hit for result in results for hit in result]
+        hits.sort(key=lambda hit: hit.rank)
+        return hits[:limit]
+
+    # Metrics
+
+    async def record_metric(self, metric: MetricRecord) -> None:
+        """Record a performance metric in the metrics database."""
+        await self.metrics_store.record_metric(metric)
+
+    async def record_metrics(self, metrics: Sequence[MetricRecord]) -> None:
+        """Record several metrics in the metrics database."""
+        await self.metrics_store.record_metrics(metrics)
+
+    async def get_metrics_for_task(self, task_id: str) -> List[MetricRecord]:
+        """Get the metrics recorded for a task, oldest first."""
+        return await self.metrics_store.get_metrics_for_task(task_id)
+
+    async def aggregate_metrics(self, *args: Any, **kwargs: Any) -> Any:
+        """Aggregate metrics from the metrics database's rollups."""
+        return await self.metrics_store.aggregate_metrics(*args, **kwargs)
@@ -0,0 +1,236 @@
+"""Online backups of the SQLite context store.
+
+A backup copies the database a few pages at a time with SQLite's backup API,
+on a worker thread and through a connection of its own, so neither the event
+loop nor the store's writer thread waits for the copy. In WAL mode the copy
+runs inside one read transaction: writers carry on appending to the WAL and
+the backup sees a single consistent snapshot instead of restarting whenever
+a page it already copied changes. Each step holds the source's shared lock
+only for the pages it copies, and the pause between steps leaves the disk to
+foreground work.
+
+Backups are written under a temporary name and renamed once complete,
+optionally gzip-compressed, and old ones are pruned by count and by age.
+"""
+
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Backup settings. Values can be overridden through ContextStoreConfig.backup.
+DEFAULT_BACKUP_PARAMS: Dict[str, Any] = {
+    "pages_per_step": 256,
+    "step_delay_ms": 5.0,
+    "compress": False,
+    "keep": None,  # Newest backups to keep; None keeps them all
+    "max_age_days": None,  # Delete older backups; None keeps them all
+}
+
+BACKUP_PREFIX = "context_"
+_TIMESTAMP_FORMAT = "%Y%m%d%H%M%S%f"
+_BACKUP_NAME = re.compile(rf"^{BACKUP_PREFIX}(\d{{20}})\.db(\.gz)?$")
+
+
+def resolve_backup_params(params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge user supplied backup settings over the defaults.
+
+    Args:
+        params: Overrides for DEFAULT_BACKUP_PARAMS
+
+    Returns:
+        The validated settings
+
+    Raises:
+        ValueError: If a key is unknown or a value is out of range
+    """
+    resolved = dict(DEFAULT_BACKUP_PARAMS)
+    for key, value in (params or {}).items():
+        if key not in DEFAULT_BACKUP_PARAMS:
+            raise ValueError(f"Unsupported backup parameter: {key}")
+        resolved[key] = value
+
+    try:
+        resolved["pages_per_step"] = int(resolved["pages_per_step"])
+        resolved["step_delay_ms"] = float(resolved["step_delay_ms"])
+        resolved["compress"] = bool(resolved["compress"])
+        if resolved["keep"] is not None:
+            resolved["keep"] = int(resolved["keep"])
+        if resolved["max_age_days"] is not None:
+            resolved["max_age_days"] = float(resolved["max_age_days"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid backup parameters: {resolved!r}")
+
+    if resolved["pages_per_step"] < 1:
+        raise ValueError("pages_per_step must be at least 1")
+    if resolved["step_delay_ms"] < 0:
+        raise ValueError("step_delay_ms must be non-negative")
+    if resolved["keep"] is not None and resolved["keep"] < 1:
+        raise ValueError("keep must be at least 1")
+    if resolved["max_age_days"] is not None and resolved["max_age_days"] <= 0:
+        raise ValueError("max_age_days must be positive")
+
+    return resolved
+
+
+@dataclass
+class BackupResult:
+    """Outcome and timings of one backup."""
+
+    path: str
+    pages: int = 0
+    steps: int = 0
+    size_bytes: int = 0
+    duration_ms: float = 0.0
+    # Time spent inside backup steps, i.e. holding the source's shared lock
+    lock_ms: float = 0.0
+    max_step_ms: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the result as a plain dictionary."""
+        return {
+            "path": self.path,
+            "pages": self.pages,
+            "steps": self.steps,
+            "size_bytes": self.size_bytes,
+            "duration_ms": self.duration_ms,
+            "lock_ms": self.lock_ms,
+            "max_step_ms": self.max_step_ms,
+        }
+
+
+def backup_path(backup_dir: str, when: datetime, compress: bool) -> str:
+    """Return the file name of a backup taken at ``when`` (UTC)."""
+    suffix = ".db.gz" if compress else ".db"
+    return os.path.join(
+        backup_dir, f"{BACKUP_PREFIX}{when.strftime(_TIMESTAMP_FORMAT)}{suffix}"
+    )
+
+
+def run_backup(
+    db_path: str,
+    dest_path: str,
+    pages_per_step: int,
+    step_delay_ms: float,
+    compress: bool,
+) -> BackupResult:
+    """Copy the database to ``dest_path`` in steps. Blocks; run it on a thread.
+
+    Args:
+        db_path: Database to back up
+        dest_path: Backup file; gzip-compressed if ``compress``
+        pages_per_step: Pages copied per backup step
+        step_delay_ms: Pause between steps
+        compress: Whether to gzip the copy
+
+    Returns:
+        Sizes and timings of the backup
+    """
+    result = BackupResult(dest_path)
+    partial = f"{dest_path}.partial"
+    started = time.perf_counter()
+    step_started = started
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal step_started
+        step_ms = (time.perf_counter() - step_started) * 1000
+        result.steps += 1
+        result.pages = total
+        result.lock_ms += step_ms
+        result.max_step_ms = max(result.max_step_ms, step_ms)
+        if remaining and step_delay_ms:
+            time.sleep(step_delay_ms / 1000)
+        step_started = time.perf_counter()
+
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    source = sqlite3.connect(uri, uri=True, isolation_level=None)
+    try:
+        dest = sqlite3.connect(partial)
+        try:
+            mode = source.execute("PRAGMA journal_mode").fetchone()[0]
+            if mode == "wal":
+                # Pin one snapshot for the whole copy
+                source.execute("BEGIN")
+                source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            source.backup(dest, pages=pages_per_step, progress=progress)
+            if source.in_transaction:
+                source.execute("COMMIT")
+        finally:
+            dest.close()
+    except BaseException:
+        _remove(partial)
+        raise
+    finally:
+        source.close()
+
+    try:
+        if compress:
+            with open(partial, "rb") as src, gzip.open(f"{dest_path}.tmp", "wb") as gz:
+                shutil.copyfileobj(src, gz, 1024 * 1024)
+            os.replace(f"{dest_path}.tmp", dest_path)
+        else:
+            os.replace(partial, dest_path)
+    finally:
+        _remove(partial)
+        _remove(f"{dest_path}.tmp")
+
+    result.size_bytes = os.path.getsize(dest_path)
+    result.duration_ms = (time.perf_counter() - started) * 1000
+    return result
+
+
+def prune_backups(
+    backup_dir: str,
+    keep: Optional[int] = None,
+    max_age_days: Optional[float] = None,
+    now: Optional[datetime] = None,
+) -> List[str]:
+    """Delete old backups, leaving other files in the directory alone.
+
+    Args:
+        backup_dir: Directory holding the backups
+        keep: Number of newest backups to keep
+        max_age_days: Delete backups older than this
+        now: Current UTC time, for tests
+
+    Returns:
+        The deleted paths
+    """
+    if keep is None and max_age_days is None:
+        return []
+
+    backups = []
+    for name in os.listdir(backup_dir):
+        match = _BACKUP_NAME.match(name)
+        if match:
+            taken = datetime.strptime(match.group(1), _TIMESTAMP_FORMAT)
+            backups.append((taken, os.path.join(backup_dir, name)))
+    backups.sort(reverse=True)
+
+    expired = backups[keep:] if keep is not None else []
+    if max_age_days is not None:
+        cutoff = (now or datetime.utcnow()) - timedelta(days=max_age_days)
+        expired += [
+            backup
+            for backup in backups[: len(backups) - len(expired)]
+            if backup[0] < cutoff
+        ]
+
+    deleted = []
+    for _, path in expired:
+        _remove(path)
+        deleted.append(path)
+    return deleted
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
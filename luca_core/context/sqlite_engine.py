@@ -0,0 +1,504 @@
+"""SQLite connection engine for the context store.
+
+This module manages the connections used by SQLiteContextStore: a single
+writer connection plus a pool of read-only reader connections, all sharing a
+WAL-mode database so that readers never wait on the writer or on each other.
+
+No database work runs on the event loop thread. Writes are queued to a
+dedicated writer thread and reads are dispatched to reader threads; awaiting
+either only costs the loop an enqueue and a future callback.
+"""
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from luca_core.context.codecs import register_sql_functions
+
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+# Pragma profile applied to every connection. Values can be overridden through
+# ContextStoreConfig.connection_params.
+DEFAULT_CONNECTION_PARAMS: Dict[str, Any] = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "cache_size": -16000,  # Negative values are KiB, so 16 MiB per connection
+    "mmap_size": 134217728,  # 128 MiB
+    "busy_timeout": 5000,  # Milliseconds
+    "read_pool_size": 4,
+    # Only takes effect when the database is created; lets retention give
+    # freed pages back to the file system (see luca_core.context.retention)
+    "auto_vacuum": "incremental",
+}
+
+# Group commit thresholds: a batch is committed once it holds max_batch
+# requests or its first request has waited max_delay_ms, whichever is first.
+DEFAULT_GROUP_COMMIT: Dict[str, Any] = {
+    "max_batch": 256,
+    "max_delay_ms": 5.0,
+}
+
+_JOURNAL_MODES = {"wal", "delete", "truncate", "persist", "memory"}
+_SYNCHRONOUS_MODES = {"off", "normal", "full", "extra"}
+_AUTO_VACUUM_MODES = {"none", "full", "incremental"}
+
+
+def resolve_connection_params(
+    connection_params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Merge user supplied connection parameters over the defaults.
+
+    Pragma values cannot be bound as SQL parameters, so every value is
+    validated here before it is interpolated into a PRAGMA statement.
+
+    Args:
+        connection_params: Overrides for DEFAULT_CONNECTION_PARAMS
+
+    Returns:
+        The validated parameter dictionary
+
+    Raises:
+        ValueError: If a key is unknown or a value is out of range
+    """
+    params = dict(DEFAULT_CONNECTION_PARAMS)
+    for key, value in (connection_params or {}).items():
+        if key not in DEFAULT_CONNECTION_PARAMS:
+            raise ValueError(f"Unsupported SQLite connection parameter: {key}")
+        params[key] = value
+
+    journal_mode = str(params["journal_mode"]).lower()
+    if journal_mode not in _JOURNAL_MODES:
+        raise ValueError(f"Invalid journal_mode: {params['journal_mode']}")
+    params["journal_mode"] = journal_mode
+
+    synchronous = str(params["synchronous"]).lower()
+    if synchronous not in _SYNCHRONOUS_MODES:
+        raise ValueError(f"Invalid synchronous mode: {params['synchronous']}")
+    params["synchronous"] = synchronous
+
+    auto_vacuum = str(params["auto_vacuum"]).lower()
+    if auto_vacuum not in _AUTO_VACUUM_MODES:
+        raise ValueError(f"Invalid auto_vacuum mode: {params['auto_vacuum']}")
+    params["auto_vacuum"] = auto_vacuum
+
+    for key in ("cache_size", "mmap_size", "busy_timeout", "read_pool_size"):
+        try:
+            params[key] = int(params[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for {key}: {params[key]!r}")
+
+    if params["mmap_size"] < 0 or params["busy_timeout"] < 0:
+        raise ValueError("mmap_size and busy_timeout must be non-negative")
+    if params["read_pool_size"] < 1:
+        raise ValueError("read_pool_size must be at least 1")
+
+    return params
+
+
+def resolve_group_commit(group_commit: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge user supplied group commit thresholds over the defaults.
+
+    Args:
+        group_commit: Overrides for DEFAULT_GROUP_COMMIT
+
+    Returns:
+        The validated thresholds
+
+    Raises:
+        ValueError: If a key is unknown or a value is out of range
+    """
+    params = dict(DEFAULT_GROUP_COMMIT)
+    for key, value in (group_commit or {}).items():
+        if key not in DEFAULT_GROUP_COMMIT:
+            raise ValueError(f"Unsupported group commit parameter: {key}")
+        params[key] = value
+
+    try:
+        params["max_batch"] = int(params["max_batch"])
+        params["max_delay_ms"] = float(params["max_delay_ms"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid group commit parameters: {params!r}")
+
+    if params["max_batch"] < 1:
+        raise ValueError("max_batch must be at least 1")
+    if params["max_delay_ms"] < 0:
+        raise ValueError("max_delay_ms must be non-negative")
+
+    return params
+
+
+@dataclass
+class OperationStats:
+    """Queueing and execution timings for one kind of engine operation.
+
+    Reader threads record concurrently, so every access takes the lock.
+    """
+
+    count: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    total_run_ms: float = 0.0
+    max_run_ms: float = 0.0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record(self, wait_ms: float, run_ms: float) -> None:
+        """Record the timings of one completed operation."""
+        with self._lock:
+            self.count += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.total_run_ms += run_ms
+            self.max_run_ms = max(self.max_run_ms, run_ms)
+
+    def totals(self) -> Tuple[int, float]:
+        """Return the operations recorded and their total time in ms."""
+        with self._lock:
+            return self.count, self.total_wait_ms + self.total_run_ms
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the timings, including means, as a plain dictionary."""
+        with self._lock:
+            count = self.count or 1
+            return {
+                "count": self.count,
+                "mean_wait_ms": self.total_wait_ms / count,
+                "max_wait_ms": self.max_wait_ms,
+                "mean_run_ms": self.total_run_ms / count,
+                "max_run_ms": self.max_run_ms,
+            }
+
+
+@dataclass
+class _WriteRequest:
+    """A unit of work queued for the writer thread."""
+
+    fn: Callable[[sqlite3.Connection], Any]
+    future: "Future[Any]"
+    group: bool = False
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class SQLiteEngine:
+    """Single-writer, pooled-reader connection manager for one database file.
+
+    The writer connection is owned by a dedicated thread that drains a request
+    queue; every request runs in its own transaction, committed when the
+    request returns and rolled back if it raises. Reads are executed on a
+    thread pool, each worker checking out one of the read-only connections, so
+    a slow scan never holds up other readers or the writer.
+
+    With group commit enabled, requests submitted with ``group=True`` are
+    coalesced: the writer keeps taking grouped requests off the queue until
+    the size or time threshold is hit, runs each one under its own savepoint
+    and commits them all at once. A request that raises only rolls back its
+    own savepoint. Any other request ends the current batch and runs alone.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        connection_params: Optional[Dict[str, Any]] = None,
+        group_commit: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize the engine.
+
+        Args:
+            db_path: Path to the SQLite database file
+            connection_params: Pragma overrides, see DEFAULT_CONNECTION_PARAMS
+            group_commit: Group commit thresholds, see DEFAULT_GROUP_COMMIT;
+                grouped requests are committed one by one when omitted
+        """
+        self.db_path = db_path
+        self.params = resolve_connection_params(connection_params)
+        self.group_commit = (
+            resolve_group_commit(group_commit) if group_commit is not None else None
+        )
+        self.writer: Optional[sqlite3.Connection] = None
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._reader_conns: List[sqlite3.Connection] = []
+        self._read_executor: Optional[ThreadPoolExecutor] = None
+        self._write_queue: "queue.Queue[Optional[_WriteRequest]]" = queue.Queue()
+        self._writer_thread: Optional[threading.Thread] = None
+        self.write_stats = OperationStats()
+        self.read_stats = OperationStats()
+        self.commits = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the engine currently holds open connections."""
+        return self.writer is not None
+
+    def _apply_pragmas(self, conn: sqlite3.Connection) -> None:
+        """Apply the per-connection pragma profile and SQL functions."""
+        conn.execute(f"PRAGMA synchronous = {self.params['synchronous']}")
+        conn.execute(f"PRAGMA cache_size = {self.params['cache_size']}")
+        conn.execute(f"PRAGMA mmap_size = {self.params['mmap_size']}")
+        conn.execute(f"PRAGMA busy_timeout = {self.params['busy_timeout']}")
+        register_sql_functions(conn)
+
+    def _connect_reader(self) -> sqlite3.Connection:
+        """Open a read-only connection to the database file."""
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        self._apply_pragmas(conn)
+        return conn
+
+    def open(self) -> None:
+        """Open the writer connection and the reader pool.
+
+        The writer is opened first so that the database file and, in WAL mode,
+        the shared-memory index exist before the read-only connections attach.
+        """
+        if self.is_open:
+            return
+
+        writer = sqlite3.connect(self.db_path, check_same_thread=False)
+        writer.row_factory = sqlite3.Row
+        # Must precede the journal mode, which creates the file's header
+        writer.execute(f"PRAGMA auto_vacuum = {self.params['auto_vacuum']}")
+        mode = writer.execute(
+            f"PRAGMA journal_mode = {self.params['journal_mode']}"
+        ).fetchone()[0]
+        if mode != self.params["journal_mode"]:
+            logger.warning(
+                f"Requested journal_mode {self.params['journal_mode']} "
+                f"but database is using {mode}"
+            )
+        self._apply_pragmas(writer)
+        self.writer = writer
+
+        pool_size = self.params["read_pool_size"]
+        for _ in range(pool_size):
+            conn = self._connect_reader()
+            self._reader_conns.append(conn)
+            self._readers.put(conn)
+
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="luca-sqlite-reader"
+        )
+
+        # Daemon thread so that a store which is never closed cannot keep the
+        # interpreter alive; SQLite's journal keeps the file consistent.
+        self._writer_thread = threading.Thread(
+            target=self._writer_loop, name="luca-sqlite-writer", daemon=True
+        )
+        self._writer_thread.start()
+
+    def close(self) -> None:
+        """Drain pending writes, then close every connection and thread."""
+        if self._writer_thread is not None:
+            self._write_queue.put(None)
+            self._writer_thread.join()
+            self._writer_thread = None
+
+        if self._read_executor is not None:
+            self._read_executor.shutdown(wait=True)
+            self._read_executor = None
+
+        for conn in self._reader_conns:
+            conn.close()
+        self._reader_conns = []
+        self._readers = queue.Queue()
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Check out a reader connection for the duration of the block."""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            # Never hand a connection back with an open read transaction, or it
+            # would pin an old WAL snapshot and block checkpoints.
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def _writer_loop(self) -> None:
+        """Execute queued write requests until the shutdown sentinel arrives."""
+        assert self.writer is not None
+        conn = self.writer
+        # Requests taken off the queue while collecting a batch that could not
+        # join it
+        backlog: Deque[Optional[_WriteRequest]] = deque()
+        while True:
+            request = backlog.popleft() if backlog else self._write_queue.get()
+            if request is None:
+                break
+            if request.group and self.group_commit is not None:
+                self._run_batch(conn, self._collect_batch(request, backlog))
+            else:
+                self._run_single(conn, request)
+
+    def _collect_batch(
+        self, first: _WriteRequest, backlog: Deque[Optional[_WriteRequest]]
+    ) -> List[_WriteRequest]:
+        """Gather grouped requests until a group commit threshold is hit."""
+        assert self.group_commit is not None
+        batch = [first]
+        deadline = time.perf_counter() + self.group_commit["max_delay_ms"] / 1000
+        while len(batch) < self.group_commit["max_batch"]:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._write_queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None or not request.group:
+                backlog.append(request)
+                break
+            batch.append(request)
+        return batch
+
+    def _run_single(self, conn: sqlite3.Connection, request: _WriteRequest) -> None:
+        """Run one request in its own transaction."""
+        if not request.future.set_running_or_notify_cancel():
+            return
+
+        started = time.perf_counter()
+        result: Any = None
+        error: Optional[BaseException] = None
+        try:
+            result = request.fn(conn)
+            if conn.in_transaction:
+                conn.commit()
+                self.commits += 1
+        except BaseException as e:
+            if conn.in_transaction:
+                conn.rollback()
+            error = e
+        self._resolve([(request, result, error)], started)
+
+    def _run_batch(self, conn: sqlite3.Connection, batch: List[_WriteRequest]) -> None:
+        """Run a batch of grouped requests and commit them together."""
+        started = time.perf_counter()
+        outcomes: List[Tuple[_WriteRequest, Any, Optional[BaseException]]] = []
+        try:
+            conn.execute("BEGIN")
+            for request in batch:
+                if not request.future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT luca_write")
+                try:
+                    result = request.fn(conn)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO luca_write")
+                    conn.execute("RELEASE luca_write")
+                    outcomes.append((request, None, e))
+                else:
+                    conn.execute("RELEASE luca_write")
+                    outcomes.append((request, result, None))
+            conn.commit()
+            self.commits += 1
+        except BaseException as e:
+            # The commit itself failed; nothing in the batch was persisted
+            if conn.in_transaction:
+                conn.rollback()
+            outcomes = [(request, None, e) for request, _, _ in outcomes]
+        self._resolve(outcomes, started)
+
+    def _resolve(
+        self,
+        outcomes: List[Tuple[_WriteRequest, Any, Optional[BaseException]]],
+        started: float,
+    ) -> None:
+        """Record stats for finished requests, then resolve their futures."""
+        finished = time.perf_counter()
+        # Record before resolving so callers see their own write counted
+        for request, _, _ in outcomes:
+            self.write_stats.record(
+                (started - request.enqueued_at) * 1000, (finished - started) * 1000
+            )
+        for request, result, error in outcomes:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result)
+
+    def submit_write(
+        self, fn: Callable[[sqlite3.Connection], R], group: bool = False
+    ) -> "Future[R]":
+        """Queue ``fn`` for the writer thread without waiting for it.
+
+        Args:
+            fn: Callable that receives the writer connection
+            group: Allow ``fn`` to share a group commit with other grouped
+                requests; such callables must not commit or roll back
+
+        Returns:
+            A concurrent future resolved with the result of ``fn`` once it has
+            been committed
+        """
+        assert self._writer_thread is not None, "Database not initialized"
+        future: "Future[R]" = Future()
+        self._write_queue.put(_WriteRequest(fn, future, group))
+        return future
+
+    async def run_write(
+        self, fn: Callable[[sqlite3.Connection], R], group: bool = False
+    ) -> R:
+        """Run ``fn`` in its own transaction on the writer thread.
+
+        Args:
+            fn: Callable that receives the writer connection
+            group: Allow ``fn`` to share a group commit, see submit_write()
+
+        Returns:
+            Whatever ``fn`` returns
+        """
+        return await asyncio.wrap_future(self.submit_write(fn, group))
+
+    def _call_with_reader(
+        self, fn: Callable[[sqlite3.Connection], R], enqueued_at: float
+    ) -> R:
+        started = time.perf_counter()
+        try:
+            with self.reader() as conn:
+                return fn(conn)
+        finally:
+            self.read_stats.record(
+                (started - enqueued_at) * 1000,
+                (time.perf_counter() - started) * 1000,
+            )
+
+    async def run_read(self, fn: Callable[[sqlite3.Connection], R]) -> R:
+        """Run ``fn`` with a pooled reader connection on a reader thread.
+
+        Args:
+            fn: Callable that receives a read-only connection
+
+        Returns:
+            Whatever ``fn`` returns
+        """
+        assert self._read_executor is not None, "Database not initialized"
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._read_executor, self._call_with_reader, fn, time.perf_counter()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queueing and execution statistics for reads and writes."""
+        return {
+            "pending_writes": self._write_queue.qsize(),
+            "commits": self.commits,
+            "writes": self.write_stats.as_dict(),
+            "reads": self.read_stats.as_dict(),
+        }
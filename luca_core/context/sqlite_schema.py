@@ -0,0 +1,215 @@
+"""Table layout of the SQLite context store and migration from the old layout.
+
+Every model is one row of the ``models`` table. Timestamps are integer
+microseconds since the Unix epoch, so they sort and compare as numbers, and
+``idx_models_recent`` on ``(namespace, model_type, updated_at, key)`` lets
+``list()`` walk a model type newest first straight off the index. ``codec``
+names the encoding of ``data`` (see luca_core.context.codecs). ``version``
+counts the writes of a row, for compare-and-swap updates (see
+luca_core.context.versions).
+
+Databases created by earlier versions keep each model in two tables,
+``metadata`` (ISO-8601 timestamps) and ``data`` (the JSON document). Their
+rows are moved to ``models`` in small batches, each in its own transaction,
+while the store is in use. Until the move is complete every row lives in
+exactly one of the layouts: reads consult both, writes to a key that is
+still in the old layout move or remove it first.
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import List, Sequence, Tuple
+
+MODELS_TABLE = "models"
+LEGACY_TABLES = ("data", "metadata")
+
+# (namespace, model_type, key)
+RowKey = Tuple[str, str, str]
+
+# ISO-8601 text to microseconds in SQL; julianday() is a double, which is
+# accurate to tens of microseconds here. Only used to order legacy rows
+# while they are being migrated.
+_LEGACY_TIMESTAMP = "CAST(ROUND((julianday({}) - 2440587.5) * 86400000000) AS INTEGER)"
+
+# Both layouts as one relation, for reads during a migration
+UNION_SOURCE = f"""(
+    SELECT namespace, model_type, key, updated_at, codec, data FROM {MODELS_TABLE}
+    UNION ALL
+    SELECT d.namespace, d.model_type, d.key,
+        COALESCE({_LEGACY_TIMESTAMP.format("m.updated_at")}, 0), 'json', d.data
+    FROM data d LEFT JOIN metadata m ON
+        d.namespace = m.namespace AND
+        d.model_type = m.model_type AND
+        d.key = m.key
+)"""
+
+_SELECT_LEGACY = """
+    SELECT d.namespace, d.model_type, d.key, m.created_at, m.updated_at, d.data
+    FROM data d LEFT JOIN metadata m ON
+        d.namespace = m.namespace AND
+        d.model_type = m.model_type AND
+        d.key = m.key
+"""
+
+
+def now_timestamp() -> int:
+    """Return the current time in microseconds since the Unix epoch."""
+    return time.time_ns() // 1000
+
+
+def to_timestamp(value: datetime) -> int:
+    """Convert a datetime (naive values are UTC) to epoch microseconds."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _legacy_timestamp(value: object) -> int:
+    """Convert a timestamp from the legacy metadata table."""
+    if not isinstance(value, str):
+        return now_timestamp()
+    try:
+        return to_timestamp(datetime.fromisoformat(value))
+    except ValueError:
+        return now_timestamp()
+
+
+def create_schema(conn: sqlite3.Connection) -> bool:
+    """Create the models table and its indexes.
+
+    Legacy tables that are already empty are dropped.
+
+    Args:
+        conn: Writer connection
+
+    Returns:
+        Whether legacy rows remain to be migrated
+    """
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MODELS_TABLE} (
+            namespace TEXT NOT NULL,
+            model_type TEXT NOT NULL,
+            key TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            codec TEXT NOT NULL DEFAULT 'json',
+            version INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (namespace, model_type, key)
+        )
+        """
+    )
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({MODELS_TABLE})")}
+    if "codec" not in columns:
+        # Tables created before codecs hold JSON only
+        conn.execute(
+            f"ALTER TABLE {MODELS_TABLE} "
+            "ADD COLUMN codec TEXT NOT NULL DEFAULT 'json'"
+        )
+    if "version" not in columns:
+        # Rows written before versioning start at version 1
+        conn.execute(
+            f"ALTER TABLE {MODELS_TABLE} "
+            "ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+        )
+    conn.execute(
+        f"""
+        CREATE INDEX IF NOT EXISTS idx_models_recent
+        ON {MODELS_TABLE} (namespace, model_type, updated_at, key)
+        """
+    )
+
+    if not has_legacy_tables(conn):
+        return False
+    if conn.execute("SELECT 1 FROM data LIMIT 1").fetchone():
+        return True
+    drop_legacy_tables(conn)
+    return False
+
+
+def has_legacy_tables(conn: sqlite3.Connection) -> bool:
+    """Return whether the database still has the two-table layout."""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+        LEGACY_TABLES,
+    ).fetchall()
+    return len(rows) == len(LEGACY_TABLES)
+
+
+def drop_legacy_tables(conn: sqlite3.Connection) -> None:
+    """Drop the legacy tables, along with their indexes."""
+    for table in LEGACY_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def _move(conn: sqlite3.Connection, rows: Sequence[sqlite3.Row]) -> None:
+    """Copy legacy rows into the models table, then delete them."""
+    conn.executemany(
+        f"""
+        INSERT OR IGNORE INTO {MODELS_TABLE}
+        (namespace, model_type, key, created_at, updated_at, data)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                row[0],
+                row[1],
+                row[2],
+                _legacy_timestamp(row[3]),
+                _legacy_timestamp(row[4]),
+                row[5],
+            )
+            for row in rows
+        ],
+    )
+    delete_legacy(conn, [(row[0], row[1], row[2]) for row in rows])
+
+
+def migrate_batch(conn: sqlite3.Connection, batch_size: int) -> int:
+    """Move up to ``batch_size`` rows from the legacy tables.
+
+    Rows already present in the models table were written after the
+    migration started and are kept. Once ``data`` is empty, leftover
+    ``metadata`` rows (which never had a document) are removed; the empty
+    tables are dropped the next time the schema is created.
+
+    Args:
+        conn: Writer connection
+        batch_size: Maximum number of rows to move
+
+    Returns:
+        The number of rows moved; 0 once the migration is complete
+    """
+    rows = conn.execute(f"{_SELECT_LEGACY} LIMIT ?", (batch_size,)).fetchall()
+    if not rows:
+        conn.execute("DELETE FROM metadata")
+        return 0
+    _move(conn, rows)
+    return len(rows)
+
+
+def promote_legacy(conn: sqlite3.Connection, keys: Sequence[RowKey]) -> None:
+    """Move specific rows to the models table ahead of the migration."""
+    rows: List[sqlite3.Row] = []
+    for key in keys:
+        rows.extend(
+            conn.execute(
+                f"{_SELECT_LEGACY} "
+                "WHERE d.namespace = ? AND d.model_type = ? AND d.key = ?",
+                key,
+            ).fetchall()
+        )
+    if rows:
+        _move(conn, rows)
+
+
+def delete_legacy(conn: sqlite3.Connection, keys: Sequence[RowKey]) -> None:
+    """Delete specific rows from the legacy tables."""
+    for table in LEGACY_TABLES:
+        conn.executemany(
+            f"DELETE FROM {table} WHERE namespace = ? AND model_type = ? AND key = ?",
+            keys,
+        )
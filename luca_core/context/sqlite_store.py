@@ -9,13 +9,125 @@ import json
 import logging
 import os
 import sqlite3
-from datetime import datetime
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Type, TypeVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 from pydantic import BaseModel
 
 from luca_core.context.base_store import BaseContextStore
+from luca_core.context.changes import (
+    DELETE,
+    STORE,
+    UPDATE,
+    ChangeEvent,
+    changes_after,
+    create_changes_schema,
+    log_changes,
+    resolve_change_log_params,
+)
+from luca_core.context.codecs import (
+    DOCUMENT_SQL,
+    JSON,
+    JSON_CODEC,
+    Payload,
+    PayloadCodec,
+    decode_model,
+    resolve_codecs,
+    to_json,
+)
+from luca_core.context.indexes import (
+    field_columns,
+    resolve_indexed_fields,
+    sync_indexes,
+)
+from luca_core.context.metrics import (
+    DEFAULT_PERCENTILES,
+    aggregate_metrics,
+)
+from luca_core.context.metrics import backfill_batch as backfill_metrics_batch
+from luca_core.context.metrics import (
+    backfill_position,
+    create_metrics_schema,
+    has_document_metrics,
+    insert_metrics,
+    metric_columns,
+    record_row,
+    select_metrics,
+    start_backfill,
+    to_arrays,
+    to_epoch,
+)
+from luca_core.context.pagination import (
+    Page,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+)
+from luca_core.context.projection import (
+    projection_model,
+    projection_sql,
+    resolve_fields,
+)
+from luca_core.context.query import compile_filter, json_path, parse_lookup
+from luca_core.context.retention import (
+    RetentionResult,
+    expire_batch,
+    expire_metrics_batch,
+    incremental_vacuum,
+    model_types,
+    page_counts,
+    resolve_retention_params,
+)
+from luca_core.context.search import (
+    DEFAULT_SEARCH_NAMESPACES,
+    MAX_RANKED_MATCHES,
+    SearchHit,
+    backfill_batch,
+    create_search_schema,
+    index_documents,
+    search,
+    search_text,
+    unindex_documents,
+)
+from luca_core.context.sqlite_backup import (
+    BackupResult,
+    backup_path,
+    prune_backups,
+    resolve_backup_params,
+    run_backup,
+)
+from luca_core.context.sqlite_engine import SQLiteEngine
+from luca_core.context.sqlite_schema import (
+    MODELS_TABLE,
+    UNION_SOURCE,
+    RowKey,
+    create_schema,
+    delete_legacy,
+    migrate_batch,
+    now_timestamp,
+    promote_legacy,
+    to_timestamp,
+)
+from luca_core.context.transactions import Transaction, validate_patch
+from luca_core.context.versions import VersionConflict, Versioned
+from luca_core.schemas import MetricRecord
 from luca_core.schemas.error import ErrorPayload, create_system_error
 
 T = TypeVar("T", bound=BaseModel)
@@ -23,21 +135,163 @@ T = TypeVar("T", bound=BaseModel)
 logger = logging.getLogger(__name__)
 
 
+# A write prepared on the event loop: the function running it on the writer
+# thread, which returns its change events, and the ``pending`` rows of
+# _write()
+_PreparedWrite = Tuple[
+    Callable[[sqlite3.Connection], List[ChangeEvent]],
+    List[Tuple[RowKey, str, Optional[Payload], bool]],
+]
+
+
+@dataclass
+class _PendingWrite:
+    """A write-behind write to one row that is not committed yet.
+
+    ``exact`` means ``codec`` and ``data`` are what the row will hold once
+    the write commits (``data`` is ``None`` for a delete). Updates of rows
+    that are not pending themselves are inexact, since the update is ignored
+    if the row does not exist.
+    """
+
+    codec: str
+    data: Optional[Payload]
+    future: "Future[Any]"
+    exact: bool = True
+
+
 class SQLiteContextStore(BaseContextStore):
-    """SQLite implementation of ContextStore."""
+    """SQLite implementation of ContextStore.
+
+    The database runs in WAL mode with one writer connection and a pool of
+    read-only connections. All database work happens off the event loop:
+    writes are queued to the engine's writer thread, which serializes them,
+    and reads run concurrently on reader threads.
+
+    In write-behind mode, writes return as soon as they are queued and the
+    writer coalesces them into group commits. ``fetch()`` answers from the
+    pending writes, so a caller always reads its own writes; ``list()`` and
+    ``query()`` wait for pending writes first. ``flush()`` waits until every
+    write issued so far is durable and raises if any of them failed.
+
+    Databases in the older two-table layout are migrated in the background
+    after initialize(); see luca_core.context.sqlite_schema.
+
+    The text of models in the searchable namespaces is kept in a full-text
+    index updated in the same transactions; see luca_core.context.search.
+
+    Metrics are stored in typed tables with time rollups rather than as
+    documents; see luca_core.context.metrics.
 
-    def __init__(self, db_path: str = "data/context.db", backup_interval: int = 300):
+    With ``retention`` set, a background sweep deletes rows older than
+    their namespace's TTL and gives the freed pages back to the file
+    system; see luca_core.context.retention.
+
+    Committed writes are published to subscribe()rs. With ``change_log``
+    set, they are also recorded in a change log that other processes tail
+    with changes_since() and tail_changes(); see
+    luca_core.context.changes.
+    """
+
+    # Rows moved from the legacy layout per writer transaction
+    MIGRATION_BATCH_SIZE = 1000
+    # Rows added to the full-text index per writer transaction
+    SEARCH_BACKFILL_BATCH_SIZE = 1000
+    # Document metrics copied to the typed metrics table per transaction
+    METRICS_BACKFILL_BATCH_SIZE = 1000
+    # Matches ranked for queries made only of common words; see
+    # luca_core.context.search.search()
+    SEARCH_MAX_RANKED = MAX_RANKED_MATCHES
+
+    def __init__(
+        self,
+        db_path: str = "data/context.db",
+        backup_interval: int = 300,
+        connection_params: Optional[Dict[str, Any]] = None,
+        indexed_fields: Optional[Dict[str, Sequence[str]]] = None,
+        write_behind: Optional[Dict[str, Any]] = None,
+        backup: Optional[Dict[str, Any]] = None,
+        codecs: Optional[Dict[str, Any]] = None,
+        search_namespaces: Optional[Sequence[str]] = None,
+        retention: Optional[Dict[str, Any]] = None,
+        change_log: Optional[Dict[str, Any]] = None,
+    ):
         """Initialize the SQLite context store.
 
         Args:
             db_path: Path to the SQLite database file
             backup_interval: Interval in seconds for automatic backups
+            connection_params: SQLite pragma profile overrides (synchronous,
+                cache_size, mmap_size, busy_timeout, journal_mode,
+                read_pool_size)
+            indexed_fields: Secondary index declarations by model class name,
+                merged over luca_core.context.indexes.DEFAULT_INDEXED_FIELDS
+            write_behind: Enables write-behind mode with these group commit
+                thresholds (max_batch, max_delay_ms); an empty dict uses the
+                defaults
+            backup: Backup settings (pages_per_step, step_delay_ms,
+                compress, keep, max_age_days), merged over
+                luca_core.context.sqlite_backup.DEFAULT_BACKUP_PARAMS
+            codecs: Payload codec by namespace, a format name or a dict of
+                luca_core.context.codecs.DEFAULT_CODEC_PARAMS overrides;
+                other namespaces store JSON. Model types with indexed
+                fields are always stored as JSON, so declare indexes before
+                switching their namespace to another codec.
+            search_namespaces: Namespaces kept in the full-text index,
+                by default luca_core.context.search.DEFAULT_SEARCH_NAMESPACES
+            retention: Enables the retention sweep with these settings
+                (days, namespaces, interval, batch_size, batch_delay_ms,
+                vacuum_pages), merged over
+                luca_core.context.retention.DEFAULT_RETENTION_PARAMS
+            change_log: Enables the change log with these settings (keep,
+                prune_every), merged over
+                luca_core.context.changes.DEFAULT_CHANGE_LOG_PARAMS
         """
         self.db_path = db_path
         self.backup_interval = backup_interval
-        self.conn: Optional[sqlite3.Connection] = None
-        self._lock = asyncio.Lock()
+        self.backup_params = resolve_backup_params(backup)
+        self.indexed_fields = resolve_indexed_fields(indexed_fields)
+        self.codecs = resolve_codecs(codecs)
+        self.search_namespaces = tuple(
+            DEFAULT_SEARCH_NAMESPACES
+            if search_namespaces is None
+            else search_namespaces
+        )
+        self.write_behind = write_behind is not None
+        self.retention_params = (
+            resolve_retention_params(retention) if retention is not None else None
+        )
+        self.change_log_params = (
+            resolve_change_log_params(change_log) if change_log is not None else None
+        )
+        self._engine = SQLiteEngine(db_path, connection_params, write_behind)
         self._backup_task: Optional[asyncio.Task[None]] = None
+        self._backup_lock = asyncio.Lock()
+        self._backup_stats: Dict[str, Any] = {
+            "count": 0,
+            "failures": 0,
+            "total_duration_ms": 0.0,
+            "last": None,
+        }
+        self._pending: Dict[RowKey, _PendingWrite] = {}
+        self._outstanding: Set["Future[Any]"] = set()
+        # Whether rows may still be in the legacy layout. Only cleared once
+        # the legacy tables are empty, and they are never dropped while the
+        # store is open, so a stale True is harmless.
+        self._legacy = False
+        self._migration_task: Optional[asyncio.Task[None]] = None
+        self._search_task: Optional[asyncio.Task[None]] = None
+        self._metrics_task: Optional[asyncio.Task[None]] = None
+        self._retention_task: Optional[asyncio.Task[None]] = None
+        self._retention_lock = asyncio.Lock()
+        self._version_conflicts = 0
+        self._retention_stats: Dict[str, Any] = {
+            "count": 0,
+            "failures": 0,
+            "deleted": 0,
+            "reclaimed_bytes": 0,
+            "last": None,
+        }
 
     async def initialize(self) -> None:
         """Initialize the SQLite database.
@@ -47,54 +301,282 @@ class SQLiteContextStore(BaseContextStore):
         # Ensure the directory exists
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
 
-        # Connect to the database
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-
-        # Create the metadata table
-        assert self.conn is not None  # For mypy
-        self.conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS metadata (
-                namespace TEXT NOT NULL,
-                model_type TEXT NOT NULL,
-                key TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                PRIMARY KEY (namespace, model_type, key)
+        # Open the writer connection and the reader pool
+        await asyncio.to_thread(self._engine.open)
+        self._legacy, backfill, metrics_after = await self._engine.run_write(
+            self._create_schema
+        )
+        if self._legacy:
+            self._migration_task = asyncio.create_task(self._migrate())
+        if backfill:
+            self._search_task = asyncio.create_task(self._backfill_search(backfill))
+        if metrics_after is not None:
+            self._metrics_task = asyncio.create_task(
+                self._backfill_metrics(metrics_after)
             )
+
+        # Start the backup task
+        if self.backup_interval > 0:
+            self._backup_task = asyncio.create_task(self._backup_loop())
+        if self.retention_params is not None:
+            self._retention_task = asyncio.create_task(self._retention_loop())
+
+    def _create_schema(
+        self, conn: sqlite3.Connection
+    ) -> Tuple[bool, List[str], Optional[str]]:
+        """Create the tables and indices. Runs on the writer thread.
+
+        Returns:
+            Whether rows remain to be migrated from the legacy layout, the
+            searchable namespaces whose rows are not all indexed, and where
+            the copy of document metrics to the typed table stands (None if
+            there is nothing to copy)
         """
+        legacy = create_schema(conn)
+        if self.change_log_params is not None:
+            create_changes_schema(conn)
+        # Migrated rows are indexed by a backfill once the migration is done
+        backfill = create_search_schema(conn, self.search_namespaces, reset=legacy)
+        # Metrics recorded as documents, or still being migrated, are copied
+        # to the typed table once it exists
+        if create_metrics_schema(conn) and (legacy or has_document_metrics(conn)):
+            start_backfill(conn)
+
+        # Generated columns and partial indexes for declared fields
+        created = sync_indexes(
+            conn, MODELS_TABLE, self.indexed_fields, codec_column="codec"
         )
+        if created:
+            logger.info(f"Built context store indexes: {', '.join(created)}")
+        return legacy, backfill, backfill_position(conn)
 
-        # Create the data table
-        self.conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS data (
-                namespace TEXT NOT NULL,
-                model_type TEXT NOT NULL,
-                key TEXT NOT NULL,
-                data TEXT NOT NULL,
-                PRIMARY KEY (namespace, model_type, key)
-            )
+    async def _migrate(self) -> None:
+        """Move rows from the legacy layout, one batch per transaction."""
+        moved = 0
+        try:
+            while True:
+                count = await self._engine.run_write(
+                    lambda conn: migrate_batch(conn, self.MIGRATION_BATCH_SIZE)
+                )
+                if not count:
+                    break
+                moved += count
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error migrating the legacy context store layout: {e}")
+            return
+        self._legacy = False
+        logger.info(f"Migrated {moved} models to the single-table layout")
+
+    async def _backfill_search(self, namespaces: List[str]) -> None:
+        """Index rows written before their namespace became searchable."""
+        if self._migration_task:
+            await asyncio.wait([self._migration_task])
+            if self._legacy:
+                return  # The migration failed; retried on the next initialize()
+
+        def _extract(codec: str, data: Payload) -> str:
+            try:
+                return search_text(json.loads(to_json(codec, data)))
+            except Exception as e:
+                logger.error(f"Error indexing a stored model for search: {e}")
+                return ""
+
+        try:
+            for namespace in namespaces:
+                after: Optional[Tuple[str, str]] = ("", "")
+                while after is not None:
+                    position = after
+                    after = await self._engine.run_write(
+                        lambda conn: backfill_batch(
+                            conn,
+                            namespace,
+                            position,
+                            self.SEARCH_BACKFILL_BATCH_SIZE,
+                            _extract,
+                        )
+                    )
+                logger.info(f"Indexed namespace {namespace} for search")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error building the context store search index: {e}")
+
+    async def _backfill_metrics(self, after: str) -> None:
+        """Copy metrics stored as documents to the typed metrics table."""
+        if self._migration_task:
+            await asyncio.wait([self._migration_task])
+            if self._legacy:
+                return  # The migration failed; retried on the next initialize()
+
+        def _decode(codec: str, data: Payload) -> Optional[MetricRecord]:
+            try:
+                return decode_model(MetricRecord, codec, data)
+            except Exception as e:
+                logger.error(f"Error copying a stored metric: {e}")
+                return None
+
+        position: Optional[str] = after
+        try:
+            while position is not None:
+                start = position
+                position = await self._engine.run_write(
+                    lambda conn: backfill_metrics_batch(
+                        conn, start, self.METRICS_BACKFILL_BATCH_SIZE, _decode
+                    )
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error copying metrics to the metrics table: {e}")
+
+    async def ensure_indexes(
+        self, indexed_fields: Optional[Dict[str, Sequence[str]]] = None
+    ) -> None:
+        """Apply new index declarations to an open store.
+
+        Index builds run on the writer thread: reads continue while an index
+        is built, and writes queue behind the build.
+
+        Args:
+            indexed_fields: Declarations merged over the defaults; the current
+                declarations are re-applied when omitted
         """
+        if indexed_fields is not None:
+            self.indexed_fields = resolve_indexed_fields(indexed_fields)
+        await self._engine.run_write(
+            lambda conn: sync_indexes(
+                conn, MODELS_TABLE, self.indexed_fields, codec_column="codec"
+            )
         )
 
-        # Create indices for faster queries
-        self.conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_namespace ON metadata (namespace)"
-        )
-        self.conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_model_type ON metadata (model_type)"
-        )
+    async def flush(self) -> None:
+        """Wait until every write issued so far is committed.
 
-        self.conn.commit()
+        Raises:
+            Exception: The error of the first failed write-behind write since
+                the last flush
+        """
+        futures = list(self._outstanding)
+        if not futures:
+            return
+        # A non-grouped no-op ends the batch being collected right away
+        self._engine.submit_write(lambda conn: None)
+        await self._wait(futures)
+        self._outstanding.difference_update(futures)
+        for future in futures:
+            error = future.exception()
+            if error is not None:
+                raise error
 
-        # Start the backup task
-        if self.backup_interval > 0:
-            self._backup_task = asyncio.create_task(self._backup_loop())
+    async def _wait(self, futures: Iterable["Future[Any]"]) -> None:
+        """Wait for engine futures without raising their errors."""
+        waiters = [asyncio.wrap_future(future) for future in futures]
+        if waiters:
+            await asyncio.wait(waiters)
+        for waiter in waiters:
+            # Mark errors as retrieved; flush() reports them
+            waiter.exception()
+
+    async def _write(
+        self,
+        fn: Callable[[sqlite3.Connection], Any],
+        pending: Sequence[Tuple[RowKey, str, Optional[Payload], bool]] = (),
+        publish: bool = False,
+    ) -> None:
+        """Run a write, or queue it in write-behind mode.
+
+        Args:
+            fn: The write, run on the writer thread
+            pending: ``(row key, codec, data, exact)`` for every row the
+                write touches, used to answer fetch() before the write commits
+            publish: ``fn`` returns ChangeEvent instances, published to the
+                change feed once the write commits
+        """
+        if not self.write_behind:
+            result = await self._engine.run_write(fn)
+            if publish:
+                self.change_feed.publish(result)
+            return
+
+        future = self._engine.submit_write(fn, group=True)
+        self._outstanding.add(future)
+        keys = [key for key, _, _, _ in pending]
+        for key, codec, data, exact in pending:
+            self._pending[key] = _PendingWrite(codec, data, future, exact)
+
+        loop = asyncio.get_running_loop()
+
+        def _done(future: "Future[Any]") -> None:
+            try:
+                loop.call_soon_threadsafe(self._settle, future, keys, publish)
+            except RuntimeError:
+                pass  # The loop is closed; there is nobody left to read
+
+        future.add_done_callback(_done)
+
+    def _settle(
+        self, future: "Future[Any]", keys: List[RowKey], publish: bool = False
+    ) -> None:
+        """Forget a finished write-behind write. Runs on the event loop."""
+        for key in keys:
+            entry = self._pending.get(key)
+            if entry is not None and entry.future is future:
+                del self._pending[key]
+        error = future.exception()
+        if error is None:
+            self._outstanding.discard(future)
+            if publish:
+                self.change_feed.publish(future.result())
+        else:
+            # Kept in _outstanding so that the next flush() raises it
+            logger.error(f"Write-behind write failed: {error}")
 
     async def close(self) -> None:
         """Close the database connection and cleanup resources."""
+        if self._retention_task:
+            # Every batch is its own transaction; the next sweep carries on
+            self._retention_task.cancel()
+            try:
+                await self._retention_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._retention_task = None
+
+        if self._metrics_task:
+            # The copy resumes from its last batch on the next initialize()
+            self._metrics_task.cancel()
+            try:
+                await self._metrics_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._metrics_task = None
+
+        if self._search_task:
+            # Batches are idempotent; an unfinished namespace is indexed
+            # again from the start on the next initialize()
+            self._search_task.cancel()
+            try:
+                await self._search_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._search_task = None
+
+        if self._migration_task:
+            # Every batch is its own transaction; the migration resumes on
+            # the next initialize()
+            self._migration_task.cancel()
+            try:
+                await self._migration_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._migration_task = None
+
         if self._backup_task:
             self._backup_task.cancel()
             try:
@@ -104,9 +586,45 @@ class SQLiteContextStore(BaseContextStore):
             finally:
                 self._backup_task = None
 
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        await asyncio.to_thread(self._engine.close)
+        self.change_feed.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queueing and execution statistics for database operations.
+
+        ``max_wait_ms`` is the longest time a request sat in the writer queue
+        or waited for a reader connection; the event loop itself only pays for
+        enqueueing the request.
+
+        ``backup`` counts backups and holds the result of the last one: its
+        duration, the time its steps held the source's shared lock
+        (``lock_ms``, longest step ``max_step_ms``), and the number of store
+        operations that completed while it ran with the time they spent
+        queued and running (``foreground_ops``, ``foreground_ms``).
+
+        ``retention`` counts retention sweeps, the rows they deleted and the
+        bytes they gave back, and holds the result of the last sweep.
+
+        ``changes`` counts the open subscriptions to the change feed and the
+        events all subscriptions, closed ones included, dropped on overflow.
+
+        ``versions`` counts the compare-and-swap updates that conflicted.
+        """
+        stats = self._engine.stats()
+        stats["backup"] = dict(self._backup_stats)
+        stats["retention"] = dict(self._retention_stats)
+        stats["changes"] = {
+            "subscriptions": self.change_feed.subscription_count,
+            "dropped": self.change_feed.dropped,
+        }
+        stats["versions"] = {"conflicts": self._version_conflicts}
+        return stats
+
+    def _foreground_totals(self) -> Tuple[int, float]:
+        """Return the operations completed so far and their total time."""
+        writes, write_ms = self._engine.write_stats.totals()
+        reads, read_ms = self._engine.read_stats.totals()
+        return writes + reads, write_ms + read_ms
 
     async def _backup_loop(self) -> None:
         """Background task to periodically backup the database."""
@@ -119,25 +637,166 @@ class SQLiteContextStore(BaseContextStore):
             except Exception as e:
                 logger.error(f"Error in backup loop: {e}")
 
-    async def _create_backup(self) -> None:
-        """Create a backup of the database."""
+    async def _create_backup(self) -> BackupResult:
+        """Create a backup of the database, then prune old backups.
+
+        The copy runs on a worker thread with its own connection; store
+        operations proceed while it runs (see luca_core.context.sqlite_backup).
+        """
+        params = self.backup_params
         backup_dir = os.path.join(os.path.dirname(self.db_path), "backups")
         os.makedirs(backup_dir, exist_ok=True)
 
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        backup_path = os.path.join(backup_dir, f"context_{timestamp}.db")
+        async with self._backup_lock:
+            dest = backup_path(backup_dir, datetime.utcnow(), params["compress"])
+            ops, op_ms = self._foreground_totals()
+            try:
+                result = await asyncio.to_thread(
+                    run_backup,
+                    self.db_path,
+                    dest,
+                    params["pages_per_step"],
+                    params["step_delay_ms"],
+                    params["compress"],
+                )
+            except Exception:
+                self._backup_stats["failures"] += 1
+                raise
+            end_ops, end_op_ms = self._foreground_totals()
+
+            last = result.as_dict()
+            last["foreground_ops"] = end_ops - ops
+            last["foreground_ms"] = end_op_ms - op_ms
+            self._backup_stats["count"] += 1
+            self._backup_stats["total_duration_ms"] += result.duration_ms
+            self._backup_stats["last"] = last
+
+            deleted = await asyncio.to_thread(
+                prune_backups, backup_dir, params["keep"], params["max_age_days"]
+            )
+
+        logger.info(
+            f"Created backup at {dest} in {result.duration_ms:.0f} ms "
+            f"({result.steps} steps, {len(deleted)} old backups removed)"
+        )
+        return result
+
+    async def _retention_loop(self) -> None:
+        """Background task to periodically expire old rows."""
+        assert self.retention_params is not None
+        while True:
+            try:
+                await self.apply_retention()
+                await asyncio.sleep(self.retention_params["interval"])
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in retention loop: {e}")
+                await asyncio.sleep(self.retention_params["interval"])
 
-        async with self._lock:
-            # Use a new connection for the backup to avoid conflicts
-            source = sqlite3.connect(self.db_path)
-            dest = sqlite3.connect(backup_path)
+    async def apply_retention(
+        self,
+        namespaces: Optional[Dict[str, float]] = None,
+        now: Optional[datetime] = None,
+    ) -> RetentionResult:
+        """Delete rows older than their namespace's TTL, then vacuum.
 
-            source.backup(dest)
+        Deletes run in batches of ``batch_size`` rows, one writer
+        transaction each, with ``batch_delay_ms`` between them; the
+        incremental vacuum likewise frees ``vacuum_pages`` pages per step.
+        Rows deleted this way are not invalidated in a CachedContextStore
+        in front of the store.
 
-            source.close()
-            dest.close()
+        Args:
+            namespaces: TTL in days by namespace, by default the configured
+                policies
+            now: Time the TTLs count back from, by default the current time
+
+        Returns:
+            The rows deleted and the bytes given back
+        """
+        params = self.retention_params or resolve_retention_params({})
+        if namespaces is None:
+            namespaces = params["namespaces"]
+        if self._migration_task:
+            await asyncio.wait([self._migration_task])
+            if self._legacy:
+                raise RuntimeError("Legacy rows are still being migrated")
 
-        logger.info(f"Created backup at {backup_path}")
+        now = now or datetime.utcnow()
+        batch_size = params["batch_size"]
+        delay = params["batch_delay_ms"] / 1000
+        result = RetentionResult()
+
+        async with self._retention_lock:
+            started = time.perf_counter()
+            try:
+                page_size, pages, _ = await self._engine.run_write(page_counts)
+                for namespace, days in namespaces.items():
+                    cutoff = now - timedelta(days=days)
+                    searchable = namespace in self.search_namespaces
+                    deleted = 0
+                    types = await self._engine.run_read(
+                        lambda conn: model_types(conn, namespace)
+                    )
+                    batches = [
+                        lambda conn, model_type=model_type: expire_batch(
+                            conn,
+                            namespace,
+                            model_type,
+                            to_timestamp(cutoff),
+                            batch_size,
+                            searchable,
+                        )
+                        for model_type in types
+                    ]
+                    if namespace == "metrics":
+                        batches.append(
+                            lambda conn: expire_metrics_batch(
+                                conn, to_epoch(cutoff), batch_size
+                            )
+                        )
+                    for batch in batches:
+                        while True:
+                            count = await self._engine.run_write(batch)
+                            result.batches += 1
+                            deleted += count
+                            if count < batch_size:
+                                break
+                            await asyncio.sleep(delay)
+                    result.deleted[namespace] = deleted
+
+                while True:
+                    free = await self._engine.run_write(
+                        lambda conn: incremental_vacuum(conn, params["vacuum_pages"])
+                    )
+                    if free is None:
+                        break
+                    result.vacuum_steps += 1
+                    if not free:
+                        break
+                    await asyncio.sleep(delay)
+
+                _, end_pages, free = await self._engine.run_write(page_counts)
+                result.reclaimed_bytes = (pages - end_pages) * page_size
+                result.free_bytes = free * page_size
+            except Exception:
+                self._retention_stats["failures"] += 1
+                raise
+            result.duration_ms = (time.perf_counter() - started) * 1000
+
+            self._retention_stats["count"] += 1
+            self._retention_stats["deleted"] += sum(result.deleted.values())
+            self._retention_stats["reclaimed_bytes"] += result.reclaimed_bytes
+            self._retention_stats["last"] = result.as_dict()
+
+        if any(result.deleted.values()):
+            logger.info(
+                f"Retention deleted {sum(result.deleted.values())} rows and "
+                f"reclaimed {result.reclaimed_bytes} bytes in "
+                f"{result.duration_ms:.0f} ms"
+            )
+        return result
 
     def _serialize_model(self, model: BaseModel) -> str:
         """Serialize a model to JSON string."""
@@ -147,36 +806,136 @@ class SQLiteContextStore(BaseContextStore):
         """Deserialize a JSON string to a model instance."""
         return model_cls.model_validate_json(data)
 
+    def _codec(self, namespace: str, model_type: str) -> PayloadCodec:
+        """Return the codec new rows of a model type are written with."""
+        if model_type in self.indexed_fields:
+            # Generated index columns read the document with json_extract()
+            return JSON_CODEC
+        return self.codecs.get(namespace, JSON_CODEC)
+
+    def _encode_model(self, model: BaseModel, namespace: str) -> Tuple[str, Payload]:
+        """Return the ``(codec, data)`` a model is stored as."""
+        codec = self._codec(namespace, type(model).__name__)
+        if codec.format == JSON:
+            return codec.pack(self._serialize_model(model))
+        return codec.encode(model)
+
+    def _decode_model(self, model_cls: Type[T], codec: str, data: Payload) -> T:
+        """Validate a model from a stored row."""
+        if codec == JSON:
+            return self._deserialize_model(model_cls, data)  # type: ignore[arg-type]
+        return decode_model(model_cls, codec, data)
+
+    def _decode_rows(
+        self,
+        model_cls: Type[BaseModel],
+        rows: Iterable[sqlite3.Row],
+        convert: Optional[Callable[[str, Payload], Any]] = None,
+    ) -> List[Tuple[sqlite3.Row, Any]]:
+        """Convert selected rows, by default to ``model_cls`` instances.
+
+        Runs on a reader thread. Rows that fail to convert are logged and
+        skipped.
+
+        Returns:
+            ``(row, converted)`` pairs
+        """
+        if convert is None:
+            convert = partial(self._decode_model, model_cls)
+        results = []
+        for row in rows:
+            try:
+                results.append((row, convert(row["codec"], row["data"])))
+            except Exception as e:
+                logger.error(f"Error deserializing {model_cls.__name__}: {e}")
+        return results
+
+    def _tracking(self) -> bool:
+        """Whether writes need to report the rows they change."""
+        return self.change_log_params is not None or self.change_feed.active
+
+    def _log(
+        self, conn: sqlite3.Connection, events: List[ChangeEvent], changed_at: int
+    ) -> List[ChangeEvent]:
+        """Record a write's events in the change log, if it is enabled.
+
+        Runs on the writer thread, in the write's transaction.
+        """
+        if self.change_log_params is None or not events:
+            return events
+        return log_changes(conn, events, changed_at, self.change_log_params)
+
+    def _exists(self, conn: sqlite3.Connection, row_key: RowKey) -> bool:
+        """Whether a row is stored, in either layout. Runs on the writer."""
+        if conn.execute(
+            f"SELECT 1 FROM {MODELS_TABLE} "
+            "WHERE namespace = ? AND model_type = ? AND key = ?",
+            row_key,
+        ).fetchone():
+            return True
+        return bool(
+            self._legacy
+            and conn.execute(
+                "SELECT 1 FROM data WHERE namespace = ? AND model_type = ? AND key = ?",
+                row_key,
+            ).fetchone()
+        )
+
     async def store(self, model: BaseModel, namespace: str = "default") -> None:
         """Store a model instance."""
-        model_type = type(model).__name__
-        key = getattr(model, "id", str(id(model)))
-        now = datetime.utcnow().isoformat()
-
-        async with self._lock:
-            # Store metadata
-            assert self.conn is not None, "Database not initialized"
-            self.conn.execute(
-                """
-                INSERT OR REPLACE INTO metadata
-                (namespace, model_type, key, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (namespace, model_type, key, now, now),
-            )
+        await self.store_many([model], namespace)
+
+    async def store_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Store several model instances in a single transaction.
+
+        Storing a model that already exists replaces its data and keeps its
+        creation time.
+        """
+        if models:
+            await self._write(*self._store_write(models, namespace), publish=True)
+
+    def _store_write(
+        self, models: Sequence[BaseModel], namespace: str
+    ) -> _PreparedWrite:
+        """Prepare the write of store_many()."""
+        now = now_timestamp()
+        # Serialize on the caller's side so later mutations are not persisted
+        rows = []
+        pending = []
+        documents = []
+        searchable = namespace in self.search_namespaces
+        tracking = self._tracking()
+        for model in models:
+            row_key = (namespace, type(model).__name__, self.model_key(model))
+            codec, data = self._encode_model(model, namespace)
+            rows.append((*row_key, now, now, codec, data))
+            pending.append((row_key, codec, data, True))
+            if searchable:
+                documents.append((row_key, search_text(dict(model))))
+        events = [ChangeEvent(*row[:3], STORE) for row in rows] if tracking else []
 
-            # Store data
-            serialized = self._serialize_model(model)
-            self.conn.execute(
-                """
-                INSERT OR REPLACE INTO data
-                (namespace, model_type, key, data)
-                VALUES (?, ?, ?, ?)
+        def _store(conn: sqlite3.Connection) -> List[ChangeEvent]:
+            conn.executemany(
+                f"""
+                INSERT INTO {MODELS_TABLE}
+                (namespace, model_type, key, created_at, updated_at, codec, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (namespace, model_type, key) DO UPDATE SET
+                    updated_at = excluded.updated_at,
+                    codec = excluded.codec,
+                    data = excluded.data,
+                    version = version + 1
                 """,
-                (namespace, model_type, key, serialized),
+                rows,
             )
+            index_documents(conn, documents)
+            if self._legacy:
+                delete_legacy(conn, [row[:3] for row in rows])
+            return self._log(conn, events, now)
 
-            self.conn.commit()
+        return _store, pending
 
     async def fetch(
         self, model_cls: Type[T], key: str, namespace: str = "default"
@@ -184,85 +943,518 @@ class SQLiteContextStore(BaseContextStore):
         """Fetch a model instance by key."""
         model_type = model_cls.__name__
 
-        async with self._lock:
-            assert self.conn is not None, "Database not initialized"
-            cursor = self.conn.execute(
-                """
-                SELECT data
-                FROM data
+        entry = self._pending.get((namespace, model_type, key))
+        if entry is not None:
+            if not entry.exact:
+                await self._wait([entry.future])
+            elif entry.data is None:
+                return None
+            else:
+                try:
+                    return self._decode_model(model_cls, entry.codec, entry.data)
+                except Exception as e:
+                    logger.error(f"Error deserializing {model_type}: {e}")
+                    return None
+
+        def _fetch(conn: sqlite3.Connection) -> Optional[T]:
+            params = (namespace, model_type, key)
+            row = conn.execute(
+                f"""
+                SELECT codec, data
+                FROM {MODELS_TABLE}
                 WHERE namespace = ? AND model_type = ? AND key = ?
                 """,
-                (namespace, model_type, key),
-            )
-
-            row = cursor.fetchone()
+                params,
+            ).fetchone()
+            if not row and self._legacy:
+                row = conn.execute(
+                    "SELECT 'json' AS codec, data FROM data "
+                    "WHERE namespace = ? AND model_type = ? AND key = ?",
+                    params,
+                ).fetchone()
             if not row:
                 return None
 
             try:
-                return self._deserialize_model(model_cls, row["data"])
+                return self._decode_model(model_cls, row["codec"], row["data"])
             except Exception as e:
                 logger.error(f"Error deserializing {model_type}: {e}")
                 return None
 
-    async def update(self, model: BaseModel, namespace: str = "default") -> None:
-        """Update an existing model instance."""
-        model_type = type(model).__name__
-        key = getattr(model, "id", str(id(model)))
-        now = datetime.utcnow().isoformat()
-
-        async with self._lock:
-            # Update metadata (only updated_at)
-            assert self.conn is not None, "Database not initialized"
-            self.conn.execute(
-                """
-                UPDATE metadata
-                SET updated_at = ?
+        return await self._engine.run_read(_fetch)
+
+    async def fetch_versioned(
+        self, model_cls: Type[T], key: str, namespace: str = "default"
+    ) -> Optional[Versioned[T]]:
+        """Fetch a model instance with its version.
+
+        In write-behind mode, a pending write of the model is committed
+        first, since its version is only known then.
+        """
+        model_type = model_cls.__name__
+        entry = self._pending.get((namespace, model_type, key))
+        if entry is not None:
+            await self._wait([entry.future])
+
+        def _fetch(conn: sqlite3.Connection) -> Optional[Versioned[T]]:
+            params = (namespace, model_type, key)
+            row = conn.execute(
+                f"""
+                SELECT codec, data, version
+                FROM {MODELS_TABLE}
                 WHERE namespace = ? AND model_type = ? AND key = ?
                 """,
-                (now, namespace, model_type, key),
+                params,
+            ).fetchone()
+            if not row and self._legacy:
+                # Legacy rows become version 1 when they are migrated
+                row = conn.execute(
+                    "SELECT 'json' AS codec, data, 1 AS version FROM data "
+                    "WHERE namespace = ? AND model_type = ? AND key = ?",
+                    params,
+                ).fetchone()
+            if not row:
+                return None
+
+            try:
+                model = self._decode_model(model_cls, row["codec"], row["data"])
+            except Exception as e:
+                logger.error(f"Error deserializing {model_type}: {e}")
+                return None
+            return Versioned(model, row["version"])
+
+        return await self._engine.run_read(_fetch)
+
+    async def update(
+        self,
+        model: BaseModel,
+        namespace: str = "default",
+        expected_version: Optional[int] = None,
+    ) -> None:
+        """Update an existing model instance.
+
+        With ``expected_version``, the update is a compare-and-swap: a
+        single conditional statement, so it is atomic across processes
+        sharing the database. It always runs in its own transaction and
+        returns once committed, in write-behind mode too, since the caller
+        needs to know whether it applied.
+
+        Raises:
+            VersionConflict: If the stored version is not expected_version,
+                or the model is not stored
+        """
+        if expected_version is None:
+            await self.update_many([model], namespace)
+        else:
+            await self._write_now(
+                [self._versioned_update_write(model, namespace, expected_version)]
             )
 
-            # Replace data
-            serialized = self._serialize_model(model)
-            self.conn.execute(
-                """
-                UPDATE data
-                SET data = ?
+    def _versioned_update_write(
+        self, model: BaseModel, namespace: str, expected_version: int
+    ) -> _PreparedWrite:
+        """Prepare a compare-and-swap update; see update()."""
+        now = now_timestamp()
+        row_key = (namespace, type(model).__name__, self.model_key(model))
+        codec, data = self._encode_model(model, namespace)
+        searchable = namespace in self.search_namespaces
+        text = search_text(dict(model)) if searchable else None
+        tracking = self._tracking()
+
+        def _update(conn: sqlite3.Connection) -> List[ChangeEvent]:
+            if self._legacy:
+                promote_legacy(conn, [row_key])
+            row = conn.execute(
+                f"""
+                UPDATE {MODELS_TABLE}
+                SET updated_at = ?, codec = ?, data = ?, version = version + 1
+                WHERE namespace = ? AND model_type = ? AND key = ? AND version = ?
+                RETURNING version
+                """,
+                (now, codec, data, *row_key, expected_version),
+            ).fetchone()
+            if row is None:
+                # Reading the version alone keeps conflicts cheap
+                current = conn.execute(
+                    f"SELECT version FROM {MODELS_TABLE} "
+                    "WHERE namespace = ? AND model_type = ? AND key = ?",
+                    row_key,
+                ).fetchone()
+                raise VersionConflict(
+                    *row_key, expected_version, current[0] if current else None
+                )
+            if text is not None:
+                index_documents(conn, [(row_key, text)])
+            events = [ChangeEvent(*row_key, UPDATE)] if tracking else []
+            return self._log(conn, events, now)
+
+        return _update, [(row_key, codec, data, False)]
+
+    async def update_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Update several existing model instances in a single transaction.
+
+        Models that are not stored yet are ignored, as with update().
+        """
+        if models:
+            await self._write(*self._update_write(models, namespace), publish=True)
+
+    def _update_write(
+        self, models: Sequence[BaseModel], namespace: str
+    ) -> _PreparedWrite:
+        """Prepare the write of update_many()."""
+        now = now_timestamp()
+        rows = []
+        pending = []
+        documents = []
+        searchable = namespace in self.search_namespaces
+        tracking = self._tracking()
+        for model in models:
+            row_key = (namespace, type(model).__name__, self.model_key(model))
+            codec, data = self._encode_model(model, namespace)
+            rows.append((now, codec, data, *row_key))
+            if searchable:
+                documents.append((row_key, search_text(dict(model))))
+            # The update only applies if the row exists, which is known for
+            # rows with a pending store
+            previous = self._pending.get(row_key)
+            exact = bool(previous and previous.exact and previous.data is not None)
+            pending.append((row_key, codec, data, exact))
+
+        def _update(conn: sqlite3.Connection) -> List[ChangeEvent]:
+            if self._legacy:
+                promote_legacy(conn, [row[3:] for row in rows])
+            conn.executemany(
+                f"""
+                UPDATE {MODELS_TABLE}
+                SET updated_at = ?, codec = ?, data = ?, version = version + 1
                 WHERE namespace = ? AND model_type = ? AND key = ?
                 """,
-                (serialized, namespace, model_type, key),
+                rows,
             )
+            # Updates of missing rows are ignored; so are their text and
+            # their change events
+            updated = (
+                {row[3:] for row in rows if self._exists(conn, row[3:])}
+                if documents or tracking
+                else set()
+            )
+            index_documents(
+                conn,
+                [(row_key, text) for row_key, text in documents if row_key in updated],
+            )
+            events = [
+                ChangeEvent(*row[3:], UPDATE)
+                for row in rows
+                if tracking and row[3:] in updated
+            ]
+            return self._log(conn, events, now)
 
-            self.conn.commit()
+        return _update, pending
 
     async def delete(
         self, model_cls: Type[BaseModel], key: str, namespace: str = "default"
     ) -> None:
         """Delete a model instance."""
+        await self.delete_many(model_cls, [key], namespace)
+
+    async def delete_many(
+        self,
+        model_cls: Type[BaseModel],
+        keys: Sequence[str],
+        namespace: str = "default",
+    ) -> None:
+        """Delete several model instances in a single transaction."""
+        if keys:
+            await self._write(
+                *self._delete_write(model_cls, keys, namespace), publish=True
+            )
+
+    def _delete_write(
+        self, model_cls: Type[BaseModel], keys: Sequence[str], namespace: str
+    ) -> _PreparedWrite:
+        """Prepare the write of delete_many()."""
         model_type = model_cls.__name__
+        rows = [(namespace, model_type, key) for key in keys]
+        pending = [(row, JSON, None, True) for row in rows]
+        tracking = self._tracking()
 
-        async with self._lock:
-            # Delete metadata
-            assert self.conn is not None, "Database not initialized"
-            self.conn.execute(
-                """
-                DELETE FROM metadata
+        def _delete(conn: sqlite3.Connection) -> List[ChangeEvent]:
+            # Deletes of missing rows report no change
+            events = (
+                [
+                    ChangeEvent(*row, DELETE)
+                    for row in dict.fromkeys(rows)
+                    if self._exists(conn, row)
+                ]
+                if tracking
+                else []
+            )
+            conn.executemany(
+                f"""
+                DELETE FROM {MODELS_TABLE}
                 WHERE namespace = ? AND model_type = ? AND key = ?
                 """,
-                (namespace, model_type, key),
+                rows,
             )
+            if namespace in self.search_namespaces:
+                unindex_documents(conn, rows)
+            if self._legacy:
+                delete_legacy(conn, rows)
+            return self._log(conn, events, now_timestamp())
 
-            # Delete data
-            self.conn.execute(
-                """
-                DELETE FROM data
-                WHERE namespace = ? AND model_type = ? AND key = ?
-                """,
-                (namespace, model_type, key),
+        return _delete, pending
+
+    async def patch(
+        self,
+        model_cls: Type[BaseModel],
+        key: str,
+        values: Dict[str, Any],
+        namespace: str = "default",
+    ) -> None:
+        """Set fields of a stored model without reading it.
+
+        The JSON document is changed in SQL with json_set(). Rows stored
+        with another codec, and models of searchable namespaces, whose text
+        must be indexed again, are decoded and encoded on the writer
+        thread instead. Runs in its own transaction, like a
+        compare-and-swap update().
+        """
+        validated = validate_patch(model_cls, values)
+        await self._write_now([self._patch_write(model_cls, key, validated, namespace)])
+
+    def _patch_write(
+        self,
+        model_cls: Type[BaseModel],
+        key: str,
+        values: BaseModel,
+        namespace: str,
+    ) -> _PreparedWrite:
+        """Prepare the write of patch(); ``values`` are validated."""
+        now = now_timestamp()
+        row_key = (namespace, model_cls.__name__, key)
+        searchable = namespace in self.search_namespaces
+        tracking = self._tracking()
+        paths = []
+        for name, value in values.model_dump(mode="json").items():
+            paths.extend((json_path(name), json.dumps(value)))
+        pairs = ", ".join(["?, json(?)"] * (len(paths) // 2))
+
+        def _patch(conn: sqlite3.Connection) -> List[ChangeEvent]:
+            if self._legacy:
+                promote_legacy(conn, [row_key])
+            patched = not searchable and bool(
+                conn.execute(
+                    f"""
+                    UPDATE {MODELS_TABLE}
+                    SET data = json_set(data, {pairs}), updated_at = ?,
+                        version = version + 1
+                    WHERE namespace = ? AND model_type = ? AND key = ?
+                        AND codec = ?
+                    RETURNING 1
+                    """,
+                    (*paths, now, *row_key, JSON),
+                ).fetchone()
             )
+            if not patched:
+                patched = self._patch_decoded(conn, model_cls, row_key, values, now)
+            events = [ChangeEvent(*row_key, UPDATE)] if tracking and patched else []
+            return self._log(conn, events, now)
+
+        return _patch, [(row_key, JSON, None, False)]
+
+    def _patch_decoded(
+        self,
+        conn: sqlite3.Connection,
+        model_cls: Type[BaseModel],
+        row_key: RowKey,
+        values: BaseModel,
+        now: int,
+    ) -> bool:
+        """Patch a row by decoding and encoding it. Runs on the writer.
+
+        Returns:
+            Whether the row exists
+        """
+        row = conn.execute(
+            f"SELECT codec, data FROM {MODELS_TABLE} "
+            "WHERE namespace = ? AND model_type = ? AND key = ?",
+            row_key,
+        ).fetchone()
+        if row is None:
+            return False
+        model = self._decode_model(model_cls, row["codec"], row["data"])
+        for name, value in values:
+            setattr(model, name, value)
+        codec, data = self._encode_model(model, row_key[0])
+        conn.execute(
+            f"""
+            UPDATE {MODELS_TABLE}
+            SET updated_at = ?, codec = ?, data = ?, version = version + 1
+            WHERE namespace = ? AND model_type = ? AND key = ?
+            """,
+            (now, codec, data, *row_key),
+        )
+        if row_key[0] in self.search_namespaces:
+            index_documents(conn, [(row_key, search_text(dict(model)))])
+        return True
 
-            self.conn.commit()
+    async def apply(self, transaction: Transaction) -> None:
+        """Apply the writes of a transaction in one transaction.
+
+        Models are serialized on the caller's side, and the transaction
+        returns once committed, in write-behind mode too.
+
+        Raises:
+            VersionConflict: If an update's expected version is stale;
+                nothing is written then
+        """
+        writes = []
+        for operation in transaction.operations:
+            namespace = operation.namespace
+            if operation.kind == STORE:
+                writes.append(self._store_write(operation.models, namespace))
+            elif operation.kind == UPDATE and operation.expected_version is not None:
+                writes.append(
+                    self._versioned_update_write(
+                        operation.models[0], namespace, operation.expected_version
+                    )
+                )
+            elif operation.kind == UPDATE:
+                writes.append(self._update_write(operation.models, namespace))
+            elif operation.kind == DELETE:
+                assert operation.model_cls is not None
+                writes.append(
+                    self._delete_write(operation.model_cls, operation.keys, namespace)
+                )
+            else:
+                assert operation.model_cls and operation.values is not None
+                writes.append(
+                    self._patch_write(
+                        operation.model_cls,
+                        operation.keys[0],
+                        operation.values,
+                        namespace,
+                    )
+                )
+        if writes:
+            await self._write_now(writes)
+
+    async def _write_now(self, writes: Sequence[_PreparedWrite]) -> None:
+        """Run prepared writes in a transaction of their own and wait for it.
+
+        Unlike _write(), this waits for the commit in write-behind mode as
+        well, so that errors such as VersionConflict reach the caller.
+        """
+
+        def _run(conn: sqlite3.Connection) -> List[ChangeEvent]:
+            events = []
+            for fn, _ in writes:
+                events.extend(fn(conn))
+            return events
+
+        try:
+            events = await self._engine.run_write(_run)
+        except VersionConflict:
+            self._version_conflicts += 1
+            raise
+        finally:
+            # Earlier write-behind writes of the rows are committed by now;
+            # fetch() must not answer from them any more
+            for _, pending in writes:
+                for row_key, _, _, _ in pending:
+                    entry = self._pending.get(row_key)
+                    if entry is not None and entry.future.done():
+                        del self._pending[row_key]
+        self.change_feed.publish(events)
+
+    def _select_sql(
+        self,
+        model_cls: Type[BaseModel],
+        namespace: str,
+        query: Dict[str, Any],
+        limit: int,
+        offset: int,
+        after: Optional[Tuple[int, str]] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> Tuple[str, List[Any]]:
+        """Build the SELECT for list() and query(), newest first.
+
+        Args:
+            model_cls: The model class to select
+            namespace: Namespace to select from
+            query: Field lookups, see luca_core.context.query
+            limit: Maximum number of rows
+            offset: Rows to skip
+            after: Only select rows that sort after this
+                ``(updated_at, key)``, i.e. keyset pagination
+            fields: Select a JSON object of these fields as ``data``, with
+                the codec ``json``, instead of the stored payload
+
+        Returns:
+            A ``(sql, params)`` tuple
+        """
+        model_type = model_cls.__name__
+        if model_type in self.indexed_fields:
+            # Partial indexes are only used when the query repeats their
+            # WHERE clause literally; indexed model types are identifiers.
+            type_clause, type_params = f"model_type = '{model_type}'", []
+        else:
+            type_clause, type_params = "model_type = ?", [model_type]
+
+        if self._legacy:
+            # Until the migration completes, read both layouts
+            source, columns = UNION_SOURCE, {}
+        else:
+            source = MODELS_TABLE
+            columns = field_columns(self.indexed_fields, model_type)
+        where, params = compile_filter(
+            query, data_column=DOCUMENT_SQL, field_columns=columns
+        )
+        # Without statistics the planner prefers idx_models_recent, which
+        # returns rows in order but has to filter the whole model type. The
+        # unary + keeps that index from serving the ORDER BY, so a filter on
+        # an indexed field is resolved with its partial index instead.
+        uses_index = any(parse_lookup(lookup)[0] in columns for lookup in query)
+        order = "+updated_at" if uses_index else "updated_at"
+        keyset, keyset_params = "", []
+        if after is not None:
+            # A row value comparison is a range on idx_models_recent
+            keyset, keyset_params = "AND (updated_at, key) < (?, ?)", list(after)
+        payload = "codec, data"
+        if fields is not None:
+            payload = f"'{JSON}' AS codec, {projection_sql(fields)} AS data"
+        sql = f"""
+            SELECT {payload}, updated_at, key
+            FROM {source}
+            WHERE namespace = ? AND {type_clause} AND ({where}) {keyset}
+            ORDER BY {order} DESC, key DESC
+            LIMIT ? OFFSET ?
+            """
+        return sql, [
+            namespace,
+            *type_params,
+            *params,
+            *keyset_params,
+            limit,
+            offset,
+        ]
+
+    def _select_models(
+        self,
+        conn: sqlite3.Connection,
+        model_cls: Type[T],
+        sql: str,
+        params: List[Any],
+    ) -> List[T]:
+        """Run a SELECT built by _select_sql() and deserialize the rows.
+
+        Runs on a reader thread. Rows that fail to deserialize are logged and
+        skipped.
+        """
+        rows = self._decode_rows(model_cls, conn.execute(sql, params))
+        return [model for _, model in rows]
 
     async def list(
         self,
@@ -272,34 +1464,11 @@ class SQLiteContextStore(BaseContextStore):
         offset: int = 0,
     ) -> List[T]:
         """List model instances of a specific type."""
-        model_type = model_cls.__name__
-
-        async with self._lock:
-            assert self.conn is not None, "Database not initialized"
-            cursor = self.conn.execute(
-                """
-                SELECT d.data
-                FROM data d
-                JOIN metadata m ON 
-                    d.namespace = m.namespace AND 
-                    d.model_type = m.model_type AND 
-                    d.key = m.key
-                WHERE d.namespace = ? AND d.model_type = ?
-                ORDER BY m.updated_at DESC
-                LIMIT ? OFFSET ?
-                """,
-                (namespace, model_type, limit, offset),
-            )
-
-            results = []
-            for row in cursor:
-                try:
-                    model = self._deserialize_model(model_cls, row["data"])
-                    results.append(model)
-                except Exception as e:
-                    logger.error(f"Error deserializing {model_type}: {e}")
-
-            return results
+        await self._wait(self._outstanding)
+        sql, params = self._select_sql(model_cls, namespace, {}, limit, offset)
+        return await self._engine.run_read(
+            lambda conn: self._select_models(conn, model_cls, sql, params)
+        )
 
     async def query(
         self,
@@ -311,23 +1480,328 @@ class SQLiteContextStore(BaseContextStore):
     ) -> List[T]:
         """Query model instances based on criteria.
 
-        This method uses simple filtering on the deserialized models, which is
-        not efficient for large datasets. A more sophisticated implementation
-        would translate the query to SQL.
+        The query dictionary is compiled to SQL (see luca_core.context.query
+        for the lookup syntax), so filtering, ordering and pagination all
+        happen in the database and only matching rows are deserialized.
+        Fields declared in ``indexed_fields`` are compared against their
+        generated column and resolved with an index seek.
         """
-        models = await self.list(model_cls, namespace, limit=1000, offset=0)
+        await self._wait(self._outstanding)
+        sql, params = self._select_sql(model_cls, namespace, query, limit, offset)
+        return await self._engine.run_read(
+            lambda conn: self._select_models(conn, model_cls, sql, params)
+        )
 
-        # Filter models based on the query
-        filtered = []
-        for model in models:
-            match = True
-            for key, value in query.items():
-                if not hasattr(model, key) or getattr(model, key) != value:
-                    match = False
-                    break
+    def _select_page(
+        self,
+        conn: sqlite3.Connection,
+        model_cls: Type[T],
+        sql: str,
+        params: List[Any],
+        limit: int,
+    ) -> Page[T]:
+        """Run a keyset SELECT for ``limit + 1`` rows and build the page.
+
+        Runs on a reader thread. Like _select_models(), rows that fail to
+        deserialize are skipped, but they still advance the cursor.
+        """
+        rows = conn.execute(sql, params).fetchall()
+        items = [model for _, model in self._decode_rows(model_cls, rows[:limit])]
+        if len(rows) <= limit:
+            return Page(items)
+        last = rows[limit - 1]
+        return Page(items, encode_keyset_cursor(last["updated_at"], last["key"]))
+
+    async def list_page(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """List one page of model instances, newest first.
+
+        Pages are keyed on ``(updated_at, key)``: each one is a range scan of
+        idx_models_recent that starts where the previous page ended, so deep
+        pages cost the same as the first.
+        """
+        return await self.query_page(model_cls, {}, namespace, limit, cursor)
+
+    async def query_page(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str = "default",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[T]:
+        """Query one page of model instances, newest first.
+
+        See list_page(). A model that is updated while the caller pages moves
+        to the front and is not returned again.
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        after = decode_keyset_cursor(cursor) if cursor is not None else None
+        await self._wait(self._outstanding)
+        sql, params = self._select_sql(model_cls, namespace, query, limit + 1, 0, after)
+        return await self._engine.run_read(
+            lambda conn: self._select_page(conn, model_cls, sql, params, limit)
+        )
+
+    async def query_sorted(
+        self,
+        model_cls: Type[T],
+        query: Dict[str, Any],
+        namespace: str = "default",
+        limit: int = 100,
+        after: Optional[Tuple[int, str]] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Tuple[Tuple[int, str], Any]]:
+        """Query model instances along with their sort keys, newest first.
+
+        Results are ``((updated_at, key), model)`` pairs; ``after`` starts
+        after a sort key, like a keyset cursor. With ``fields``, the models
+        are projections, as returned by project(). Used to merge the results
+        of several stores in list() order (see luca_core.context.sharded).
+        """
+        target: Type[BaseModel] = model_cls
+        if fields is not None:
+            fields = resolve_fields(model_cls, fields)
+            target = projection_model(model_cls, fields)
+        await self._wait(self._outstanding)
+        sql, params = self._select_sql(
+            model_cls, namespace, query, limit, 0, after, fields
+        )
+
+        def _select(conn: sqlite3.Connection) -> List[Tuple[Tuple[int, str], Any]]:
+            rows = self._decode_rows(target, conn.execute(sql, params))
+            return [((row["updated_at"], row["key"]), model) for row, model in rows]
 
-            if match:
-                filtered.append(model)
+        return await self._engine.run_read(_select)
+
+    async def project(
+        self,
+        model_cls: Type[BaseModel],
+        fields: Sequence[str],
+        query: Optional[Dict[str, Any]] = None,
+        namespace: str = "default",
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[BaseModel]:
+        """Select some fields of model instances, ordered like query().
 
-        # Apply limit and offset
-        return filtered[offset : offset + limit]
+        The fields are extracted from the stored documents in SQL, so the
+        rest of each document, a message's content say, is never parsed in
+        Python. See luca_core.context.projection.
+        """
+        fields = resolve_fields(model_cls, fields)
+        projection = projection_model(model_cls, fields)
+        await self._wait(self._outstanding)
+        sql, params = self._select_sql(
+            model_cls, namespace, query or {}, limit, offset, fields=fields
+        )
+        return await self._engine.run_read(
+            lambda conn: self._select_models(conn, projection, sql, params)
+        )
+
+    async def _aiter_rows(
+        self,
+        model_cls: Type[BaseModel],
+        namespace: str,
+        query: Optional[Dict[str, Any]],
+        batch_size: int,
+        convert: Callable[[str, Payload], Any],
+    ) -> AsyncIterator[Any]:
+        """Stream converted rows in keyset batches.
+
+        ``convert`` is called with each row's codec and data on the reader
+        thread; rows it rejects with an exception are logged and skipped.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        await self._wait(self._outstanding)
+
+        def _batch(
+            conn: sqlite3.Connection, sql: str, params: List[Any]
+        ) -> Tuple[List[Any], Optional[Tuple[int, str]]]:
+            rows = conn.execute(sql, params).fetchall()
+            items = [item for _, item in self._decode_rows(model_cls, rows, convert)]
+            if len(rows) < batch_size:
+                return items, None
+            return items, (rows[-1]["updated_at"], rows[-1]["key"])
+
+        after: Optional[Tuple[int, str]] = None
+        while True:
+            sql, params = self._select_sql(
+                model_cls, namespace, query or {}, batch_size, 0, after
+            )
+            items, after = await self._engine.run_read(
+                lambda conn: _batch(conn, sql, params)
+            )
+            for item in items:
+                yield item
+            if after is None:
+                return
+
+    async def aiter_models(
+        self,
+        model_cls: Type[T],
+        namespace: str = "default",
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[T]:
+        """Stream model instances in keyset batches, newest first.
+
+        Each batch is fetched and validated on a reader thread; rows that
+        fail validation are logged and skipped, as in list().
+        """
+        async for model in self._aiter_rows(
+            model_cls,
+            namespace,
+            query,
+            batch_size,
+            lambda codec, data: self._decode_model(model_cls, codec, data),
+        ):
+            yield model
+
+    async def aiter_raw(
+        self,
+        model_cls: Type[BaseModel],
+        namespace: str = "default",
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[str]:
+        """Stream the stored JSON documents in keyset batches, newest first.
+
+        Documents are returned without model validation: JSON rows exactly as
+        stored, rows in other codecs decoded to JSON.
+        """
+        async for data in self._aiter_rows(
+            model_cls, namespace, query, batch_size, to_json
+        ):
+            yield data
+
+    async def search_messages(
+        self, query: str, limit: int = 20, namespace: Optional[str] = None
+    ) -> List[SearchHit]:
+        """Search the full-text index, ranked by BM25.
+
+        Queries made only of words more frequent than SEARCH_MAX_RANKED rank
+        just the newest SEARCH_MAX_RANKED matches, which keeps their cost
+        independent of the size of the store. Only the store's
+        search_namespaces are searchable. Rows written
+        before their namespace became searchable are found once the
+        background backfill started by initialize() has indexed them.
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        if namespace is not None and namespace not in self.search_namespaces:
+            raise ValueError(f"Namespace is not searchable: {namespace}")
+        await self._wait(self._outstanding)
+        return await self._engine.run_read(
+            lambda conn: search(conn, query, limit, namespace, self.SEARCH_MAX_RANKED)
+        )
+
+    async def changes_since(
+        self,
+        after: int = 0,
+        limit: int = 1000,
+        namespaces: Optional[Sequence[str]] = None,
+    ) -> List[ChangeEvent]:
+        """Read the change log entries that follow sequence number ``after``.
+
+        Args:
+            after: Sequence number of the last change already seen; 0 reads
+                the log from its oldest entry
+            limit: Maximum number of entries to return
+            namespaces: Only return changes to these namespaces
+
+        Returns:
+            Change events with their ``seq``, oldest first
+
+        Raises:
+            ValueError: If the change log is not enabled
+        """
+        if self.change_log_params is None:
+            raise ValueError("The change log is not enabled for this store")
+        await self._wait(self._outstanding)
+        return await self._engine.run_read(
+            lambda conn: changes_after(conn, after, limit, namespaces)
+        )
+
+    async def tail_changes(
+        self,
+        after: int = 0,
+        namespaces: Optional[Sequence[str]] = None,
+        poll_interval: float = 1.0,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[ChangeEvent]:
+        """Stream change log entries as they are committed, forever.
+
+        Changes made through this store wake the tail at once; changes
+        committed by other processes are picked up within
+        ``poll_interval`` seconds, by a primary key range read.
+
+        Raises:
+            ValueError: If the change log is not enabled
+        """
+        while True:
+            # Taken before the read, so a publish right after it is not missed
+            published = self.change_feed.next_publish()
+            events = await self.changes_since(after, batch_size, namespaces)
+            for event in events:
+                yield event
+            if events:
+                assert events[-1].seq is not None
+                after = events[-1].seq
+            if len(events) < batch_size:
+                try:
+                    await asyncio.wait_for(published.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def record_metric(self, metric: MetricRecord) -> None:
+        """Record a performance metric in the typed metrics table."""
+        await self.record_metrics([metric])
+
+    async def record_metrics(self, metrics: Sequence[MetricRecord]) -> None:
+        """Record several metrics and update their rollups in one transaction."""
+        if not metrics:
+            return
+        # Converted on the caller's side so later mutations are not persisted
+        rows = [record_row(metric) for metric in metrics]
+        await self._write(lambda conn: insert_metrics(conn, rows))
+
+    async def get_metrics_for_task(self, task_id: str) -> List[MetricRecord]:
+        """Get the metrics recorded for a task, oldest first."""
+        await self._wait(self._outstanding)
+        return await self._engine.run_read(lambda conn: select_metrics(conn, task_id))
+
+    async def aggregate_metrics(
+        self,
+        group_by: Sequence[str] = (),
+        granularity: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+        as_arrays: bool = False,
+    ) -> Any:
+        """Aggregate metrics from their rollups.
+
+        Queries whose range starts and ends on a minute boundary read the
+        coarsest rollup that lines up, so their cost depends on the number
+        of buckets and groups rather than on the number of metrics; their
+        percentiles come from log histograms and are within 5%. Other
+        ranges scan the typed metrics table and compute exact percentiles.
+        """
+        await self._wait(self._outstanding)
+        rows = await self._engine.run_read(
+            lambda conn: aggregate_metrics(
+                conn, group_by, granularity, start, end, filters, percentiles
+            )
+        )
+        if as_arrays:
+            return to_arrays(rows, metric_columns(group_by, granularity, percentiles))
+        return rows
@@ -7,9 +7,11 @@ storage for conversations, messages, tasks, and other context data.
 
 import json
 import sqlite3
+import threading
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Type, TypeVar, Union, cast
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union, cast
 
 from pydantic import BaseModel
 
@@ -23,10 +25,38 @@ from ..schemas import (
     TaskStatus,
     UserPreferences,
 )
+from .codecs import JSON_CODEC, Payload, decode_model, resolve_codecs
+from .metrics import (
+    DEFAULT_PERCENTILES,
+    GRANULARITIES,
+    METRICS_TABLE,
+    aggregate_metrics,
+    create_metrics_schema,
+    insert_metrics,
+    metric_columns,
+    record_row,
+    rollup_table,
+    to_arrays,
+)
+from .pagination import Page, decode_keyset_cursor, encode_keyset_cursor
 
 # Type variable for generic context store methods
 T = TypeVar("T", bound=BaseModel)
 
+TABLES = (
+    "messages",
+    "conversations",
+    "tasks",
+    "task_results",
+    "projects",
+    "user_preferences",
+    "metrics",
+)
+
+# Prepared statements kept per connection; sqlite3 caches them by SQL text,
+# and the store issues a few dozen distinct statements
+STATEMENT_CACHE_SIZE = 256
+
 
 class ContextStore:
     """
@@ -35,16 +65,28 @@ class ContextStore:
     This class implements storage and retrieval of various models needed for
     maintaining context in the LUCA system. It uses SQLite as a backend for
     zero-config, ACID-compliant persistence.
+
+    Each thread gets one long-lived connection, opened on first use and kept
+    until close(), so calls skip the connection setup and reuse the
+    connection's prepared statements.
     """
 
-    def __init__(self, db_path: str = "data/context.db"):
+    def __init__(
+        self, db_path: str = "data/context.db", codecs: Optional[Dict[str, Any]] = None
+    ):
         """
         Initialize the context store with the specified database path.
 
         Args:
             db_path: Path to the SQLite database file. Default: "data/context.db"
+            codecs: Payload codec by table name (see luca_core.context.codecs);
+                other tables store JSON
         """
         self.db_path = db_path
+        self.codecs = resolve_codecs(codecs)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
         self._ensure_db_exists()
         self._setup_tables()
 
@@ -54,8 +96,33 @@ class ContextStore:
         db_dir.mkdir(parents=True, exist_ok=True)
 
     def _get_connection(self) -> sqlite3.Connection:
-        """Get a connection to the SQLite database."""
-        return sqlite3.connect(self.db_path)
+        """Get the calling thread's connection to the SQLite database."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only the owning thread uses a connection; other threads may
+            # close it in close()
+            conn = sqlite3.connect(
+                self.db_path,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False,
+            )
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """
+        Close the connections of all threads.
+
+        The store stays usable; the next call from a thread opens a new
+        connection. Do not call this while other threads use the store.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
 
     def _setup_tables(self) -> None:
         """Set up the database tables if they don't exist."""
@@ -66,6 +133,7 @@ class ContextStore:
                 CREATE TABLE IF NOT EXISTS messages (
                     id TEXT PRIMARY KEY,
                     data TEXT NOT NULL,
+                    codec TEXT NOT NULL DEFAULT 'json',
                     conversation_id TEXT,
                     timestamp REAL
                 )
@@ -77,6 +145,7 @@ class ContextStore:
                 CREATE TABLE IF NOT EXISTS conversations (
                     id TEXT PRIMARY KEY,
                     data TEXT NOT NULL,
+                    codec TEXT NOT NULL DEFAULT 'json',
                     project_id TEXT,
                     timestamp REAL
                 )
@@ -88,6 +157,7 @@ class ContextStore:
                 CREATE TABLE IF NOT EXISTS tasks (
                     id TEXT PRIMARY KEY,
                     data TEXT NOT NULL,
+                    codec TEXT NOT NULL DEFAULT 'json',
                     conversation_id TEXT,
                     status TEXT,
                     timestamp REAL
@@ -101,6 +171,7 @@ class ContextStore:
                     id TEXT PRIMARY KEY,
                     task_id TEXT NOT NULL,
                     data TEXT NOT NULL,
+                    codec TEXT NOT NULL DEFAULT 'json',
                     timestamp REAL
                 )
             """
@@ -111,6 +182,7 @@ class ContextStore:
                 CREATE TABLE IF NOT EXISTS projects (
                     id TEXT PRIMARY KEY,
                     data TEXT NOT NULL,
+                    codec TEXT NOT NULL DEFAULT 'json',
                     timestamp REAL
                 )
             """
@@ -121,6 +193,7 @@ class ContextStore:
                 CREATE TABLE IF NOT EXISTS user_preferences (
                     id TEXT PRIMARY KEY,
                     data TEXT NOT NULL,
+                    codec TEXT NOT NULL DEFAULT 'json',
                     timestamp REAL
                 )
             """
@@ -132,15 +205,31 @@ class ContextStore:
                     id TEXT PRIMARY KEY,
                     task_id TEXT NOT NULL,
                     data TEXT NOT NULL,
+                    codec TEXT NOT NULL DEFAULT 'json',
                     timestamp REAL
                 )
             """
             )
 
+            # Tables created before codecs hold JSON only
+            for table in TABLES:
+                columns = {
+                    row[1] for row in conn.execute(f"PRAGMA table_info({table})")
+                }
+                if "codec" not in columns:
+                    conn.execute(
+                        f"ALTER TABLE {table} "
+                        "ADD COLUMN codec TEXT NOT NULL DEFAULT 'json'"
+                    )
+
             # Create indices for faster lookups
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id)"
             )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_messages_conversation_time "
+                "ON messages (conversation_id, timestamp, id)"
+            )
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_tasks_conversation ON tasks (conversation_id)"
             )
@@ -157,6 +246,24 @@ class ContextStore:
                 "CREATE INDEX IF NOT EXISTS idx_metrics_task ON metrics (task_id)"
             )
 
+            # Typed metrics with rollups; metrics stored before they existed
+            # are copied over once
+            if create_metrics_schema(conn):
+                rows = conn.execute(
+                    "SELECT codec, data FROM metrics ORDER BY timestamp"
+                )
+                insert_metrics(
+                    conn,
+                    [
+                        record_row(decode_model(MetricRecord, row[0], row[1]))
+                        for row in rows
+                    ],
+                )
+
+    def _encode(self, table: str, model: BaseModel) -> Tuple[str, Payload]:
+        """Return the (codec, data) a model is stored as in a table."""
+        return self.codecs.get(table, JSON_CODEC).encode(model)
+
     def store_message(
         self, message: Message, conversation_id: Optional[str] = None
     ) -> str:
@@ -172,10 +279,10 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             conn.execute(
-                "INSERT OR REPLACE INTO messages (id, data, conversation_id, timestamp) VALUES (?, ?, ?, ?)",
+                "INSERT OR REPLACE INTO messages (id, codec, data, conversation_id, timestamp) VALUES (?, ?, ?, ?, ?)",
                 (
                     message.id,
-                    message.model_dump_json(),
+                    *self._encode("messages", message),
                     conversation_id,
                     datetime.utcnow().timestamp(),
                 ),
@@ -194,11 +301,11 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             cursor = conn.execute(
-                "SELECT data FROM messages WHERE id = ?", (message_id,)
+                "SELECT codec, data FROM messages WHERE id = ?", (message_id,)
             )
             row = cursor.fetchone()
             if row:
-                return Message.model_validate_json(row[0])
+                return decode_model(Message, row[0], row[1])
             return None
 
     def store_conversation(self, conversation: Conversation) -> str:
@@ -213,10 +320,10 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             conn.execute(
-                "INSERT OR REPLACE INTO conversations (id, data, project_id, timestamp) VALUES (?, ?, ?, ?)",
+                "INSERT OR REPLACE INTO conversations (id, codec, data, project_id, timestamp) VALUES (?, ?, ?, ?, ?)",
                 (
                     conversation.id,
-                    conversation.model_dump_json(),
+                    *self._encode("conversations", conversation),
                     conversation.project_id,
                     datetime.utcnow().timestamp(),
                 ),
@@ -235,11 +342,11 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             cursor = conn.execute(
-                "SELECT data FROM conversations WHERE id = ?", (conversation_id,)
+                "SELECT codec, data FROM conversations WHERE id = ?", (conversation_id,)
             )
             row = cursor.fetchone()
             if row:
-                return Conversation.model_validate_json(row[0])
+                return decode_model(Conversation, row[0], row[1])
             return None
 
     def store_task(self, task: Task, conversation_id: Optional[str] = None) -> str:
@@ -255,10 +362,10 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             conn.execute(
-                "INSERT OR REPLACE INTO tasks (id, data, conversation_id, status, timestamp) VALUES (?, ?, ?, ?, ?)",
+                "INSERT OR REPLACE INTO tasks (id, codec, data, conversation_id, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
                 (
                     task.id,
-                    task.model_dump_json(),
+                    *self._encode("tasks", task),
                     conversation_id,
                     task.status,
                     datetime.utcnow().timestamp(),
@@ -277,10 +384,12 @@ class ContextStore:
             The task if found, None otherwise
         """
         with self._get_connection() as conn:
-            cursor = conn.execute("SELECT data FROM tasks WHERE id = ?", (task_id,))
+            cursor = conn.execute(
+                "SELECT codec, data FROM tasks WHERE id = ?", (task_id,)
+            )
             row = cursor.fetchone()
             if row:
-                return Task.model_validate_json(row[0])
+                return decode_model(Task, row[0], row[1])
             return None
 
     def store_task_result(self, result: TaskResult) -> str:
@@ -295,11 +404,11 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             conn.execute(
-                "INSERT OR REPLACE INTO task_results (id, task_id, data, timestamp) VALUES (?, ?, ?, ?)",
+                "INSERT OR REPLACE INTO task_results (id, task_id, codec, data, timestamp) VALUES (?, ?, ?, ?, ?)",
                 (
                     f"result_{result.task_id}",
                     result.task_id,
-                    result.model_dump_json(),
+                    *self._encode("task_results", result),
                     datetime.utcnow().timestamp(),
                 ),
             )
@@ -317,11 +426,11 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             cursor = conn.execute(
-                "SELECT data FROM task_results WHERE task_id = ?", (task_id,)
+                "SELECT codec, data FROM task_results WHERE task_id = ?", (task_id,)
             )
             row = cursor.fetchone()
             if row:
-                return TaskResult.model_validate_json(row[0])
+                return decode_model(TaskResult, row[0], row[1])
             return None
 
     def store_project(self, project: Project) -> str:
@@ -336,8 +445,12 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             conn.execute(
-                "INSERT OR REPLACE INTO projects (id, data, timestamp) VALUES (?, ?, ?)",
-                (project.id, project.model_dump_json(), datetime.utcnow().timestamp()),
+                "INSERT OR REPLACE INTO projects (id, codec, data, timestamp) VALUES (?, ?, ?, ?)",
+                (
+                    project.id,
+                    *self._encode("projects", project),
+                    datetime.utcnow().timestamp(),
+                ),
             )
         return project.id
 
@@ -353,11 +466,11 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             cursor = conn.execute(
-                "SELECT data FROM projects WHERE id = ?", (project_id,)
+                "SELECT codec, data FROM projects WHERE id = ?", (project_id,)
             )
             row = cursor.fetchone()
             if row:
-                return Project.model_validate_json(row[0])
+                return decode_model(Project, row[0], row[1])
             return None
 
     def store_user_preferences(
@@ -375,8 +488,12 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             conn.execute(
-                "INSERT OR REPLACE INTO user_preferences (id, data, timestamp) VALUES (?, ?, ?)",
-                (user_id, preferences.model_dump_json(), datetime.utcnow().timestamp()),
+                "INSERT OR REPLACE INTO user_preferences (id, codec, data, timestamp) VALUES (?, ?, ?, ?)",
+                (
+                    user_id,
+                    *self._encode("user_preferences", preferences),
+                    datetime.utcnow().timestamp(),
+                ),
             )
         return user_id
 
@@ -392,11 +509,11 @@ class ContextStore:
         """
         with self._get_connection() as conn:
             cursor = conn.execute(
-                "SELECT data FROM user_preferences WHERE id = ?", (user_id,)
+                "SELECT codec, data FROM user_preferences WHERE id = ?", (user_id,)
             )
             row = cursor.fetchone()
             if row:
-                return UserPreferences.model_validate_json(row[0])
+                return decode_model(UserPreferences, row[0], row[1])
             return UserPreferences(
                 user_id=user_id
             )  # Return default preferences if not found
@@ -405,25 +522,65 @@ class ContextStore:
         """
         Store a metric record in the context store.
 
+        The record is also added to the typed metrics table and its rollups
+        in the same transaction; see aggregate_metrics().
+
         Args:
             metric: The metric record to store
 
         Returns:
             The ID of the stored metric record
         """
-        metric_id = f"metric_{metric.task_id}_{datetime.utcnow().timestamp()}"
+        metric_id = f"metric_{uuid.uuid4().hex}"
         with self._get_connection() as conn:
             conn.execute(
-                "INSERT INTO metrics (id, task_id, data, timestamp) VALUES (?, ?, ?, ?)",
+                "INSERT INTO metrics (id, task_id, codec, data, timestamp) VALUES (?, ?, ?, ?, ?)",
                 (
                     metric_id,
                     metric.task_id,
-                    metric.model_dump_json(),
+                    *self._encode("metrics", metric),
                     datetime.utcnow().timestamp(),
                 ),
             )
+            insert_metrics(conn, [record_row(metric)])
         return metric_id
 
+    def aggregate_metrics(
+        self,
+        group_by: Tuple[str, ...] = (),
+        granularity: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        percentiles: Tuple[float, ...] = DEFAULT_PERCENTILES,
+        as_arrays: bool = False,
+    ) -> Any:
+        """
+        Aggregate the stored metrics from their rollups.
+
+        Takes the same options and returns the same rows as
+        BaseContextStore.aggregate_metrics().
+
+        Args:
+            group_by: Fields to group by (agent_id, domain, learning_mode)
+            granularity: Time bucket, "minute", "hour" or "day", or None
+            start: Earliest timestamp included
+            end: Timestamp the range ends before
+            filters: Values to keep per field
+            percentiles: Latency percentiles to compute
+            as_arrays: Return a dict of NumPy arrays instead of a list of dicts
+
+        Returns:
+            The aggregate rows, or arrays
+        """
+        with self._get_connection() as conn:
+            rows = aggregate_metrics(
+                conn, group_by, granularity, start, end, filters, percentiles
+            )
+        if as_arrays:
+            return to_arrays(rows, metric_columns(group_by, granularity, percentiles))
+        return rows
+
     def get_metrics_for_task(self, task_id: str) -> List[MetricRecord]:
         """
         Retrieve all metric records for a task.
@@ -437,10 +594,10 @@ class ContextStore:
         metrics = []
         with self._get_connection() as conn:
             cursor = conn.execute(
-                "SELECT data FROM metrics WHERE task_id = ?", (task_id,)
+                "SELECT codec, data FROM metrics WHERE task_id = ?", (task_id,)
             )
             for row in cursor:
-                metrics.append(MetricRecord.model_validate_json(row[0]))
+                metrics.append(decode_model(MetricRecord, row[0], row[1]))
         return metrics
 
     def get_conversation_messages(self, conversation_id: str) -> List[Message]:
@@ -456,13 +613,58 @@ class ContextStore:
         messages = []
         with self._get_connection() as conn:
             cursor = conn.execute(
-                "SELECT data FROM messages WHERE conversation_id = ? ORDER BY timestamp",
+                "SELECT codec, data FROM messages WHERE conversation_id = ? ORDER BY timestamp",
                 (conversation_id,),
             )
             for row in cursor:
-                messages.append(Message.model_validate_json(row[0]))
+                messages.append(decode_model(Message, row[0], row[1]))
         return messages
 
+    def get_conversation_messages_page(
+        self,
+        conversation_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page[Message]:
+        """
+        Retrieve one page of messages for a conversation.
+
+        Pages are keyed on (timestamp, id), so every page is a range scan of
+        idx_messages_conversation_time and deep pages cost the same as the
+        first.
+
+        Args:
+            conversation_id: The ID of the conversation
+            limit: Maximum number of messages to return
+            cursor: next_cursor of the previous page, None for the first page
+
+        Returns:
+            A page of messages ordered by timestamp
+
+        Raises:
+            ValueError: If the cursor is invalid or limit is not positive
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        sql = (
+            "SELECT codec, data, timestamp, id FROM messages WHERE conversation_id = ?"
+        )
+        params: List[Any] = [conversation_id]
+        if cursor is not None:
+            sql += " AND (timestamp, id) > (?, ?)"
+            params.extend(decode_keyset_cursor(cursor))
+        sql += " ORDER BY timestamp, id LIMIT ?"
+        params.append(limit + 1)
+
+        with self._get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        page = Page([decode_model(Message, row[0], row[1]) for row in rows[:limit]])
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            page.next_cursor = encode_keyset_cursor(last[2], last[3])
+        return page
+
     def get_project_conversations(self, project_id: str) -> List[Conversation]:
         """
         Retrieve all conversations for a project.
@@ -476,11 +678,11 @@ class ContextStore:
         conversations = []
         with self._get_connection() as conn:
             cursor = conn.execute(
-                "SELECT data FROM conversations WHERE project_id = ? ORDER BY timestamp",
+                "SELECT codec, data FROM conversations WHERE project_id = ? ORDER BY timestamp",
                 (project_id,),
             )
             for row in cursor:
-                conversations.append(Conversation.model_validate_json(row[0]))
+                conversations.append(decode_model(Conversation, row[0], row[1]))
         return conversations
 
     def get_active_tasks(self) -> List[Task]:
@@ -494,13 +696,13 @@ class ContextStore:
         with self._get_connection() as conn:
             cursor = conn.execute(
                 """
-                SELECT data FROM tasks 
+                SELECT codec, data FROM tasks 
                 WHERE status IN ('pending', 'in_progress') 
                 ORDER BY status, timestamp
                 """
             )
             for row in cursor:
-                task = Task.model_validate_json(row[0])
+                task = decode_model(Task, row[0], row[1])
                 tasks.append(task)
 
         # Sort by created_at since Task doesn't have priority field
@@ -510,6 +712,9 @@ class ContextStore:
         """
         Update the status of a task.
 
+        JSON rows are patched in place with json_set(); rows stored with
+        other codecs are decoded and rewritten in the same transaction.
+
         Args:
             task_id: The ID of the task to update
             status: The new status ("pending", "in_progress", "completed", or "failed")
@@ -517,14 +722,34 @@ class ContextStore:
         Returns:
             True if the task was updated, False if the task was not found
         """
-        task = self.get_task(task_id)
-        if not task:
-            return False
-
-        # Update the task status directly since update_status method doesn't exist
-        task.status = TaskStatus(status)
-        task.updated_at = datetime.utcnow()
-        self.store_task(task)
+        status = TaskStatus(status).value
+        now = datetime.utcnow()
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE tasks
+                SET status = ?, timestamp = ?,
+                    data = json_set(data, '$.status', ?, '$.updated_at', ?)
+                WHERE id = ? AND codec = 'json'
+                """,
+                (status, now.timestamp(), status, now.isoformat(), task_id),
+            )
+            if cursor.rowcount:
+                return True
+
+            row = conn.execute(
+                "SELECT codec, data FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            task = decode_model(Task, row[0], row[1])
+            task.status = TaskStatus(status)
+            task.updated_at = now
+            conn.execute(
+                "UPDATE tasks SET codec = ?, data = ?, status = ?, timestamp = ? "
+                "WHERE id = ?",
+                (*self._encode("tasks", task), status, now.timestamp(), task_id),
+            )
         return True
 
     def clear_all_data(self) -> None:
@@ -539,3 +764,6 @@ class ContextStore:
             conn.execute("DELETE FROM projects")
             conn.execute("DELETE FROM user_preferences")
             conn.execute("DELETE FROM metrics")
+            conn.execute(f"DELETE FROM {METRICS_TABLE}")
+            for granularity in GRANULARITIES:
+                conn.execute(f"DELETE FROM {rollup_table(granularity)}")
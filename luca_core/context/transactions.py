@@ -0,0 +1,165 @@
+"""Transactions of a context store.
+
+BaseContextStore.transact() collects writes and applies them together when
+its block exits::
+
+    async with store.transact() as transaction:
+        transaction.store(result, namespace="task_results")
+        transaction.patch(Task, result.task_id, {"status": "completed"}, "tasks")
+
+The writes are applied in order once the block exits, and models are
+serialized then; reads inside the block do not see them. If the block
+raises, nothing is written.
+
+Besides the store's own write methods, a transaction can patch() a stored
+model: set some of its fields without reading it first. The values are
+validated against the model's field types up front, and the SQLite store
+then changes the JSON document in SQL.
+
+How atomic a transaction is depends on the backend. The SQLite store
+commits it as one transaction of its writer, and the log store appends it
+with no other write in between; an update with an ``expected_version``
+that conflicts then raises VersionConflict and nothing is written. The
+sharded store commits once per database the transaction touches, and
+BaseContextStore's default applies the operations one by one.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+from luca_core.context.changes import DELETE, STORE, UPDATE
+from luca_core.context.projection import projection_model, resolve_fields
+from luca_core.context.sqlite_schema import RowKey
+
+PATCH = "patch"
+
+
+def validate_patch(model_cls: Type[BaseModel], values: Dict[str, Any]) -> BaseModel:
+    """Validate patched values against the types of their fields.
+
+    Returns:
+        The projection of ``model_cls`` (see luca_core.context.projection)
+        holding the values
+
+    Raises:
+        ValueError: If a field is not on the model
+        pydantic.ValidationError: If a value does not fit its field
+    """
+    fields = resolve_fields(model_cls, tuple(values))
+    return projection_model(model_cls, fields).model_validate(values)
+
+
+@dataclass(frozen=True)
+class Operation:
+    """One write of a transaction.
+
+    ``models`` are written by stores and updates, ``keys`` name the models
+    deleted or patched, and ``values`` holds a patch's validated fields.
+    """
+
+    kind: str
+    namespace: str
+    models: Tuple[BaseModel, ...] = ()
+    model_cls: Optional[Type[BaseModel]] = None
+    keys: Tuple[str, ...] = ()
+    values: Optional[BaseModel] = None
+    expected_version: Optional[int] = None
+
+    def row_keys(self, model_key: Callable[[BaseModel], str]) -> List[RowKey]:
+        """Return the rows the operation writes."""
+        if self.models:
+            return [
+                (self.namespace, type(model).__name__, model_key(model))
+                for model in self.models
+            ]
+        assert self.model_cls is not None
+        return [(self.namespace, self.model_cls.__name__, key) for key in self.keys]
+
+
+class Transaction:
+    """Writes collected by BaseContextStore.transact()."""
+
+    def __init__(self) -> None:
+        self.operations: List[Operation] = []
+
+    def store(self, model: BaseModel, namespace: str = "default") -> None:
+        """Store a model instance."""
+        self.store_many([model], namespace)
+
+    def store_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Store several model instances."""
+        if models:
+            self.operations.append(Operation(STORE, namespace, tuple(models)))
+
+    def update(
+        self,
+        model: BaseModel,
+        namespace: str = "default",
+        expected_version: Optional[int] = None,
+    ) -> None:
+        """Update an existing model instance, optionally compare-and-swap."""
+        self.operations.append(
+            Operation(UPDATE, namespace, (model,), expected_version=expected_version)
+        )
+
+    def update_many(
+        self, models: Sequence[BaseModel], namespace: str = "default"
+    ) -> None:
+        """Update several existing model instances."""
+        if models:
+            self.operations.append(Operation(UPDATE, namespace, tuple(models)))
+
+    def delete(
+        self, model_cls: Type[BaseModel], key: str, namespace: str = "default"
+    ) -> None:
+        """Delete a model instance."""
+        self.delete_many(model_cls, [key], namespace)
+
+    def delete_many(
+        self,
+        model_cls: Type[BaseModel],
+        keys: Sequence[str],
+        namespace: str = "default",
+    ) -> None:
+        """Delete several model instances."""
+        if keys:
+            self.operations.append(
+                Operation(DELETE, namespace, model_cls=model_cls, keys=tuple(keys))
+            )
+
+    def patch(
+        self,
+        model_cls: Type[BaseModel],
+        key: str,
+        values: Dict[str, Any],
+        namespace: str = "default",
+    ) -> None:
+        """Set fields of a stored model; ignored if it is not stored.
+
+        Raises:
+            ValueError: If a field is not on the model
+            pydantic.ValidationError: If a value does not fit its field
+        """
+        self.operations.append(
+            Operation(
+                PATCH,
+                namespace,
+                model_cls=model_cls,
+                keys=(key,),
+                values=validate_patch(model_cls, values),
+            )
+        )
+
+    def row_keys(self, model_key: Callable[[BaseModel], str]) -> List[RowKey]:
+        """Return the rows the transaction writes, in order."""
+        return list(
+            dict.fromkeys(
+                row_key
+                for operation in self.operations
+                for row_key in operation.row_keys(model_key)
+            )
+        )
@@ -0,0 +1,513 @@
+"""Memory-mapped vector index with top-k cosine search.
+
+The index is a directory of flat files, kept next to the context database:
+
+    meta.json        # dim, embedder name, coarse quantizer settings
+    vectors.f32      # float32 rows, L2-normalised, memory-mapped
+    keys.txt         # one JSON-encoded key per row, in row order
+    quantizer.npz    # coarse quantizer centre and centroids, once trained
+    lists.i32        # centroid of every row, memory-mapped
+
+Adding a vector writes its row (and centroid) first and appends its key
+last, so the key file is the commit record: rows beyond the last complete
+key line are ignored when the index is opened, and a crash never exposes a
+half-written vector. Re-adding a key overwrites its row in place. The
+index holds derived data and is not fsynced; MessageRecall.sync() rebuilds
+anything lost.
+
+Search is exact by default: the query is scored against every row in
+blocks of ``block_rows`` with one matrix product each, keeping only a
+running top k, so memory stays flat however large the index grows.
+
+For large corpora, ``coarse_above`` enables an inverted-file (IVF) coarse
+quantizer. Once the index holds that many rows, spherical k-means on a
+sample learns about sqrt(rows) centroids and every row is filed under its
+nearest one. Vectors are clustered relative to their mean: text embeddings
+share a large common component (frequent words), and without centring most
+rows would crowd into a few huge lists. A search then scores only the rows
+filed under the ``probes`` centroids nearest the query, trading a little
+recall for scanning a small fraction of the index. The quantizer is
+retrained when the index has grown fourfold since the last training.
+Training runs in a background thread; searches stay exact (or use the
+previous quantizer) until it finishes.
+
+Needs the optional ``numpy`` package.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from luca_core.context.embeddings import np, require_numpy
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+INITIAL_CAPACITY = 1024
+
+# Rows of the training sample per centroid, and k-means iterations
+TRAIN_SAMPLE_PER_LIST = 64
+TRAIN_ITERATIONS = 8
+RETRAIN_GROWTH = 4
+
+
+class VectorIndex:
+    """Persistent index of unit vectors keyed by string.
+
+    Methods are thread-safe and blocking; async callers run them in a
+    worker thread.
+
+    Args:
+        path: Directory holding the index files
+        dim: Vector dimension
+        embedder_name: Identity of the embedding space; an index built for
+            another name or dimension is discarded
+        block_rows: Rows scored per matrix product in exact search
+        coarse_above: Rows at which the coarse quantizer is trained,
+            None for exact search only
+        probes: Centroids searched per query once the quantizer is trained
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        dim: int,
+        embedder_name: str = "",
+        block_rows: int = 65536,
+        coarse_above: Optional[int] = None,
+        probes: int = 16,
+    ):
+        require_numpy()
+        if dim < 1:
+            raise ValueError("dim must be positive")
+        if block_rows < 1:
+            raise ValueError("block_rows must be positive")
+        if coarse_above is not None and coarse_above < 1:
+            raise ValueError("coarse_above must be positive")
+        if probes < 1:
+            raise ValueError("probes must be positive")
+        self.path = Path(path)
+        self.dim = dim
+        self.embedder_name = embedder_name
+        self.block_rows = block_rows
+        self.coarse_above = coarse_above
+        self.probes = probes
+
+        self._lock = threading.RLock()
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._capacity = 0
+        self._vectors: Optional["np.memmap"] = None
+        self._assignments: Optional["np.memmap"] = None
+        self._center: Optional["np.ndarray"] = None
+        self._centroids: Optional["np.ndarray"] = None
+        self._trained_rows = 0
+        # Rows grouped by centroid: _order[_offsets[c]:_offsets[c + 1]] are
+        # the rows filed under centroid c, for rows below _listed_rows
+        self._order: Optional["np.ndarray"] = None
+        self._offsets: Optional["np.ndarray"] = None
+        self._listed_rows = 0
+        # Rows written while train() runs, and the background training run
+        self._replaced: Optional[set] = None
+        self._trainer: Optional[threading.Thread] = None
+        self._open()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows
+
+    @property
+    def trained(self) -> bool:
+        """Whether searches go through the coarse quantizer."""
+        return self._centroids is not None
+
+    # Files
+
+    def _file(self, name: str) -> Path:
+        return self.path / name
+
+    def _open(self) -> None:
+        """Load the index from disk, or start an empty one."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta = self._read_meta()
+        expected = {"dim": self.dim, "embedder": self.embedder_name}
+        if meta is not None and any(meta.get(k) != v for k, v in expected.items()):
+            logger.warning(
+                "Discarding vector index %s built for %s:%s",
+                self.path,
+                meta.get("embedder"),
+                meta.get("dim"),
+            )
+            meta = None
+        if meta is None or meta.get("version") != FORMAT_VERSION:
+            self._reset()
+            return
+
+        vectors_file = self._file("vectors.f32")
+        try:
+            capacity = vectors_file.stat().st_size // (self.dim * 4)
+            keys = self._read_keys(capacity)
+        except (OSError, ValueError) as e:
+            logger.warning("Discarding unreadable vector index %s: %s", self.path, e)
+            self._reset()
+            return
+        self._keys = keys
+        self._rows = {key: row for row, key in enumerate(keys)}
+        self._map(max(capacity, INITIAL_CAPACITY))
+
+        quantizer_file = self._file("quantizer.npz")
+        if meta.get("trained_rows") and quantizer_file.exists():
+            with np.load(quantizer_file) as quantizer:
+                self._center = quantizer["center"]
+                self._centroids = quantizer["centroids"]
+            self._trained_rows = meta["trained_rows"]
+            self._map_assignments()
+            self._build_lists()
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._file("meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Unreadable vector index metadata in %s: %s", self.path, e)
+            return None
+
+    def _write_meta(self) -> None:
+        meta = {
+            "version": FORMAT_VERSION,
+            "dim": self.dim,
+            "embedder": self.embedder_name,
+            "trained_rows": self._trained_rows,
+        }
+        tmp = self._file("meta.json.tmp")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, self._file("meta.json"))
+
+    def _read_keys(self, limit: int) -> List[str]:
+        """Read up to ``limit`` keys, cutting off any unfinished append."""
+        path = self._file("keys.txt")
+        with open(path, "rb") as f:
+            lines = f.read().split(b"\n")
+        # The last element is empty after a complete final line, or the
+        # unfinished line of an interrupted append
+        lines = lines[: min(limit, len(lines) - 1)]
+        size = sum(len(line) + 1 for line in lines)
+        if path.stat().st_size != size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+        return [json.loads(line) for line in lines]
+
+    def _reset(self) -> None:
+        """Replace whatever is on disk with an empty index."""
+        self._close_maps()
+        for name in ("vectors.f32", "keys.txt", "quantizer.npz", "lists.i32"):
+            self._file(name).unlink(missing_ok=True)
+        self._keys = []
+        self._rows = {}
+        self._center = self._centroids = None
+        self._trained_rows = 0
+        self._order = self._offsets = None
+        self._listed_rows = 0
+        self._file("keys.txt").touch()
+        self._capacity = 0
+        self._map(INITIAL_CAPACITY)
+        self._write_meta()
+
+    def _map(self, capacity: int) -> None:
+        """Map the vector file, growing it to ``capacity`` rows."""
+        self._vectors = self._grow_file("vectors.f32", "float32", capacity, self.dim)
+        self._capacity = capacity
+        if self._centroids is not None:
+            self._map_assignments()
+
+    def _map_assignments(self) -> None:
+        self._assignments = self._grow_file("lists.i32", "int32", self._capacity)
+
+    def _grow_file(self, name: str, dtype: str, rows: int, width: int = 1):
+        path = self._file(name)
+        size = rows * width * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        shape = (rows, width) if width > 1 else (rows,)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _close_maps(self) -> None:
+        for array in (self._vectors, self._assignments):
+            if array is not None:
+                array.flush()
+        self._vectors = self._assignments = None
+
+    def close(self) -> None:
+        """Wait for background training, then flush and release the maps."""
+        trainer = self._trainer
+        if trainer is not None:
+            trainer.join()
+        with self._lock:
+            self._close_maps()
+
+    # Writes
+
+    def add(self, keys: Sequence[str], vectors: "np.ndarray") -> None:
+        """Add or replace vectors.
+
+        Vectors are normalised on the way in, so search scores are cosine
+        similarities whatever the embedder returns.
+
+        Args:
+            keys: Key of every vector; existing keys are overwritten
+            vectors: A ``(len(keys), dim)`` array
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) != len(keys):
+            raise ValueError("Expected one vector per key")
+        if not len(keys):
+            return
+        latest = dict(zip(keys, range(len(keys))))
+        keys = list(latest)
+        vectors = vectors[list(latest.values())]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+        with self._lock:
+            rows = []
+            new_keys = []
+            for key in keys:
+                row = self._rows.get(key)
+                if row is None:
+                    row = len(self._keys) + len(new_keys)
+                    new_keys.append(key)
+                rows.append(row)
+            needed = len(self._keys) + len(new_keys)
+            if needed > self._capacity:
+                capacity = self._capacity
+                while capacity < needed:
+                    capacity *= 2
+                self._map(capacity)
+
+            self._vectors[rows] = vectors
+            if self._replaced is not None:
+                self._replaced.update(rows)
+            if self._centroids is not None:
+                self._assignments[rows] = self._assign(vectors)
+                if min(rows) < self._listed_rows:
+                    # A replaced vector may have moved to another list
+                    self._build_lists()
+            if new_keys:
+                with open(self._file("keys.txt"), "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(key) + "\n" for key in new_keys))
+                for key in new_keys:
+                    self._rows[key] = len(self._keys)
+                    self._keys.append(key)
+
+            if (
+                self.coarse_above is not None
+                and self._trainer is None
+                and len(self._keys)
+                >= max(self.coarse_above, self._trained_rows * RETRAIN_GROWTH)
+            ):
+                # Training takes seconds on large indexes; keep it off the
+                # caller's path
+                self._trainer = threading.Thread(
+                    target=self._train_in_background,
+                    name="vector-index-train",
+                    daemon=True,
+                )
+                self._trainer.start()
+
+    # Coarse quantizer
+
+    def train(self, lists: Optional[int] = None, seed: int = 0) -> None:
+        """Train the coarse quantizer on the current rows.
+
+        The clustering and the filing of existing rows run without the
+        lock, so adds and searches carry on meanwhile; rows added or
+        replaced in the meantime are filed when the new quantizer is
+        swapped in.
+
+        Args:
+            lists: Number of centroids; defaults to sqrt(rows)
+            seed: Seed for the sample and initial centroids
+        """
+        with self._lock:
+            count = len(self._keys)
+            vectors = self._vectors
+            self._replaced = set()
+        if not count:
+            return
+        lists = min(count, lists or max(1, int(math.sqrt(count))))
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, lists * TRAIN_SAMPLE_PER_LIST)
+        sample = np.sort(rng.choice(count, sample_size, replace=False))
+        data = np.asarray(vectors[sample])
+        center = data.mean(axis=0)
+        data -= center
+        data /= np.maximum(np.linalg.norm(data, axis=1, keepdims=True), 1e-12)
+
+        centroids = data[rng.choice(len(data), lists, replace=False)]
+        for _ in range(TRAIN_ITERATIONS):
+            nearest = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, data)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        center = center.astype(np.float32)
+        centroids = centroids.astype(np.float32)
+
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, self.block_rows):
+            stop = min(count, start + self.block_rows)
+            assignments[start:stop] = self._assign(
+                vectors[start:stop], center, centroids
+            )
+
+        with self._lock:
+            replaced, self._replaced = self._replaced, None
+            if self._vectors is None:  # Closed meanwhile
+                return
+            self._center, self._centroids = center, centroids
+            self._map_assignments()
+            self._assignments[:count] = assignments
+            late = sorted(replaced.union(range(count, len(self._keys))))
+            if late:
+                self._assignments[late] = self._assign(self._vectors[late])
+            with open(self._file("quantizer.npz"), "wb") as f:
+                np.savez(f, center=center, centroids=centroids)
+            self._trained_rows = count
+            self._write_meta()
+            self._build_lists()
+        logger.info("Trained %d coarse lists over %d vectors", lists, count)
+
+    def _train_in_background(self) -> None:
+        try:
+            self.train()
+        except Exception:
+            logger.exception("Training the coarse quantizer of %s failed", self.path)
+        finally:
+            with self._lock:
+                self._trainer = None
+
+    def _assign(
+        self,
+        vectors: "np.ndarray",
+        center: Optional["np.ndarray"] = None,
+        centroids: Optional["np.ndarray"] = None,
+    ) -> "np.ndarray":
+        """Return the nearest centroid of every vector."""
+        if centroids is None:
+            center, centroids = self._center, self._centroids
+        scores = (vectors - center) @ centroids.T
+        return np.argmax(scores, axis=1).astype(np.int32)
+
+    def _build_lists(self) -> None:
+        """Group the rows by centroid for probing."""
+        count = len(self._keys)
+        assignments = np.asarray(self._assignments[:count])
+        self._order = np.argsort(assignments, kind="stable")
+        self._offsets = np.zeros(len(self._centroids) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(assignments, minlength=len(self._centroids)),
+            out=self._offsets[1:],
+        )
+        self._listed_rows = count
+
+    def _probe(self, queries: "np.ndarray", probes: int) -> "np.ndarray":
+        """Return the sorted rows filed under the centroids nearest any query."""
+        count = len(self._keys)
+        # Regroup once the rows added since the last grouping are many
+        if count - self._listed_rows > max(1024, self._listed_rows // 16):
+            self._build_lists()
+        scores = (queries - self._center) @ self._centroids.T
+        probes = min(probes, len(self._centroids))
+        nearest = np.unique(np.argpartition(-scores, probes - 1, axis=1)[:, :probes])
+        parts = [self._order[self._offsets[c] : self._offsets[c + 1]] for c in nearest]
+        if count > self._listed_rows:
+            tail = np.arange(self._listed_rows, count)
+            parts.append(
+                tail[np.isin(self._assignments[self._listed_rows : count], nearest)]
+            )
+        return np.sort(np.concatenate(parts))
+
+    # Search
+
+    def search(
+        self, query: "np.ndarray", k: int = 10, probes: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """Return the ``k`` keys most similar to a query vector.
+
+        Args:
+            query: A ``(dim,)`` vector
+            k: Number of results
+            probes: Centroids to search, overriding the index default;
+                ignored before the quantizer is trained
+
+        Returns:
+            ``(key, cosine similarity)`` pairs, most similar first
+        """
+        return self.search_many(np.asarray(query).reshape(1, -1), k, probes)[0]
+
+    def search_many(
+        self, queries: "np.ndarray", k: int = 10, probes: Optional[int] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """Return the top ``k`` keys for every row of ``queries``.
+
+        Scoring several queries together shares each pass over the
+        vectors between them.
+        """
+        if k < 1:
+            raise ValueError("k must be positive")
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+
+        with self._lock:
+            count = len(self._keys)
+            if self._centroids is not None:
+                candidates = self._probe(queries, probes or self.probes)
+                blocks = (
+                    (candidates[i : i + self.block_rows], None)
+                    for i in range(0, len(candidates), self.block_rows)
+                )
+            else:
+                blocks = (
+                    (None, slice(i, min(count, i + self.block_rows)))
+                    for i in range(0, count, self.block_rows)
+                )
+
+            best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            for rows, span in blocks:
+                if rows is None:
+                    block = self._vectors[span]
+                    rows = np.arange(span.start, span.stop)
+                else:
+                    block = self._vectors[rows]
+                scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+                all_rows = np.concatenate(
+                    [best_rows, np.broadcast_to(rows, (len(queries), len(rows)))],
+                    axis=1,
+                )
+                if scores.shape[1] > k:
+                    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                    scores = np.take_along_axis(scores, top, axis=1)
+                    all_rows = np.take_along_axis(all_rows, top, axis=1)
+                best_scores, best_rows = scores, all_rows
+
+            results = []
+            for scores, rows, norm in zip(best_scores, best_rows, norms[:, 0]):
+                if not norm:
+                    # A query with no features is similar to nothing
+                    results.append([])
+                    continue
+                order = np.argsort(-scores, kind="stable")
+                results.append([(self._keys[rows[i]], float(scores[i])) for i in order])
+            return results
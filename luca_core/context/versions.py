@@ -0,0 +1,72 @@
+"""Model versions and optimistic concurrency for context stores.
+
+Stores that support versioning give every stored model a version number:
+1 when it is first stored, one more on every store or update. A
+compare-and-swap update only applies if the stored version is still the one
+the caller read, so processes sharing a database can change the same model
+without a lock: the losers of a race get a VersionConflict instead of
+silently overwriting the winner::
+
+    current = await store.fetch_versioned(Task, task_id, namespace="tasks")
+    current.model.status = TaskStatus.RUNNING
+    await store.update(current.model, "tasks", expected_version=current.version)
+
+BaseContextStore.modify() wraps this read-modify-write cycle and retries it
+on conflicts. Checking the version costs nothing more than the update
+itself, and a conflict is reported without decoding the stored model.
+
+A model that is deleted and stored again starts over at version 1.
+"""
+
+import random
+from typing import Generic, NamedTuple, Optional, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+# Attempts of a read-modify-write cycle before a conflict is raised
+DEFAULT_ATTEMPTS = 5
+# First retry delay in seconds; it doubles on every attempt, with jitter
+RETRY_BASE_DELAY = 0.005
+
+
+class Versioned(NamedTuple, Generic[T]):
+    """A model with the version it was read at."""
+
+    model: T
+    # None for backends that do not track versions
+    version: Optional[int]
+
+
+class VersionConflict(Exception):
+    """Raised by an update whose expected version is no longer stored."""
+
+    def __init__(
+        self,
+        namespace: str,
+        model_type: str,
+        key: str,
+        expected: int,
+        actual: Optional[int],
+    ):
+        self.namespace = namespace
+        self.model_type = model_type
+        self.key = key
+        self.expected = expected
+        # None if the model was deleted
+        self.actual = actual
+        found = f"version {actual}" if actual is not None else "no model"
+        super().__init__(
+            f"Expected version {expected} of {model_type} {key!r} in "
+            f"{namespace!r}, found {found}"
+        )
+
+
+def retry_delay(attempt: int) -> float:
+    """Return the pause in seconds before retrying after ``attempt`` failed.
+
+    Full jitter spreads out processes that conflicted with each other, so
+    they do not collide again on the retry.
+    """
+    return random.uniform(0, RETRY_BASE_DELAY * 2**attempt)
@@ -0,0 +1,226 @@
+"""Token-budgeted context windows for agent prompts.
+
+ContextAssembler picks what goes into a prompt so that it fits a token
+budget, in priority order:
+
+1. the agent's system prompt and the request itself, which must fit;
+2. tool specifications, in the agent's order, within ``tool_share`` of the
+   budget;
+3. retrieved messages (semantic recall), most relevant first, within
+   ``retrieved_share`` of what is left;
+4. recent messages, newest first, in whatever remains. Recent history is
+   kept contiguous: the first message that does not fit ends it.
+
+Budget left over by recent history goes back to retrieved messages that
+did not fit their share. Token counts come from TokenCounter, which caches
+them on the messages; assembly only tokenizes the system prompt, tools
+(once each) and messages stored without a count.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+from luca_core.manager.tokens import MESSAGE_OVERHEAD, TokenCounter
+from luca_core.schemas import Message
+from luca_core.schemas.tools import ToolSpecification
+
+# Budget when an agent's LLMModelConfig sets no max_tokens
+DEFAULT_CONTEXT_TOKENS = 8192
+
+RETRIEVED_HEADER = "Relevant earlier messages:"
+
+
+def tool_schema(spec: ToolSpecification) -> Dict[str, Any]:
+    """Return a tool specification as a function-calling schema."""
+    properties = {}
+    for parameter in spec.parameters:
+        prop: Dict[str, Any] = {
+            "type": parameter.type,
+            "description": parameter.description,
+        }
+        if parameter.enum_values:
+            prop["enum"] = parameter.enum_values
+        properties[parameter.name] = prop
+    return {
+        "name": spec.metadata.name,
+        "description": spec.metadata.description,
+        "parameters": {
+            "type": "object",
+            "properties": properties,
+            "required": [p.name for p in spec.parameters if p.required],
+        },
+    }
+
+
+@dataclass
+class ContextWindow:
+    """The parts of a prompt chosen to fit a token budget."""
+
+    system_prompt: str
+    tools: List[Dict[str, Any]]  # Function-calling schemas
+    retrieved: List[Message]  # Most relevant first
+    messages: List[Message]  # Recent history, oldest first, ending with the request
+    tokens: int
+    budget: int
+    omitted: int = 0  # Candidate messages and tools left out
+    breakdown: Dict[str, int] = field(default_factory=dict)
+
+    def to_chat(self) -> List[Dict[str, str]]:
+        """Return the window as chat messages (tools are passed separately)."""
+        chat = [{"role": "system", "content": self.system_prompt}]
+        if self.retrieved:
+            lines = [RETRIEVED_HEADER]
+            lines.extend(f"{m.role.value}: {m.content}" for m in self.retrieved)
+            chat.append({"role": "system", "content": "\n".join(lines)})
+        chat.extend({"role": m.role.value, "content": m.content} for m in self.messages)
+        return chat
+
+
+class ContextAssembler:
+    """Builds context windows under a token budget.
+
+    Args:
+        counter: Token counter; its counts are cached on the messages
+        tool_share: Fraction of the budget tools may use
+        retrieved_share: Fraction of the budget left after the system
+            prompt, request and tools reserved for retrieved messages
+    """
+
+    def __init__(
+        self,
+        counter: TokenCounter,
+        tool_share: float = 0.25,
+        retrieved_share: float = 0.3,
+    ):
+        if not 0 <= tool_share <= 1 or not 0 <= retrieved_share <= 1:
+            raise ValueError("Shares must be between 0 and 1")
+        self.counter = counter
+        self.tool_share = tool_share
+        self.retrieved_share = retrieved_share
+        self._header = counter.count(RETRIEVED_HEADER) + MESSAGE_OVERHEAD
+        # Tool schemas and their token counts by (name, version)
+        self._tools: Dict[Tuple[str, str], Tuple[Dict[str, Any], int]] = {}
+
+    def _tool(self, spec: ToolSpecification) -> Tuple[Dict[str, Any], int]:
+        key = (spec.metadata.name, spec.metadata.version)
+        cached = self._tools.get(key)
+        if cached is None:
+            schema = tool_schema(spec)
+            cached = self._tools[key] = (schema, self.counter.count_json(schema))
+        return cached
+
+    def assemble(
+        self,
+        system_prompt: str,
+        request: Message,
+        budget: int,
+        history: Sequence[Message] = (),
+        retrieved: Sequence[Message] = (),
+        tools: Sequence[ToolSpecification] = (),
+    ) -> ContextWindow:
+        """Choose the prompt contents that fit a budget.
+
+        Args:
+            system_prompt: The agent's system prompt
+            request: The message being answered
+            budget: Token budget for the whole prompt
+            history: Recent messages, in any order; the request and
+                messages without content are skipped
+            retrieved: Recalled messages, most relevant first
+            tools: Specifications of the tools the agent may call
+
+        Returns:
+            The context window
+
+        Raises:
+            ValueError: If the system prompt and request alone exceed the
+                budget
+        """
+        count = self.counter.message_tokens
+        fixed = self.counter.count(system_prompt) + MESSAGE_OVERHEAD + count(request)
+        if fixed > budget:
+            raise ValueError(
+                f"System prompt and request need {fixed} tokens, "
+                f"over the budget of {budget}"
+            )
+        breakdown = {"system": fixed - count(request), "request": count(request)}
+        used = fixed
+        omitted = 0
+
+        chosen_tools = []
+        tool_tokens = 0
+        for spec in tools:
+            schema, tokens = self._tool(spec)
+            if (
+                tool_tokens + tokens <= budget * self.tool_share
+                and used + tokens <= budget
+            ):
+                chosen_tools.append(schema)
+                tool_tokens += tokens
+                used += tokens
+            else:
+                omitted += 1
+        breakdown["tools"] = tool_tokens
+
+        recent = sorted(
+            (m for m in history if m.id != request.id and m.content),
+            key=lambda m: m.timestamp,
+            reverse=True,
+        )
+        candidates = [m for m in retrieved if m.id != request.id and m.content]
+        header = self._header
+
+        # Reserve the retrieved share first, so recent history cannot crowd
+        # relevant older messages out
+        share = (budget - used) * self.retrieved_share
+        reserved = self._fill(candidates, share - header, count)
+        reserve = sum(count(m) for m in reserved) + (header if reserved else 0)
+
+        chosen_recent: List[Message] = []
+        recent_tokens = 0
+        for message in recent:
+            tokens = count(message)
+            if used + reserve + recent_tokens + tokens > budget:
+                break
+            chosen_recent.append(message)
+            recent_tokens += tokens
+        used += recent_tokens
+        breakdown["recent"] = recent_tokens
+
+        # Messages already in recent history need not be repeated, which
+        # may free room for more retrieved ones
+        in_window = {m.id for m in chosen_recent}
+        candidates = [m for m in candidates if m.id not in in_window]
+        chosen_retrieved = self._fill(candidates, budget - used - header, count)
+        retrieved_tokens = sum(count(m) for m in chosen_retrieved)
+        if chosen_retrieved:
+            retrieved_tokens += header
+        used += retrieved_tokens
+        offered = {m.id for m in recent} | {m.id for m in candidates}
+        omitted += len(offered - in_window - {m.id for m in chosen_retrieved})
+        breakdown["retrieved"] = retrieved_tokens
+
+        chosen_recent.reverse()
+        chosen_recent.append(request)
+        return ContextWindow(
+            system_prompt=system_prompt,
+            tools=chosen_tools,
+            retrieved=chosen_retrieved,
+            messages=chosen_recent,
+            tokens=used,
+            budget=budget,
+            omitted=omitted,
+            breakdown=breakdown,
+        )
+
+    @staticmethod
+    def _fill(messages: Sequence[Message], budget: float, count) -> List[Message]:
+        """Take messages in order, skipping those that no longer fit."""
+        chosen = []
+        used = 0
+        for message in messages:
+            tokens = count(message)
+            if used + tokens <= budget:
+                chosen.append(message)
+                used += tokens
+        return chosen
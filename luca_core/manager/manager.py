@@ -6,12 +6,19 @@ and implements the main LUCA functionality.
 
 import logging
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Collection, Dict, List, Optional
 
 from pydantic import BaseModel
 
 from luca_core.context import BaseContextStore
+from luca_core.context.recall import MessageRecall
 from luca_core.error import ErrorHandler
+from luca_core.manager.context_window import (
+    DEFAULT_CONTEXT_TOKENS,
+    ContextAssembler,
+    ContextWindow,
+)
+from luca_core.manager.tokens import TokenCounter
 from luca_core.registry import ToolRegistry, registry
 from luca_core.sandbox.sandbox_manager import SandboxManager
 from luca_core.schemas import (
@@ -54,6 +61,10 @@ class LucaManager:
         tool_registry: Optional[ToolRegistry] = None,
         error_handler: Optional[ErrorHandler] = None,
         sandbox_manager: Optional[SandboxManager] = None,
+        message_recall: Optional[MessageRecall] = None,
+        context_limit: int = 5,
+        token_counter: Optional[TokenCounter] = None,
+        history_limit: int = 50,
     ):
         """Initialize the LUCA manager.
 
@@ -64,11 +75,23 @@ class LucaManager:
             error_handler: Error handler for error management
                 (defaults to global handler)
             sandbox_manager: Sandbox manager for secure code execution
+            message_recall: Vector index of past messages; when set, requests
+                are given the most similar past messages as context instead
+                of the most recent ones
+            context_limit: Number of past messages given as context
+            token_counter: Token counter for prompt budgets; its counts are
+                stored with every message (defaults to the gpt-4o tokenizer)
+            history_limit: Most recent messages considered for a prompt
         """
         self.context_store = context_store
         self.tool_registry = tool_registry or registry
         self.error_handler = error_handler or ErrorHandler()
         self.sandbox_manager = sandbox_manager or SandboxManager()
+        self.message_recall = message_recall
+        self.context_limit = context_limit
+        self.token_counter = token_counter or TokenCounter("gpt-4o")
+        self.context_assembler = ContextAssembler(self.token_counter)
+        self.history_limit = history_limit
         self.agents: Dict[str, Agent] = {}
         self.current_project: Optional[Project] = None
         self.user_id = "default"
@@ -81,6 +104,10 @@ class LucaManager:
         # Create default agents if not already registered
         await self._create_default_agents()
 
+        # Index the stored conversation if the recall index is new
+        if self.message_recall is not None and not len(self.message_recall):
+            await self.message_recall.sync(self.context_store)
+
         # Load active project if any
         # This is a placeholder for project loading logic
         pass
@@ -233,10 +260,16 @@ class LucaManager:
         )
 
         # Store the message
-        await self.context_store.store_message(message)
+        await self._store_message(message)
 
-        # Step 1: Understand the request
+        # Step 1: Understand the request, with the context that fits a prompt
         understood_request = await self._understand(request)
+        try:
+            understood_request["window"] = await self.build_context_window(message)
+        except ValueError as e:
+            # A request too long for the budget is still answered, only
+            # without earlier context
+            logger.warning(f"Skipping the context window: {e}")
 
         # Step 2: Create a plan
         plan = await self._create_plan(understood_request)
@@ -262,13 +295,83 @@ class LucaManager:
         )
 
         # Store the response message
-        await self.context_store.store_message(response_message)
+        await self._store_message(response_message)
 
         # Record metrics
         await self._record_metrics(request, response, response_options)
 
         return response
 
+    async def _store_message(self, message: Message) -> None:
+        """Store a conversation message and add it to the recall index.
+
+        The message's token count is cached on it first, so it is stored
+        with the message.
+
+        Args:
+            message: The message to store
+        """
+        self.token_counter.annotate(message)
+        await self.context_store.store_message(message)
+        if self.message_recall is not None:
+            await self.message_recall.add([message])
+
+    async def get_relevant_context(
+        self, query: str, limit: Optional[int] = None, exclude: Collection[str] = ()
+    ) -> List[Message]:
+        """Get the past messages most relevant to a request.
+
+        With a recall index these are the messages most similar to the
+        query; without one, the most recent messages.
+
+        Args:
+            query: Request text
+            limit: Maximum number of messages (defaults to context_limit)
+            exclude: Ids of messages to leave out
+
+        Returns:
+            List of messages
+        """
+        limit = self.context_limit if limit is None else limit
+        if self.message_recall is not None:
+            return await self.message_recall.recall(
+                self.context_store, query, limit, exclude
+            )
+        history = await self.context_store.get_conversation_history(
+            limit + len(exclude)
+        )
+        return [message for message in history if message.id not in exclude][:limit]
+
+    async def build_context_window(
+        self, request: Message, agent_id: str = "luca", budget: Optional[int] = None
+    ) -> ContextWindow:
+        """Assemble the prompt context for a request under a token budget.
+
+        Args:
+            request: The message being answered
+            agent_id: Agent whose system prompt, tools and model limits apply
+            budget: Token budget; defaults to the agent's max_tokens
+
+        Returns:
+            The context window
+        """
+        config = self.agents[agent_id].config
+        budget = budget or config.llm_config.max_tokens or DEFAULT_CONTEXT_TOKENS
+        history = await self.context_store.get_conversation_history(self.history_limit)
+        retrieved: List[Message] = []
+        if self.message_recall is not None:
+            retrieved = await self.message_recall.recall(
+                self.context_store, request.content, self.context_limit, {request.id}
+            )
+        tools = [
+            registration.specification
+            for registration in map(self.tool_registry.get_tool, config.tools)
+            if registration is not None
+        ]
+        return self.context_assembler.assemble(
+            config.system_prompt, request, budget, history, retrieved, tools
+        )
+
     async def _understand(self, request: str) -> Dict[str, Any]:
         """Understand the user request.
 
@@ -343,22 +446,23 @@ class LucaManager:
         # This is a placeholder for more sophisticated task delegation logic
         # In Phase 0, we'll use a simple approach
 
-        results = []
-
-        for task_info in plan:
-            # Create a formal task record
-            task = Task(
+        # Record every planned task in one transaction
+        tasks = [
+            Task(
                 id=task_info["id"],
                 agent_id=task_info["agent"],
                 description=task_info["description"],
                 status=TaskStatus.PENDING,
             )
+            for task_info in plan
+        ]
+        await self.context_store.store_many(tasks, namespace="tasks")
 
-            # Store the task
-            await self.context_store.store_task(task)
+        results = []
 
+        for task in tasks:
             # Update agent status
-            agent = self.agents[task_info["agent"]]
+            agent = self.agents[task.agent_id]
             agent.status = AgentStatus.BUSY
             agent.current_task_id = task.id
 
@@ -376,7 +480,8 @@ class LucaManager:
             agent.total_tasks_completed += 1
             agent.task_history.append(task.id)
 
-            # Store the result
+            # Store the result and mark the task finished, in one
+            # transaction, as soon as the task is done
             await self.context_store.store_task_result(result)
 
             results.append(result)
@@ -0,0 +1,82 @@
+"""Token counting for prompt budgets.
+
+Counts come from tiktoken when it is installed and from a characters/4
+estimate otherwise, as in scripts/omniscience. Every counter has a name
+(the tiktoken encoding, or ``chars/4``) and a message's count is cached in
+``Message.token_counts`` under that name, so it is stored with the message
+and history is never tokenized twice. Counts made by another tokenizer are
+ignored rather than trusted.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+from luca_core.schemas import Message
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency
+    tiktoken = None
+
+ESTIMATE = "chars/4"
+DEFAULT_ENCODING = "cl100k_base"
+
+# Framing tokens the chat format adds around every message
+MESSAGE_OVERHEAD = 3
+
+# Loaded tiktoken encodings by model name; loading one takes a while
+_encodings: Dict[str, Any] = {}
+
+
+def _encoding(model_name: Optional[str]) -> Any:
+    key = model_name or ""
+    encoding = _encodings.get(key)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model_name or "")
+        except Exception:
+            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+        _encodings[key] = encoding
+    return encoding
+
+
+class TokenCounter:
+    """Counts tokens for one model's tokenizer.
+
+    Args:
+        model_name: Model whose tokenizer to use; unknown models and None
+            use the cl100k_base encoding
+    """
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.encoding = _encoding(model_name) if tiktoken is not None else None
+        self.name = self.encoding.name if self.encoding is not None else ESTIMATE
+
+    def count(self, text: str) -> int:
+        """Count the tokens of a text."""
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def count_json(self, value: Any) -> int:
+        """Count the tokens of a value serialized as compact JSON."""
+        return self.count(json.dumps(value, separators=(",", ":"), default=str))
+
+    def annotate(self, message: Message) -> int:
+        """Cache a message's content token count on the message.
+
+        Args:
+            message: Message to annotate; counted only if it has no count
+                for this tokenizer yet
+
+        Returns:
+            The content token count
+        """
+        count = message.token_counts.get(self.name)
+        if count is None:
+            count = message.token_counts[self.name] = self.count(message.content)
+        return count
+
+    def message_tokens(self, message: Message) -> int:
+        """Return the tokens a message takes in a prompt, framing included."""
+        return self.annotate(message) + MESSAGE_OVERHEAD
@@ -28,6 +28,8 @@ class Message(BaseModel):
     content: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     metadata: Dict[str, Any] = Field(default_factory=dict)
+    # Token count of content by tokenizer name, cached when stored
+    token_counts: Dict[str, int] = Field(default_factory=dict)
 
 
 class Conversation(BaseModel):
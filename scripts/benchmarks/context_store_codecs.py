@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Benchmark payload codecs on conversation data.
+
+The benchmark builds a conversation from the repository's own documentation
+and source files: short user messages, long assistant answers mixing prose
+and code, and task results holding file contents. For every codec it
+reports encode and decode throughput (in models and in megabytes of JSON per
+second) and the size of a vacuumed database holding the whole conversation.
+
+    python scripts/benchmarks/context_store_codecs.py --messages 5000
+
+The msgpack codecs are skipped when the msgpack package is not installed.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# Add project root to sys.path to find luca_core
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from luca_core.context import codecs  # noqa: E402
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole, TaskResult  # noqa: E402
+
+CODECS: Dict[str, Dict[str, Any]] = {
+    "json": {"format": "json"},
+    "json+zlib>1k": {"format": "json", "compress_above": 1024},
+    "msgpack": {"format": "msgpack"},
+    "msgpack+zlib>1k": {"format": "msgpack", "compress_above": 1024},
+}
+
+
+def load_corpus() -> List[str]:
+    """Return the text of the repository's Markdown and Python files."""
+    texts = []
+    for folder in ("docs", "luca_core"):
+        for path in sorted((ROOT / folder).rglob("*")):
+            if path.suffix in (".md", ".py") and path.is_file():
+                texts.append(path.read_text(errors="replace"))
+    return [text for text in texts if text.strip()]
+
+
+def build_conversation(count: int, seed: int) -> List[Any]:
+    """Return ``count`` models resembling a recorded conversation."""
+    rng = random.Random(seed)
+    corpus = load_corpus()
+    models: List[Any] = []
+    for i in range(count):
+        text = rng.choice(corpus)
+        start = rng.randrange(max(1, len(text) - 200))
+        if i % 10 == 9:
+            models.append(
+                TaskResult(
+                    task_id=f"task-{i}",
+                    success=True,
+                    result={"file": f"f{i}.py", "content": text[:20000]},
+                    execution_time_ms=rng.randrange(10, 5000),
+                    metadata={"agent": "coder", "tokens": rng.randrange(100, 8000)},
+                )
+            )
+        elif i % 2 == 0:
+            line = text[start : start + rng.randrange(20, 300)]
+            models.append(Message(id=f"m{i}", role=MessageRole.USER, content=line))
+        else:
+            body = text[start : start + rng.randrange(400, 8000)]
+            models.append(
+                Message(
+                    id=f"m{i}",
+                    role=MessageRole.ASSISTANT,
+                    content=body,
+                    metadata={"model": "gpt-4o", "tokens": len(body) // 4},
+                )
+            )
+    return models
+
+
+def time_codec(
+    codec: codecs.PayloadCodec, models: List[Any]
+) -> Tuple[float, float, List[Tuple[str, codecs.Payload]]]:
+    """Return encode seconds, decode seconds and the encoded rows."""
+    start = time.perf_counter()
+    encoded = [codec.encode(model) for model in models]
+    encode_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for model, (tag, data) in zip(models, encoded):
+        codecs.decode_model(type(model), tag, data)
+    decode_s = time.perf_counter() - start
+    return encode_s, decode_s, encoded
+
+
+async def database_size(settings: Dict[str, Any], models: List[Any]) -> int:
+    """Store the models with a codec and return the vacuumed file size."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "bench.db")
+        # Indexed model types are always stored as JSON; drop the TaskResult
+        # index so the results are encoded with the codec under test
+        store = SQLiteContextStore(
+            path,
+            backup_interval=0,
+            indexed_fields={"TaskResult": []},
+            codecs={"conversation": settings},
+        )
+        await store.initialize()
+        await store.store_many(models, namespace="conversation")
+        await store._engine.run_write(
+            lambda conn: conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        )
+        await store.close()
+
+        conn = sqlite3.connect(path)
+        conn.execute("VACUUM")
+        conn.close()
+        return os.path.getsize(path)
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a table of results."""
+    models = build_conversation(args.messages, args.seed)
+    json_mb = sum(len(model.model_dump_json().encode()) for model in models) / 1e6
+    print(f"models={len(models)} json={json_mb:.1f}MB")
+    print(
+        f"{'codec':16s} {'enc/s':>9s} {'enc MB/s':>9s} {'dec/s':>9s} "
+        f"{'dec MB/s':>9s} {'payload MB':>10s} {'db MB':>7s}"
+    )
+    for label, settings in CODECS.items():
+        try:
+            codec = codecs.resolve_codecs({label: settings})[label]
+        except ValueError as e:
+            print(f"{label:16s} skipped: {e}")
+            continue
+        encode_s, decode_s, encoded = time_codec(codec, models)
+        payload_mb = sum(len(data) for _, data in encoded) / 1e6
+        db_mb = await database_size(settings, models) / 1e6
+        print(
+            f"{label:16s} {len(models) / encode_s:9.0f} {json_mb / encode_s:9.1f} "
+            f"{len(models) / decode_s:9.0f} {json_mb / decode_s:9.1f} "
+            f"{payload_mb:10.1f} {db_mb:7.1f}"
+        )
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000, help="Models")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Benchmark write-behind group commits in SQLiteContextStore.
+
+Many session coroutines store messages concurrently, once with every write
+committed on its own and once in write-behind mode. For each mode the
+benchmark reports write throughput, commits per second and the write latency
+seen by the calling coroutine. In write-behind mode the run ends with a
+flush(), so the elapsed time covers making every write durable.
+
+    python scripts/benchmarks/context_store_group_commit.py --sessions 64
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole  # noqa: E402
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Return the pct-th percentile of samples (nearest rank)."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(
+    args: argparse.Namespace, write_behind: Optional[Dict[str, Any]]
+) -> None:
+    """Run one mode and print its summary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteContextStore(
+            db_path=str(Path(tmp) / "bench.db"),
+            backup_interval=0,
+            connection_params={"synchronous": args.synchronous},
+            write_behind=write_behind,
+        )
+        await store.initialize()
+        commits = store.stats()["commits"]
+        latencies_ms: List[float] = []
+
+        async def session(n: int) -> None:
+            for i in range(args.writes):
+                message = Message(
+                    id=f"{n}-{i}", role=MessageRole.USER, content="z" * args.size
+                )
+                start = time.perf_counter()
+                await store.store(message, namespace="conversation")
+                latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session(n) for n in range(args.sessions)))
+        await store.flush()
+        elapsed = time.perf_counter() - start
+        commits = store.stats()["commits"] - commits
+        await store.close()
+
+    label = "write-behind" if write_behind is not None else "per-write commit"
+    writes = len(latencies_ms)
+    print(f"{label}:")
+    print(f"  writes/sec:    {writes / elapsed:10.0f}")
+    print(f"  commits/sec:   {commits / elapsed:10.0f} ({commits} commits)")
+    print(f"  write p50:     {statistics.median(latencies_ms):10.3f} ms")
+    print(f"  write p99:     {percentile(latencies_ms, 99):10.3f} ms")
+    print(f"  durable after: {elapsed:10.3f} s")
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark in both modes."""
+    print(
+        f"sessions={args.sessions} writes/session={args.writes} "
+        f"payload={args.size}B synchronous={args.synchronous}"
+    )
+    await run_mode(args, None)
+    await run_mode(
+        args, {"max_batch": args.max_batch, "max_delay_ms": args.max_delay_ms}
+    )
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=64, help="Sessions")
+    parser.add_argument("--writes", type=int, default=50, help="Writes per session")
+    parser.add_argument("--size", type=int, default=500, help="Payload bytes")
+    parser.add_argument("--synchronous", default="full")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Benchmark declarative indexes on a large SQLiteContextStore.
+
+The benchmark bulk-loads ``--rows`` Task rows (1% pending) into a database with
+no declarative indexes and times get_pending_tasks() as a json_extract scan.
+It then reopens the same file with the default declarations, which migrates
+the database by adding the generated column and building the partial index,
+and times the same query as an index seek.
+
+    python scripts/benchmarks/context_store_indexes.py --rows 1000000
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.indexes import DEFAULT_INDEXED_FIELDS  # noqa: E402
+from luca_core.context.sqlite_schema import now_timestamp  # noqa: E402
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Task, TaskStatus  # noqa: E402
+
+BATCH = 50000
+
+
+def bulk_load(conn, rows: int) -> None:
+    """Insert rows directly on the writer connection."""
+    now = now_timestamp()
+    for start in range(0, rows, BATCH):
+        batch = []
+        for i in range(start, min(rows, start + BATCH)):
+            status = TaskStatus.PENDING if i % 100 == 0 else TaskStatus.COMPLETED
+            task = Task(id=f"t{i}", agent_id="luca", description="x", status=status)
+            batch.append(("tasks", "Task", task.id, now, now, task.model_dump_json()))
+        conn.executemany(
+            "INSERT INTO models "
+            "(namespace, model_type, key, created_at, updated_at, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            batch,
+        )
+        conn.commit()
+
+
+async def time_query(store: SQLiteContextStore, repeat: int) -> float:
+    """Return the median wall time of get_pending_tasks() in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await store.query(Task, {"status": "pending"}, namespace="tasks", limit=100)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a summary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        no_indexes = {model_type: [] for model_type in DEFAULT_INDEXED_FIELDS}
+
+        store = SQLiteContextStore(
+            db_path, backup_interval=0, indexed_fields=no_indexes
+        )
+        await store.initialize()
+        start = time.perf_counter()
+        await store._engine.run_write(lambda conn: bulk_load(conn, args.rows))
+        print(f"loaded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+        scan_ms = await time_query(store, args.repeat)
+        await store.close()
+
+        store = SQLiteContextStore(db_path, backup_interval=0)
+        start = time.perf_counter()
+        await store.initialize()
+        build_s = time.perf_counter() - start
+        seek_ms = await time_query(store, args.repeat)
+        await store.close()
+
+    print(f"  json_extract scan: {scan_ms:10.2f} ms")
+    print(f"  index migration:   {build_s:10.2f} s")
+    print(f"  index seek:        {seek_ms:10.2f} ms")
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000, help="Task rows")
+    parser.add_argument("--repeat", type=int, default=5, help="Query repetitions")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Benchmark the legacy ContextStore with per-thread connections.
+
+The benchmark runs the same operations against ContextStore and against a
+subclass that opens a new connection per call and updates task statuses by
+reading and rewriting the task, as ContextStore did before connections were
+kept open. It prints operations per second for each operation and store.
+
+    python scripts/benchmarks/context_store_legacy.py --ops 20000
+"""
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.store import ContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole, Task, TaskStatus  # noqa: E402
+
+STATUSES = [status.value for status in TaskStatus]
+
+
+class PerCallContextStore(ContextStore):
+    """ContextStore as it was: a connection per call, status by rewrite."""
+
+    def _get_connection(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def update_task_status(self, task_id: str, status: str) -> bool:
+        task = self.get_task(task_id)
+        if not task:
+            return False
+        task.status = TaskStatus(status)
+        task.updated_at = datetime.utcnow()
+        self.store_task(task)
+        return True
+
+
+def operations(store: ContextStore) -> Dict[str, Callable[[int], object]]:
+    """Return the benchmarked operations, each taking an operation number."""
+    return {
+        "store_message": lambda i: store.store_message(
+            Message(id=f"m{i}", role=MessageRole.USER, content="hello"), "conv"
+        ),
+        "get_message": lambda i: store.get_message(f"m{i}"),
+        "store_task": lambda i: store.store_task(
+            Task(id=f"t{i}", agent_id="agent", description="benchmark task")
+        ),
+        "get_task": lambda i: store.get_task(f"t{i}"),
+        "update_task_status": lambda i: store.update_task_status(
+            f"t{i}", STATUSES[i % len(STATUSES)]
+        ),
+    }
+
+
+def measure(store: ContextStore, ops: int) -> Dict[str, float]:
+    """Return operations per second for each operation."""
+    rates = {}
+    for name, operation in operations(store).items():
+        start = time.perf_counter()
+        for i in range(ops):
+            operation(i)
+        rates[name] = ops / (time.perf_counter() - start)
+    return rates
+
+
+def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a summary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        before = measure(PerCallContextStore(str(Path(tmp) / "before.db")), args.ops)
+        store = ContextStore(str(Path(tmp) / "after.db"))
+        after = measure(store, args.ops)
+        store.close()
+
+    print(f"ops={args.ops}")
+    print(f"{'operation':20s} {'per call':>10s} {'per thread':>11s} {'speedup':>8s}")
+    for name in before:
+        print(
+            f"{name:20s} {before[name]:8.0f}/s {after[name]:9.0f}/s "
+            f"{after[name] / before[name]:7.1f}x"
+        )
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=5000, help="Operations each")
+    run(parser.parse_args())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Benchmark the log-structured store against the SQLite store.
+
+The benchmark runs the same workload on a LogContextStore and a
+SQLiteContextStore and prints the throughput of each phase:
+
+    store         ``--rows`` messages of ``--size`` bytes, one store() each
+    store_many    the same messages overwritten in batches of ``--batch``
+    fetch         every message fetched by key, in random order
+    list          the newest ``--limit`` messages, ``--lists`` times
+    reopen        closing and opening the store again
+
+    python scripts/benchmarks/context_store_log.py --rows 20000
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.base_store import BaseContextStore  # noqa: E402
+from luca_core.context.log_store import LogContextStore  # noqa: E402
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole  # noqa: E402
+
+
+def message(i: int, content: str) -> Message:
+    return Message(id=f"m{i:09d}", role=MessageRole.USER, content=content)
+
+
+async def workload(
+    open_store: Callable[[], BaseContextStore], args: argparse.Namespace
+) -> Dict[str, float]:
+    """Run every phase on a store; return operations per second by phase."""
+    results = {}
+    store = open_store()
+    await store.initialize()
+    content = "x" * args.size
+
+    start = time.perf_counter()
+    for i in range(args.rows):
+        await store.store(message(i, content), namespace="conversation")
+    results["store"] = args.rows / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for first in range(0, args.rows, args.batch):
+        await store.store_many(
+            [
+                message(i, content)
+                for i in range(first, min(args.rows, first + args.batch))
+            ],
+            namespace="conversation",
+        )
+    results["store_many"] = args.rows / (time.perf_counter() - start)
+
+    keys = [f"m{i:09d}" for i in range(args.rows)]
+    random.Random(0).shuffle(keys)
+    start = time.perf_counter()
+    for key in keys:
+        assert await store.fetch(Message, key, namespace="conversation") is not None
+    results["fetch"] = args.rows / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(args.lists):
+        rows = await store.list(Message, "conversation", limit=args.limit)
+        assert len(rows) == min(args.limit, args.rows)
+    results["list"] = args.lists / (time.perf_counter() - start)
+
+    await store.close()
+    store = open_store()
+    start = time.perf_counter()
+    await store.initialize()
+    results["reopen"] = 1 / (time.perf_counter() - start)
+    await store.close()
+    return results
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a summary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            "sqlite": lambda: SQLiteContextStore(
+                str(Path(tmp) / "context.db"), backup_interval=0
+            ),
+            "log": lambda: LogContextStore(
+                str(Path(tmp) / "context.log"), log={"compact_interval": 0}
+            ),
+        }
+        results = {
+            name: await workload(open_store, args)
+            for name, open_store in stores.items()
+        }
+
+    print(f"rows={args.rows} size={args.size} batch={args.batch} limit={args.limit}")
+    print(f"  {'phase':10s} {'sqlite':>12s} {'log':>12s}   ops/s")
+    for phase in results["sqlite"]:
+        print(
+            f"  {phase:10s} {results['sqlite'][phase]:12.1f} "
+            f"{results['log'][phase]:12.1f}"
+        )
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000, help="Messages")
+    parser.add_argument("--size", type=int, default=500, help="Content bytes")
+    parser.add_argument("--batch", type=int, default=500, help="store_many() size")
+    parser.add_argument("--limit", type=int, default=100, help="list() size")
+    parser.add_argument("--lists", type=int, default=200, help="list() calls")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
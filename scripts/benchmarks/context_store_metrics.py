@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Benchmark metric aggregation from rollups against document scans.
+
+The benchmark records synthetic MetricRecords for ``--agents`` agents over
+``--days`` days, with log-normal latencies, both through record_metrics()
+(typed table and rollups) and as documents in the ``metrics`` namespace,
+as BaseContextStore.record_metric() stores them. It then times "latency
+percentiles per agent per day" both ways: from the rollups, and by
+decoding every document and aggregating in memory.
+
+    python scripts/benchmarks/context_store_metrics.py --metrics 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+# Add project root to sys.path to find luca_core
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from luca_core.context.metrics import aggregate_records  # noqa: E402
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import MetricRecord  # noqa: E402
+
+START = datetime(2024, 1, 1)
+DOMAINS = ("general", "code", "data")
+MODES = ("noob", "pro", "guru")
+
+
+class DocumentMetric(MetricRecord):
+    """A MetricRecord with a key, so documents do not overwrite each other."""
+
+    id: str
+
+
+def build_metrics(
+    start: int, count: int, args: argparse.Namespace, rng: random.Random
+) -> List[DocumentMetric]:
+    """Return ``count`` metrics spread over the benchmark's days."""
+    seconds = args.days * 86400
+    metrics = []
+    for i in range(start, start + count):
+        status = rng.choices(("success", "partial", "failure"), (90, 7, 3))[0]
+        metrics.append(
+            DocumentMetric(
+                id=f"metric{i}",
+                task_id=f"task{i}",
+                agent_id=f"agent{rng.randrange(args.agents)}",
+                timestamp=START + timedelta(seconds=rng.randrange(seconds)),
+                latency_ms=int(rng.lognormvariate(6, 0.8)),
+                error_count=0 if status == "success" else 1,
+                user_feedback_score=rng.choice((None, None, 3.0, 4.0, 5.0)),
+                tokens_used=rng.randrange(50, 4000),
+                completion_status=status,
+                domain=rng.choice(DOMAINS),
+                learning_mode=rng.choice(MODES),
+            )
+        )
+    return metrics
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Record the metrics, run the aggregations and print the results."""
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "metrics.db")
+        store = SQLiteContextStore(path, backup_interval=0)
+        await store.initialize()
+
+        typed_s = document_s = 0.0
+        for offset in range(0, args.metrics, args.batch):
+            count = min(args.batch, args.metrics - offset)
+            metrics = build_metrics(offset, count, args, rng)
+            start = time.perf_counter()
+            await store.record_metrics(metrics)
+            typed_s += time.perf_counter() - start
+            start = time.perf_counter()
+            await store.store_many(metrics, namespace="metrics")
+            document_s += time.perf_counter() - start
+        print(
+            f"metrics={args.metrics} agents={args.agents} days={args.days} "
+            f"record={args.metrics / typed_s:.0f}/s "
+            f"documents={args.metrics / document_s:.0f}/s "
+            f"db={os.path.getsize(path) / 1e6:.0f}MB"
+        )
+
+        options = dict(group_by=["agent_id"], granularity="day")
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            rows = await store.aggregate_metrics(**options)
+        rollup_ms = (time.perf_counter() - start) / args.repeat * 1000
+        start = time.perf_counter()
+        arrays = await store.aggregate_metrics(**options, as_arrays=True)
+        arrays_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        documents = [
+            m async for m in store.aiter_models(DocumentMetric, namespace="metrics")
+        ]
+        exact = aggregate_records(documents, **options)
+        scan_ms = (time.perf_counter() - start) * 1000
+
+        error = max(
+            abs(row[column] - expected[column]) / expected[column]
+            for row, expected in zip(rows, exact)
+            for column in ("latency_p50", "latency_p95", "latency_p99")
+        )
+        print(f"p95 latency per agent per day: {len(rows)} rows")
+        print(f"{'rollups':10s} {rollup_ms:10.2f} ms")
+        print(f"{'arrays':10s} {arrays_ms:10.2f} ms ({len(arrays['count'])} rows)")
+        print(f"{'documents':10s} {scan_ms:10.2f} ms")
+        print(f"largest percentile error of the rollups: {error:.2%}")
+        await store.close()
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--metrics", type=int, default=100000, help="Metrics")
+    parser.add_argument("--agents", type=int, default=20, help="Agents")
+    parser.add_argument("--days", type=int, default=30, help="Days")
+    parser.add_argument("--batch", type=int, default=5000, help="Metrics per write")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
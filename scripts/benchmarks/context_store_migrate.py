@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Benchmark migrations between the ContextStore and models layouts.
+
+The benchmark fills a ContextStore database with ``--rows`` messages of
+``--size`` bytes, migrates it to the SQLiteContextStore layout and back, and
+prints rows and payload megabytes per second for both directions.
+
+    python scripts/benchmarks/context_store_migrate.py --rows 1000000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.migrate import migrate  # noqa: E402
+from luca_core.context.store import ContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole  # noqa: E402
+
+BATCH = 10000
+
+
+def fill(path: str, args: argparse.Namespace) -> None:
+    """Write the messages straight to the legacy messages table."""
+    ContextStore(path).close()
+    content = "x" * args.size
+    conn = sqlite3.connect(path)
+    now = time.time()
+    for start in range(0, args.rows, BATCH):
+        with conn:
+            conn.executemany(
+                "INSERT INTO messages (id, codec, data, conversation_id, timestamp) "
+                "VALUES (?, 'json', ?, 'conv', ?)",
+                [
+                    (
+                        f"m{i:09d}",
+                        Message(
+                            id=f"m{i:09d}", role=MessageRole.USER, content=content
+                        ).model_dump_json(),
+                        now + i / 1000,
+                    )
+                    for i in range(start, min(args.rows, start + BATCH))
+                ],
+            )
+    conn.close()
+
+
+def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a summary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy, models, back = (
+            str(Path(tmp) / name) for name in ("legacy.db", "models.db", "back.db")
+        )
+        fill(legacy, args)
+        print(f"rows={args.rows} source={os.path.getsize(legacy) / 1e6:.0f}MB")
+        for source, destination in ((legacy, models), (models, back)):
+            report = migrate(source, destination, batch_size=args.batch_size)
+            print(
+                f"  {report.source_layout:6s} -> {report.destination_layout:6s} "
+                f"{report.duration_s:7.2f}s {report.rows_per_s:9.0f} rows/s "
+                f"{report.mb_per_s:6.1f} MB/s"
+            )
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000, help="Messages")
+    parser.add_argument("--size", type=int, default=500, help="Content bytes")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Batch rows")
+    run(parser.parse_args())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Benchmark offset pagination against keyset cursors.
+
+The benchmark loads ``--rows`` messages into one namespace, then walks the
+whole namespace page by page, once with list(limit, offset) and once with
+list_page() cursors. It prints the time per page at several depths: offset
+pages get slower the deeper they are, keyset pages should stay flat.
+
+    python scripts/benchmarks/context_store_pagination.py --rows 200000
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole  # noqa: E402
+
+BATCH = 5000
+
+
+def report(label: str, samples: List[float], marks: List[int]) -> None:
+    """Print the page times at each marked page number."""
+    times = ", ".join(f"p{mark}={samples[mark] * 1000:.2f}ms" for mark in marks)
+    print(f"  {label:7s} total={sum(samples):6.2f}s  {times}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a summary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteContextStore(str(Path(tmp) / "bench.db"), backup_interval=0)
+        await store.initialize()
+        for start in range(0, args.rows, BATCH):
+            await store.store_many(
+                [
+                    Message(id=f"m{i}", role=MessageRole.USER, content="hello")
+                    for i in range(start, min(args.rows, start + BATCH))
+                ],
+                namespace="conversation",
+            )
+
+        timings: Dict[str, List[float]] = {"offset": [], "keyset": []}
+        offset = 0
+        while True:
+            start = time.perf_counter()
+            items = await store.list(Message, "conversation", args.page, offset)
+            timings["offset"].append(time.perf_counter() - start)
+            if len(items) < args.page:
+                break
+            offset += args.page
+
+        cursor = None
+        while True:
+            start = time.perf_counter()
+            page = await store.list_page(Message, "conversation", args.page, cursor)
+            timings["keyset"].append(time.perf_counter() - start)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        await store.close()
+
+    pages = min(len(samples) for samples in timings.values())
+    marks = sorted({0, pages // 4, pages // 2, pages - 1})
+    print(f"rows={args.rows} page={args.page} pages={pages}")
+    for label, samples in timings.items():
+        report(label, samples, marks)
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000, help="Messages")
+    parser.add_argument("--page", type=int, default=100, help="Page size")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark reading a large history: whole models versus projections.
+
+The benchmark stores ``--rows`` messages of ``--size`` bytes, then reads
+all of them back in one list() call two ways and prints the time of the
+best of ``--repeat`` runs:
+
+    list          full models
+    project       id, role and timestamp only, extracted in SQL
+
+It then times decoding the stored JSON payloads alone, without SQLite:
+
+    validated     validate_json(), as the store decodes rows
+    trusted       json.loads() and model_construct(), converting the enum
+                  and datetime fields by hand, as a trusted read mode would
+
+    python scripts/benchmarks/context_store_projection.py --rows 100000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole  # noqa: E402
+
+BATCH = 5000
+FIELDS = ("id", "role", "timestamp")
+
+
+async def best(args: argparse.Namespace, read) -> float:
+    """Return the fastest of ``--repeat`` timed reads, in seconds."""
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        rows = await read()
+        times.append(time.perf_counter() - start)
+        assert len(rows) == args.rows
+    return min(times)
+
+
+def decode_trusted(payloads: List[str]) -> List[Message]:
+    """Build messages from trusted payloads without validating them."""
+    messages = []
+    for payload in payloads:
+        fields = json.loads(payload)
+        fields["role"] = MessageRole(fields["role"])
+        fields["timestamp"] = datetime.fromisoformat(fields["timestamp"])
+        messages.append(Message.model_construct(**fields))
+    return messages
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a summary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteContextStore(str(Path(tmp) / "context.db"), backup_interval=0)
+        await store.initialize()
+        content = "x" * args.size
+        payloads = []
+        for start in range(0, args.rows, BATCH):
+            batch = [
+                Message(id=f"m{i:09d}", role=MessageRole.USER, content=content)
+                for i in range(start, min(args.rows, start + BATCH))
+            ]
+            await store.store_many(batch, namespace="conversation")
+            payloads.extend(message.model_dump_json() for message in batch)
+
+        def list_all():
+            return store.list(Message, "conversation", limit=args.rows)
+
+        print(f"rows={args.rows} size={args.size}")
+        results = {"list": await best(args, list_all)}
+        results["project"] = await best(
+            args,
+            lambda: store.project(Message, FIELDS, None, "conversation", args.rows),
+        )
+        await store.close()
+
+    async def decode_validated():
+        return [Message.model_validate_json(payload) for payload in payloads]
+
+    async def decode_unvalidated():
+        return decode_trusted(payloads)
+
+    assert (await decode_unvalidated())[0] == (await decode_validated())[0]
+    results["validated"] = await best(args, decode_validated)
+    results["trusted"] = await best(args, decode_unvalidated)
+
+    for name, seconds in results.items():
+        print(f"  {name:13s} {seconds:7.3f}s {args.rows / seconds:10.0f} rows/s")
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="Messages")
+    parser.add_argument("--size", type=int, default=500, help="Content bytes")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Benchmark the vector index behind semantic message recall.
+
+The benchmark embeds synthetic messages mixing Zipf-distributed words from
+the vocabulary of the repository's own sources with words of one of
+``--topics`` random topics, adds them
+to a VectorIndex, then times top-k searches with exact blocked scoring and
+with the coarse (IVF) quantizer at several probe counts. For the coarse
+searches it reports recall@k against the exact results.
+
+    python scripts/benchmarks/context_store_recall.py --messages 1000000
+
+Needs numpy.
+"""
+
+import argparse
+import itertools
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Add project root to sys.path to find luca_core
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from luca_core.context.embeddings import HashingEmbedder  # noqa: E402
+from luca_core.context.vector_index import VectorIndex  # noqa: E402
+
+
+def load_vocabulary() -> List[str]:
+    """Return the distinct words of the repository, most frequent first."""
+    counts: Dict[str, int] = {}
+    for folder in ("docs", "luca_core"):
+        for path in (ROOT / folder).rglob("*"):
+            if path.suffix in (".md", ".py") and path.is_file():
+                for word in re.findall(r"[a-z]{3,}", path.read_text(errors="replace")):
+                    counts[word] = counts.get(word, 0) + 1
+    return sorted(counts, key=lambda word: -counts[word])
+
+
+def build_texts(
+    vocabulary: List[str],
+    cum_weights: List[float],
+    topics: List[List[str]],
+    count: int,
+    rng: random.Random,
+) -> List[str]:
+    """Return ``count`` texts of 8 to 80 words on random topics.
+
+    Half of every text is Zipf-distributed common vocabulary and half is
+    drawn from the words of one topic, so texts on the same topic are
+    near neighbours, as in a real conversation.
+    """
+    texts = []
+    for _ in range(count):
+        length = rng.randrange(8, 80)
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=length // 2)
+        words += rng.choices(rng.choice(topics), k=length - length // 2)
+        rng.shuffle(words)
+        texts.append(" ".join(words))
+    return texts
+
+
+def time_searches(index: VectorIndex, queries, k: int, probes=None):
+    """Return per-query milliseconds and the keys found."""
+    times = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k, probes)
+        times.append((time.perf_counter() - start) * 1000)
+        found.append({key for key, _ in hits})
+    return sorted(times), found
+
+
+def report(label: str, times: List[float], recall: str = "") -> None:
+    """Print one result line."""
+    p95 = times[int(len(times) * 0.95) - 1]
+    print(
+        f"{label:14s} {statistics.median(times):8.2f} {p95:8.2f} "
+        f"{times[-1]:8.2f} {recall:>9s}"
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    """Build the index, run the searches and print the results."""
+    rng = random.Random(args.seed)
+    vocabulary = load_vocabulary()[: args.vocabulary]
+    cum_weights = list(
+        itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1))
+    )
+    topics = [rng.sample(vocabulary, args.topic_words) for _ in range(args.topics)]
+    embedder = HashingEmbedder(dim=args.dim)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = VectorIndex(Path(tmp) / "vectors", embedder.dim, embedder.name)
+        embed_s = add_s = 0.0
+        for offset in range(0, args.messages, args.batch):
+            count = min(args.batch, args.messages - offset)
+            texts = build_texts(vocabulary, cum_weights, topics, count, rng)
+            start = time.perf_counter()
+            vectors = embedder.embed(texts)
+            embed_s += time.perf_counter() - start
+            start = time.perf_counter()
+            index.add([f"m{offset + i}" for i in range(count)], vectors)
+            add_s += time.perf_counter() - start
+
+        # Incremental adds, one message at a time as the manager does
+        single = build_texts(vocabulary, cum_weights, topics, 1000, rng)
+        start = time.perf_counter()
+        for i, text in enumerate(single):
+            index.add([f"s{i}"], embedder.embed([text]))
+        single_ms = (time.perf_counter() - start) / len(single) * 1000
+        print(
+            f"messages={len(index)} dim={embedder.dim} "
+            f"embed={args.messages / embed_s:.0f}/s add={args.messages / add_s:.0f}/s "
+            f"single add={single_ms:.3f}ms"
+        )
+
+        queries = embedder.embed(
+            build_texts(vocabulary, cum_weights, topics, args.queries, rng)
+        )
+        print(
+            f"{'search':14s} {'p50 ms':>8s} {'p95 ms':>8s} {'max ms':>8s} "
+            f"{'recall':>9s}"
+        )
+        times, exact = time_searches(index, queries, args.k)
+        report("exact", times)
+
+        start = time.perf_counter()
+        index.train()
+        print(f"trained coarse lists in {time.perf_counter() - start:.1f}s")
+        for probes in args.probes:
+            times, found = time_searches(index, queries, args.k, probes)
+            hits = sum(len(a & b) for a, b in zip(exact, found))
+            recall = hits / sum(len(a) for a in exact)
+            report(f"ivf probes={probes}", times, f"{recall:.3f}")
+        index.close()
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000, help="Messages")
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Words")
+    parser.add_argument("--topics", type=int, default=1000, help="Topics")
+    parser.add_argument("--topic-words", type=int, default=30, help="Words/topic")
+    parser.add_argument("--dim", type=int, default=512, help="Embedding size")
+    parser.add_argument("--batch", type=int, default=5000, help="Messages per add")
+    parser.add_argument("--queries", type=int, default=100, help="Searches")
+    parser.add_argument("--k", type=int, default=10, help="Results per search")
+    parser.add_argument(
+        "--probes", type=int, nargs="+", default=[8, 32, 128], help="IVF probes"
+    )
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    run(parser.parse_args())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
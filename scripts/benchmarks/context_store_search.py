@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Benchmark full-text search over a large conversation.
+
+The benchmark stores synthetic messages whose words follow a Zipf
+distribution over the vocabulary of the repository's own sources, so the
+corpus has the usual mix of very common, middling and rare terms. It then
+reports the latency of search_messages() for queries of each kind, since
+those take different ranking paths (see luca_core.context.search.search()).
+
+    python scripts/benchmarks/context_store_search.py --messages 1000000
+
+Building the corpus writes through the store, index included, and reports
+the write throughput with search indexing enabled.
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Add project root to sys.path to find luca_core
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole  # noqa: E402
+
+
+def load_vocabulary() -> List[str]:
+    """Return the distinct words of the repository, most frequent first."""
+    counts: Dict[str, int] = {}
+    for folder in ("docs", "luca_core"):
+        for path in (ROOT / folder).rglob("*"):
+            if path.suffix in (".md", ".py") and path.is_file():
+                for word in re.findall(r"[a-z]{3,}", path.read_text(errors="replace")):
+                    counts[word] = counts.get(word, 0) + 1
+    return sorted(counts, key=lambda word: -counts[word])
+
+
+def build_messages(
+    vocabulary: List[str],
+    cum_weights: List[float],
+    start: int,
+    count: int,
+    rng: random.Random,
+) -> List[Message]:
+    """Return ``count`` messages of 8 to 80 Zipf-distributed words."""
+    messages = []
+    for i in range(start, start + count):
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randrange(8, 80))
+        role = MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT
+        messages.append(Message(id=f"m{i}", role=role, content=" ".join(words)))
+    return messages
+
+
+async def time_queries(
+    store: SQLiteContextStore, queries: List[str], repeat: int, limit: int
+) -> List[float]:
+    """Return the latency of every search, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            await store.search_messages(query, limit, namespace="conversation")
+            times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Build the corpus, run the queries and print the results."""
+    rng = random.Random(args.seed)
+    vocabulary = load_vocabulary()[: args.vocabulary]
+    cum_weights = list(
+        itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1))
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "search.db")
+        store = SQLiteContextStore(path, backup_interval=0)
+        await store.initialize()
+
+        write_s = 0.0
+        for offset in range(0, args.messages, args.batch):
+            count = min(args.batch, args.messages - offset)
+            messages = build_messages(vocabulary, cum_weights, offset, count, rng)
+            start = time.perf_counter()
+            await store.store_many(messages, namespace="conversation")
+            write_s += time.perf_counter() - start
+        print(
+            f"messages={args.messages} vocabulary={len(vocabulary)} "
+            f"write={args.messages / write_s:.0f}/s "
+            f"db={os.path.getsize(path) / 1e6:.0f}MB"
+        )
+
+        n = len(vocabulary)
+        kinds = {
+            "common": vocabulary[:10],
+            "middling": vocabulary[n // 10 : n // 10 + 10],
+            "rare": vocabulary[-10:],
+            "two words": [
+                f"{vocabulary[i]} {vocabulary[n // 20 + i]}" for i in range(10)
+            ],
+        }
+        print(
+            f"{'query':10s} {'hits':>5s} {'p50 ms':>8s} {'p95 ms':>8s} {'max ms':>8s}"
+        )
+        for kind, queries in kinds.items():
+            hits = len(await store.search_messages(queries[0], args.limit))
+            times = sorted(await time_queries(store, queries, args.repeat, args.limit))
+            p95 = times[int(len(times) * 0.95) - 1]
+            print(
+                f"{kind:10s} {hits:5d} {statistics.median(times):8.2f} "
+                f"{p95:8.2f} {times[-1]:8.2f}"
+            )
+        await store.close()
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000, help="Messages")
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Words")
+    parser.add_argument("--batch", type=int, default=5000, help="Messages per write")
+    parser.add_argument("--limit", type=int, default=20, help="Results per search")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Benchmark conversation writes under concurrent metrics ingestion.
+
+Several tasks record batches of metrics as fast as they can while one task
+stores conversation messages one at a time. The benchmark runs once with a
+single SQLiteContextStore and once with a ShardedContextStore, where the
+two namespaces have databases (and writers) of their own, and prints the
+metrics throughput and the message write latencies of both.
+
+    python scripts/benchmarks/context_store_sharded.py --seconds 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.base_store import BaseContextStore  # noqa: E402
+from luca_core.context.sharded import ShardedContextStore  # noqa: E402
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole, MetricRecord  # noqa: E402
+
+
+def metric(i: int) -> MetricRecord:
+    return MetricRecord(
+        task_id=f"t{i % 1000}",
+        latency_ms=i % 5000,
+        error_count=0,
+        tokens_used=100,
+        completion_status="success",
+        domain="general",
+        learning_mode="pro",
+    )
+
+
+async def ingest(store: BaseContextStore, args: argparse.Namespace, stop) -> int:
+    """Record metric batches until stopped; return the metrics recorded."""
+    count = 0
+    while not stop.is_set():
+        await store.record_metrics([metric(count + i) for i in range(args.batch)])
+        count += args.batch
+    return count
+
+
+async def converse(store: BaseContextStore, args: argparse.Namespace, stop):
+    """Store messages one at a time until stopped; return their latencies."""
+    latencies = []
+    i = 0
+    while not stop.is_set():
+        message = Message(id=f"m{i}", role=MessageRole.USER, content="x" * 500)
+        start = time.perf_counter()
+        await store.store(message, namespace="conversation")
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+    return latencies
+
+
+async def measure(name: str, store: BaseContextStore, args) -> None:
+    """Run the workload against one store and print its numbers."""
+    await store.initialize()
+    stop = asyncio.Event()
+    tasks = [
+        asyncio.create_task(ingest(store, args, stop)) for _ in range(args.writers)
+    ]
+    messages = asyncio.create_task(converse(store, args, stop))
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    recorded = sum(await asyncio.gather(*tasks))
+    latencies = sorted(await messages)
+    await store.close()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(
+        f"  {name:8s} metrics={recorded / args.seconds:9.0f}/s "
+        f"messages={len(latencies) / args.seconds:7.0f}/s "
+        f"p50={statistics.median(latencies):6.2f}ms p99={p99:6.2f}ms"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a summary."""
+    print(f"writers={args.writers} batch={args.batch} seconds={args.seconds}")
+    with tempfile.TemporaryDirectory() as tmp:
+        await measure(
+            "single",
+            SQLiteContextStore(str(Path(tmp) / "single.db"), backup_interval=0),
+            args,
+        )
+        await measure(
+            "sharded",
+            ShardedContextStore(str(Path(tmp) / "sharded.db"), backup_interval=0),
+            args,
+        )
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5, help="Run time")
+    parser.add_argument("--writers", type=int, default=4, help="Metric writers")
+    parser.add_argument("--batch", type=int, default=200, help="Metrics per batch")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Benchmark event-loop latency while SQLiteContextStore is under load.
+
+A heartbeat coroutine asks to wake up every millisecond and records how late
+it actually runs. Meanwhile several coroutines store models and scan the
+namespace. Because all database work runs on the engine's writer and reader
+threads, the heartbeat lag should stay close to scheduler noise no matter how
+busy the database is.
+
+    python scripts/benchmarks/sqlite_loop_latency.py --writers 8 --seconds 5
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole  # noqa: E402
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Return the pct-th percentile of samples (nearest rank)."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a summary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteContextStore(
+            db_path=str(Path(tmp) / "bench.db"),
+            backup_interval=0,
+            connection_params={"synchronous": args.synchronous},
+        )
+        await store.initialize()
+
+        deadline = time.perf_counter() + args.seconds
+        lags_ms: List[float] = []
+        ops = 0
+
+        async def heartbeat() -> None:
+            interval = 0.001
+            while time.perf_counter() < deadline:
+                expected = time.perf_counter() + interval
+                await asyncio.sleep(interval)
+                lags_ms.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+        async def writer(n: int) -> None:
+            nonlocal ops
+            i = 0
+            while time.perf_counter() < deadline:
+                await store.store(
+                    Message(
+                        id=f"{n}-{i}", role=MessageRole.USER, content="z" * args.size
+                    ),
+                    namespace="conversation",
+                )
+                ops += 1
+                i += 1
+
+        async def scanner() -> None:
+            nonlocal ops
+            while time.perf_counter() < deadline:
+                await store.list(Message, namespace="conversation", limit=500)
+                ops += 1
+
+        await asyncio.gather(
+            heartbeat(), scanner(), *(writer(n) for n in range(args.writers))
+        )
+        stats = store.stats()
+        await store.close()
+
+    print(f"writers={args.writers} payload={args.size}B ops={ops}")
+    print(f"  loop lag p50: {statistics.median(lags_ms):8.3f} ms")
+    print(f"  loop lag p99: {percentile(lags_ms, 99):8.3f} ms")
+    print(f"  loop lag max: {max(lags_ms):8.3f} ms")
+    print("  engine stats:")
+    print(json.dumps(stats, indent=4))
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0, help="Run time")
+    parser.add_argument("--writers", type=int, default=4, help="Writer coroutines")
+    parser.add_argument("--size", type=int, default=1000, help="Payload bytes")
+    parser.add_argument("--synchronous", default="normal")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
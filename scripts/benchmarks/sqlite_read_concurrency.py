@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark reader throughput of SQLiteContextStore under a saturated writer.
+
+One coroutine stores models as fast as it can while several reader coroutines
+issue list() and fetch() calls. The benchmark reports reads/sec and writes/sec
+for the requested pragma profile, so the WAL pooled-reader profile can be
+compared with a rollback-journal, single-reader profile:
+
+    python scripts/benchmarks/sqlite_read_concurrency.py
+    python scripts/benchmarks/sqlite_read_concurrency.py --journal-mode delete \
+        --read-pool-size 1 --synchronous full
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to sys.path to find luca_core
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from luca_core.context.sqlite_store import SQLiteContextStore  # noqa: E402
+from luca_core.schemas import Message, MessageRole  # noqa: E402
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark and print a summary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteContextStore(
+            db_path=str(Path(tmp) / "bench.db"),
+            backup_interval=0,
+            connection_params={
+                "journal_mode": args.journal_mode,
+                "synchronous": args.synchronous,
+                "read_pool_size": args.read_pool_size,
+            },
+        )
+        await store.initialize()
+
+        for i in range(args.rows):
+            await store.store(
+                Message(id=f"seed-{i}", role=MessageRole.USER, content="x" * 200),
+                namespace="conversation",
+            )
+
+        deadline = time.perf_counter() + args.seconds
+        counts = {"reads": 0, "writes": 0}
+
+        async def writer() -> None:
+            i = 0
+            while time.perf_counter() < deadline:
+                await store.store(
+                    Message(id=f"w-{i}", role=MessageRole.USER, content="y" * 200),
+                    namespace="conversation",
+                )
+                counts["writes"] += 1
+                i += 1
+                # Yield so readers can be scheduled between writes
+                await asyncio.sleep(0)
+
+        async def reader(n: int) -> None:
+            i = 0
+            while time.perf_counter() < deadline:
+                if i % 2:
+                    await store.fetch(
+                        Message, f"seed-{(n + i) % args.rows}", namespace="conversation"
+                    )
+                else:
+                    await store.list(Message, namespace="conversation", limit=50)
+                counts["reads"] += 1
+                i += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(writer(), *(reader(n) for n in range(args.readers)))
+        elapsed = time.perf_counter() - start
+        await store.close()
+
+    print(
+        f"journal_mode={args.journal_mode} synchronous={args.synchronous} "
+        f"read_pool_size={args.read_pool_size} readers={args.readers}"
+    )
+    print(f"  reads/sec:  {counts['reads'] / elapsed:10.1f}")
+    print(f"  writes/sec: {counts['writes'] / elapsed:10.1f}")
+
+
+def main() -> int:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000, help="Seed rows")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Run time")
+    parser.add_argument("--readers", type=int, default=8, help="Reader coroutines")
+    parser.add_argument("--read-pool-size", type=int, default=4)
+    parser.add_argument("--journal-mode", default="wal")
+    parser.add_argument("--synchronous", default="normal")
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
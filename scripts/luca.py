@@ -18,6 +18,9 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from autogen_core.tools import FunctionTool  # noqa: E402
 
 # Import luca_core components
+from luca_core.config import load_config  # noqa: E402
+from luca_core.config.loader import ConfigurationError  # noqa: E402
+from luca_core.config.schemas import ComponentConfig  # noqa: E402
 from luca_core.context import factory  # noqa: E402
 from luca_core.error import error_handler  # noqa: E402
 from luca_core.manager.manager import LucaManager, ResponseOptions  # noqa: E402
@@ -43,6 +46,20 @@ DB_PATH.parent.mkdir(exist_ok=True)
 _manager = None
 
 
+def context_store_config():
+    """Return the context store settings from the configuration files.
+
+    Falls back to the defaults of ComponentConfig, which include retention,
+    when the configuration cannot be loaded.
+    """
+    try:
+        components = load_config().components
+    except ConfigurationError as e:
+        logger.warning(f"Using the default context store settings: {e}")
+        components = ComponentConfig()
+    return components.context_store.model_dump(mode="json")
+
+
 def get_manager():
     """Returns a singleton LucaManager instance."""
     global _manager
@@ -62,7 +79,8 @@ def get_manager():
                 print(f"🐛 Database directory creation error: {e}")
             raise RuntimeError(f"Failed to create database directory: {e}")
 
-        # Create context store
+        # Create context store, with the configured settings
+        config = context_store_config()
         try:
             if debug_mode:
                 print("🐛 Creating context store and manager...")
@@ -78,7 +96,7 @@ def get_manager():
                 async def create_manager():
                     try:
                         context_store = await factory.create_async_context_store(
-                            "sqlite", str(DB_PATH)
+                            "sqlite", str(DB_PATH), config
                         )
                         if debug_mode:
                             print("🐛 Created async context store successfully")
@@ -87,6 +105,9 @@ def get_manager():
                             context_store=context_store,
                             tool_registry=registry,
                             error_handler=error_handler,
+                            message_recall=factory.create_message_recall(
+                                str(DB_PATH), config
+                            ),
                         )
 
                         if debug_mode:
@@ -116,7 +137,9 @@ def get_manager():
                 # No event loop, use synchronous method
                 if debug_mode:
                     print("🐛 No event loop found, using synchronous context store")
-                context_store = factory.create_context_store("sqlite", str(DB_PATH))
+                context_store = factory.create_context_store(
+                    "sqlite", str(DB_PATH), config
+                )
 
                 if debug_mode:
                     print("🐛 Created synchronous context store successfully")
@@ -125,6 +148,7 @@ def get_manager():
                     context_store=context_store,
                     tool_registry=registry,
                     error_handler=error_handler,
+                    message_recall=factory.create_message_recall(str(DB_PATH), config),
                 )
 
                 if debug_mode:
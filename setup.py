@@ -10,5 +10,13 @@ setup(
     install_requires=[
         "pydantic>=2.0.0",
     ],
+    extras_require={
+        # Binary payload codec for the context stores
+        "msgpack": ["msgpack>=1.0"],
+        # Vector index behind semantic recall of past messages
+        "vector": ["numpy>=1.24"],
+        # Exact token counts for prompt budgets (estimated without it)
+        "tokens": ["tiktoken>=0.5.0"],
+    },
     python_requires=">=3.13",
 )
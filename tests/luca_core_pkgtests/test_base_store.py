@@ -501,3 +501,109 @@ async def test_abstract_method_coverage():
     await store.delete(None, "")
     await store.list(None)
     await store.query(None, {})
+
+
+@pytest.mark.asyncio
+async def test_bulk_defaults(store):
+    """Test the per-item fallbacks for the bulk methods."""
+    await store.initialize()
+
+    tasks = [
+        Task(id=f"task-{i}", agent_id="agent-1", description="d", status="pending")
+        for i in range(3)
+    ]
+    await store.store_many(tasks, namespace="tasks")
+    assert len(await store.get_pending_tasks()) == 3
+
+    tasks[0].status = "completed"
+    await store.update_many(tasks[:1], namespace="tasks")
+    assert len(await store.get_pending_tasks()) == 2
+
+    await store.delete_many(Task, ["task-1", "task-2"], namespace="tasks")
+    assert await store.get_pending_tasks() == []
+    assert await store.fetch(Task, "task-0", namespace="tasks") is not None
+
+
+@pytest.mark.asyncio
+async def test_page_offset_shim(store):
+    """Test the offset-based default for cursor pagination."""
+    for i in range(5):
+        await store.store_message(Message(id=f"m{i}", role="user", content="c"))
+
+    page = await store.list_page(Message, namespace="conversation", limit=2)
+    seen = [m.id for m in page.items]
+    while page.next_cursor:
+        page = await store.list_page(
+            Message, namespace="conversation", limit=2, cursor=page.next_cursor
+        )
+        seen.extend(m.id for m in page.items)
+    assert sorted(seen) == [f"m{i}" for i in range(5)]
+
+    page = await store.query_page(
+        Message, {"content": "c"}, namespace="conversation", limit=10
+    )
+    assert len(page.items) == 5 and page.next_cursor is None
+
+    with pytest.raises(ValueError):
+        await store.list_page(Message, namespace="conversation", limit=0)
+
+
+@pytest.mark.asyncio
+async def test_streaming_defaults(store):
+    """Test the page-based defaults for aiter_models() and aiter_raw()."""
+    for i in range(5):
+        await store.store_message(Message(id=f"m{i}", role="user", content="c"))
+
+    models = [
+        m async for m in store.aiter_models(Message, "conversation", batch_size=2)
+    ]
+    assert sorted(m.id for m in models) == [f"m{i}" for i in range(5)]
+
+    raw = [d async for d in store.aiter_raw(Message, "conversation", batch_size=2)]
+    assert sorted(Message.model_validate_json(d).id for d in raw) == sorted(
+        m.id for m in models
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_messages_default(store):
+    """Test the scanning default for search_messages()."""
+    await store.store_message(Message(id="m1", role="user", content="Deploy it"))
+    await store.store_message(
+        Message(id="m2", role="assistant", content="The deploy failed; deploy again")
+    )
+    await store.store(
+        TaskResult(
+            task_id="t1",
+            success=False,
+            result={"log": "deploy step failed"},
+            error_message="timeout",
+            execution_time_ms=5,
+        ),
+        namespace="task_results",
+    )
+
+    hits = await store.search_messages("DEPLOY")
+    assert [hit.model_type for hit in hits] == ["Message", "Message", "TaskResult"]
+    assert [hit.key for hit in hits[:2]] == ["m2", "m1"]
+    assert hits[0].snippet == "The [deploy] failed; [deploy] again"
+    hits = await store.search_messages("deploy failed", namespace="task_results")
+    assert [hit.model_type for hit in hits] == ["TaskResult"]
+    assert [hit.key for hit in await store.search_messages("deploy", limit=1)] == ["m2"]
+    assert await store.search_messages("...") == []
+
+    with pytest.raises(ValueError, match="not searchable"):
+        await store.search_messages("deploy", namespace="tasks")
+
+
+@pytest.mark.asyncio
+async def test_project_default(store):
+    """Test the query-based default for project()."""
+    await store.store_message(Message(id="m1", role="user", content="c"))
+
+    (row,) = await store.project(Message, ["id", "role"], namespace="conversation")
+    assert (row.id, row.role) == ("m1", "user")
+    assert not hasattr(row, "content")
+
+    with pytest.raises(ValueError, match="no field"):
+        await store.project(Message, ["body"], namespace="conversation")
@@ -0,0 +1,187 @@
+"""Tests for the read-through context store cache."""
+
+import asyncio
+
+import pytest
+import pytest_asyncio
+from pydantic import BaseModel
+
+from luca_core.context.cache import CachedContextStore
+from luca_core.context.factory import create_async_context_store
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.schemas import Project
+
+
+class SampleModel(BaseModel):
+    id: str
+    name: str
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest_asyncio.fixture
+async def inner(tmp_path):
+    """Provide an initialized SQLite store to wrap."""
+    store = SQLiteContextStore(str(tmp_path / "cache.db"), backup_interval=0)
+    await store.initialize()
+    yield store
+    await store.close()
+
+
+def count_reads(store):
+    return store.stats()["reads"]["count"]
+
+
+@pytest.mark.asyncio
+async def test_hits_skip_the_inner_store(inner):
+    """Test that repeated fetches are served from the cache."""
+    cache = CachedContextStore(inner)
+    await inner.store(SampleModel(id="a", name="one"))
+
+    first = await cache.fetch(SampleModel, "a")
+    reads = count_reads(inner)
+    second = await cache.fetch(SampleModel, "a")
+
+    assert first == second == SampleModel(id="a", name="one")
+    assert count_reads(inner) == reads
+    assert cache.cache_stats()["hits"] == 1
+    assert cache.cache_stats()["misses"] == 1
+
+    # Hits are fresh instances; mutating one leaves the cache intact
+    second.name = "mutated"
+    assert (await cache.fetch(SampleModel, "a")).name == "one"
+
+
+@pytest.mark.asyncio
+async def test_misses_are_cached(inner):
+    """Test that a missing key is remembered until it is stored."""
+    cache = CachedContextStore(inner)
+    assert await cache.fetch(SampleModel, "missing") is None
+    assert await cache.fetch(SampleModel, "missing") is None
+    assert cache.cache_stats()["hits"] == 1
+
+    await cache.store(SampleModel(id="missing", name="found"))
+    assert (await cache.fetch(SampleModel, "missing")).name == "found"
+
+
+@pytest.mark.asyncio
+async def test_writes_invalidate_their_keys(inner):
+    """Test that store, update and delete drop only the keys they touch."""
+    cache = CachedContextStore(inner)
+    await cache.store_many([SampleModel(id=k, name=k) for k in "abc"])
+    for key in "abc":
+        await cache.fetch(SampleModel, key)
+
+    await cache.update(SampleModel(id="a", name="A"))
+    await cache.delete(SampleModel, "b")
+
+    assert (await cache.fetch(SampleModel, "a")).name == "A"
+    assert await cache.fetch(SampleModel, "b") is None
+    assert (await cache.fetch(SampleModel, "c")).name == "c"
+    stats = cache.cache_stats()
+    assert stats["invalidations"] == 2
+    assert stats["hits"] == 1
+
+    # Namespaces and model types are part of the key
+    await cache.store(SampleModel(id="c", name="other"), namespace="other")
+    assert (await cache.fetch(SampleModel, "c")).name == "c"
+    assert cache.cache_stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_fetch_racing_a_write_is_not_cached(inner):
+    """Test that a fetch that read the old row does not outlive the write."""
+    cache = CachedContextStore(inner)
+    await cache.store(SampleModel(id="a", name="old"))
+    fetch = asyncio.ensure_future(cache.fetch(SampleModel, "a"))
+    await asyncio.sleep(0)
+    await cache.update(SampleModel(id="a", name="new"))
+    await fetch
+
+    assert (await cache.fetch(SampleModel, "a")).name == "new"
+
+
+@pytest.mark.asyncio
+async def test_lru_bounds(inner):
+    """Test eviction by entry count and by size."""
+    cache = CachedContextStore(inner, max_entries=2)
+    await inner.store_many([SampleModel(id=k, name=k * 100) for k in "abc"])
+    await cache.fetch(SampleModel, "a")
+    await cache.fetch(SampleModel, "b")
+    await cache.fetch(SampleModel, "a")
+    await cache.fetch(SampleModel, "c")
+
+    assert cache.cache_stats()["evictions"] == 1
+    assert cache.cache_stats()["entries"] == 2
+    await cache.fetch(SampleModel, "a")
+    assert cache.cache_stats()["hits"] == 2
+
+    size = len(SampleModel(id="a", name="a" * 100).model_dump_json())
+    cache = CachedContextStore(inner, max_bytes=size * 2)
+    for key in "abc":
+        await cache.fetch(SampleModel, key)
+    stats = cache.cache_stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == size * 2
+    assert stats["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_namespace_ttls(inner):
+    """Test per-namespace expiry and namespaces that are never cached."""
+    clock = FakeClock()
+    cache = CachedContextStore(
+        inner, ttls={"projects": 10, "tasks": 0}, default_ttl=None, clock=clock
+    )
+    await inner.store(SampleModel(id="a", name="a"), namespace="projects")
+    await inner.store(SampleModel(id="a", name="a"), namespace="tasks")
+    await inner.store(SampleModel(id="a", name="a"))
+
+    for namespace in ("projects", "tasks", "default"):
+        await cache.fetch(SampleModel, "a", namespace)
+    clock.now = 11
+    for namespace in ("projects", "tasks", "default"):
+        await cache.fetch(SampleModel, "a", namespace)
+
+    stats = cache.cache_stats()
+    assert stats["expirations"] == 1
+    assert stats["hits"] == 1
+    assert stats["entries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_other_calls_pass_through(inner):
+    """Test that lists, pages and backend extras reach the wrapped store."""
+    cache = CachedContextStore(inner)
+    await cache.store_many([SampleModel(id=str(i), name="x") for i in range(3)])
+
+    assert len(await cache.list(SampleModel)) == 3
+    assert len(await cache.query(SampleModel, {"name": "x"})) == 3
+    assert len((await cache.list_page(SampleModel, limit=2)).items) == 2
+    assert len([m async for m in cache.aiter_models(SampleModel)]) == 3
+    assert "reads" in cache.stats()
+
+
+@pytest.mark.asyncio
+async def test_factory_wraps_store(tmp_path):
+    """Test that a cache section in the config wraps the store."""
+    store = await create_async_context_store(
+        "sqlite",
+        str(tmp_path / "factory.db"),
+        {"backup_interval": 0, "cache": {"max_entries": 10, "ttls": {"projects": 5}}},
+    )
+    assert isinstance(store, CachedContextStore)
+    assert store.ttls == {"projects": 5}
+
+    project = Project(id="p", name="p", description="", domain="general")
+    await store.store(project, namespace="projects")
+    assert await store.get_project("p") == project
+    assert await store.get_project("p") == project
+    assert store.cache_stats()["hits"] == 1
+    await store.close()
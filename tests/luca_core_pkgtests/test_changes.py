@@ -0,0 +1,142 @@
+"""Tests for the change feed and change log."""
+
+import asyncio
+
+import pytest
+
+from luca_core.context.cache import CachedContextStore
+from luca_core.context.changes import (
+    ChangeEvent,
+    ChangeFeed,
+    ChangeFeedOverflow,
+    resolve_change_log_params,
+)
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.schemas import Message, MessageRole
+
+
+def event(key, namespace="conversation", op="store"):
+    return ChangeEvent(namespace, "Message", key, op)
+
+
+def message(id):
+    return Message(id=id, role=MessageRole.USER, content="hi")
+
+
+def drain(subscription):
+    events = []
+    while (item := subscription.get_nowait()) is not None:
+        events.append(item.key)
+    return events
+
+
+@pytest.mark.asyncio
+async def test_overflow_policies():
+    """Test bounded queues, namespace filters and closing."""
+    feed = ChangeFeed()
+    oldest = feed.subscribe(maxsize=2)
+    newest = feed.subscribe(maxsize=2, overflow="drop_newest")
+    overflow = feed.subscribe(maxsize=2, overflow="overflow")
+    tasks = feed.subscribe(namespaces=["tasks"])
+    feed.publish([event("a"), event("b"), event("c"), event("t", "tasks")])
+
+    assert drain(oldest) == ["c", "t"] and oldest.dropped == 2
+    assert drain(newest) == ["a", "b"] and newest.dropped == 2
+    with pytest.raises(ChangeFeedOverflow):
+        overflow.get_nowait()
+    assert drain(overflow) == ["t"]
+    assert await tasks.get() == event("t", "tasks")
+
+    waiter = asyncio.create_task(tasks.get())
+    await asyncio.sleep(0)
+    tasks.close()
+    with pytest.raises(StopAsyncIteration):
+        await waiter
+    assert feed.subscription_count == 3
+
+    # The feed's count of dropped events outlives the subscriptions
+    assert feed.dropped == 7
+    oldest.close()
+    assert feed.subscription_count == 2 and feed.dropped == 7
+
+    with pytest.raises(ValueError, match="maxsize"):
+        feed.subscribe(maxsize=0)
+    with pytest.raises(ValueError, match="Unsupported overflow"):
+        feed.subscribe(overflow="block")
+    with pytest.raises(ValueError, match="positive"):
+        resolve_change_log_params({"keep": 0})
+    with pytest.raises(ValueError, match="Unsupported"):
+        resolve_change_log_params({"ttl": 1})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("write_behind", [None, {}])
+async def test_store_publishes_committed_changes(tmp_path, write_behind):
+    """Test that writes are published once committed, and only real ones."""
+    store = SQLiteContextStore(
+        str(tmp_path / "context.db"), backup_interval=0, write_behind=write_behind
+    )
+    await store.initialize()
+    await store.store(message("before"), namespace="conversation")
+    cached = CachedContextStore(store)
+    async with cached.subscribe(namespaces=["conversation"]) as changes:
+        await cached.store_many([message("a"), message("b")], "conversation")
+        await cached.update_many([message("a"), message("missing")], "conversation")
+        await cached.delete_many(Message, ["b", "b", "missing"], "conversation")
+        await cached.store(message("other"), namespace="notes")
+        await store.flush()
+        await asyncio.sleep(0)
+
+        events = [await changes.get() for _ in range(4)]
+        assert [(e.key, e.op) for e in events] == [
+            ("a", "store"),
+            ("b", "store"),
+            ("a", "update"),
+            ("b", "delete"),
+        ]
+        assert events[0].seq is None
+        assert changes.get_nowait() is None
+        assert store.stats()["changes"] == {"subscriptions": 1, "dropped": 0}
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_change_log_tail(tmp_path):
+    """Test that another store on the database tails the change log."""
+    path = str(tmp_path / "context.db")
+    writer = SQLiteContextStore(
+        path, backup_interval=0, change_log={"keep": 2, "prune_every": 5}
+    )
+    reader = SQLiteContextStore(path, backup_interval=0, change_log={})
+    await writer.initialize()
+    await reader.initialize()
+
+    async with writer.subscribe() as changes:
+        await writer.store(message("m0"), namespace="conversation")
+        assert (await changes.get()).seq == 1
+
+    tail = reader.tail_changes(poll_interval=0.01)
+    assert (await tail.__anext__()).key == "m0"
+    pending = asyncio.ensure_future(tail.__anext__())
+    await writer.store_many([message(f"m{i}") for i in range(1, 4)], "conversation")
+    first = await asyncio.wait_for(pending, 5)
+    assert (first.key, first.seq) == ("m1", 2)
+    await tail.aclose()
+
+    await writer.delete(Message, "m1", namespace="conversation")
+    await writer.store(message("t"), namespace="tasks")
+    events = await reader.changes_since(3)
+    assert [(e.seq, e.key, e.op) for e in events] == [
+        (4, "m3", "store"),
+        (5, "m1", "delete"),
+        (6, "t", "store"),
+    ]
+    assert [e.key for e in await reader.changes_since(0, namespaces=["tasks"])] == ["t"]
+    # Reaching seq 5, a multiple of prune_every, kept the 2 most recent
+    assert [e.seq for e in await reader.changes_since(0, limit=2)] == [4, 5]
+
+    await writer.close()
+    await reader.close()
+    plain = SQLiteContextStore(path, backup_interval=0)
+    with pytest.raises(ValueError, match="not enabled"):
+        await plain.changes_since()
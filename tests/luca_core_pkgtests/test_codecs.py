@@ -0,0 +1,147 @@
+"""Tests for payload codecs in both context stores."""
+
+import sqlite3
+
+import pytest
+from pydantic import BaseModel
+
+from luca_core.context.codecs import (
+    PayloadCodec,
+    decode_model,
+    resolve_codecs,
+    to_json,
+)
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.context.store import ContextStore
+from luca_core.schemas import Message, MessageRole, Task
+
+
+class SampleModel(BaseModel):
+    id: str
+    name: str
+    body: str = ""
+
+
+def row_codecs(path, table="models"):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(row[0] for row in conn.execute(f"SELECT codec FROM {table}"))
+    finally:
+        conn.close()
+
+
+def test_resolve_codecs():
+    """Test format shorthands, overrides and validation."""
+    codecs = resolve_codecs({"a": "json", "b": {"compress_above": "100", "level": 6}})
+    assert codecs["a"].compress_above is None
+    assert codecs["b"].format == "json"
+    assert codecs["b"].compress_above == 100
+    assert codecs["b"].level == 6
+
+    with pytest.raises(ValueError, match="Unsupported codec format"):
+        resolve_codecs({"a": "xml"})
+    with pytest.raises(ValueError, match="Unsupported codec parameter"):
+        resolve_codecs({"a": {"threshold": 1}})
+
+
+def test_compression_threshold():
+    """Test that only payloads over the threshold are compressed."""
+    codec = PayloadCodec(compress_above=200)
+    small = SampleModel(id="s", name="n")
+    large = SampleModel(id="l", name="n", body="lorem ipsum " * 100)
+
+    assert codec.encode(small) == ("json", small.model_dump_json())
+    tag, data = codec.encode(large)
+    assert tag == "json+zlib"
+    assert len(data) < len(large.model_dump_json())
+    assert decode_model(SampleModel, tag, data) == large
+    assert to_json(tag, data) == large.model_dump_json()
+
+    with pytest.raises(ValueError, match="Unsupported codec"):
+        decode_model(SampleModel, "json+lz4", data)
+
+
+def test_msgpack_round_trip():
+    """Test the binary format, compressed and not."""
+    pytest.importorskip("msgpack")
+    message = Message(
+        id="m", role=MessageRole.ASSISTANT, content="é" * 500, metadata={"n": [1]}
+    )
+    for codec in (PayloadCodec("msgpack"), PayloadCodec("msgpack", 100)):
+        tag, data = codec.encode(message)
+        assert isinstance(data, bytes)
+        assert decode_model(Message, tag, data) == message
+        assert to_json(tag, data) == message.model_dump_json()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_mixes_codecs(tmp_path):
+    """Test reading and filtering a namespace written with several codecs."""
+    path = str(tmp_path / "codecs.db")
+    store = SQLiteContextStore(path, backup_interval=0)
+    await store.initialize()
+    await store.store(SampleModel(id="plain", name="a", body="x" * 500))
+    await store.close()
+
+    store = SQLiteContextStore(
+        path, backup_interval=0, codecs={"default": {"compress_above": 100}}
+    )
+    await store.initialize()
+    await store.store(SampleModel(id="small", name="a"))
+    await store.store(SampleModel(id="big", name="b", body="y" * 500))
+    await store.update(SampleModel(id="plain", name="a", body="z" * 500))
+    # Indexed model types stay JSON for their generated columns
+    await store.store(Task(id="t", description="d" * 500, agent_id="a"))
+
+    assert row_codecs(path) == ["json", "json", "json+zlib", "json+zlib"]
+    assert (await store.fetch(SampleModel, "big")).body == "y" * 500
+    assert {m.id for m in await store.list(SampleModel)} == {"small", "big", "plain"}
+    # Filters see inside compressed rows
+    matched = await store.query(SampleModel, {"name": "a"})
+    assert {m.id for m in matched} == {"small", "plain"}
+    raw = [doc async for doc in store.aiter_raw(SampleModel, query={"name": "b"})]
+    assert raw == [SampleModel(id="big", name="b", body="y" * 500).model_dump_json()]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_msgpack_write_behind(tmp_path):
+    """Test binary rows, including reads of pending write-behind writes."""
+    pytest.importorskip("msgpack")
+    path = str(tmp_path / "msgpack.db")
+    store = SQLiteContextStore(
+        path, backup_interval=0, codecs={"default": "msgpack"}, write_behind={}
+    )
+    await store.initialize()
+    await store.store(SampleModel(id="a", name="a"))
+    assert await store.fetch(SampleModel, "a") == SampleModel(id="a", name="a")
+    await store.flush()
+
+    assert row_codecs(path) == ["msgpack"]
+    assert [m.id for m in await store.query(SampleModel, {"name": "a"})] == ["a"]
+    await store.close()
+
+
+def test_legacy_store_codecs(tmp_path):
+    """Test codecs in ContextStore, including a table from before codecs."""
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE messages (id TEXT PRIMARY KEY, data TEXT NOT NULL, "
+        "conversation_id TEXT, timestamp REAL)"
+    )
+    old = Message(id="old", role=MessageRole.USER, content="hi")
+    conn.execute(
+        "INSERT INTO messages VALUES ('old', ?, 'c', 1.0)", (old.model_dump_json(),)
+    )
+    conn.commit()
+    conn.close()
+
+    store = ContextStore(path, codecs={"messages": {"compress_above": 100}})
+    new = Message(id="new", role=MessageRole.ASSISTANT, content="long " * 100)
+    store.store_message(new, conversation_id="c")
+
+    assert row_codecs(path, "messages") == ["json", "json+zlib"]
+    assert store.get_message("new") == new
+    assert store.get_conversation_messages("c") == [old, new]
+    assert store.get_conversation_messages_page("c", limit=1).items == [old]
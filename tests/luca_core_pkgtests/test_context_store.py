@@ -1,8 +1,10 @@
 """Tests for the ContextStore implementation."""
 
 import os
+import sqlite3
 import sys
 import tempfile
+import threading
 import uuid
 from datetime import datetime
 
@@ -193,3 +195,80 @@ def test_store_and_retrieve_metric(context_store):
     assert metrics[0].completion_status == "success"
     assert metrics[0].domain == "general"
     assert metrics[0].learning_mode == "pro"
+
+
+def test_conversation_messages_page(context_store):
+    """Test keyset pagination of conversation messages."""
+    for i in range(7):
+        message = Message(id=f"m{i}", role=MessageRole.USER, content=str(i))
+        context_store.store_message(message, conversation_id="conv")
+    context_store.store_message(
+        Message(id="other", role=MessageRole.USER, content="x"), conversation_id="c2"
+    )
+
+    ids = []
+    cursor = None
+    pages = 0
+    while True:
+        page = context_store.get_conversation_messages_page(
+            "conv", limit=3, cursor=cursor
+        )
+        ids.extend(m.id for m in page.items)
+        pages += 1
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert ids == [m.id for m in context_store.get_conversation_messages("conv")]
+    assert sorted(ids) == [f"m{i}" for i in range(7)]
+
+    with pytest.raises(ValueError):
+        context_store.get_conversation_messages_page("conv", cursor="bogus")
+
+
+def test_connection_per_thread(context_store):
+    """Test that each thread reuses one connection until close()."""
+    conn = context_store._get_connection()
+    assert context_store._get_connection() is conn
+
+    other = []
+    thread = threading.Thread(
+        target=lambda: other.append(context_store._get_connection())
+    )
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+    context_store.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert context_store.get_task("missing") is None
+    assert context_store._get_connection() is not conn
+
+
+@pytest.mark.parametrize("codecs", [None, {"tasks": {"compress_above": 0}}])
+def test_update_task_status_in_place(temp_db_path, codecs):
+    """Test status updates for JSON and compressed rows."""
+    store = ContextStore(db_path=temp_db_path, codecs=codecs)
+    task = Task(id="t", agent_id="a", description="d", status=TaskStatus.PENDING)
+    store.store_task(task, conversation_id="conv")
+
+    assert store.update_task_status("t", "completed")
+    updated = store.get_task("t")
+    assert updated.status == TaskStatus.COMPLETED
+    assert updated.updated_at > task.updated_at
+    assert updated.description == "d"
+    row = store._get_connection().execute(
+        "SELECT codec, status, conversation_id FROM tasks WHERE id = 't'"
+    )
+    assert row.fetchone() == (
+        "json" if codecs is None else "json+zlib",
+        "completed",
+        "conv",
+    )
+    assert store.get_active_tasks() == []
+
+    with pytest.raises(ValueError):
+        store.update_task_status("t", "bogus")
+    store.close()
@@ -0,0 +1,165 @@
+"""Tests for token counting and token-budgeted context windows."""
+
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.manager.context_window import ContextAssembler, tool_schema
+from luca_core.manager.manager import LucaManager
+from luca_core.manager.tokens import MESSAGE_OVERHEAD, TokenCounter
+from luca_core.registry import ToolRegistry
+from luca_core.schemas import Message, MessageRole
+
+START = datetime(2024, 1, 1)
+
+
+def message(i, content, role=MessageRole.USER):
+    return Message(
+        id=f"m{i}", role=role, content=content, timestamp=START + timedelta(minutes=i)
+    )
+
+
+class CountingCounter(TokenCounter):
+    """A counter that records what it tokenizes."""
+
+    def __init__(self):
+        super().__init__()
+        self.counted = []
+
+    def count(self, text):
+        self.counted.append(text)
+        return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def test_token_counts_are_cached_on_messages():
+    """Test that a message is tokenized once and foreign counts are ignored."""
+    counter = CountingCounter()
+    msg = message(0, "one two three")
+    msg.token_counts["some-other-tokenizer"] = 1000
+
+    assert counter.message_tokens(msg) == 3 + MESSAGE_OVERHEAD
+    assert counter.message_tokens(msg) == 3 + MESSAGE_OVERHEAD
+    assert counter.counted == ["one two three"]
+    assert msg.token_counts == {"some-other-tokenizer": 1000, counter.name: 3}
+
+    # Counts survive serialization, as they do in the store
+    stored = Message.model_validate_json(msg.model_dump_json())
+    assert counter.message_tokens(stored) == 3 + MESSAGE_OVERHEAD
+    assert len(counter.counted) == 1
+    assert TokenCounter().count("") == 0
+
+
+def test_assembler_fits_budget():
+    """Test priorities, contiguous recent history and retrieved reserve."""
+    counter = CountingCounter()
+    assembler = ContextAssembler(counter, retrieved_share=0.5)
+    history = [message(i, "word " * 10) for i in range(10)]  # 13 tokens each
+    request = message(10, "the request")
+    old = message(-100, "an old but relevant message " * 2)  # 13 tokens
+
+    window = assembler.assemble(
+        "system prompt", request, 60, history + [request], retrieved=[old, history[9]]
+    )
+    assert window.tokens <= 60
+    assert window.messages[-1] == request
+    # The newest history, in order, after the retrieved reserve
+    assert window.messages[:-1] == history[-len(window.messages) + 1 :]
+    assert window.retrieved == [old]
+    assert window.omitted == 10 + 1 - len(window.messages)
+    assert window.breakdown == {
+        "system": 2 + MESSAGE_OVERHEAD,
+        "request": 2 + MESSAGE_OVERHEAD,
+        "tools": 0,
+        "recent": 13 * (len(window.messages) - 1),
+        "retrieved": 13 + 4 + MESSAGE_OVERHEAD,
+    }
+    assert sum(window.breakdown.values()) == window.tokens
+
+    chat = window.to_chat()
+    assert chat[0] == {"role": "system", "content": "system prompt"}
+    assert chat[1]["content"].startswith("Relevant earlier messages:\nuser: an old")
+    assert chat[-1] == {"role": "user", "content": "the request"}
+
+    # A retrieved message that made it into recent history is not repeated
+    window = assembler.assemble("s", request, 1000, history, retrieved=[history[9]])
+    assert window.retrieved == []
+    assert len(window.messages) == 11
+
+    with pytest.raises(ValueError, match="over the budget"):
+        assembler.assemble("long system prompt " * 20, request, 50)
+
+
+def test_assembler_tools():
+    """Test that tools are limited to their share and counted once."""
+    registry = ToolRegistry()
+
+    @registry.register(name="read_text", description="Read a text file")
+    def read_text(path: str, encoding: str = "utf-8") -> str:
+        """Read a text file."""
+        return ""
+
+    spec = registry.get_tool("read_text").specification
+    schema = tool_schema(spec)
+    assert schema["name"] == "read_text"
+    assert schema["parameters"]["required"] == ["path"]
+
+    counter = CountingCounter()
+    assembler = ContextAssembler(counter, tool_share=0.5)
+    tokens = counter.count_json(schema)
+    request = message(0, "hi")
+    window = assembler.assemble("s", request, tokens * 2, tools=[spec])
+    assert window.tools == [schema]
+    counted = len(counter.counted)
+    assembler.assemble("s", request, tokens * 2, tools=[spec])
+    # Only the system prompt was tokenized again
+    assert len(counter.counted) == counted + 1
+
+    window = assembler.assemble("s", request, tokens * 2 - 2, tools=[spec])
+    assert window.tools == []
+    assert window.omitted == 1
+
+
+@pytest.mark.asyncio
+async def test_manager_builds_windows(tmp_path):
+    """Test that the manager stores token counts and assembles a window."""
+    store = SQLiteContextStore(str(tmp_path / "context.db"), backup_interval=0)
+    await store.initialize()
+    manager = LucaManager(context_store=store, tool_registry=ToolRegistry())
+    await manager.initialize()
+    await manager.process_request("first question")
+
+    name = manager.token_counter.name
+    stored = await store.get_conversation_history(10)
+    assert len(stored) == 2
+    assert all(m.token_counts.get(name) for m in stored)
+
+    request = message(1000, "second question")
+    window = await manager.build_context_window(request)
+    assert [m.content for m in window.messages] == [
+        "first question",
+        "Processed: first question",
+        "second question",
+    ]
+    # Budget too small for the history
+    window = await manager.build_context_window(request, budget=window.tokens - 1)
+    assert window.messages[-1] == request
+    assert window.omitted >= 1
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_manager_answers_oversized_requests(tmp_path, caplog):
+    """Test that a request over the token budget is answered without a window."""
+    store = SQLiteContextStore(str(tmp_path / "context.db"), backup_interval=0)
+    await store.initialize()
+    manager = LucaManager(context_store=store, tool_registry=ToolRegistry())
+    await manager.initialize()
+    request = "word " * 20000
+
+    response = await manager.process_request(request)
+    assert response == f"Processed: {request}"
+    assert "Skipping the context window" in caplog.text
+    assert len(await store.get_conversation_history(10)) == 2
+    await store.close()
@@ -0,0 +1,177 @@
+"""Tests for declarative context store indexes."""
+
+import pytest
+import pytest_asyncio
+
+from luca_core.context.indexes import (
+    DEFAULT_INDEXED_FIELDS,
+    column_expression,
+    column_name,
+    index_name,
+    resolve_indexed_fields,
+    sync_indexes,
+)
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.schemas import Task, TaskResult, TaskStatus
+
+
+async def index_names(store):
+    """Return the names of the declarative indexes in the store."""
+    rows = await store._engine.run_read(
+        lambda conn: conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'"
+        ).fetchall()
+    )
+    return sorted(row[0] for row in rows)
+
+
+async def query_plan(store, model_cls, query, namespace):
+    """Return the EXPLAIN QUERY PLAN details for a query() call."""
+    sql, params = store._select_sql(model_cls, namespace, query, 100, 0)
+    rows = await store._engine.run_read(
+        lambda conn: conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    )
+    return " | ".join(row[3] for row in rows)
+
+
+class TestResolveIndexedFields:
+    """Test cases for index declarations."""
+
+    def test_defaults(self):
+        """Test that the hot filters are indexed by default."""
+        assert resolve_indexed_fields() == DEFAULT_INDEXED_FIELDS
+
+    def test_override_and_disable(self):
+        """Test adding fields and disabling a default declaration."""
+        resolved = resolve_indexed_fields(
+            {"Message": ["role", "metadata.request_id"], "Task": []}
+        )
+        assert resolved["Message"] == ("role", "metadata.request_id")
+        assert "Task" not in resolved
+
+    @pytest.mark.parametrize(
+        "declaration",
+        [{"Task": ["status__in"]}, {"Task": ["bad field"]}, {"Bad[Type]": ["x"]}],
+    )
+    def test_invalid_declarations(self, declaration):
+        """Test that unsafe declarations are rejected."""
+        with pytest.raises(ValueError):
+            resolve_indexed_fields(declaration)
+
+    def test_names(self):
+        """Test generated column and index naming."""
+        assert column_name("metadata.request_id") == "ix_metadata__request_id"
+        assert index_name("models", "Task", "status") == "ix_models_Task_ix_status"
+
+
+class TestStoreIndexes:
+    """Test cases for indexes in SQLiteContextStore."""
+
+    @pytest_asyncio.fixture
+    async def store(self, tmp_path):
+        """Create a store with the default declarations."""
+        store = SQLiteContextStore(db_path=str(tmp_path / "ctx.db"), backup_interval=0)
+        await store.initialize()
+        yield store
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_default_indexes_created(self, store):
+        """Test that every default declaration gets an index."""
+        assert await index_names(store) == sorted(
+            index_name("models", model_type, field)
+            for model_type, fields in DEFAULT_INDEXED_FIELDS.items()
+            for field in fields
+        )
+
+    @pytest.mark.asyncio
+    async def test_indexed_query_uses_index(self, store):
+        """Test that filters on indexed fields become index seeks."""
+        plan = await query_plan(store, Task, {"status": "pending"}, "tasks")
+        assert "ix_models_Task_ix_status" in plan
+
+        plan = await query_plan(store, TaskResult, {"task_id": "t1"}, "task_results")
+        assert "ix_models_TaskResult_ix_task_id" in plan
+
+    @pytest.mark.asyncio
+    async def test_indexed_query_results(self, store):
+        """Test that indexed queries return the right rows."""
+        for i, status in enumerate(["pending", "completed", "pending", "failed"]):
+            await store.store_task(
+                Task(id=f"t{i}", agent_id="a", description="d", status=status)
+            )
+
+        pending = await store.get_pending_tasks()
+        assert sorted(t.id for t in pending) == ["t0", "t2"]
+
+        done = await store.query(
+            Task, {"status__in": [TaskStatus.COMPLETED, "failed"]}, namespace="tasks"
+        )
+        assert sorted(t.id for t in done) == ["t1", "t3"]
+
+    @pytest.mark.asyncio
+    async def test_ensure_indexes_online(self, store):
+        """Test that new declarations are applied to an open store."""
+        await store.store_task(Task(id="t", agent_id="coder", description="d"))
+
+        await store.ensure_indexes({"Task": ["status", "agent_id"]})
+
+        assert index_name("models", "Task", "agent_id") in await index_names(store)
+        plan = await query_plan(store, Task, {"agent_id": "coder"}, "tasks")
+        assert "ix_models_Task_ix_agent_id" in plan
+        found = await store.query(Task, {"agent_id": "coder"}, namespace="tasks")
+        assert [t.id for t in found] == ["t"]
+
+
+@pytest.mark.asyncio
+async def test_existing_database_is_migrated(tmp_path):
+    """Test that indexes are added to, and removed from, existing databases."""
+    db_path = str(tmp_path / "legacy.db")
+    no_indexes = {model_type: [] for model_type in DEFAULT_INDEXED_FIELDS}
+
+    store = SQLiteContextStore(db_path, backup_interval=0, indexed_fields=no_indexes)
+    await store.initialize()
+    assert await index_names(store) == []
+    for i in range(5):
+        await store.store_task(
+            Task(id=f"t{i}", agent_id="a", description="d", status="pending")
+        )
+    await store.close()
+
+    store = SQLiteContextStore(db_path, backup_interval=0)
+    await store.initialize()
+    assert index_name("models", "Task", "status") in await index_names(store)
+    assert len(await store.get_pending_tasks()) == 5
+    await store.close()
+
+    store = SQLiteContextStore(db_path, backup_interval=0, indexed_fields=no_indexes)
+    await store.initialize()
+    assert await index_names(store) == []
+    assert len(await store.get_pending_tasks()) == 5
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_changed_column_expression_is_rebuilt(tmp_path):
+    """Test that columns generated with an older expression are replaced."""
+    db_path = str(tmp_path / "old.db")
+    store = SQLiteContextStore(db_path, backup_interval=0)
+    await store.initialize()
+    await store.store_task(Task(id="t", agent_id="a", description="d"))
+    # Rebuild the column as it was declared before rows carried a codec
+    await store._engine.run_write(
+        lambda conn: sync_indexes(conn, "models", DEFAULT_INDEXED_FIELDS)
+    )
+    await store.close()
+
+    store = SQLiteContextStore(db_path, backup_interval=0)
+    await store.initialize()
+    table_sql = await store._engine.run_read(
+        lambda conn: conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'models'"
+        ).fetchone()[0]
+    )
+    assert column_expression("status", codec_column="codec") in table_sql
+    assert index_name("models", "Task", "status") in await index_names(store)
+    assert [t.id for t in await store.get_pending_tasks()] == ["t"]
+    await store.close()
@@ -0,0 +1,156 @@
+"""Tests for the log-structured context store."""
+
+import os
+
+import pytest
+
+from luca_core.context.factory import create_async_context_store
+from luca_core.context.log_store import LogContextStore, resolve_log_params
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.schemas import Message, MessageRole, Task, TaskStatus
+
+
+def message(i, content="hello"):
+    return Message(id=f"m{i:03d}", role=MessageRole.USER, content=f"{content} {i}")
+
+
+def segments(path):
+    return sorted(name for name in os.listdir(path) if name.endswith(".seg"))
+
+
+@pytest.mark.asyncio
+async def test_crud_and_recovery(tmp_path):
+    """Test writes, reads and rebuilding the index after a restart."""
+    path = str(tmp_path / "context.log")
+    store = LogContextStore(path, log={"compact_interval": 0})
+    await store.initialize()
+    await store.store_many([message(i) for i in range(10)], "conversation")
+    created = store._index[("conversation", "Message")]["m003"].created_at
+    await store.store(message(3, "edited"), namespace="conversation")
+    await store.update(message(99), namespace="conversation")
+    await store.delete_many(Message, ["m000", "m001", "missing"], "conversation")
+
+    fetched = await store.fetch(Message, "m003", namespace="conversation")
+    assert fetched.content == "edited 3"
+    assert store._index[("conversation", "Message")]["m003"].created_at == created
+    assert await store.fetch(Message, "m099", namespace="conversation") is None
+    assert await store.fetch(Message, "m000", namespace="conversation") is None
+    listed = await store.list(Message, "conversation", limit=3, offset=1)
+    assert [m.id for m in listed] == ["m009", "m008", "m007"]
+
+    page = await store.list_page(Message, "conversation", limit=5)
+    rest = await store.list_page(
+        Message, "conversation", limit=5, cursor=page.next_cursor
+    )
+    assert [m.id for m in page.items + rest.items] == [
+        "m003", "m009", "m008", "m007", "m006", "m005", "m004", "m002"
+    ]  # fmt: skip
+    assert rest.next_cursor is None
+    await store.close()
+
+    # The active segment's hint covers everything written before close()
+    store = LogContextStore(path, log={"compact_interval": 0})
+    await store.initialize()
+    await store.store(message(50), namespace="conversation")
+    await store.close()
+    assert os.path.exists(os.path.join(path, "00000001.hint"))
+
+    # A torn record after the hint is truncated away on the next startup
+    segment = os.path.join(path, "00000001.seg")
+    with open(segment, "ab") as f:
+        f.write(b"\x01\x02\x03torn")
+    store = LogContextStore(path, log={"compact_interval": 0})
+    await store.initialize()
+    assert (await store.fetch(Message, "m050", "conversation")).content == "hello 50"
+    assert await store.fetch(Message, "m001", "conversation") is None
+    assert store.stats()["keys"] == 9
+    assert os.path.getsize(segment) == store.stats()["bytes"]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_query_matches_sqlite(tmp_path):
+    """Test that filters select what the SQLite store selects."""
+    log = LogContextStore(str(tmp_path / "context.log"), log={"compact_interval": 0})
+    sqlite = SQLiteContextStore(str(tmp_path / "context.db"), backup_interval=0)
+    statuses = [TaskStatus.PENDING, TaskStatus.COMPLETED, TaskStatus.FAILED]
+    tasks = [
+        Task(
+            id=f"t{i}",
+            agent_id=f"agent{i % 2}",
+            description="d",
+            status=statuses[i % 3],
+            parent_task_id="t0" if i % 4 else None,
+            context={"attempt": i, "tags": {"lane": "fast" if i % 2 else "slow"}},
+        )
+        for i in range(12)
+    ]
+    queries = [
+        {},
+        {"status": TaskStatus.COMPLETED},
+        {"status__in": ["pending", "failed"], "agent_id": "agent1"},
+        {"parent_task_id": None},
+        {"parent_task_id__ne": "t0"},
+        {"context.attempt__gte": 5, "context.attempt__lt": 9},
+        {"context.tags.lane__ne": "fast"},
+        {"context.missing__gt": 1},
+    ]
+    for store in (log, sqlite):
+        await store.initialize()
+        await store.store_many(tasks, namespace="tasks")
+    for query in queries:
+        expected = {t.id for t in await sqlite.query(Task, query, "tasks", limit=50)}
+        assert {t.id for t in await log.query(Task, query, "tasks", limit=50)} == (
+            expected
+        ), query
+    page = await log.query_page(Task, {"agent_id": "agent0"}, "tasks", limit=4)
+    rest = await log.query_page(
+        Task, {"agent_id": "agent0"}, "tasks", cursor=page.next_cursor
+    )
+    assert len(page.items) == 4 and len(rest.items) == 2
+    with pytest.raises(ValueError, match="Invalid query field"):
+        await log.query(Task, {"status; --": "x"}, "tasks")
+    with pytest.raises(ValueError, match="must be a list"):
+        await log.query(Task, {"status__in": "pending"}, "tasks")
+    await log.close()
+    await sqlite.close()
+
+
+@pytest.mark.asyncio
+async def test_compaction(tmp_path):
+    """Test that compaction reclaims dead records and survives a restart."""
+    path = str(tmp_path / "context.log")
+    store = await create_async_context_store(
+        "log", path, {"log": {"segment_bytes": 2048, "compact_interval": 0}}
+    )
+    assert isinstance(store, LogContextStore)
+    for round in range(5):
+        await store.store_many(
+            [message(i, f"round {round}") for i in range(20)], "conversation"
+        )
+    await store.delete_many(Message, [f"m{i:03d}" for i in range(10)], "conversation")
+    before = store.stats()
+    assert before["segments"] > 3 and before["dead_bytes"] > before["bytes"] / 2
+
+    result = await store.compact()
+    after = store.stats()
+    assert result["segments"] > 0 and result["reclaimed_bytes"] > 0
+    assert after["bytes"] == before["bytes"] - result["reclaimed_bytes"]
+    assert after["compaction"]["count"] == 1
+    assert len(segments(path)) == after["segments"] < before["segments"]
+    listed = await store.list(Message, "conversation", limit=50)
+    assert sorted(m.id for m in listed) == [f"m{i:03d}" for i in range(10, 20)]
+    assert {m.content for m in listed} == {f"round 4 {i}" for i in range(10, 20)}
+    await store.close()
+
+    store = LogContextStore(path, log={"compact_interval": 0})
+    await store.initialize()
+    assert store.stats()["keys"] == 10
+    assert (await store.fetch(Message, "m015", "conversation")).content == "round 4 15"
+    assert await store.fetch(Message, "m005", "conversation") is None
+    await store.close()
+
+    with pytest.raises(ValueError, match="Unsupported"):
+        resolve_log_params({"ttl": 1})
+    with pytest.raises(ValueError, match="at least 1024"):
+        resolve_log_params({"segment_bytes": 10})
@@ -0,0 +1,182 @@
+"""Tests for typed metric storage and rollups."""
+
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from luca_core.context.base_store import BaseContextStore
+from luca_core.context.metrics import (
+    aggregate_records,
+    bin_value,
+    latency_bin,
+    metric_columns,
+)
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.context.store import ContextStore
+from luca_core.schemas import MetricRecord
+
+DAY = datetime(2024, 3, 1)
+
+
+def metric(minutes, latency, agent="a1", status="success", feedback=None, **kwargs):
+    return MetricRecord(
+        task_id=kwargs.pop("task_id", f"t{minutes}"),
+        agent_id=agent,
+        timestamp=DAY + timedelta(minutes=minutes),
+        latency_ms=latency,
+        error_count=0 if status == "success" else 1,
+        user_feedback_score=feedback,
+        tokens_used=10,
+        completion_status=status,
+        domain=kwargs.pop("domain", "general"),
+        learning_mode="pro",
+        **kwargs,
+    )
+
+
+async def open_store(path):
+    store = SQLiteContextStore(str(path), backup_interval=0)
+    await store.initialize()
+    return store
+
+
+def test_latency_bins():
+    """Test that every latency is within 5% of its bin's value."""
+    assert latency_bin(0) == 0 and bin_value(0) == 0
+    for latency in (1, 2, 17, 250, 999, 60000):
+        assert abs(bin_value(latency_bin(latency)) - latency) <= latency * 0.05
+
+
+@pytest.mark.asyncio
+async def test_rollups_match_exact_aggregates(tmp_path):
+    """Test rollup aggregates against exact ones computed in memory."""
+    rng = random.Random(3)
+    metrics = [
+        metric(
+            rng.randrange(3 * 24 * 60),
+            rng.randrange(1, 5000),
+            agent=rng.choice(["a1", "a2", None]),
+            status=rng.choice(["success", "partial", "failure"]),
+            feedback=rng.choice([None, 1.0, 4.0]),
+        )
+        for _ in range(2000)
+    ]
+    store = await open_store(tmp_path / "metrics.db")
+    await store.record_metrics(metrics[:1000])
+    for item in metrics[1000:1100]:
+        await store.record_metric(item)
+    await store.record_metrics(metrics[1100:])
+
+    options = dict(group_by=["agent_id"], granularity="day")
+    rows = await store.aggregate_metrics(**options)
+    exact = aggregate_records(metrics, **options)
+    assert [(r["bucket"], r["agent_id"]) for r in rows] == [
+        (r["bucket"], r["agent_id"]) for r in exact
+    ]
+    assert len(rows) == 9 and {r["agent_id"] for r in rows} == {"a1", "a2", None}
+    for row, expected in zip(rows, exact):
+        for column in metric_columns(**options):
+            if column.startswith("latency_p"):
+                assert row[column] == pytest.approx(expected[column], rel=0.05)
+            elif column != "bucket":
+                assert row[column] == pytest.approx(expected[column])
+
+    # Unaligned ranges are computed exactly from the records
+    start, end = DAY + timedelta(seconds=90), DAY + timedelta(hours=30)
+    options = dict(group_by=["agent_id", "domain"], start=start, end=end)
+    rows = await store.aggregate_metrics(**options)
+    assert rows == aggregate_records(metrics, **options)
+
+    # Filters, and an hourly range served by the hour rollup
+    rows = await store.aggregate_metrics(
+        granularity="hour",
+        start=DAY,
+        end=DAY + timedelta(hours=2),
+        filters={"agent_id": [None, "a2"]},
+    )
+    expected = [
+        m
+        for m in metrics
+        if m.agent_id != "a1" and m.timestamp < DAY + timedelta(hours=2)
+    ]
+    assert [r["bucket"] for r in rows] == [DAY, DAY + timedelta(hours=1)]
+    assert sum(r["count"] for r in rows) == len(expected)
+
+    with pytest.raises(ValueError, match="group metrics by"):
+        await store.aggregate_metrics(group_by=["task_id"])
+    with pytest.raises(ValueError, match="granularity"):
+        await store.aggregate_metrics(granularity="week")
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_metric_arrays_and_task_lookup(tmp_path):
+    """Test NumPy output and reading records back by task."""
+    np = pytest.importorskip("numpy")
+    store = await open_store(tmp_path / "metrics.db")
+    await store.record_metrics(
+        [
+            metric(0, 100, task_id="t", feedback=5.0, additional_metrics={"k": 1}),
+            metric(1, 300, task_id="t", status="failure"),
+            metric(61, 200),
+        ]
+    )
+    arrays = await store.aggregate_metrics(
+        granularity="hour", percentiles=[50], as_arrays=True
+    )
+    assert list(arrays) == metric_columns(granularity="hour", percentiles=[50])
+    assert arrays["bucket"].dtype == np.dtype("datetime64[s]")
+    assert arrays["count"].tolist() == [2, 1]
+    assert arrays["failure"].tolist() == [1, 0]
+    assert arrays["latency_max"].tolist() == [300, 200]
+    assert arrays["feedback_mean"][0] == 5.0 and np.isnan(arrays["feedback_mean"][1])
+
+    stored = await store.get_metrics_for_task("t")
+    assert [m.latency_ms for m in stored] == [100, 300]
+    assert stored[0].additional_metrics == {"k": 1}
+    assert stored[0].timestamp == DAY
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_document_metrics_are_backfilled(tmp_path):
+    """Test that metrics stored as documents are copied on initialize()."""
+    path = tmp_path / "metrics.db"
+    store = await open_store(path)
+    # Metrics written by BaseContextStore.record_metric() before this change;
+    # their keys are instance ids, so both instances are kept alive
+    documents = [metric(0, 100), metric(1, 200)]
+    for item in documents:
+        await BaseContextStore.record_metric(store, item)
+    await store.close()
+    conn = sqlite3.connect(path)
+    with conn:
+        for table in ("records", "rollup_minute", "rollup_hour", "rollup_day"):
+            conn.execute(f"DROP TABLE metric_{table}")
+    conn.close()
+
+    store = await open_store(path)
+    await store._metrics_task
+    rows = await store.aggregate_metrics()
+    assert rows[0]["count"] == 2 and rows[0]["latency_max"] == 200
+    await store.close()
+
+    # Not copied twice
+    store = await open_store(path)
+    assert store._metrics_task is None
+    assert (await store.aggregate_metrics())[0]["count"] == 2
+    await store.close()
+
+
+def test_legacy_store_metrics(tmp_path):
+    """Test that the legacy store keeps rollups and unique ids."""
+    store = ContextStore(str(tmp_path / "legacy.db"))
+    ids = {store.store_metric(metric(0, latency, task_id="t")) for latency in (1, 2)}
+    assert len(ids) == 2
+    assert len(store.get_metrics_for_task("t")) == 2
+    rows = store.aggregate_metrics(group_by=("agent_id",), granularity="minute")
+    assert rows[0]["agent_id"] == "a1" and rows[0]["count"] == 2
+    store.clear_all_data()
+    assert store.aggregate_metrics() == []
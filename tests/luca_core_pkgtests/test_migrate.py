@@ -0,0 +1,145 @@
+"""Tests for copying context databases between layouts."""
+
+import json
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from luca_core.__main__ import main
+from luca_core.context.migrate import CHECKPOINT_TABLE, migrate
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.context.store import ContextStore
+from luca_core.schemas import (
+    ClarificationRequest,
+    Message,
+    MessageRole,
+    MetricRecord,
+    Project,
+    Task,
+    TaskResult,
+    TaskStatus,
+    UserPreferences,
+)
+
+
+def metric(task_id, latency):
+    return MetricRecord(
+        task_id=task_id,
+        latency_ms=latency,
+        error_count=0,
+        tokens_used=5,
+        completion_status="success",
+        domain="general",
+        learning_mode="pro",
+    )
+
+
+def legacy_store(path, messages=3):
+    store = ContextStore(str(path), codecs={"tasks": {"compress_above": 0}})
+    for i in range(messages):
+        store.store_message(
+            Message(id=f"m{i}", role=MessageRole.USER, content=f"zebra {i}"), "c"
+        )
+    store.store_task(Task(id="t", agent_id="a", description="d"), "c")
+    store.update_task_status("t", "completed")
+    store.store_task_result(
+        TaskResult(task_id="t", success=True, result="ok", execution_time_ms=3)
+    )
+    store.store_project(Project(id="p", name="P", description="x", domain="general"))
+    store.store_user_preferences(UserPreferences(user_id="u", theme="dark"), "u")
+    store.store_metric(metric("t", 100))
+    store.store_metric(metric("t", 300))
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_migrate_both_ways(tmp_path):
+    """Test a round trip from ContextStore to SQLiteContextStore and back."""
+    legacy_store(tmp_path / "legacy.db")
+    report = migrate(str(tmp_path / "legacy.db"), str(tmp_path / "models.db"))
+    assert (report.source_layout, report.destination_layout) == ("legacy", "models")
+    assert report.copied["messages"] == 3 and report.copied["metric_records"] == 2
+    assert report.rows == report.total and report.bytes > 0
+    assert not report.resumed
+
+    store = SQLiteContextStore(str(tmp_path / "models.db"), backup_interval=0)
+    await store.initialize()
+    await store._search_task
+    message = await store.fetch(Message, "m1", namespace="conversation")
+    assert message.content == "zebra 1"
+    task = await store.fetch(Task, "t", namespace="tasks")
+    assert task.status == TaskStatus.COMPLETED
+    result = await store.fetch(TaskResult, "t", namespace="task_results")
+    assert result.result == "ok"
+    assert (await store.get_user_preferences("u")).theme == "dark"
+    assert (await store.aggregate_metrics())[0]["count"] == 2
+    assert len(await store.search_messages("zebra")) == 3
+    await store.store(
+        ClarificationRequest(id="q", task_id="t", agent_id="a", question="?"),
+        namespace="clarification_requests",
+    )
+    await store.close()
+
+    report = migrate(str(tmp_path / "models.db"), str(tmp_path / "back.db"))
+    assert (report.source_layout, report.destination_layout) == ("models", "legacy")
+    assert report.skipped == 1
+    back = ContextStore(str(tmp_path / "back.db"))
+    assert back.get_message("m2").content == "zebra 2"
+    assert back.get_task("t").status == TaskStatus.COMPLETED
+    assert back.get_active_tasks() == []
+    assert back.get_task_result("t").result == "ok"
+    assert back.get_user_preferences("u").theme == "dark"
+    assert back.get_project("p").name == "P"
+    assert len(back.get_metrics_for_task("t")) == 2
+    (row,) = back.aggregate_metrics()
+    assert row["count"] == 2 and row["latency_max"] == 300
+    back.close()
+
+
+def test_migrate_resumes(tmp_path):
+    """Test that an interrupted migration resumes from its checkpoint."""
+    source, destination = tmp_path / "legacy.db", tmp_path / "models.db"
+    legacy_store(source, messages=10)
+
+    def interrupt(report):
+        if report.batches == 2:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        migrate(str(source), str(destination), batch_size=3, progress=interrupt)
+    conn = sqlite3.connect(destination)
+    assert conn.execute("SELECT count(*) FROM models").fetchone()[0] == 6
+    conn.close()
+
+    legacy_store(tmp_path / "other.db")
+    with pytest.raises(ValueError, match="checkpoint"):
+        migrate(str(tmp_path / "other.db"), str(destination))
+
+    report = migrate(str(source), str(destination), batch_size=3)
+    assert report.resumed
+    assert report.copied["messages"] == 4
+    assert report.total == report.rows
+    conn = sqlite3.connect(destination)
+    assert conn.execute("SELECT count(*) FROM models").fetchone()[0] == 16
+    assert conn.execute("SELECT count(*) FROM metric_records").fetchone()[0] == 2
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    assert CHECKPOINT_TABLE not in tables
+    conn.close()
+
+    with pytest.raises(ValueError, match="already uses the legacy layout"):
+        migrate(str(source), str(tmp_path / "other.db"))
+
+
+def test_migrate_command(tmp_path, capsys):
+    """Test the migrate subcommand."""
+    legacy_store(tmp_path / "legacy.db")
+    argv = ["luca_core", "migrate", str(tmp_path / "legacy.db"), str(tmp_path / "m.db")]
+    with patch("sys.argv", argv):
+        assert main() == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["rows"] == report["total"] and report["rows_per_s"] > 0
+
+    argv[2] = str(tmp_path / "missing.db")
+    with patch("sys.argv", argv):
+        assert main() == 1
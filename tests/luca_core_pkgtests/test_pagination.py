@@ -0,0 +1,40 @@
+"""Tests for context store cursor pagination."""
+
+import pytest
+
+from luca_core.context.pagination import (
+    decode_keyset_cursor,
+    decode_offset_cursor,
+    encode_keyset_cursor,
+    encode_offset_cursor,
+)
+
+
+def test_keyset_cursor_round_trip():
+    """Test that keyset cursors are opaque, URL-safe and reversible."""
+    cursor = encode_keyset_cursor(1700000000123456, "key/with?odd&chars")
+    assert cursor.replace("-", "").replace("_", "").isalnum()
+    assert decode_keyset_cursor(cursor) == (1700000000123456, "key/with?odd&chars")
+
+
+def test_offset_cursor_round_trip():
+    """Test offset cursors, where no cursor means the first page."""
+    assert decode_offset_cursor(encode_offset_cursor(40)) == 40
+    assert decode_offset_cursor(None) == 0
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "e30", "W10"])
+def test_invalid_cursors(cursor):
+    """Test that malformed cursors raise ValueError."""
+    with pytest.raises(ValueError):
+        decode_keyset_cursor(cursor)
+    with pytest.raises(ValueError):
+        decode_offset_cursor(cursor)
+
+
+def test_cursor_kinds_are_not_interchangeable():
+    """Test that a cursor from one scheme is rejected by the other."""
+    with pytest.raises(ValueError):
+        decode_offset_cursor(encode_keyset_cursor(1, "a"))
+    with pytest.raises(ValueError):
+        decode_keyset_cursor(encode_offset_cursor(1))
@@ -0,0 +1,74 @@
+"""Tests for field projections."""
+
+import pytest
+
+from luca_core.context.projection import projection_model, resolve_fields
+from luca_core.context.sharded import ShardedContextStore
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.schemas import Message, MessageRole
+
+
+def test_resolve_fields():
+    """Test field validation and the cached projection classes."""
+    assert resolve_fields(Message, ["id", "role", "id"]) == ("id", "role")
+    assert resolve_fields(Message, "id") == ("id",)
+    with pytest.raises(ValueError, match="at least one"):
+        resolve_fields(Message, [])
+    with pytest.raises(ValueError, match="no field 'body'"):
+        resolve_fields(Message, ["body"])
+    projection = projection_model(Message, ("id", "role"))
+    assert projection is projection_model(Message, ("id", "role"))
+    assert list(projection.model_fields) == ["id", "role"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("codecs", [None, {"conversation": {"compress_above": 0}}])
+async def test_project(tmp_path, codecs):
+    """Test projections from JSON and compressed rows."""
+    store = SQLiteContextStore(
+        str(tmp_path / "context.db"), backup_interval=0, codecs=codecs
+    )
+    await store.initialize()
+    for i in range(5):
+        role = MessageRole.USER if i % 2 else MessageRole.ASSISTANT
+        await store.store(
+            Message(id=f"m{i}", role=role, content="x" * 1000, metadata={"i": i}),
+            namespace="conversation",
+        )
+
+    rows = await store.project(
+        Message, ("id", "role", "timestamp", "metadata"), namespace="conversation"
+    )
+    assert [row.id for row in rows] == ["m4", "m3", "m2", "m1", "m0"]
+    full = await store.fetch(Message, "m3", namespace="conversation")
+    assert rows[1].role is MessageRole.USER
+    assert rows[1].timestamp == full.timestamp
+    assert rows[1].metadata == {"i": 3}
+    assert not hasattr(rows[1], "content")
+
+    rows = await store.project(
+        Message, ["id"], {"role": "user"}, "conversation", limit=1, offset=1
+    )
+    assert [row.id for row in rows] == ["m1"]
+    sorted_rows = await store.query_sorted(
+        Message, {}, "conversation", limit=2, fields=["id"]
+    )
+    assert [row.id for _, row in sorted_rows] == ["m4", "m3"]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_project_across_partitions(tmp_path):
+    """Test that partition projections merge in query() order."""
+    store = ShardedContextStore(
+        str(tmp_path / "context.db"), shards={"conversation": 3}, backup_interval=0
+    )
+    await store.initialize()
+    for i in range(10):
+        await store.store(
+            Message(id=f"m{i}", role=MessageRole.USER, content="c"),
+            namespace="conversation",
+        )
+    rows = await store.project(Message, ["id"], namespace="conversation", offset=2)
+    assert [row.id for row in rows] == [f"m{i}" for i in range(7, -1, -1)]
+    await store.close()
@@ -0,0 +1,117 @@
+"""Tests for context store query compilation."""
+
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from luca_core.context.query import compile_filter, json_path, parse_lookup
+from luca_core.schemas import TaskStatus
+
+
+@pytest.fixture
+def conn():
+    """Create an in-memory table of JSON documents."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE docs (key TEXT, data TEXT)")
+    docs = {
+        "a": '{"status": "pending", "n": 1, "flag": true, "meta": {"k": "x"}}',
+        "b": '{"status": "completed", "n": 5, "flag": false, "meta": {"k": "y"}}',
+        "c": '{"status": "failed", "n": 10, "flag": false, "opt": null}',
+        "d": '{"status": "pending", "n": 7, "when": "2025-01-02T00:00:00"}',
+    }
+    conn.executemany("INSERT INTO docs VALUES (?, ?)", docs.items())
+    yield conn
+    conn.close()
+
+
+def keys(conn, query):
+    """Return the sorted keys of documents matching query."""
+    where, params = compile_filter(query)
+    rows = conn.execute(f"SELECT key FROM docs WHERE {where}", params)
+    return sorted(row[0] for row in rows)
+
+
+class TestParseLookup:
+    """Test cases for lookup parsing."""
+
+    def test_plain_field(self):
+        """Test that a bare field is an equality lookup."""
+        assert parse_lookup("status") == ("status", "eq")
+
+    def test_operator_suffix(self):
+        """Test that a known suffix is split off."""
+        assert parse_lookup("n__gte") == ("n", "gte")
+        assert parse_lookup("meta.k__in") == ("meta.k", "in")
+
+    def test_unknown_suffix_is_part_of_field(self):
+        """Test that an unknown suffix stays part of the field name."""
+        assert parse_lookup("task__id") == ("task__id", "eq")
+
+    @pytest.mark.parametrize("lookup", ["", "a b", "x'); DROP TABLE docs; --", "1a"])
+    def test_invalid_field(self, lookup):
+        """Test that unsafe field names are rejected."""
+        with pytest.raises(ValueError):
+            parse_lookup(lookup)
+
+    def test_json_path(self):
+        """Test JSON path construction for nested fields."""
+        assert json_path("meta.k") == '$."meta"."k"'
+
+
+class TestCompileFilter:
+    """Test cases for filter compilation against real SQLite."""
+
+    def test_empty_query_matches_everything(self, conn):
+        """Test that an empty query compiles to a true expression."""
+        assert compile_filter({}) == ("1", [])
+        assert keys(conn, {}) == ["a", "b", "c", "d"]
+
+    def test_equality_with_enum(self, conn):
+        """Test that enum values compare by their serialized value."""
+        assert keys(conn, {"status": TaskStatus.PENDING}) == ["a", "d"]
+
+    def test_boolean(self, conn):
+        """Test that booleans match JSON true/false."""
+        assert keys(conn, {"flag": True}) == ["a"]
+        assert keys(conn, {"flag": False}) == ["b", "c"]
+
+    def test_ranges(self, conn):
+        """Test range operators."""
+        assert keys(conn, {"n__gt": 1, "n__lte": 7}) == ["b", "d"]
+        assert keys(conn, {"n__lt": 5}) == ["a"]
+
+    def test_datetime_range(self, conn):
+        """Test that datetimes compare in their serialized form."""
+        assert keys(conn, {"when__gte": datetime(2025, 1, 1)}) == ["d"]
+
+    def test_in(self, conn):
+        """Test membership, including None and the empty list."""
+        assert keys(conn, {"status__in": ["failed", "completed"]}) == ["b", "c"]
+        assert keys(conn, {"opt__in": [None]}) == ["a", "b", "c", "d"]
+        assert keys(conn, {"status__in": []}) == []
+
+    def test_in_requires_list(self):
+        """Test that a scalar value for 'in' is rejected."""
+        with pytest.raises(ValueError):
+            compile_filter({"status__in": "pending"})
+
+    def test_none_and_not_equal(self, conn):
+        """Test NULL handling for eq and ne."""
+        assert keys(conn, {"when": None}) == ["a", "b", "c"]
+        assert keys(conn, {"when__ne": None}) == ["d"]
+        assert keys(conn, {"status__ne": "pending"}) == ["b", "c"]
+        assert keys(conn, {"n__gt": None}) == []
+
+    def test_nested_and_structured(self, conn):
+        """Test nested paths and whole-object comparison."""
+        assert keys(conn, {"meta.k": "y"}) == ["b"]
+        assert keys(conn, {"meta": {"k": "x"}}) == ["a"]
+
+    def test_field_columns(self):
+        """Test that mapped fields use the dedicated column."""
+        where, params = compile_filter(
+            {"status": "pending"}, field_columns={"status": "c_status"}
+        )
+        assert where == "c_status = ?"
+        assert params == ["pending"]
@@ -0,0 +1,141 @@
+"""Tests for retention in the SQLite context store."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from luca_core.config.schemas import ComponentConfig
+from luca_core.context.factory import create_async_context_store
+from luca_core.context.retention import (
+    DEFAULT_RETENTION_NAMESPACES,
+    resolve_retention_params,
+)
+from luca_core.context.sqlite_schema import to_timestamp
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.schemas import Message, MessageRole, MetricRecord
+
+NOW = datetime(2024, 6, 1)
+
+
+def message(id, content):
+    return Message(id=id, role=MessageRole.USER, content=content)
+
+
+def test_retention_params():
+    """Test policy resolution and validation."""
+    params = resolve_retention_params({})
+    assert params["namespaces"] == {
+        "conversation": 30.0,
+        "task_results": 30.0,
+        "metrics": 30.0,
+    }
+    params = resolve_retention_params(
+        {"days": 7, "namespaces": {"conversation": None, "metrics": 2}}
+    )
+    assert params["namespaces"] == {"metrics": 2.0}
+    assert resolve_retention_params({"days": 7, "namespaces": ["tasks"]})[
+        "namespaces"
+    ] == {"tasks": 7.0}
+
+    with pytest.raises(ValueError, match="Unsupported"):
+        resolve_retention_params({"ttl": 1})
+    with pytest.raises(ValueError, match="positive"):
+        resolve_retention_params({"namespaces": {"metrics": 0}})
+
+    config = ComponentConfig.model_validate(
+        {
+            "context_store": {"retention": {"interval": 60}},
+            "error_schema": {"error_retention_days": 90},
+        }
+    )
+    assert config.context_store.retention == {"interval": 60, "days": 90}
+    assert ComponentConfig().context_store.retention == {"days": 30}
+
+
+@pytest.mark.asyncio
+async def test_default_config_enables_retention(tmp_path):
+    """Test that a store built from the default configuration expires rows."""
+    config = ComponentConfig(error_schema={"error_retention_days": 14})
+    settings = config.context_store.model_dump(mode="json")
+    store = await create_async_context_store(
+        "sqlite", str(tmp_path / "context.db"), settings
+    )
+    assert store.retention_params["days"] == 14
+    assert set(store.retention_params["namespaces"]) == set(
+        DEFAULT_RETENTION_NAMESPACES
+    )
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_retention_sweep(tmp_path):
+    """Test that expired rows go in batches and their space is reclaimed."""
+    store = SQLiteContextStore(
+        str(tmp_path / "retention.db"),
+        backup_interval=0,
+        retention={"days": 30, "batch_size": 50, "batch_delay_ms": 0},
+    )
+    await store.initialize()
+    # The first sweep runs on initialize() and finds nothing to delete
+    await asyncio.sleep(0.1)
+    assert store.stats()["retention"]["count"] == 1
+
+    padding = "x" * 2000
+    await store.store_many(
+        [message(f"old{i}", f"ancient history {padding}") for i in range(200)],
+        namespace="conversation",
+    )
+    await store.store_many(
+        [message(f"new{i}", "recent news") for i in range(5)], namespace="conversation"
+    )
+    # Old, but in a namespace without a policy
+    await store.store(message("old_note", "kept"), namespace="notes")
+    old = to_timestamp(NOW - timedelta(days=40))
+    await store._engine.run_write(
+        lambda conn: conn.execute(
+            "UPDATE models SET updated_at = ? WHERE key LIKE 'old%'",
+            (old,),
+        )
+    )
+    await store.record_metrics(
+        [
+            MetricRecord(
+                task_id=f"t{i}",
+                timestamp=NOW - timedelta(days=days),
+                latency_ms=10,
+                error_count=0,
+                tokens_used=1,
+                completion_status="success",
+                domain="general",
+                learning_mode="pro",
+            )
+            for i, days in enumerate([40, 40, 1])
+        ]
+    )
+
+    result = await store.apply_retention(now=NOW)
+    assert result.deleted["conversation"] == 200
+    assert result.deleted["task_results"] == 0
+    # Two records and their minute rollup rows
+    assert result.deleted["metrics"] == 3
+    assert result.batches > 200 // 50
+    assert result.vacuum_steps >= 1
+    assert result.reclaimed_bytes > 200 * 2000
+    assert result.free_bytes == 0
+
+    history = await store.get_conversation_history(limit=300)
+    assert sorted(m.id for m in history) == [f"new{i}" for i in range(5)]
+    assert await store.search_messages("ancient") == []
+    assert await store.fetch(Message, "old_note", namespace="notes") is not None
+    (row,) = await store.aggregate_metrics(
+        granularity="day", end=NOW - timedelta(days=30)
+    )
+    assert row["count"] == 2  # Day rollups outlive the records
+    assert len(await store.aggregate_metrics(granularity="minute")) == 1
+
+    stats = store.stats()["retention"]
+    assert stats["count"] == 2
+    assert stats["deleted"] == 203
+    assert stats["last"]["reclaimed_bytes"] == result.reclaimed_bytes
+    await store.close()
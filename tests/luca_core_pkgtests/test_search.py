@@ -0,0 +1,188 @@
+"""Tests for full-text search in the SQLite context store."""
+
+import sqlite3
+
+import pytest
+
+from luca_core.context.search import match_expression, search_text
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.schemas import Message, MessageRole, TaskResult
+
+
+def message(id, content):
+    return Message(id=id, role=MessageRole.USER, content=content)
+
+
+def result(task_id, result, error_message=None):
+    return TaskResult(
+        task_id=task_id,
+        success=error_message is None,
+        result=result,
+        error_message=error_message,
+        execution_time_ms=1,
+    )
+
+
+async def open_store(path, **kwargs):
+    store = SQLiteContextStore(str(path), backup_interval=0, **kwargs)
+    await store.initialize()
+    return store
+
+
+def test_search_text_and_query():
+    """Test text extraction and query sanitizing."""
+    text = search_text(
+        {"result": {"file": "a.py", "lines": ["x = 1", 2]}, "error_message": "boom"}
+    )
+    assert text.split("\n") == ["a.py", "x = 1", "boom"]
+    assert match_expression('deploy* OR "x" NEAR(') == '"deploy" "OR" "x" "NEAR"'
+    assert match_expression(" -- ") is None
+
+
+@pytest.mark.asyncio
+async def test_search_follows_writes(tmp_path):
+    """Test that stores, updates and deletes keep the index in sync."""
+    store = await open_store(tmp_path / "search.db")
+    await store.store_many(
+        [
+            message("m1", "How do I deploy the staging cluster?"),
+            message("m2", "Deploying needs the deploy key; deploy from CI."),
+            message("m3", "Unrelated chatter"),
+        ],
+        namespace="conversation",
+    )
+    await store.store(
+        result("t1", {"stdout": "deployed 3 services"}), namespace="task_results"
+    )
+    # Other namespaces are not indexed
+    await store.store(message("d1", "deploy"), namespace="default")
+
+    hits = await store.search_messages("deploy")
+    # Porter stemming folds "deploying" and "deployed" into "deploy"
+    assert (hits[0].namespace, hits[0].key) == ("conversation", "m2")
+    assert sorted(hit.model_type for hit in hits) == ["Message"] * 2 + ["TaskResult"]
+    assert "[deploy]" in hits[0].snippet
+    assert hits[0].rank <= hits[1].rank
+
+    hits = await store.search_messages("deploy", namespace="task_results")
+    assert [hit.model_type for hit in hits] == ["TaskResult"]
+    hits = await store.search_messages("cluster staging", limit=5)
+    assert [hit.key for hit in hits] == ["m1"]
+
+    await store.update(message("m1", "Rolled back"), namespace="conversation")
+    await store.update(message("missing", "deploy"), namespace="conversation")
+    await store.delete(Message, "m2", namespace="conversation")
+    hits = await store.search_messages("deploy", namespace="conversation")
+    assert hits == []
+    assert [hit.key for hit in await store.search_messages("rolled")] == ["m1"]
+    # The external-content index matches the text it was built from
+    await store._engine.run_write(
+        lambda conn: conn.execute(
+            "INSERT INTO search_fts (search_fts) VALUES ('integrity-check')"
+        )
+    )
+
+    with pytest.raises(ValueError, match="not searchable"):
+        await store.search_messages("deploy", namespace="default")
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_common_words_rank_newest_matches(tmp_path):
+    """Test the bounded ranking used when every query word is common."""
+    store = await open_store(tmp_path / "common.db")
+    store.SEARCH_MAX_RANKED = 5
+    await store.store_many(
+        [message(f"m{i}", f"status update {i} " + "padding " * i) for i in range(8)]
+        + [message("m8", "status update status update")],
+        namespace="conversation",
+    )
+    hits = await store.search_messages("status update", limit=3)
+    # Only the five newest matches are ranked: repeats, then shorter texts
+    assert [hit.key for hit in hits] == ["m8", "m4", "m5"]
+    assert hits[0].rank < hits[1].rank < hits[2].rank
+    assert "[status] [update]" in hits[0].snippet
+
+    # A selective word ranks every match with FTS5's bm25()
+    await store.store(message("r1", "rare status update"), namespace="conversation")
+    hits = await store.search_messages("rare update")
+    assert [hit.key for hit in hits] == ["r1"]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_search_reads_write_behind_writes(tmp_path):
+    """Test that a search waits for pending write-behind writes."""
+    store = await open_store(tmp_path / "wb.db", write_behind={"max_delay_ms": 50})
+    await store.store(message("m1", "pending write"), namespace="conversation")
+    assert [hit.key for hit in await store.search_messages("pending")] == ["m1"]
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_backfill_indexes_existing_rows(tmp_path):
+    """Test indexing rows written while a namespace was not searchable."""
+    path = tmp_path / "backfill.db"
+    store = await open_store(
+        path, search_namespaces=[], codecs={"conversation": {"compress_above": 10}}
+    )
+    await store.store_many(
+        [message(f"m{i}", f"note number {i}") for i in range(25)],
+        namespace="conversation",
+    )
+    await store.close()
+
+    store = await open_store(path)
+    store.SEARCH_BACKFILL_BATCH_SIZE = 10
+    await store._search_task
+    hits = await store.search_messages("note 7")
+    assert [hit.key for hit in hits] == ["m7"]
+    assert len(await store.search_messages("note", limit=100)) == 25
+    await store.close()
+
+    # Finished namespaces are not backfilled again; dropped ones are removed
+    store = await open_store(path)
+    assert store._search_task is None
+    await store.close()
+    store = await open_store(path, search_namespaces=["task_results"])
+    assert await store.search_messages("note", namespace="task_results") == []
+    await store.close()
+    store = await open_store(path)
+    await store._search_task
+    assert len(await store.search_messages("note", limit=100)) == 25
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_legacy_rows_are_indexed_after_migration(tmp_path):
+    """Test that rows migrated from the two-table layout become searchable."""
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE metadata (namespace TEXT NOT NULL, model_type TEXT NOT NULL, "
+        "key TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL, "
+        "PRIMARY KEY (namespace, model_type, key))"
+    )
+    conn.execute(
+        "CREATE TABLE data (namespace TEXT NOT NULL, model_type TEXT NOT NULL, "
+        "key TEXT NOT NULL, data TEXT NOT NULL, "
+        "PRIMARY KEY (namespace, model_type, key))"
+    )
+    for i in range(3):
+        conn.execute(
+            "INSERT INTO metadata VALUES ('conversation', 'Message', ?, ?, ?)",
+            (f"m{i}", "2025-01-01T00:00:00", "2025-01-01T00:00:00"),
+        )
+        conn.execute(
+            "INSERT INTO data VALUES ('conversation', 'Message', ?, ?)",
+            (f"m{i}", message(f"m{i}", f"legacy note {i}").model_dump_json()),
+        )
+    conn.commit()
+    conn.close()
+
+    store = await open_store(path)
+    await store._search_task
+    assert not store._legacy
+    hits = await store.search_messages("legacy note 2")
+    assert [hit.key for hit in hits] == ["m2"]
+    await store.close()
@@ -0,0 +1,119 @@
+"""Tests for the sharded SQLite context store."""
+
+from datetime import datetime
+
+import pytest
+
+from luca_core.context.factory import create_async_context_store
+from luca_core.context.sharded import ShardedContextStore, partition, resolve_shards
+from luca_core.schemas import Message, MessageRole, MetricRecord, Task
+
+
+def message(i, content="hello"):
+    return Message(id=f"m{i:03d}", role=MessageRole.USER, content=f"{content} {i}")
+
+
+def test_resolve_shards():
+    """Test shard layout validation and key partitioning."""
+    assert resolve_shards(None)["metrics"] == 1
+    assert resolve_shards({}) == {}
+    with pytest.raises(ValueError, match="Invalid"):
+        resolve_shards({"../x": 1})
+    with pytest.raises(ValueError, match="at least 1"):
+        resolve_shards({"tasks": 0})
+    assert partition("m001", 4) == partition("m001", 4) < 4
+
+
+@pytest.mark.asyncio
+async def test_routing_and_merged_reads(tmp_path):
+    """Test that partitioned reads merge into a single store's order."""
+    path = tmp_path / "context.db"
+    store = ShardedContextStore(
+        str(path), shards={"conversation": 3, "metrics": 1}, backup_interval=0
+    )
+    await store.initialize()
+    messages = [message(i) for i in range(40)]
+    await store.store_many(messages[:20], namespace="conversation")
+    for item in messages[20:]:
+        await store.store(item, namespace="conversation")
+    await store.store(Task(id="t", agent_id="a", description="d"), namespace="tasks")
+
+    for i in range(3):
+        assert (
+            tmp_path / "context.shards" / f"conversation.{i}" / "context.db"
+        ).exists()
+    assert (tmp_path / "context.shards" / "metrics" / "context.db").exists()
+    assert (await store.main.fetch(Task, "t", namespace="tasks")).id == "t"
+    shard = store.shard("conversation", "m007")
+    assert (await shard.fetch(Message, "m007", namespace="conversation")).id == "m007"
+    assert (await store.fetch(Message, "m007", namespace="conversation")).id == "m007"
+
+    def ids(models):
+        return [model.id for model in models]
+
+    newest = ids(await store.list(Message, "conversation", 100))
+    assert newest[:20] == [f"m{i:03d}" for i in range(39, 19, -1)]
+    assert sorted(newest) == ids(messages)
+    assert ids(await store.list(Message, "conversation", 10, 15)) == newest[15:25]
+    paged, cursor = [], None
+    while True:
+        page = await store.list_page(Message, "conversation", limit=7, cursor=cursor)
+        paged += ids(page.items)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert paged == newest
+    streamed = [item.id async for item in store.aiter_models(Message, "conversation")]
+    assert streamed == paged
+
+    await store.delete_many(Message, ["m000", "m001", "m002"], "conversation")
+    assert len(await store.list(Message, "conversation", 100)) == 37
+    hits = await store.search_messages("hello", limit=5)
+    assert len(hits) == 5
+    assert sorted(hit.rank for hit in hits) == [hit.rank for hit in hits]
+
+    metric = MetricRecord(
+        task_id="t",
+        latency_ms=10,
+        error_count=0,
+        tokens_used=1,
+        completion_status="success",
+        domain="general",
+        learning_mode="pro",
+        timestamp=datetime(2024, 6, 1),
+    )
+    await store.record_metrics([metric, metric])
+    assert len(await store.metrics_store.get_metrics_for_task("t")) == 2
+    assert (await store.aggregate_metrics())[0]["count"] == 2
+    assert set(store.stats()) == {"main", "conversation.0", "conversation.1"} | {
+        "conversation.2",
+        "metrics",
+    }
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_layout_changes_are_refused(tmp_path):
+    """Test that a changed partition count or stranded rows stop initialize."""
+    path = str(tmp_path / "context.db")
+    store = ShardedContextStore(path, shards={"conversation": 2}, backup_interval=0)
+    await store.initialize()
+    await store.store(message(1), namespace="tasks")
+    await store.close()
+
+    with pytest.raises(ValueError, match="migration"):
+        await ShardedContextStore(
+            path, shards={"conversation": 4}, backup_interval=0
+        ).initialize()
+    with pytest.raises(ValueError, match="rows in the main database"):
+        await ShardedContextStore(
+            path, shards={"conversation": 2, "tasks": 1}, backup_interval=0
+        ).initialize()
+
+    store = await create_async_context_store(
+        "sqlite_sharded",
+        config={"path": path, "shards": {"conversation": 2}, "backup_interval": 0},
+    )
+    assert isinstance(store, ShardedContextStore)
+    assert (await store.fetch(Message, "m001", namespace="tasks")).id == "m001"
+    await store.close()
@@ -0,0 +1,119 @@
+"""Tests for online backups of the SQLite context store."""
+
+import asyncio
+import gzip
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from pydantic import BaseModel
+
+from luca_core.context.sqlite_backup import (
+    backup_path,
+    prune_backups,
+    resolve_backup_params,
+)
+from luca_core.context.sqlite_store import SQLiteContextStore
+
+
+class SampleModel(BaseModel):
+    id: str
+    payload: str
+
+
+async def open_store(tmp_path, **backup):
+    store = SQLiteContextStore(
+        str(tmp_path / "context.db"), backup_interval=0, backup=backup
+    )
+    await store.initialize()
+    await store.store_many(
+        [SampleModel(id=str(i), payload="x" * 1000) for i in range(500)]
+    )
+    return store
+
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        return conn.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_resolve_backup_params():
+    """Test defaults, overrides and validation of backup settings."""
+    params = resolve_backup_params({"keep": "3", "compress": 1})
+    assert params["keep"] == 3
+    assert params["compress"] is True
+    assert params["pages_per_step"] == 256
+
+    with pytest.raises(ValueError, match="Unsupported"):
+        resolve_backup_params({"pages": 10})
+    with pytest.raises(ValueError, match="keep"):
+        resolve_backup_params({"keep": 0})
+    with pytest.raises(ValueError, match="pages_per_step"):
+        resolve_backup_params({"pages_per_step": 0})
+
+
+@pytest.mark.asyncio
+async def test_backup_does_not_block_writes(tmp_path):
+    """Test that writes complete while a slow backup is still copying."""
+    store = await open_store(tmp_path, pages_per_step=4, step_delay_ms=2)
+    backup = asyncio.ensure_future(store._create_backup())
+    await asyncio.sleep(0.05)
+
+    await store.store_many([SampleModel(id=f"new{i}", payload="y") for i in range(10)])
+    assert not backup.done()
+
+    result = await backup
+    assert result.steps > 1
+    assert result.max_step_ms <= result.lock_ms <= result.duration_ms
+    # The backup is the snapshot taken when it started
+    assert count_rows(result.path) == 500
+    assert not [name for name in os.listdir(tmp_path / "backups") if "partial" in name]
+
+    stats = store.stats()["backup"]
+    assert stats["count"] == 1
+    assert stats["last"]["foreground_ops"] >= 1
+    assert stats["last"]["steps"] == result.steps
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_compressed_backup_with_retention(tmp_path):
+    """Test gzip output and keeping only the newest backups."""
+    store = await open_store(tmp_path, compress=True, keep=2)
+    results = [await store._create_backup() for _ in range(3)]
+    await store.close()
+
+    names = sorted(os.listdir(tmp_path / "backups"))
+    assert names == sorted(os.path.basename(r.path) for r in results[1:])
+    assert all(name.endswith(".db.gz") for name in names)
+
+    restored = tmp_path / "restored.db"
+    with gzip.open(results[-1].path, "rb") as src:
+        restored.write_bytes(src.read())
+    assert count_rows(restored) == 500
+    assert results[-1].size_bytes < os.path.getsize(tmp_path / "context.db")
+
+
+def test_prune_backups_by_age(tmp_path):
+    """Test age-based retention, leaving unrelated files alone."""
+    now = datetime(2025, 6, 10)
+    paths = [
+        backup_path(str(tmp_path), now - timedelta(days=days), compress=False)
+        for days in (0, 2, 5, 9)
+    ]
+    for path in paths + [str(tmp_path / "notes.txt")]:
+        open(path, "w").close()
+
+    deleted = prune_backups(str(tmp_path), max_age_days=4, now=now)
+    assert sorted(deleted) == sorted(paths[2:])
+
+    deleted = prune_backups(str(tmp_path), keep=1, max_age_days=30, now=now)
+    assert deleted == [paths[1]]
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [os.path.basename(paths[0]), "notes.txt"]
+    )
@@ -0,0 +1,289 @@
+"""Tests for the WAL-mode SQLite connection engine."""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+import pytest_asyncio
+from pydantic import BaseModel
+
+from luca_core.context.sqlite_engine import (
+    DEFAULT_CONNECTION_PARAMS,
+    DEFAULT_GROUP_COMMIT,
+    SQLiteEngine,
+    resolve_connection_params,
+    resolve_group_commit,
+)
+from luca_core.context.sqlite_store import SQLiteContextStore
+
+
+class SampleModel(BaseModel):
+    id: str
+    name: str
+
+
+class TestResolveConnectionParams:
+    """Test cases for pragma profile validation."""
+
+    def test_defaults(self):
+        """Test that no overrides yields the default profile."""
+        assert resolve_connection_params() == DEFAULT_CONNECTION_PARAMS
+
+    def test_overrides_are_normalized(self):
+        """Test that overrides are merged and normalized."""
+        params = resolve_connection_params(
+            {"synchronous": "FULL", "cache_size": "-2000", "read_pool_size": 2}
+        )
+        assert params["synchronous"] == "full"
+        assert params["cache_size"] == -2000
+        assert params["read_pool_size"] == 2
+        assert params["journal_mode"] == "wal"
+
+    @pytest.mark.parametrize(
+        "overrides",
+        [
+            {"unknown": 1},
+            {"journal_mode": "wal; DROP TABLE data"},
+            {"synchronous": "sometimes"},
+            {"mmap_size": -1},
+            {"busy_timeout": "soon"},
+            {"read_pool_size": 0},
+        ],
+    )
+    def test_invalid_values(self, overrides):
+        """Test that invalid overrides are rejected."""
+        with pytest.raises(ValueError):
+            resolve_connection_params(overrides)
+
+
+class TestSQLiteEngine:
+    """Test cases for SQLiteEngine."""
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        """Create an open engine on a temporary database."""
+        engine = SQLiteEngine(
+            str(tmp_path / "engine.db"),
+            {"read_pool_size": 2, "busy_timeout": 1234, "cache_size": -4000},
+        )
+        engine.open()
+        yield engine
+        engine.close()
+
+    def test_open_enables_wal(self, engine):
+        """Test that the writer switches the database to WAL mode."""
+        mode = engine.writer.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_pragmas_applied_to_readers(self, engine):
+        """Test that reader connections share the pragma profile."""
+        with engine.reader() as conn:
+            assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -4000
+
+    def test_readers_are_read_only(self, engine):
+        """Test that pooled connections cannot write."""
+        engine.writer.execute("CREATE TABLE t (x INTEGER)")
+        engine.writer.commit()
+        with engine.reader() as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO t VALUES (1)")
+
+    @pytest.mark.asyncio
+    async def test_run_read_sees_committed_writes(self, engine):
+        """Test that reads observe data committed by the writer."""
+        engine.writer.execute("CREATE TABLE t (x INTEGER)")
+        engine.writer.execute("INSERT INTO t VALUES (42)")
+        engine.writer.commit()
+
+        value = await engine.run_read(
+            lambda conn: conn.execute("SELECT x FROM t").fetchone()[0]
+        )
+        assert value == 42
+
+    @pytest.mark.asyncio
+    async def test_run_write_commits_on_writer_thread(self, engine):
+        """Test that write requests run on the writer thread and commit."""
+        main_thread = threading.get_ident()
+
+        def _write(conn):
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.execute("INSERT INTO t VALUES (7)")
+            return threading.get_ident()
+
+        writer_thread = await engine.run_write(_write)
+        assert writer_thread != main_thread
+
+        value = await engine.run_read(
+            lambda conn: conn.execute("SELECT x FROM t").fetchone()[0]
+        )
+        assert value == 7
+        assert engine.stats()["writes"]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_run_write_rolls_back_on_error(self, engine):
+        """Test that a failing write request leaves no partial changes."""
+        await engine.run_write(lambda conn: conn.execute("CREATE TABLE t (x)"))
+
+        def _fail(conn):
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError, match="boom"):
+            await engine.run_write(_fail)
+
+        count = await engine.run_read(
+            lambda conn: conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+        )
+        assert count == 0
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reads_are_all_counted(self, engine):
+        """Test that reads recorded by several pool threads are not lost."""
+        reads = [
+            engine.run_read(lambda conn: conn.execute("SELECT 1")) for _ in range(200)
+        ]
+        await asyncio.gather(*reads)
+        assert engine.stats()["reads"]["count"] == 200
+
+    @pytest.mark.asyncio
+    async def test_slow_write_does_not_block_event_loop(self, engine):
+        """Test that the loop keeps running while the writer is busy."""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        try:
+            await engine.run_write(lambda conn: time.sleep(0.3))
+        finally:
+            ticker_task.cancel()
+
+        assert ticks >= 10
+
+    def test_close_drains_pending_writes(self, engine):
+        """Test that close waits for queued writes to finish."""
+        engine.submit_write(lambda conn: conn.execute("CREATE TABLE t (x)"))
+        future = engine.submit_write(
+            lambda conn: conn.execute("INSERT INTO t VALUES (1)")
+        )
+        engine.close()
+        assert future.done() and future.exception() is None
+
+    def test_close_is_idempotent(self, engine):
+        """Test that closing twice does not raise."""
+        engine.close()
+        engine.close()
+        assert not engine.is_open
+
+
+class TestConcurrentReads:
+    """Test that reads proceed while the writer is busy."""
+
+    @pytest_asyncio.fixture
+    async def store(self, tmp_path):
+        """Create a store with a small reader pool."""
+        store = SQLiteContextStore(
+            db_path=str(tmp_path / "context.db"),
+            backup_interval=0,
+            connection_params={"read_pool_size": 2},
+        )
+        await store.initialize()
+        yield store
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_reads_do_not_wait_for_writer(self, store):
+        """Test that fetch and list complete while the writer is busy."""
+        await store.store(SampleModel(id="a", name="first"))
+
+        release = threading.Event()
+        blocked = store._engine.submit_write(lambda conn: release.wait(5))
+        try:
+            fetched = await asyncio.wait_for(store.fetch(SampleModel, "a"), timeout=5)
+            listed = await asyncio.wait_for(store.list(SampleModel), timeout=5)
+        finally:
+            release.set()
+        await asyncio.wrap_future(blocked)
+
+        assert fetched is not None and fetched.name == "first"
+        assert [m.id for m in listed] == ["a"]
+
+
+class TestGroupCommit:
+    """Test cases for group commits on the writer thread."""
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        """Create an engine that groups writes for up to 50 ms."""
+        engine = SQLiteEngine(
+            str(tmp_path / "group.db"), group_commit={"max_delay_ms": 50}
+        )
+        engine.open()
+        engine.submit_write(lambda conn: conn.execute("CREATE TABLE t (x)")).result()
+        yield engine
+        engine.close()
+
+    def test_resolve_group_commit(self):
+        """Test threshold defaults and validation."""
+        assert resolve_group_commit({}) == DEFAULT_GROUP_COMMIT
+        assert resolve_group_commit({"max_batch": "8"})["max_batch"] == 8
+        for overrides in ({"max_batch": 0}, {"max_delay_ms": -1}, {"other": 1}):
+            with pytest.raises(ValueError):
+                resolve_group_commit(overrides)
+
+    @pytest.mark.asyncio
+    async def test_grouped_writes_share_commits(self, engine):
+        """Test that concurrent grouped writes are committed together."""
+        commits = engine.commits
+
+        def _insert(value):
+            return lambda conn: conn.execute("INSERT INTO t VALUES (?)", (value,))
+
+        await asyncio.gather(
+            *(engine.run_write(_insert(i), group=True) for i in range(100))
+        )
+
+        assert engine.commits - commits < 10
+        count = await engine.run_read(
+            lambda conn: conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+        )
+        assert count == 100
+
+    @pytest.mark.asyncio
+    async def test_failure_only_rolls_back_its_own_write(self, engine):
+        """Test that one failing request does not abort its batch."""
+
+        def _fail(conn):
+            conn.execute("INSERT INTO t VALUES ('lost')")
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            engine.run_write(
+                lambda conn: conn.execute("INSERT INTO t VALUES ('a')"), group=True
+            ),
+            engine.run_write(_fail, group=True),
+            engine.run_write(
+                lambda conn: conn.execute("INSERT INTO t VALUES ('b')"), group=True
+            ),
+            return_exceptions=True,
+        )
+
+        assert isinstance(results[1], RuntimeError)
+        rows = await engine.run_read(
+            lambda conn: conn.execute("SELECT x FROM t ORDER BY x").fetchall()
+        )
+        assert [row[0] for row in rows] == ["a", "b"]
+
+    def test_ungrouped_write_ends_batch(self, engine):
+        """Test that an ungrouped request is not held for the group delay."""
+        engine.submit_write(lambda conn: conn.execute("INSERT INTO t VALUES (1)"), True)
+        started = time.perf_counter()
+        engine.submit_write(lambda conn: None).result()
+        assert time.perf_counter() - started < 0.05
@@ -0,0 +1,147 @@
+"""Tests for the single-table layout and migration from the two-table layout."""
+
+import sqlite3
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from pydantic import BaseModel
+
+from luca_core.context.sqlite_schema import has_legacy_tables, to_timestamp
+from luca_core.context.sqlite_store import SQLiteContextStore
+
+
+class SampleModel(BaseModel):
+    id: str
+    name: str
+
+
+def create_legacy_db(path, count=5):
+    """Create a database in the two-table layout with ``count`` models."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE metadata (namespace TEXT NOT NULL, model_type TEXT NOT NULL, "
+        "key TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL, "
+        "PRIMARY KEY (namespace, model_type, key))"
+    )
+    conn.execute(
+        "CREATE TABLE data (namespace TEXT NOT NULL, model_type TEXT NOT NULL, "
+        "key TEXT NOT NULL, data TEXT NOT NULL, "
+        "PRIMARY KEY (namespace, model_type, key))"
+    )
+    for i in range(count):
+        stamp = datetime(2025, 1, 1, 0, 0, i).isoformat()
+        conn.execute(
+            "INSERT INTO metadata VALUES ('default', 'SampleModel', ?, ?, ?)",
+            (f"m{i}", stamp, stamp),
+        )
+        conn.execute(
+            "INSERT INTO data VALUES ('default', 'SampleModel', ?, ?)",
+            (f"m{i}", SampleModel(id=f"m{i}", name=f"legacy{i}").model_dump_json()),
+        )
+    # A metadata row that never got a document
+    conn.execute(
+        "INSERT INTO metadata VALUES ('default', 'SampleModel', 'orphan', '', '')"
+    )
+    conn.commit()
+    conn.close()
+
+
+async def open_store(path, migrate=True):
+    """Open a store, optionally holding back the background migration."""
+    store = SQLiteContextStore(str(path), backup_interval=0)
+    store.MIGRATION_BATCH_SIZE = 2
+    if migrate:
+        await store.initialize()
+    else:
+        with patch.object(store, "_migrate", AsyncMock()):
+            await store.initialize()
+    return store
+
+
+def test_to_timestamp():
+    """Test that naive datetimes are treated as UTC microseconds."""
+    assert to_timestamp(datetime(1970, 1, 1, 0, 0, 1, 5)) == 1000005
+    aware = datetime(1970, 1, 1, 1, tzinfo=timezone.utc)
+    assert to_timestamp(aware) == 3600 * 1000000
+
+
+@pytest.mark.asyncio
+async def test_new_database_has_single_table(tmp_path):
+    """Test that list() is an ordered index scan without a join."""
+    store = await open_store(tmp_path / "new.db")
+    sql, params = store._select_sql(SampleModel, "default", {}, 10, 0)
+    plan = await store._engine.run_read(
+        lambda conn: conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    )
+    await store.close()
+
+    details = [row[3] for row in plan]
+    assert details == [
+        "SEARCH models USING INDEX idx_models_recent (namespace=? AND model_type=?)"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_legacy_database_is_migrated(tmp_path):
+    """Test the background migration of a two-table database."""
+    path = tmp_path / "legacy.db"
+    create_legacy_db(path)
+
+    store = await open_store(path)
+    await store._migration_task
+    assert not store._legacy
+
+    rows = await store._engine.run_read(
+        lambda conn: conn.execute(
+            "SELECT key, created_at, updated_at FROM models ORDER BY key"
+        ).fetchall()
+    )
+    assert [row["key"] for row in rows] == ["m0", "m1", "m2", "m3", "m4"]
+    assert rows[3]["updated_at"] == to_timestamp(datetime(2025, 1, 1, 0, 0, 3))
+
+    listed = await store.list(SampleModel)
+    assert [m.id for m in listed] == ["m4", "m3", "m2", "m1", "m0"]
+    await store.close()
+
+    # The emptied legacy tables are dropped on the next start
+    store = await open_store(path)
+    assert not await store._engine.run_read(has_legacy_tables)
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_store_is_usable_during_migration(tmp_path):
+    """Test reads and writes while rows are still in the legacy layout."""
+    path = tmp_path / "legacy.db"
+    create_legacy_db(path)
+    store = await open_store(path, migrate=False)
+    assert store._legacy
+
+    assert (await store.fetch(SampleModel, "m1")).name == "legacy1"
+
+    await store.store(SampleModel(id="m0", name="rewritten"))
+    await store.update(SampleModel(id="m2", name="updated"))
+    await store.delete(SampleModel, "m3")
+    await store.store(SampleModel(id="new", name="new"))
+
+    expected = [
+        ("m2", "updated"),
+        ("m0", "rewritten"),
+        ("new", "new"),
+        ("m4", "legacy4"),
+        ("m1", "legacy1"),
+    ]
+    listed = await store.list(SampleModel)
+    assert sorted((m.id, m.name) for m in listed) == sorted(expected)
+    assert listed[-2:] == [
+        SampleModel(id="m4", name="legacy4"),
+        SampleModel(id="m1", name="legacy1"),
+    ]
+    assert [m.id for m in await store.query(SampleModel, {"name": "legacy4"})] == ["m4"]
+
+    await store._migrate()
+    assert not store._legacy
+    listed = await store.list(SampleModel)
+    assert sorted((m.id, m.name) for m in listed) == sorted(expected)
+    await store.close()
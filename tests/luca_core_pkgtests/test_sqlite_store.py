@@ -73,7 +73,7 @@ class TestSQLiteContextStore:
         await store.initialize()
 
         assert store.db_path == temp_db_path
-        assert store.conn is not None
+        assert store._engine.is_open
         assert os.path.exists(temp_db_path)
 
         await store.close()
@@ -94,7 +94,7 @@ class TestSQLiteContextStore:
     async def test_close(self, store_with_backup):
         """Test closing the store."""
         await store_with_backup.close()
-        assert store_with_backup.conn is None
+        assert not store_with_backup._engine.is_open
         # The backup task should be None after close
         assert store_with_backup._backup_task is None
 
@@ -173,7 +173,7 @@ class TestSQLiteContextStore:
 
         backup_path = os.path.join(backup_dir, backup_files[0])
         conn = sqlite3.connect(backup_path)
-        cursor = conn.execute("SELECT COUNT(*) FROM data")
+        cursor = conn.execute("SELECT COUNT(*) FROM models")
         count = cursor.fetchone()[0]
         conn.close()
         assert count == 1
@@ -219,17 +219,14 @@ class TestSQLiteContextStore:
     @pytest.mark.asyncio
     async def test_fetch_deserialization_error(self, store):
         """Test handling deserialization errors."""
-        # Manually insert invalid data
-        await store._lock.acquire()
-        try:
-            store.conn.execute(
-                "INSERT INTO data (namespace, model_type, key, data) "
-                "VALUES (?, ?, ?, ?)",
-                ("default", "SampleModel", "invalid", "invalid json"),
+        # Manually insert data that does not validate as a SampleModel
+        await store._engine.run_write(
+            lambda conn: conn.execute(
+                "INSERT INTO models (namespace, model_type, key, "
+                "created_at, updated_at, data) VALUES (?, ?, ?, 0, 0, ?)",
+                ("default", "SampleModel", "invalid", '{"id": "invalid"}'),
             )
-            store.conn.commit()
-        finally:
-            store._lock.release()
+        )
 
         # Try to fetch the invalid data
         retrieved = await store.fetch(SampleModel, "invalid")
@@ -310,28 +307,15 @@ class TestSQLiteContextStore:
         valid_model = SampleModel(id="valid", name="Valid Model")
         await store.store(valid_model)
 
-        # Manually insert invalid data
-        await store._lock.acquire()
-        try:
-            store.conn.execute(
-                "INSERT INTO data (namespace, model_type, key, data) "
-                "VALUES (?, ?, ?, ?)",
-                ("default", "SampleModel", "invalid", "invalid json"),
-            )
-            store.conn.execute(
-                "INSERT INTO metadata (namespace, model_type, key, "
-                "created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
-                (
-                    "default",
-                    "SampleModel",
-                    "invalid",
-                    datetime.utcnow().isoformat(),
-                    datetime.utcnow().isoformat(),
-                ),
+        # Manually insert data that does not validate as a SampleModel
+        def _insert_invalid(conn):
+            conn.execute(
+                "INSERT INTO models (namespace, model_type, key, "
+                "created_at, updated_at, data) VALUES (?, ?, ?, 0, 0, ?)",
+                ("default", "SampleModel", "invalid", '{"id": "invalid"}'),
             )
-            store.conn.commit()
-        finally:
-            store._lock.release()
+
+        await store._engine.run_write(_insert_invalid)
 
         # List should skip the invalid model
         models = await store.list(SampleModel)
@@ -430,3 +414,361 @@ class TestSQLiteContextStore:
 
         # Double close - should not raise
         await store.close()
+
+    @pytest.mark.asyncio
+    async def test_query_operators(self, store):
+        """Test range and membership lookups are applied in SQL."""
+        for i in range(10):
+            await store.store(SampleModel(id=f"op{i}", name=f"n{i % 3}", value=i))
+
+        in_range = await store.query(SampleModel, {"value__gte": 3, "value__lt": 6})
+        assert sorted(m.value for m in in_range) == [3, 4, 5]
+
+        names = await store.query(SampleModel, {"name__in": ["n0", "n2"]}, limit=100)
+        assert sorted(m.id for m in names) == [
+            "op0",
+            "op2",
+            "op3",
+            "op5",
+            "op6",
+            "op8",
+            "op9",
+        ]
+
+        assert await store.query(SampleModel, {"value__in": []}) == []
+
+    @pytest.mark.asyncio
+    async def test_query_beyond_first_thousand_rows(self, store):
+        """Test that matches older than the newest 1000 rows are found."""
+        from luca_core.schemas import Task, TaskStatus
+
+        await store.store_task(Task(id="old", agent_id="luca", description="old"))
+        for i in range(1100):
+            await store.store_task(
+                Task(
+                    id=f"done{i}",
+                    agent_id="luca",
+                    description="done",
+                    status=TaskStatus.COMPLETED,
+                )
+            )
+
+        pending = await store.get_pending_tasks()
+        assert [t.id for t in pending] == ["old"]
+
+    @pytest.mark.asyncio
+    async def test_query_does_not_deserialize_non_matching_rows(self, store):
+        """Test that only matching rows reach model validation."""
+        for i in range(20):
+            await store.store(SampleModel(id=f"d{i}", name="x", value=i))
+
+        with patch.object(
+            store, "_deserialize_model", wraps=store._deserialize_model
+        ) as spy:
+            result = await store.query(SampleModel, {"value": 7})
+
+        assert [m.id for m in result] == ["d7"]
+        assert spy.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_pending_clarification_requests(self, store):
+        """Test boolean filters on real schemas."""
+        from luca_core.schemas import ClarificationRequest
+
+        for i, resolved in enumerate([False, True, False]):
+            await store.request_clarification(
+                ClarificationRequest(
+                    id=f"c{i}",
+                    task_id="t",
+                    agent_id="luca",
+                    question="?",
+                    resolved=resolved,
+                )
+            )
+
+        pending = await store.get_pending_clarification_requests()
+        assert sorted(r.id for r in pending) == ["c0", "c2"]
+
+    @pytest.mark.asyncio
+    async def test_bulk_operations(self, store):
+        """Test store_many, update_many and delete_many."""
+        models = [SampleModel(id=f"b{i}", name=f"n{i}", value=i) for i in range(5)]
+        # A later model with the same key wins
+        await store.store_many([*models, SampleModel(id="b0", name="last")])
+
+        fetched = await store.list(SampleModel, limit=10)
+        assert sorted(m.id for m in fetched) == ["b0", "b1", "b2", "b3", "b4"]
+        assert (await store.fetch(SampleModel, "b0")).name == "last"
+
+        for model in models:
+            model.value = model.value * 10
+        await store.update_many(models[1:3] + [SampleModel(id="missing", name="x")])
+        assert (await store.fetch(SampleModel, "b2")).value == 20
+        assert (await store.fetch(SampleModel, "b3")).value == 3
+        assert await store.fetch(SampleModel, "missing") is None
+
+        await store.delete_many(SampleModel, ["b1", "b2", "missing"])
+        remaining = await store.list(SampleModel, limit=10)
+        assert sorted(m.id for m in remaining) == ["b0", "b3", "b4"]
+
+        # Empty batches are no-ops
+        await store.store_many([])
+        await store.update_many([])
+        await store.delete_many(SampleModel, [])
+
+    @pytest.mark.asyncio
+    async def test_store_many_single_transaction(self, store):
+        """Test that a batch is one write and is applied atomically."""
+        writes = store.stats()["writes"]["count"]
+        models = [SampleModel(id=f"t{i}", name="n") for i in range(100)]
+        await store.store_many(models)
+        assert store.stats()["writes"]["count"] == writes + 1
+
+        # The last row is rejected by SQLite, so the whole batch rolls back
+        original = store._serialize_model
+        batch = [SampleModel(id="ok", name="n"), SampleModel(id="bad", name="n")]
+        with patch.object(
+            store,
+            "_serialize_model",
+            side_effect=lambda m: "not json" if m.id == "bad" else original(m),
+        ):
+            with pytest.raises(Exception):
+                await store.store_many(batch)
+        assert await store.fetch(SampleModel, "ok") is None
+
+
+class TestWriteBehind:
+    """Test cases for SQLiteContextStore in write-behind mode."""
+
+    @pytest_asyncio.fixture
+    async def store(self, tmp_path):
+        """Create a write-behind store that holds batches for 100 ms."""
+        store = SQLiteContextStore(
+            db_path=str(tmp_path / "wb.db"),
+            backup_interval=0,
+            write_behind={"max_delay_ms": 100},
+        )
+        await store.initialize()
+        yield store
+        await store.close()
+
+    async def committed(self, store, key):
+        """Return the committed data for a key, bypassing pending writes."""
+        row = await store._engine.run_read(
+            lambda conn: conn.execute(
+                "SELECT data FROM models WHERE key = ?", (key,)
+            ).fetchone()
+        )
+        return row["data"] if row else None
+
+    @pytest.mark.asyncio
+    async def test_read_your_writes(self, store):
+        """Test that fetch() sees writes that are not committed yet."""
+        await store.store(SampleModel(id="a", name="first"))
+        assert await self.committed(store, "a") is None
+        assert (await store.fetch(SampleModel, "a")).name == "first"
+
+        await store.update(SampleModel(id="a", name="second"))
+        assert (await store.fetch(SampleModel, "a")).name == "second"
+
+        await store.delete(SampleModel, "a")
+        assert await store.fetch(SampleModel, "a") is None
+
+        await store.flush()
+        assert await self.committed(store, "a") is None
+        assert store._pending == {}
+
+    @pytest.mark.asyncio
+    async def test_update_of_committed_row(self, store):
+        """Test that updates of rows that are not pending wait for the write."""
+        await store.update(SampleModel(id="missing", name="x"))
+        assert await store.fetch(SampleModel, "missing") is None
+
+        await store.store(SampleModel(id="b", name="old"))
+        await store.flush()
+        await store.update(SampleModel(id="b", name="new"))
+        assert (await store.fetch(SampleModel, "b")).name == "new"
+
+    @pytest.mark.asyncio
+    async def test_flush_makes_writes_durable(self, store):
+        """Test that flush() returns once everything is committed."""
+        commits = store.stats()["commits"]
+        await asyncio.gather(
+            *(store.store(SampleModel(id=f"m{i}", name="n")) for i in range(50))
+        )
+        await store.flush()
+
+        assert store.stats()["commits"] - commits < 5
+        count = await store._engine.run_read(
+            lambda conn: conn.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+        )
+        assert count == 50
+
+    @pytest.mark.asyncio
+    async def test_list_and_query_see_pending_writes(self, store):
+        """Test that list() and query() wait for pending writes."""
+        await store.store_many([SampleModel(id=f"q{i}", name="n") for i in range(3)])
+        assert len(await store.list(SampleModel)) == 3
+        assert len(await store.query(SampleModel, {"name": "n"})) == 3
+
+    @pytest.mark.asyncio
+    async def test_flush_raises_failed_writes(self, store):
+        """Test that a failed write-behind write surfaces on flush()."""
+        with patch.object(store, "_serialize_model", return_value="not json"):
+            await store.store(SampleModel(id="bad", name="n"))
+        await store.store(SampleModel(id="good", name="n"))
+
+        with pytest.raises(Exception, match="JSON"):
+            await store.flush()
+        assert await store.fetch(SampleModel, "bad") is None
+        assert await store.fetch(SampleModel, "good") is not None
+
+        # The error is reported once
+        await store.flush()
+
+
+class TestKeysetPagination:
+    """Test cases for cursor pagination in SQLiteContextStore."""
+
+    @pytest_asyncio.fixture
+    async def store(self, tmp_path):
+        """Create a store holding 25 models with shared timestamps."""
+        store = SQLiteContextStore(
+            db_path=str(tmp_path / "pages.db"), backup_interval=0
+        )
+        await store.initialize()
+        # Batches share one updated_at, so the key has to break ties
+        for batch in range(5):
+            await store.store_many(
+                [
+                    SampleModel(id=f"m{batch}{i}", name="n", value=i % 2)
+                    for i in range(5)
+                ]
+            )
+        yield store
+        await store.close()
+
+    async def walk(self, store, limit, query=None):
+        """Collect every page, returning the ids and the number of pages."""
+        ids, pages, cursor = [], 0, None
+        while True:
+            if query is None:
+                page = await store.list_page(SampleModel, limit=limit, cursor=cursor)
+            else:
+                page = await store.query_page(
+                    SampleModel, query, limit=limit, cursor=cursor
+                )
+            ids.extend(m.id for m in page.items)
+            pages += 1
+            cursor = page.next_cursor
+            if cursor is None:
+                return ids, pages
+
+    @pytest.mark.asyncio
+    async def test_pages_match_list_order(self, store):
+        """Test that pages concatenate to the list() order."""
+        ids, pages = await self.walk(store, limit=10)
+        assert pages == 3
+        assert ids == [m.id for m in await store.list(SampleModel, limit=100)]
+        assert len(set(ids)) == 25
+
+        # An exact multiple of the limit does not produce an empty last page
+        ids, pages = await self.walk(store, limit=5)
+        assert (len(ids), pages) == (25, 5)
+
+    @pytest.mark.asyncio
+    async def test_query_pages(self, store):
+        """Test that filters apply across pages."""
+        ids, _ = await self.walk(store, limit=4, query={"value": 1})
+        expected = await store.query(SampleModel, {"value": 1}, limit=100)
+        assert ids == [m.id for m in expected]
+        assert len(ids) == 10
+
+    @pytest.mark.asyncio
+    async def test_deep_page_is_index_range(self, store):
+        """Test that a page after a cursor seeks instead of skipping rows."""
+        sql, params = store._select_sql(
+            SampleModel, "default", {}, 11, 0, after=(0, "m00")
+        )
+        plan = await store._engine.run_read(
+            lambda conn: conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        )
+        assert "(updated_at,key)<(?,?)" in plan[0][3]
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, store):
+        """Test that foreign cursors are rejected."""
+        from luca_core.context.pagination import encode_offset_cursor
+
+        with pytest.raises(ValueError):
+            await store.list_page(SampleModel, cursor=encode_offset_cursor(10))
+        with pytest.raises(ValueError):
+            await store.list_page(SampleModel, limit=0)
+
+
+class TestStreaming:
+    """Test cases for aiter_models() and aiter_raw()."""
+
+    @pytest_asyncio.fixture
+    async def store(self, tmp_path):
+        """Create a store holding 23 models and one invalid document."""
+        store = SQLiteContextStore(
+            db_path=str(tmp_path / "stream.db"), backup_interval=0
+        )
+        await store.initialize()
+        await store.store_many(
+            [SampleModel(id=f"m{i:02}", name="n", value=i % 3) for i in range(23)]
+        )
+        await store._engine.run_write(
+            lambda conn: conn.execute(
+                "INSERT INTO models (namespace, model_type, key, "
+                "created_at, updated_at, data) VALUES (?, ?, ?, 0, 0, ?)",
+                ("default", "SampleModel", "invalid", '{"id": "invalid"}'),
+            )
+        )
+        yield store
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_streams_in_batches(self, store):
+        """Test that every model is streamed with one read per batch."""
+        reads = store.stats()["reads"]["count"]
+        ids = [m.id async for m in store.aiter_models(SampleModel, batch_size=5)]
+        # 24 rows in batches of 5
+        assert store.stats()["reads"]["count"] - reads == 5
+
+        expected = await store.list(SampleModel, limit=100)
+        assert ids == [m.id for m in expected]
+        assert len(ids) == 23
+
+    @pytest.mark.asyncio
+    async def test_query_and_early_termination(self, store):
+        """Test filtered streaming and stopping after the first batch."""
+        ids = [
+            m.id
+            async for m in store.aiter_models(
+                SampleModel, query={"value": 0}, batch_size=2
+            )
+        ]
+        assert sorted(ids) == [f"m{i:02}" for i in range(0, 23, 3)]
+
+        reads = store.stats()["reads"]["count"]
+        stream = store.aiter_models(SampleModel, batch_size=4)
+        async for model in stream:
+            break
+        await stream.aclose()
+        assert store.stats()["reads"]["count"] - reads == 1
+
+    @pytest.mark.asyncio
+    async def test_raw_mode_skips_validation(self, store):
+        """Test that raw documents are returned as stored."""
+        with patch.object(store, "_deserialize_model") as deserialize:
+            documents = [d async for d in store.aiter_raw(SampleModel, batch_size=7)]
+        deserialize.assert_not_called()
+
+        assert len(documents) == 24
+        assert '{"id": "invalid"}' in documents
+
+        with pytest.raises(ValueError):
+            async for _ in store.aiter_raw(SampleModel, batch_size=0):
+                pass
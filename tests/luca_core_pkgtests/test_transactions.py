@@ -0,0 +1,143 @@
+"""Tests for transactions and the fused store_task_result()."""
+
+import pytest
+
+from luca_core.context.cache import CachedContextStore
+from luca_core.context.log_store import LogContextStore
+from luca_core.context.sharded import ShardedContextStore
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.context.versions import VersionConflict
+from luca_core.manager.manager import LucaManager
+from luca_core.registry import ToolRegistry
+from luca_core.schemas import Task, TaskResult, TaskStatus
+
+
+def task(id="t1", **fields):
+    return Task(**{"id": id, "agent_id": "a", "description": "d", **fields})
+
+
+def result(task_id="t1", success=True):
+    return TaskResult(
+        task_id=task_id, success=success, result=None, execution_time_ms=5
+    )
+
+
+async def open_store(kind, tmp_path):
+    if kind == "log":
+        store = LogContextStore(
+            str(tmp_path / "context.log"), log={"compact_interval": 0}
+        )
+    elif kind == "sharded":
+        store = ShardedContextStore(
+            str(tmp_path / "context.db"),
+            shards={"tasks": 2, "task_results": 1},
+            backup_interval=0,
+        )
+    else:
+        store = SQLiteContextStore(
+            str(tmp_path / "context.db"),
+            backup_interval=0,
+            write_behind={} if kind == "write_behind" else None,
+            codecs={"tasks": {"compress_above": 64}} if kind == "compressed" else None,
+        )
+    if kind == "cache":
+        store = CachedContextStore(store)
+    await store.initialize()
+    return store
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "kind", ["sqlite", "write_behind", "compressed", "log", "cache", "sharded"]
+)
+async def test_store_task_result(tmp_path, kind):
+    """Test that a result and its task's new status are written together."""
+    store = await open_store(kind, tmp_path)
+    await store.store_many(
+        [task("t1", context={"note": "x" * 100}), task("t2")], namespace="tasks"
+    )
+    # Cached before the result arrives
+    assert (await store.fetch(Task, "t1", "tasks")).status == TaskStatus.PENDING
+
+    # Results are keyed by object identity; keep them alive
+    outcomes = [result("t1"), result("t2", success=False), result("missing")]
+    for outcome in outcomes:
+        await store.store_task_result(outcome)
+
+    completed = await store.fetch(Task, "t1", namespace="tasks")
+    assert completed.status == TaskStatus.COMPLETED and completed.completed_at
+    assert completed.context == {"note": "x" * 100}
+    failed = await store.fetch(Task, "t2", namespace="tasks")
+    assert failed.status == TaskStatus.FAILED and failed.completed_at is None
+    results = await store.list(TaskResult, namespace="task_results")
+    assert sorted(r.task_id for r in results) == ["missing", "t1", "t2"]
+    assert await store.fetch(Task, "missing", namespace="tasks") is None
+    if kind != "cache":
+        assert (await store.fetch_versioned(Task, "t1", "tasks")).version == 2
+    await store.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["sqlite", "write_behind", "log"])
+async def test_transaction_is_atomic(tmp_path, kind):
+    """Test that a conflict or an error in the block writes nothing."""
+    store = await open_store(kind, tmp_path)
+    await store.store(task(), namespace="tasks")
+
+    with pytest.raises(VersionConflict):
+        async with store.transact() as transaction:
+            transaction.store(result(), namespace="task_results")
+            transaction.patch(Task, "t1", {"status": "in_progress"}, "tasks")
+            transaction.update(task(status=TaskStatus.FAILED), "tasks", 1)
+    with pytest.raises(RuntimeError):
+        async with store.transact() as transaction:
+            transaction.delete(Task, "t1", namespace="tasks")
+            raise RuntimeError("abandoned")
+    assert await store.list(TaskResult, namespace="task_results") == []
+    current = await store.fetch_versioned(Task, "t1", namespace="tasks")
+    assert current.version == 1 and current.model.status == TaskStatus.PENDING
+
+    # Later operations see the earlier ones
+    async with store.transact() as transaction:
+        transaction.patch(Task, "t1", {"status": "in_progress"}, "tasks")
+        transaction.update(task(description="e", status="in_progress"), "tasks", 2)
+        transaction.store(task("t2"), namespace="tasks")
+        transaction.delete_many(Task, ["t2"], namespace="tasks")
+    current = await store.fetch_versioned(Task, "t1", namespace="tasks")
+    assert current.version == 3 and current.model.description == "e"
+    assert await store.fetch(Task, "t2", namespace="tasks") is None
+    assert store.stats()["versions"] == {"conflicts": 1}
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_patch_validates_values(tmp_path):
+    """Test that patched values are checked against their fields."""
+    store = await open_store("sqlite", tmp_path)
+    await store.store(task(), namespace="tasks")
+    with pytest.raises(ValueError):
+        await store.patch(Task, "t1", {"no_such_field": 1}, "tasks")
+    with pytest.raises(ValueError):
+        await store.patch(Task, "t1", {"status": "not-a-status"}, "tasks")
+
+    await store.patch(Task, "t1", {"context": {"step": 2}}, "tasks")
+    patched = await store.fetch(Task, "t1", namespace="tasks")
+    assert patched.context == {"step": 2} and patched.status == TaskStatus.PENDING
+    assert await store.query(Task, {"context.step": 2}, namespace="tasks")
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_manager_stores_results_as_tasks_finish(tmp_path):
+    """Test that the manager's tasks are finished by store_task_result()."""
+    store = await open_store("sqlite", tmp_path)
+    manager = LucaManager(context_store=store, tool_registry=ToolRegistry())
+    await manager.initialize()
+    await manager.process_request("hello")
+
+    (finished,) = await store.list(Task, namespace="tasks")
+    assert finished.status == TaskStatus.COMPLETED and finished.completed_at
+    assert (await store.fetch_versioned(Task, finished.id, "tasks")).version == 2
+    (stored,) = await store.list(TaskResult, namespace="task_results")
+    assert stored.task_id == finished.id
+    await store.close()
@@ -0,0 +1,176 @@
+"""Tests for the vector index and semantic recall of messages."""
+
+import pytest
+
+from luca_core.context.embeddings import HashingEmbedder
+from luca_core.context.factory import create_message_recall
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.context.vector_index import VectorIndex
+from luca_core.manager.manager import LucaManager
+from luca_core.schemas import Message, MessageRole
+
+np = pytest.importorskip("numpy")
+
+
+def message(id, content):
+    return Message(id=id, role=MessageRole.USER, content=content)
+
+
+def random_unit(rng, n, dim):
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_hashing_embedder():
+    """Test that embeddings are deterministic, normalised and meaningful."""
+    texts = [
+        "Rebuild the search indexes",
+        "rebuilding the search index",
+        "Lunch options near the office",
+        "",
+    ]
+    embedder = HashingEmbedder(dim=256)
+    vectors = embedder.embed(texts)
+    assert vectors.shape == (4, 256)
+    assert vectors.dtype == np.float32
+    assert np.array_equal(vectors, HashingEmbedder(dim=256).embed(texts))
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1)
+    assert not vectors[3].any()
+    assert vectors[0] @ vectors[1] > 0.5 > vectors[0] @ vectors[2]
+    assert embedder.name != HashingEmbedder(dim=256, char_ngrams=0).name
+
+
+def test_exact_search_matches_brute_force(tmp_path):
+    """Test blocked top-k against a plain full sort, with several queries."""
+    rng = np.random.default_rng(1)
+    vectors = random_unit(rng, 700, 32)
+    index = VectorIndex(tmp_path / "v", 32, block_rows=64)
+    for start in range(0, 700, 100):
+        index.add(
+            [f"k{i}" for i in range(start, start + 100)], vectors[start : start + 100]
+        )
+
+    queries = random_unit(rng, 3, 32)
+    results = index.search_many(queries, k=10)
+    for query, hits in zip(queries, results):
+        expected = np.argsort(-(vectors @ query))[:10]
+        assert [key for key, _ in hits] == [f"k{i}" for i in expected]
+        assert hits[0][1] == pytest.approx(
+            float(vectors[expected[0]] @ query), abs=1e-5
+        )
+    assert index.search(np.zeros(32), k=3) == []
+    assert len(index.search(queries[0], k=1000)) == 700
+
+
+def test_index_persists_and_replaces(tmp_path):
+    """Test reopening, in-place replacement and recovery from a torn append."""
+    path = tmp_path / "v"
+    index = VectorIndex(path, 4, "e1")
+    index.add(["a", "b", "c"], np.eye(4)[:3])
+    index.add(["b"], [[0, 0, 0, 5]])
+    index.close()
+
+    index = VectorIndex(path, 4, "e1")
+    assert len(index) == 3
+    assert index.search([0, 0, 0, 1], k=1) == [("b", pytest.approx(1.0))]
+    index.close()
+
+    # A crash mid-append leaves an unfinished key line; it is dropped and
+    # later appends start on a fresh line
+    with open(path / "keys.txt", "a") as f:
+        f.write('"d')
+    index = VectorIndex(path, 4, "e1")
+    assert len(index) == 3
+    index.add(["e"], [[1, 1, 0, 0]])
+    index.close()
+    assert len(VectorIndex(path, 4, "e1")) == 4
+
+    # Another embedding space discards the index
+    assert len(VectorIndex(path, 4, "e2")) == 0
+    assert len(VectorIndex(path, 8, "e2")) == 0
+
+
+def test_coarse_quantizer(tmp_path):
+    """Test IVF search recall and incremental filing of new rows."""
+    rng = np.random.default_rng(2)
+    # Clustered data, as real embeddings are
+    centers = random_unit(rng, 40, 48)
+    labels = rng.integers(0, 40, 4000)
+    vectors = centers[labels] + 0.1 * rng.standard_normal((4000, 48))
+    index = VectorIndex(tmp_path / "v", 48, probes=8)
+    index.add([f"k{i}" for i in range(3000)], vectors[:3000])
+    index.train()
+    assert index.trained
+    index.add([f"k{i}" for i in range(3000, 4000)], vectors[3000:])
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = unit[rng.choice(4000, 50, replace=False)]
+    found = 0
+    for query in queries:
+        expected = {f"k{i}" for i in np.argsort(-(unit @ query))[:10]}
+        found += len(expected & {key for key, _ in index.search(query, k=10)})
+    assert found / 500 > 0.9
+    # Probing every list is exact
+    query = queries[0]
+    exact = [f"k{i}" for i in np.argsort(-(unit @ query))[:10]]
+    assert [key for key, _ in index.search(query, k=10, probes=1000)] == exact
+
+    index.close()
+    reopened = VectorIndex(tmp_path / "v", 48, probes=1000)
+    assert reopened.trained
+    assert [key for key, _ in reopened.search(query, k=10)] == exact
+    reopened.close()
+
+    # Past coarse_above, training starts in the background on its own
+    index = VectorIndex(tmp_path / "auto", 48, coarse_above=500)
+    index.add([f"k{i}" for i in range(600)], vectors[:600])
+    index.close()
+    assert VectorIndex(tmp_path / "auto", 48).trained
+
+
+@pytest.mark.asyncio
+async def test_manager_recalls_similar_messages(tmp_path):
+    """Test that the manager indexes its messages and recalls by topic."""
+    db_path = tmp_path / "context.db"
+    store = SQLiteContextStore(str(db_path), backup_interval=0)
+    await store.initialize()
+    await store.store_message(message("old", "The staging deploy failed on migrations"))
+
+    recall = create_message_recall(str(db_path), {"recall": {}})
+    assert recall.index.path == tmp_path / "context.vectors"
+    assert create_message_recall(str(db_path), {}) is None
+
+    manager = LucaManager(context_store=store, message_recall=recall, context_limit=2)
+    await manager.initialize()
+    # Start-up indexed the message stored before the manager existed
+    assert "old" in recall.index
+
+    await manager.process_request("What is a good lunch spot nearby?")
+    await manager.process_request("Where can I get coffee?")
+    assert len(recall) == 5
+
+    context = await manager.get_relevant_context("why did the deploy fail on staging")
+    assert context[0].id == "old"
+    assert len(context) == 2
+    others = await manager.get_relevant_context("deploy", exclude={"old"}, limit=1)
+    assert [m.id for m in others] != ["old"]
+    assert len(others) == 1
+
+    # Messages deleted from the store drop out of recall
+    await store.delete(Message, "old", namespace="conversation")
+    assert "old" not in [m.id for m in await recall.recall(store, "deploy staging")]
+    recall.close()
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_manager_without_recall_uses_history(tmp_path):
+    """Test the recency fallback."""
+    store = SQLiteContextStore(str(tmp_path / "context.db"), backup_interval=0)
+    await store.initialize()
+    manager = LucaManager(context_store=store)
+    await store.store_message(message("m1", "first"))
+    await store.store_message(message("m2", "second"))
+    context = await manager.get_relevant_context("anything", exclude={"m2"})
+    assert [m.id for m in context] == ["m1"]
+    await store.close()
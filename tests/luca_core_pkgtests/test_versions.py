@@ -0,0 +1,108 @@
+"""Tests for model versions and compare-and-swap updates."""
+
+import asyncio
+
+import pytest
+
+from luca_core.context.cache import CachedContextStore
+from luca_core.context.log_store import LogContextStore
+from luca_core.context.sqlite_store import SQLiteContextStore
+from luca_core.context.versions import VersionConflict
+from luca_core.schemas import Task, TaskStatus
+
+
+def task(id="t1", **fields):
+    return Task(id=id, agent_id="a", description="d", **fields)
+
+
+async def open_store(kind, tmp_path):
+    if kind == "log":
+        store = LogContextStore(
+            str(tmp_path / "context.log"), log={"compact_interval": 0}
+        )
+    else:
+        store = SQLiteContextStore(
+            str(tmp_path / "context.db"),
+            backup_interval=0,
+            write_behind={} if kind == "write_behind" else None,
+        )
+    await store.initialize()
+    return store
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["sqlite", "write_behind", "log"])
+async def test_compare_and_swap(tmp_path, kind):
+    """Test that versions count writes and stale updates are refused."""
+    store = await open_store(kind, tmp_path)
+    await store.store(task(), namespace="tasks")
+    await store.store(task(), namespace="tasks")
+    current = await store.fetch_versioned(Task, "t1", namespace="tasks")
+    assert current.version == 2
+
+    current.model.status = TaskStatus.IN_PROGRESS
+    await store.update(current.model, "tasks", expected_version=2)
+    with pytest.raises(VersionConflict) as conflict:
+        await store.update(task(status=TaskStatus.FAILED), "tasks", expected_version=2)
+    assert (conflict.value.expected, conflict.value.actual) == (2, 3)
+    stored = await store.fetch_versioned(Task, "t1", namespace="tasks")
+    assert stored.version == 3 and stored.model.status == TaskStatus.IN_PROGRESS
+
+    await store.update_many([task(), task()], namespace="tasks")
+    assert (await store.fetch_versioned(Task, "t1", "tasks")).version == 5
+    await store.delete(Task, "t1", namespace="tasks")
+    with pytest.raises(VersionConflict) as conflict:
+        await store.update(task(), "tasks", expected_version=5)
+    assert conflict.value.actual is None
+    assert await store.fetch_versioned(Task, "t1", "tasks") is None
+    assert store.stats()["versions"] == {"conflicts": 2}
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_modify_across_stores(tmp_path):
+    """Test that read-modify-write cycles from two stores lose nothing."""
+    path = str(tmp_path / "context.db")
+    first = SQLiteContextStore(path, backup_interval=0)
+    second = CachedContextStore(SQLiteContextStore(path, backup_interval=0))
+    await first.initialize()
+    await second.initialize()
+    await first.store(task(context={"count": 0}), namespace="tasks")
+    # Cached by the second store before the first one changes it
+    await second.fetch(Task, "t1", namespace="tasks")
+
+    def increment(model):
+        model.context["count"] += 1
+
+    await asyncio.gather(
+        *(
+            store.modify(Task, "t1", increment, "tasks", attempts=50)
+            for _ in range(10)
+            for store in (first, second)
+        )
+    )
+    final = await second.fetch_versioned(Task, "t1", namespace="tasks")
+    assert final.model.context["count"] == 20 and final.version == 21
+    assert (await second.fetch(Task, "t1", "tasks")).context["count"] == 20
+    assert await first.modify(Task, "missing", increment, "tasks") is None
+
+    await second.update_task_status("t1", "completed")
+    completed = await first.fetch(Task, "t1", namespace="tasks")
+    assert completed.status == TaskStatus.COMPLETED and completed.completed_at
+    assert completed.context["count"] == 20
+    await first.close()
+    await second.close()
+
+
+@pytest.mark.asyncio
+async def test_versions_survive_reopen(tmp_path):
+    """Test that log store versions are rebuilt from its hints and records."""
+    store = await open_store("log", tmp_path)
+    await store.store_many([task(), task("t2")], namespace="tasks")
+    await store.update(task(), "tasks", expected_version=1)
+    await store.close()
+
+    store = await open_store("log", tmp_path)
+    assert (await store.fetch_versioned(Task, "t1", "tasks")).version == 2
+    assert (await store.fetch_versioned(Task, "t2", "tasks")).version == 1
+    await store.close()
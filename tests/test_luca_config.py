@@ -0,0 +1,32 @@
+"""Tests for the context store settings used by scripts/luca.py."""
+
+import sys
+import unittest.mock as mock
+from pathlib import Path
+
+# Add scripts directory to path for luca imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import luca  # noqa: E402
+
+from luca_core.config.loader import ConfigurationError  # noqa: E402
+from luca_core.config.schemas import ConfigSchema  # noqa: E402
+from luca_core.context import factory  # noqa: E402
+
+
+def test_context_store_config_follows_config(tmp_path):
+    """Recall and retention come from the loaded configuration."""
+    configured = ConfigSchema(components={"context_store": {"recall": {}}})
+    with mock.patch.object(luca, "load_config", return_value=configured):
+        config = luca.context_store_config()
+    recall = factory.create_message_recall(str(tmp_path / "luca.db"), config)
+    assert recall.index.path == tmp_path / "luca.vectors"
+    assert config["retention"] == {"days": 30}
+
+    with mock.patch.object(luca, "load_config", return_value=ConfigSchema()):
+        config = luca.context_store_config()
+    assert factory.create_message_recall("luca.db", config) is None
+
+    error = ConfigurationError("broken")
+    with mock.patch.object(luca, "load_config", side_effect=error):
+        assert luca.context_store_config()["retention"] == {"days": 30}